@@ -18,33 +18,52 @@ import sys
 import os
 import types
 import time
+import datetime
 import argparse
 import signal
+import importlib
 
-from typing import List, Optional
+from typing import List, Optional, TYPE_CHECKING
 
 from backend.data.Database import Database
 from backend.data.CSVImporter import CSVImporter
 from backend.data.CSVExporter import CSVExporter
+from backend.data.ArchiveImporter import ArchiveImporter
+from backend.data.ArchiveExporter import ArchiveExporter
 from backend.util.AppInfo import AppInfo
 from backend.util.Settings import Settings
 from backend.util.DisplayPowerManager import DisplayPowerManager
 from backend.util.PluginManager import PluginManager
 from backend.util.Module import Module
-from backend.api.WebSocket import WebSocket
+from backend.util.StartupProfiler import StartupProfiler
+
+if TYPE_CHECKING:
+    from backend.api.WebSocket import WebSocket
+
+STARTUP_TIME = time.perf_counter() # reference for the timings of the startup profiler
 
 class SituationBoardBackend(Module):
     """The SituationBoardBackend class represents the core of the backend service.
     It initializes the different subsystems and implements core application logic
     like the event loop that is responsible for retrieving and handling of alarm events."""
 
-    def __init__(self, appInfo: AppInfo, settings: Settings, database: Database):
+    def __init__(self, appInfo: AppInfo, settings: Settings, database: Database, profiler: Optional[StartupProfiler] = None):
         super().__init__("situationboard", settings)
         self.appInfo = appInfo
         self.settings = settings
         self.database = database
-        self.displayPowerManager = DisplayPowerManager(self.settings)
-        self.webSocket = WebSocket(self.appInfo, self.settings, self.database)
+        self.profiler = profiler if profiler is not None else StartupProfiler(False)
+
+        # the web server (flask/socketio) is only imported when the backend service is started (not for import/export)
+        with self.profiler.phase("Import web server"):
+            webSocketModule = importlib.import_module("backend.api.WebSocket")
+
+        with self.profiler.phase("Init display power manager"):
+            self.displayPowerManager = DisplayPowerManager(self.settings)
+
+        with self.profiler.phase("Init websocket"):
+            self.webSocket: 'WebSocket' = webSocketModule.WebSocket(self.appInfo, self.settings, self.database)
+
         self.pluginManager = PluginManager(self.settings, self.database, self.webSocket, self.displayPowerManager)
         signal.signal(signal.SIGTERM, self.__shutdownHandler) # a SIGTERM signal causes the backend to shutdown
         signal.signal(signal.SIGINT, self.__shutdownHandler)  # a SIGINT signal causes the backend to shutdown
@@ -60,9 +79,16 @@ class SituationBoardBackend(Module):
         """Background thread / event loop that retrieves SourceEvents from configured SourceDrivers
         and handles them by passing them to all the configured Action plugins.
         Those plugins in turn may perform various actions (like updating the frontend of web clients).
-        When no SourceEvents are retrieved, Action plugins are allowed to perform housekeeping operations instead."""
+        When no SourceEvents are retrieved, Action plugins are allowed to perform housekeeping operations instead.
+        Between two iterations the event loop blocks until a SourceDriver pushes a new SourceEvent
+        or until the deadline of the next housekeeping operation (and polling of all SourceDrivers) is reached."""
+
+        self.profiler.mark("Event loop started (accepting alarms)")
+        self.profiler.stopImportTracking()
+        self.profiler.report()
 
-        sleepDuration = self.settings.getBackendLoopSleepDuration()
+        cyclicInterval = self.settings.getBackendLoopSleepDuration()
+        nextCyclic = time.monotonic()
 
         while True:
             # wait for alarms or setting event messages, parse them and handle them
@@ -73,26 +99,33 @@ class SituationBoardBackend(Module):
                 #   new alarm   -> add to database and send an async alarm event to frontend
                 #   new setting -> update setting and send an async update event to frontend
                 self.pluginManager.handleEvent(message)
-            else:
-                # perform housekeeping tasks ...
-                housekeepingStart = time.time()
+                continue
+
+            # inform all clients about a changed source state (the state is determined only once for all clients) ...
+            if self.pluginManager.updateSourceState():
+                self.webSocket.broadcastState()
+
+            # perform housekeeping tasks (if they are due) ...
+            if time.monotonic() >= nextCyclic:
                 self.pluginManager.handleCyclic()
-                housekeepingEnd = time.time()
+                nextCyclic = time.monotonic() + cyclicInterval
 
-                # maybe sleep some time ...
-                housekeepingDuration = housekeepingEnd - housekeepingStart
-                if housekeepingDuration < sleepDuration:
-                    remainingDuration = sleepDuration - housekeepingDuration
-                    self.webSocket.sleep(round(remainingDuration))
+            # wait for pushed source events until the next housekeeping tasks are due ...
+            self.pluginManager.waitForEvent(nextCyclic - time.monotonic())
 
     def run(self) -> None:
         # Read all the configured plugins from the configuration file and initialize them
         self.print("Initializing all configured plugins")
-        self.pluginManager.initPlugins()
+        with self.profiler.phase("Init plugins"):
+            self.pluginManager.initPlugins()
+
+        for (plugin, duration) in self.pluginManager.getInitTimings().items():
+            self.profiler.addPhase(f"Init plugin {plugin}", duration)
 
         # Initialize websocket interface and register all endpoints
         self.print("Initializing websocket interface")
-        self.webSocket.init(self.pluginManager)
+        with self.profiler.phase("Init websocket interface"):
+            self.webSocket.init(self.pluginManager)
 
         # Start the background task with the event loop that retrieves events and handles them
         self.print("Starting background task")
@@ -111,6 +144,10 @@ class SituationBoard(Module):
     DEFAULT_CONFIG_FILENAME   = "situationboard.conf"
     DEFAULT_DATABASE_FILENAME = "situationboard.sqlite"
 
+    FORMAT_CSV     = "csv"
+    FORMAT_ARCHIVE = "archive"
+    FORMATS        = [FORMAT_CSV, FORMAT_ARCHIVE]
+
     def __init__(self) -> None:
         """This constructor is responsible for the early startup of the backend
         and instantiates all the required modules."""
@@ -130,8 +167,8 @@ class SituationBoard(Module):
         igroup = parser.add_argument_group("Important Commands and Parameters")
         mmutex = igroup.add_mutually_exclusive_group()
         mmutex.add_argument("-s", "--server",   help="start backend server (default)",  default=True,                action='store_true')
-        mmutex.add_argument("-i", "--import",   help="import data from CSV",            default=None,                dest='importFile')
-        mmutex.add_argument("-e", "--export",   help="export data to CSV",              default=None,                dest='exportFile')
+        mmutex.add_argument("-i", "--import",   help="import data from CSV (or archive)", default=None,              dest='importFile')
+        mmutex.add_argument("-e", "--export",   help="export data to CSV (or archive)", default=None,                dest='exportFile')
         mmutex.add_argument("-n", "--version",  help="show version number and exit",    default=False,               action='store_true')
         mmutex.add_argument("-h", "--help",     help="show this help message and exit",                              action='help')
         ogroup = parser.add_argument_group("Other Parameters and Options")
@@ -139,6 +176,12 @@ class SituationBoard(Module):
         ogroup.add_argument("-d", "--database", help="alternate path to database file", default=defaultDatabasePath, dest='databasePath')
         ogroup.add_argument("-r", "--reset",    help="reset database before import",    default=False,               action='store_true')
         ogroup.add_argument("-v", "--verbose",  help="force debug output",              default=False,               action='store_true')
+        ogroup.add_argument("--since",          help="export alarms since date (YYYY-MM-DD)", default="",          dest='since')
+        ogroup.add_argument("--until",          help="export alarms until date (YYYY-MM-DD)", default="",          dest='until')
+        ogroup.add_argument("--flags",          help="export alarms with flags (e.g. VALID,INVALID)", default=None, dest='flags')
+        ogroup.add_argument("--import-format",  help="format of the imported file",     default=None, choices=SituationBoard.FORMATS, dest='importFormat')
+        ogroup.add_argument("--export-format",  help="format of the exported file",     default=None, choices=SituationBoard.FORMATS, dest='exportFormat')
+        ogroup.add_argument("--profile-startup", help="print startup timings and import times", default=False,   action='store_true', dest='profileStartup')
 
         # args = parser.parse_args(argv)
         args = parser.parse_args()
@@ -148,36 +191,82 @@ class SituationBoard(Module):
             parser.error("reset is only allowed for the import command")
             sys.exit(1)
 
+        if (args.since != "" or args.until != "" or args.flags is not None) and (args.exportFile is None):
+            parser.error("since, until and flags are only allowed for the export command")
+            sys.exit(1)
+
+        if (args.importFormat is not None) and (args.importFile is None):
+            parser.error("import-format is only allowed for the import command")
+            sys.exit(1)
+
+        if (args.exportFormat is not None) and (args.exportFile is None):
+            parser.error("export-format is only allowed for the export command")
+            sys.exit(1)
+
+        if (args.profileStartup is True) and (args.importFile is not None or args.exportFile is not None):
+            parser.error("profile-startup is only allowed for the server command")
+            sys.exit(1)
+
+        for date in [args.since, args.until]:
+            try:
+                if date != "":
+                    datetime.date.fromisoformat(date)
+            except ValueError:
+                parser.error(f"invalid date {date} (expected YYYY-MM-DD)")
+                sys.exit(1)
+
+        exportFlags: Optional[List[str]] = None
+        if args.flags is not None:
+            exportFlags = [flag.strip().upper() for flag in args.flags.split(",") if flag.strip() != ""]
+
         # Show version number and exit (if requested)
         if args.version:
             print(f"{self.appInfo.name} {self.appInfo.version}")
             sys.exit(0)
 
+        importArchive = (args.importFormat == SituationBoard.FORMAT_ARCHIVE)
+        exportArchive = (args.exportFormat == SituationBoard.FORMAT_ARCHIVE)
+
         # Print application header
         if args.importFile is not None:
-            self.print("Starting import from CSV...")
+            self.print("Starting import from archive..." if importArchive else "Starting import from CSV...")
         elif args.exportFile is not None:
-            self.print("Starting export to CSV...")
+            self.print("Starting export to archive..." if exportArchive else "Starting export to CSV...")
         else:
             self.clrPrint(f"Starting {self.appInfo.name} backend v{self.appInfo.version} (PID {self.appInfo.pid})")
 
+        profiler = StartupProfiler(args.profileStartup, startTime = STARTUP_TIME)
+        profiler.startImportTracking()
+
         # Load configuration and database
-        settings = Settings(args.configPath, self.appInfo.path, args.verbose)
-        database = Database(args.databasePath, args.reset)
+        with profiler.phase("Load settings"):
+            settings = Settings(args.configPath, self.appInfo.path, args.verbose)
+
+        with profiler.phase("Open database"):
+            database = Database(args.databasePath, args.reset, settings = settings)
+
         self.lateInit(settings)
 
-        # Handle CSV import/export (if required)
+        # Handle CSV/archive import/export (if required)
         if args.importFile is not None:
-            csvImporter = CSVImporter(database)
-            result = csvImporter.importEvents(args.importFile)
+            if importArchive:
+                archiveImporter = ArchiveImporter(database)
+                result = archiveImporter.importEvents(args.importFile)
+            else:
+                csvImporter = CSVImporter(database)
+                result = csvImporter.importEvents(args.importFile)
             sys.exit(result)
         elif args.exportFile is not None:
-            csvExporter = CSVExporter(database)
-            result = csvExporter.exportEvents(args.exportFile)
+            if exportArchive:
+                archiveExporter = ArchiveExporter(database)
+                result = archiveExporter.exportEvents(args.exportFile, since = args.since, until = args.until, flags = exportFlags)
+            else:
+                csvExporter = CSVExporter(database)
+                result = csvExporter.exportEvents(args.exportFile, since = args.since, until = args.until, flags = exportFlags)
             sys.exit(result)
 
         # Start SituationBoard backend service
-        backendService = SituationBoardBackend(self.appInfo, settings, database)
+        backendService = SituationBoardBackend(self.appInfo, settings, database, profiler)
         backendService.run()
 
 
@@ -14,6 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+from typing import Any, Dict
+
 from backend.util.Plugin import Plugin
 from backend.util.Settings import Settings
 
@@ -22,13 +24,23 @@ from backend.event.SourceEvent import SourceEvent
 class Action(Plugin):
     """Action plugins implement the handling of SourceEvents and perform operations like updating the frontend.
     Action plugins have a unique name, implement the methods specified below
-    and have to be registered with the PluginManager.
+    and have to be registered with the PluginRegistry.
     They can retrieve settings from their respective section of the configuration file with the helper methods
     provided by the Plugin base class. In addition, they can print log/debug/error messages with the helper methods
     provided by the Module base class."""
 
     PLUGIN_TYPE = "action"
 
+    # Hints for the concurrent dispatch of SourceEvents (see action_dispatch setting of the backend):
+    # CONCURRENT           - handleEvent/handleCyclic may run on a worker thread of the plugin (instead of the event loop)
+    # ENRICHES_EVENT       - handleEvent augments the SourceEvent (e.g. with the location of an alarm)
+    # USES_ENRICHED_EVENT  - handleEvent has to wait for all preceding Action plugins that enrich the SourceEvent
+    CONCURRENT          = False
+    ENRICHES_EVENT      = False
+    USES_ENRICHED_EVENT = True
+
+    DEFAULT_DEADLINE = 10.0 # in seconds
+
     def __init__(self, actionPluginName: str, instanceName: str, settings: Settings, multipleInstances: bool = False) -> None:
         """Constructs a Action plugin with a unique action name and access to settings and initializes it.
 
@@ -38,6 +50,21 @@ class Action(Plugin):
         :param multipleInstances: boolean that specifies whether multiple (named) instances of this action plugin are supported"""
         super().__init__(Action.PLUGIN_TYPE, actionPluginName, instanceName, settings, multipleInstances)
 
+    def getDeadline(self) -> float:
+        """Returns the duration (in seconds) the handling of a SourceEvent by this plugin should take at most.
+        When dispatching concurrently, dependent Action plugins stop waiting for this plugin after the deadline.
+        The deadline can be adjusted with the deadline setting in the configuration section of the plugin.
+
+        :return: float with the deadline (in seconds)"""
+        return self.getSettingFloat("deadline", self.DEFAULT_DEADLINE)
+
+    def getState(self) -> Dict[str, Any]:
+        """Returns plugin-specific state information (e.g. for the state Web API).
+        Plugins without any relevant state information return an empty dict.
+
+        :return: dict with state information that can be serialized to JSON"""
+        return {}
+
     def handleEvent(self, sourceEvent: SourceEvent) -> None:
         """This method is called when a SourceEvent was received and implements
         the handling of SourceEvents by triggering plugin-specific actions.
@@ -25,6 +25,10 @@ from backend.event.SettingEvent import SettingEvent
 
 class ActionActivateScreen(Action):
 
+    USES_ENRICHED_EVENT = False
+
+    DEPENDENCIES = [Action.DEPENDENCY_DISPLAYPOWERMANAGER]
+
     def __init__(self, instanceName: str, settings: Settings, displayPowerManager: DisplayPowerManager):
         super().__init__("activate_screen", instanceName, settings)
         self.__displayPowerManager = displayPowerManager
@@ -14,18 +14,103 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from geopy.geocoders import Nominatim
+from typing import Any, Dict, Optional, Tuple
 
 from backend.action.Action import Action
 from backend.util.Settings import Settings
+from backend.data.Database import Database
+from backend.data.GeocodeCache import GeocodeCache
+from backend.data.Gazetteer import Gazetteer
 from backend.event.SourceEvent import SourceEvent
 from backend.event.AlarmEvent import AlarmEvent
 
 class ActionSearchLocation(Action):
 
-    def __init__(self, instanceName: str, settings: Settings):
+    CONCURRENT          = True
+    ENRICHES_EVENT      = True
+    USES_ENRICHED_EVENT = False
+
+    DEPENDENCIES = [Action.DEPENDENCY_DATABASE]
+
+    GEOCODER_NOMINATIM           = "nominatim"            # online search (Nominatim of OpenStreetMap)
+    GEOCODER_GAZETTEER           = "gazetteer"            # offline search (local gazetteer file)
+    GEOCODER_GAZETTEER_NOMINATIM = "gazetteer_nominatim"  # offline search with online search as fallback
+    GEOCODERS = [GEOCODER_NOMINATIM, GEOCODER_GAZETTEER, GEOCODER_GAZETTEER_NOMINATIM]
+
+    def __init__(self, instanceName: str, settings: Settings, database: Database, geocoder: Optional[Any] = None):
+        """Constructs the ActionSearchLocation plugin.
+
+        :param instanceName: optional string representing a unique instance name of the action plugin
+        :param settings: reference to the Settings object
+        :param database: reference to the Database (the geocode cache is stored in the same file)
+        :param geocoder: online geocoder with a geopy compatible geocode method (optional; Nominatim is used by default)"""
         super().__init__("search_location", instanceName, settings)
         self.__timeout = self.getSettingInt("timeout", 5)
+        mode = self.getSettingOption("geocoder", ActionSearchLocation.GEOCODERS, ActionSearchLocation.GEOCODER_NOMINATIM)
+
+        self.__gazetteer: Optional[Gazetteer] = None
+        if mode in (ActionSearchLocation.GEOCODER_GAZETTEER, ActionSearchLocation.GEOCODER_GAZETTEER_NOMINATIM):
+            self.__gazetteer = Gazetteer(str(self), self.getSettingFilename("gazetteer_file", "gazetteer.csv"))
+
+        self.__geocoder: Optional[Any] = None
+        if mode in (ActionSearchLocation.GEOCODER_NOMINATIM, ActionSearchLocation.GEOCODER_GAZETTEER_NOMINATIM):
+            if geocoder is not None:
+                self.__geocoder = geocoder
+            else:
+                # geopy is only imported if the online search is used (it is slow to import and not needed offline)
+                from geopy.geocoders import Nominatim # pylint: disable=import-outside-toplevel
+                self.__geocoder = Nominatim(user_agent="SB", timeout=self.__timeout)
+
+        self.__cache: Optional[GeocodeCache] = None
+        if self.getSettingBoolean("cache", True):
+            cacheSize = self.getSettingInt("cache_size", 10000)
+            cacheTTL = self.getSettingFloat("cache_ttl", 365.0) * 24.0 * 3600.0                  # in days
+            cacheNegativeTTL = self.getSettingFloat("cache_negative_ttl", 24.0) * 3600.0         # in hours
+            self.__cache = GeocodeCache(str(self), database.getFilename(), cacheSize, cacheTTL, cacheNegativeTTL)
+            prewarmed = self.__cache.prewarm()
+            if prewarmed > 0:
+                self.print(f"Prewarmed geocode cache with {prewarmed} locations of previous alarm events")
+
+    def getDeadline(self) -> float:
+        return self.getSettingFloat("deadline", self.__timeout + 1.0)
+
+    def __searchLocation(self, geocoder: Any, address: str) -> Optional[Any]:
+        self.dbgPrint(f"Searching address: {address}")
+        location = geocoder.geocode(address)
+        if location is not None:
+            self.dbgPrint(f"Found address: {location.address}")
+            self.dbgPrint(f"Found location: latitude={location.latitude} longitude={location.longitude}")
+            #self.dbgPrint(location.raw)
+        return location
+
+    def __searchCoordinates(self, location: str, locationDetails: str) -> Optional[Tuple[float, float]]:
+        if self.__gazetteer is not None:
+            # the local gazetteer is searched first (it is fast and does not depend on network access)
+            gazetteerLocation = self.__gazetteer.search(location, locationDetails)
+            if gazetteerLocation is not None:
+                self.dbgPrint(f"Found address in gazetteer: {gazetteerLocation.address}")
+                return (gazetteerLocation.latitude, gazetteerLocation.longitude)
+
+        if self.__cache is not None:
+            (cached, coordinates) = self.__cache.lookup(location, locationDetails)
+            if cached:
+                if coordinates is not None:
+                    self.dbgPrint(f"Found cached location: latitude={coordinates[0]} longitude={coordinates[1]}")
+                return coordinates
+
+        if self.__geocoder is None:
+            return None
+
+        try:
+            networkLocation = self.__searchLocation(self.__geocoder, location + " " + locationDetails)
+        except Exception:
+            # errors (e.g. network issues) are not cached
+            return None
+
+        coordinates = (networkLocation.latitude, networkLocation.longitude) if networkLocation is not None else None
+        if self.__cache is not None:
+            self.__cache.store(location, locationDetails, coordinates)
+        return coordinates
 
     def handleEvent(self, sourceEvent: SourceEvent) -> None:
         if isinstance(sourceEvent, AlarmEvent):
@@ -36,20 +121,18 @@ class ActionSearchLocation(Action):
 
             if alarmEvent.locationLatitude == 0.0 and alarmEvent.locationLongitude == 0.0:
                 if alarmEvent.location != "" and alarmEvent.locationDetails != "":
-                    address = alarmEvent.location + " " + alarmEvent.locationDetails
-                    try:
-                        geoLocator = Nominatim(user_agent="SB", timeout=self.__timeout)
-                        self.dbgPrint(f"Searching address: {address}")
-                        location = geoLocator.geocode(address)
-                        if location is not None:
-                            self.dbgPrint(f"Found address: {location.address}")
-                            self.dbgPrint(f"Found location: latitude={location.latitude} longitude={location.longitude}")
-                            #self.dbgPrint(location.raw)
-
-                            alarmEvent.locationLatitude = location.latitude
-                            alarmEvent.locationLongitude = location.longitude
-                        else:
-                            self.error("Failed to search location")
-
-                    except Exception:
+                    coordinates = self.__searchCoordinates(alarmEvent.location, alarmEvent.locationDetails)
+                    if coordinates is not None:
+                        (alarmEvent.locationLatitude, alarmEvent.locationLongitude) = coordinates
+                    else:
                         self.error("Failed to search location")
+
+    def handleCyclic(self) -> None:
+        if self.__cache is not None:
+            self.__cache.flush()
+
+    def getState(self) -> Dict[str, Any]:
+        if self.__cache is None:
+            return {}
+
+        return {'geocode_cache': self.__cache.getState()}
@@ -14,16 +14,22 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import ssl
 import json
 import time
+import sqlite3
+import hashlib
+import threading
 
 import urllib.parse as URLParse
-import http.client as HTTPClient
 
-from typing import List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
 
 from backend.action.Action import Action
+from backend.data.Outbox import Outbox, OutboxItem
 from backend.util.Settings import Settings
+from backend.util.HTTPSConnectionPool import HTTPSConnectionPool
 from backend.event.SourceEvent import SourceEvent
 from backend.event.AlarmEvent import AlarmEvent
 from backend.event.SettingEvent import SettingEvent
@@ -36,7 +42,6 @@ class _PowerAlarmMessage:
         self.details = ""
         self.locationLongitude = 0.0
         self.locationLatitude = 0.0
-        self.timestamp = 0.0
 
     def isEmpty(self) -> bool:
         return (self.text == "" and self.details == "")
@@ -47,14 +52,15 @@ class _PowerAlarmMessage:
     def hasLocation(self) -> bool:
         return (self.locationLatitude != 0.0 or self.locationLongitude != 0.0)
 
-    def isIdentical(self, message: "_PowerAlarmMessage") -> bool:
-        return (self.text == message.text
-            and self.details == message.details
-            and self.locationLongitude == message.locationLongitude
-            and self.locationLatitude == message.locationLatitude)
+    def getKey(self, apiGroup: str) -> str:
+        """Returns an idempotency key that identifies this message for a specific group."""
+        content = f"{apiGroup}\x00{self.text}\x00{self.details}\x00{self.locationLatitude}\x00{self.locationLongitude}"
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
 class ActionSendMessagePowerAlarm(Action):
 
+    CONCURRENT = True
+
     API_URL = "www.poweralarm.de"
     API_REQUEST = "/api/custom/?apikey={VAPIKEY}&action={VACTION}&kuerzel={VGROUP}&text={VMESSAGE}"
     API_REQUEST_ADDON_DETAILS = "&zusatz={VDETAILS}"
@@ -69,12 +75,27 @@ class ActionSendMessagePowerAlarm(Action):
     API_GROUP_ADMIN     = 5
     API_GROUP_MAX       = 6
 
-    def __init__(self, instanceName: str, settings: Settings, test: bool = False):
-        super().__init__("send_poweralarm", instanceName, settings)
+    SENDER_IDLE_DURATION = 10.0          # in seconds
+    SENDER_BACKOFF       = 1.0           # in seconds (doubled after each failed access of the outbox)
+    PURGE_INTERVAL       = 60 * 60       # in seconds
+    RETENTION_DURATION   = 24 * 60 * 60  # in seconds
+    REFRESH_BACKOFF      = 5.0           # in seconds (doubled after each failed refresh of the connections)
+    REFRESH_BACKOFF_MAX  = 5 * 60        # in seconds
+
+    def __init__(self, instanceName: str, settings: Settings, test: bool = False, sslContext: Optional[ssl.SSLContext] = None):
+        super().__init__("send_poweralarm", instanceName, settings, True)
         self.__test = test
 
         self.__apiKey                = self.getSettingString("api_key", "")
+        self.__apiURL                = self.getSettingString("api_url", ActionSendMessagePowerAlarm.API_URL)
+        self.__apiPort               = self.getSettingInt("api_port", 443)
         self.__timeout               = self.getSettingInt("timeout", 5)
+        self.__connectionPoolSize    = self.getSettingInt("connection_pool_size", 4)
+        self.__keepaliveDuration     = self.getSettingInt("keepalive_duration", 30)
+        self.__outboxFilename        = self.getSettingFilename("outbox_file", self.__getDefaultOutboxFilename(instanceName))
+        self.__retryDuration         = self.getSettingInt("retry_duration", 600)
+        self.__retryBackoff          = self.getSettingFloat("retry_backoff", 2.0)
+        self.__retryBackoffMax       = self.getSettingFloat("retry_backoff_max", 60.0)
         self.__alarmMessage          = self.getSettingString("alarm_message", "Alarm")
         self.__deduplicationDuration = self.getSettingInt("deduplication_duration", 60)
         self.__sendInvalid           = self.getSettingBoolean("send_invalid", True)
@@ -82,8 +103,6 @@ class ActionSendMessagePowerAlarm(Action):
         self.__adminSendUnhandled    = self.getSettingBoolean("admin_send_unhandled", True)
         self.__adminSendInvalid      = self.getSettingBoolean("admin_send_invalid", False)
 
-        self.__lastMessage: List[Optional[_PowerAlarmMessage]] = [None] * ActionSendMessagePowerAlarm.API_GROUP_MAX
-
         self.__apiGroups = [""] * ActionSendMessagePowerAlarm.API_GROUP_MAX
         self.__apiGroups[ActionSendMessagePowerAlarm.API_GROUP_NODETAILS] = self.getSettingString("api_group_nodetails", "")
         self.__apiGroups[ActionSendMessagePowerAlarm.API_GROUP_REDUCED]   = self.getSettingString("api_group_reduced", "")
@@ -95,6 +114,191 @@ class ActionSendMessagePowerAlarm(Action):
         if self.__apiKey == "":
             self.fatal("No API key specified in configuration")
 
+        # messages are only added to a durable outbox during the handling of events;
+        # a background sender delivers them concurrently via persistent connections (and retries failed requests)
+        self.__outbox: Optional[Outbox] = None
+        self.__connectionPool = HTTPSConnectionPool(self.__apiURL, self.__apiPort, self.__timeout,
+                                                    self.__connectionPoolSize, self.__keepaliveDuration, sslContext=sslContext)
+        self.__executor = ThreadPoolExecutor(max_workers=ActionSendMessagePowerAlarm.API_GROUP_MAX, thread_name_prefix=str(self))
+        self.__senderWakeup = threading.Event()
+        self.__senderStop = threading.Event()
+        self.__senderThread: Optional[threading.Thread] = None
+        self.__senderErrors = 0
+        self.__deliveryLock = threading.Lock()
+        self.__deliveries = 0
+        self.__lastPurge = 0.0
+        self.__refreshFuture: Optional['Future[None]'] = None
+        self.__refreshFailures = 0
+        self.__nextRefresh = 0.0
+
+        if not self.__test:
+            self.__outbox = Outbox(str(self), self.__outboxFilename)
+            # establish the connections in advance (without delaying the startup)
+            self.__executor.submit(self.__connectionPool.warmup)
+            self.__senderThread = threading.Thread(target=self.__senderLoop, name=f"{self}:sender", daemon=True)
+            self.__senderThread.start()
+
+    @staticmethod
+    def __getDefaultOutboxFilename(instanceName: str) -> str:
+        # each instance requires its own outbox
+        if instanceName != "":
+            return f"situationboard_outbox_{instanceName}.sqlite"
+        return "situationboard_outbox.sqlite"
+
+    def handleCyclic(self) -> None:
+        if self.__outbox is None:
+            return
+
+        # the connections are refreshed in the background (handshakes may take up to the timeout when PowerAlarm is unreachable)
+        refreshBusy = self.__refreshFuture is not None and not self.__refreshFuture.done()
+        if not refreshBusy and time.monotonic() >= self.__nextRefresh:
+            self.__refreshFuture = self.__executor.submit(self.__refreshConnections)
+
+        if time.time() - self.__lastPurge >= ActionSendMessagePowerAlarm.PURGE_INTERVAL:
+            self.__lastPurge = time.time()
+            self.__outbox.purge(max(self.__deduplicationDuration, ActionSendMessagePowerAlarm.RETENTION_DURATION))
+
+    def __refreshConnections(self) -> None:
+        if self.__connectionPool.refresh():
+            self.__refreshFailures = 0
+            self.__nextRefresh = 0.0
+        else:
+            # back off while PowerAlarm is unreachable
+            delay = min(ActionSendMessagePowerAlarm.REFRESH_BACKOFF * (2 ** self.__refreshFailures), ActionSendMessagePowerAlarm.REFRESH_BACKOFF_MAX)
+            self.__refreshFailures += 1
+            self.__nextRefresh = time.monotonic() + delay
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stops the background sender and waits for the running deliveries
+        (messages that are not delivered yet remain in the outbox and are delivered after a restart).
+
+        :param timeout: maximum duration to wait for the background sender (in seconds; None waits indefinitely)"""
+        self.__senderStop.set()
+        self.__senderWakeup.set()
+        if self.__senderThread is not None:
+            self.__senderThread.join(timeout)
+
+        self.__executor.shutdown(wait=True, cancel_futures=True)
+        self.__connectionPool.close()
+        if self.__outbox is not None:
+            self.__outbox.close()
+
+    def getState(self) -> Dict[str, Any]:
+        if self.__outbox is None:
+            return {}
+
+        try:
+            outboxState = self.__outbox.getState()
+        except sqlite3.Error as e:
+            outboxState = {'error': str(e)}
+
+        connectionState = self.__connectionPool.getState()
+        connectionState['refreshFailures'] = self.__refreshFailures
+        return {'outbox': outboxState, 'connections': connectionState, 'sender': {'errors': self.__senderErrors}}
+
+    def waitForDelivery(self, timeout: float) -> bool:
+        """Blocks until all pending messages are delivered (or given up) or the timeout expires.
+
+        :param timeout: maximum duration to wait (in seconds)
+        :return: bool whether there are no pending messages left"""
+        if self.__outbox is None:
+            return True
+
+        endTime = time.monotonic() + timeout
+        while self.__outbox.getPendingCount() > 0:
+            if time.monotonic() >= endTime:
+                return False
+            time.sleep(0.01)
+
+        return True
+
+    def __senderLoop(self) -> None:
+        if self.__outbox is None:
+            return
+
+        # worst case of a delivery: connect and request, reconnect and retry the request
+        # (plus waiting for a refresh of the connections that occupies a worker of the executor)
+        leaseDuration = 5.0 * self.__timeout + 1.0
+        failures = 0
+
+        while not self.__senderStop.is_set():
+            self.__senderWakeup.clear()
+
+            try:
+                timeout = self.__sendDueItems(self.__outbox, leaseDuration)
+                failures = 0
+            except Exception as e:
+                # the outbox may be unavailable for a while (e.g. database is locked); new messages do not shorten the backoff
+                delay = min(ActionSendMessagePowerAlarm.SENDER_BACKOFF * (2 ** failures), ActionSendMessagePowerAlarm.SENDER_IDLE_DURATION)
+                failures += 1
+                self.__senderErrors += 1
+                self.error(f"Failed to access outbox (retry in {delay:.0f} seconds) ({e})")
+                self.__senderStop.wait(delay)
+                continue
+
+            self.__senderWakeup.wait(timeout)
+
+    def __sendDueItems(self, outbox: Outbox, leaseDuration: float) -> float:
+        """Submits the deliveries of all due messages and returns the duration until the next due message."""
+        expired = outbox.expire(self.__retryDuration)
+        if expired > 0:
+            self.error(f"Gave up on {expired} messages after {self.__retryDuration} seconds")
+
+        # only as many notifications are leased as can be delivered right away (the lease does not cover waiting in the executor)
+        with self.__deliveryLock:
+            available = ActionSendMessagePowerAlarm.API_GROUP_MAX - self.__deliveries
+        if available > 0:
+            for item in outbox.acquireDueItems(leaseDuration, available):
+                with self.__deliveryLock:
+                    self.__deliveries += 1
+                self.__executor.submit(self.__deliver, item)
+
+        timeout = ActionSendMessagePowerAlarm.SENDER_IDLE_DURATION
+        nextAttempt = outbox.getNextAttempt()
+        if nextAttempt is not None:
+            timeout = min(max(nextAttempt - time.time(), 0.0), timeout)
+        return timeout
+
+    def __deliver(self, item: OutboxItem) -> None:
+        if self.__outbox is None:
+            return
+
+        try:
+            self.dbgPrint(f"API request:\n{item.request}")
+
+            (status, responseData) = self.__connectionPool.request('GET', item.request)
+            response = responseData.decode("utf-8")
+            try:
+                result = json.loads(response)
+                self.dbgPrint(f"API response:\n{json.dumps(result)}")
+            except Exception:
+                self.dbgPrint(f"API response:\n{response}")
+
+            if status >= 500 or status in (408, 429):
+                raise Exception(f"HTTP status {status}")
+
+            if status >= 400:
+                # the request was rejected (e.g. invalid API key); retrying does not help
+                self.error(f"Failed to send message to group {item.target} (HTTP status {status})")
+                self.__outbox.markFailed(item, f"HTTP status {status}")
+            else:
+                self.__outbox.markSent(item)
+                self.dbgPrint(f"Sent message to group {item.target}")
+
+        except Exception as e:
+            delay = min(self.__retryBackoff * (2 ** item.attempts), self.__retryBackoffMax)
+            if time.time() + delay >= item.created + self.__retryDuration:
+                self.error(f"Failed to send message to group {item.target} (attempt {item.attempts + 1}; giving up) ({e})")
+                self.__outbox.markFailed(item, str(e))
+            else:
+                self.error(f"Failed to send message to group {item.target} (attempt {item.attempts + 1}; retry in {delay:.0f} seconds) ({e})")
+                self.__outbox.markRetry(item, delay, str(e))
+
+        finally:
+            with self.__deliveryLock:
+                self.__deliveries -= 1
+            self.__senderWakeup.set()
+
     def handleEvent(self, sourceEvent: SourceEvent) -> None:
         if isinstance(sourceEvent, AlarmEvent):
             alarmEvent = sourceEvent
@@ -254,20 +458,6 @@ class ActionSendMessagePowerAlarm(Action):
         if message.isEmpty():
             return
 
-        if self.__deduplicationDuration > 0:
-            # Check for message duplication
-            lastMessage = self.__lastMessage[apiGroupID]
-            if lastMessage is not None:
-                # There was a previous message for this group
-                secondsPassed = time.time() - lastMessage.timestamp
-                if secondsPassed < self.__deduplicationDuration:
-                    # It was not sent too long ago
-                    if message.isIdentical(lastMessage):
-                        # Exactly the same message already sent to this group not too long ago -> ignore new message
-                        return
-
-        self.print(f"Sending message to group {apiGroup}")
-
         self.dbgPrint(f"Message:\n{message.text}")
         completeRequest = ActionSendMessagePowerAlarm.API_REQUEST.format(
             VAPIKEY=URLParse.quote(self.__apiKey, ""),
@@ -285,22 +475,12 @@ class ActionSendMessagePowerAlarm(Action):
             completeRequest += ActionSendMessagePowerAlarm.API_REQUEST_ADDON_LOCATION.format(
                 VLAT=message.locationLatitude, VLONG=message.locationLongitude)
 
-        try:
-            connection = HTTPClient.HTTPSConnection(ActionSendMessagePowerAlarm.API_URL, 443, timeout=self.__timeout)
-            connection.connect()
-
-            self.dbgPrint(f"API request:\n{completeRequest}")
-
-            connection.request('GET', completeRequest)
-            response = connection.getresponse().read().decode("utf-8")
-            try:
-                result = json.loads(response)
-                self.dbgPrint(f"API response:\n{json.dumps(result)}")
-            except Exception:
-                self.dbgPrint(f"API response:\n{response}")
-
-            message.timestamp = time.time()
-            self.__lastMessage[apiGroupID] = message
+        if self.__outbox is None:
+            return
 
-        except Exception as e:
-            self.error(f"Failed to send message ({e})")
+        # identical messages are not sent again to the same group within the deduplication duration
+        if self.__outbox.enqueue(message.getKey(apiGroup), apiGroup, completeRequest, self.__deduplicationDuration):
+            self.print(f"Sending message to group {apiGroup}")
+            self.__senderWakeup.set()
+        else:
+            self.dbgPrint(f"Ignoring duplicate message to group {apiGroup}")
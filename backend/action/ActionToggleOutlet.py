@@ -26,6 +26,9 @@ from backend.event.AlarmEvent import AlarmEvent
 
 class ActionToggleOutlet(Action):
 
+    CONCURRENT          = True
+    USES_ENRICHED_EVENT = False
+
     API_SET = "/relay?state={STATE}" # STATE=0 (OFF) STATE=1 (ON)
     API_TOGGLE = "/toggle"
     API_REPORT = "/report"
@@ -25,6 +25,9 @@ from backend.event.AlarmEvent import AlarmEvent
 
 class ActionToggleOutput(Action):
 
+    CONCURRENT          = True
+    USES_ENRICHED_EVENT = False
+
     def __init__(self, instanceName: str, settings: Settings):
         super().__init__("toggle_output", instanceName, settings, multipleInstances=True)
         self.__pin = self.getSettingInt("pin", 0) # BCM
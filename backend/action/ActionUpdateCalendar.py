@@ -25,6 +25,10 @@ from backend.api.WebSocket import WebSocket
 
 class ActionUpdateCalendar(Action):
 
+    USES_ENRICHED_EVENT = False
+
+    DEPENDENCIES = [Action.DEPENDENCY_WEBSOCKET]
+
     def __init__(self, instanceName: str, settings: Settings, webSocket: WebSocket):
         super().__init__("update_calendar", instanceName, settings)
         self.__webSocket = webSocket
@@ -33,13 +37,15 @@ class ActionUpdateCalendar(Action):
         self.__calendarUpdateDuration = self.getSettingInt("calendar_update_duration", 120 * 60) # every 2 hours
         self.__timeout = self.getSettingInt("timeout", 5)
 
+        # the initial download is deferred to the first cyclic call (it must not delay the startup of the backend
+        # and the calendar change can only be broadcast by the event loop after the WebSocket is initialized)
         self.__lastUpdateTimestamp = 0.0
 
-        self.print("Updating calendar (initial)")
-        self.updateCalendar()
-
     def handleCyclic(self) -> None:
-        if self.__calendarUpdateDuration > 0 and self.__lastUpdateTimestamp > 0:
+        if self.__lastUpdateTimestamp == 0:
+            self.print("Updating calendar (initial)")
+            self.updateCalendar()
+        elif self.__calendarUpdateDuration > 0:
             nowTimestamp = time.time()
             endTimestamp = self.__lastUpdateTimestamp + self.__calendarUpdateDuration
             if nowTimestamp >= endTimestamp:
@@ -23,6 +23,8 @@ from backend.event.AlarmEvent import AlarmEvent
 
 class ActionUpdateDatabase(Action):
 
+    DEPENDENCIES = [Action.DEPENDENCY_DATABASE, Action.DEPENDENCY_WEBSOCKET]
+
     def __init__(self, instanceName: str, settings: Settings, database: Database, webSocket: WebSocket):
         super().__init__("update_database", instanceName, settings)
         self.__database = database
@@ -34,8 +36,11 @@ class ActionUpdateDatabase(Action):
             if alarmEvent.noID:
                 self.print("Adding alarm event")
                 self.__database.addEvent(alarmEvent)
+                change = WebSocket.CHANGE_ADDED
             else:
                 self.print(f"Updating alarm event #{alarmEvent.eventID}")
                 self.__database.updateEvent(alarmEvent)
+                change = WebSocket.CHANGE_UPDATED
             self.__database.commit()
-            self.__webSocket.broadcastDatabaseChanged()
+            # clients apply the change directly (instead of requesting the whole alarm list)
+            self.__webSocket.broadcastDatabaseChanged(change, alarmEvent)
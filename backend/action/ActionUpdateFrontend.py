@@ -24,6 +24,8 @@ from backend.event.SettingEvent import SettingEvent
 
 class ActionUpdateFrontend(Action):
 
+    DEPENDENCIES = [Action.DEPENDENCY_WEBSOCKET]
+
     def __init__(self, instanceName: str, settings: Settings, webSocket: WebSocket):
         super().__init__("update_frontend", instanceName, settings)
         self.__webSocket = webSocket
@@ -22,6 +22,8 @@ from backend.event.SettingEvent import SettingEvent
 
 class ActionUpdateSettings(Action):
 
+    USES_ENRICHED_EVENT = False
+
     def __init__(self, instanceName: str, settings: Settings):
         super().__init__("update_settings", instanceName, settings)
 
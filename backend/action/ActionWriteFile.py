@@ -21,6 +21,9 @@ from backend.event.AlarmEvent import AlarmEvent
 
 class ActionWriteFile(Action):
 
+    CONCURRENT          = True
+    USES_ENRICHED_EVENT = False
+
     def __init__(self, instanceName: str, settings: Settings):
         super().__init__("write_file", instanceName, settings)
         self.__filename = self.getSettingFilename("filename", "alarm.txt")
@@ -16,8 +16,9 @@
 
 import json
 import errno
+import datetime
 
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, List, Mapping, Tuple
 
 from flask import Flask, Response, render_template, session, request, send_from_directory
 from flask_socketio import SocketIO, emit
@@ -26,6 +27,7 @@ from backend.util.AppInfo import AppInfo
 from backend.util.Module import Module
 from backend.util.Settings import Settings
 from backend.util.PluginManager import PluginManager
+from backend.util.ResponseCache import ResponseCache, EncodedPayload, PayloadJSON
 from backend.data.Database import Database, DatabaseTimespan
 from backend.source.SourceDriver import SourceState
 from backend.event.AlarmEvent import AlarmEvent
@@ -43,6 +45,13 @@ class WebSocket(Module):
     FF = 'frontend/'     # frontend folder
 
     MIME_JS = 'application/javascript'
+    MIME_JSON = 'application/json'
+
+    CHANGE_ADDED   = "added"
+    CHANGE_UPDATED = "updated"
+
+    DEFAULT_PAGE_SIZE = 50   # alarm events per page of the alarm history
+    MAX_PAGE_SIZE     = 500  # keeps size and latency of responses bounded
 
     def __init__(self, appInfo: AppInfo, settings: Settings, database: Database):
         super().__init__("websocket", settings)
@@ -53,10 +62,14 @@ class WebSocket(Module):
 
         self.clientCount = 0
 
+        # encoded payloads of read-only requests (invalidated by any change of the database);
+        # payloads of Socket.IO events are encoded once and inserted into the packets of all clients as is (PayloadJSON)
+        self.responseCache = ResponseCache(self.settings.getBackendResponseCacheSize())
+
         self.app = Flask(self.appInfo.name, static_url_path='', static_folder=WebSocket.FF, template_folder=WebSocket.FF)
         self.app.config['SECRET_KEY'] = 'secret!'
 
-        self.socketio = SocketIO(self.app, async_mode=WebSocket.SOCKETIO_ASYNC_MODE)
+        self.socketio = SocketIO(self.app, async_mode=WebSocket.SOCKETIO_ASYNC_MODE, json=PayloadJSON)
         self.btask: Any = None
 
     def init(self, pluginManager: PluginManager) -> None:
@@ -73,19 +86,25 @@ class WebSocket(Module):
         if self.settings.getBackendWebAPI():
             self.app.add_url_rule('/api/v1/stats',             'api_stats',            self.__api_stats)
             self.app.add_url_rule('/api/v1/state',             'api_state',            self.__api_state)
+            self.app.add_url_rule('/api/v1/events',            'api_events',           self.__api_events)
 
         # register socket io handlers
         self.socketio.on_event("connect", self.__socket_connect, WebSocket.NS)
         self.socketio.on_event("disconnect", self.__socket_disconnect, WebSocket.NS)
         self.socketio.on_event("get_last_alarm_events", self.__socket_get_last_alarm_events, WebSocket.NS)
+        self.socketio.on_event("get_alarm_events", self.__socket_get_alarm_events, WebSocket.NS)
         self.socketio.on_event("get_stats", self.__socket_get_stats, WebSocket.NS)
         self.socketio.on_event("get_header", self.__socket_get_header, WebSocket.NS)
         self.socketio.on_event("get_news", self.__socket_get_news, WebSocket.NS)
         self.socketio.on_event("get_state", self.__socket_get_state, WebSocket.NS)
 
-    def sleep(self, duration: int) -> None:
+    def sleep(self, duration: float) -> None:
         self.socketio.sleep(duration)
 
+    def create_event(self) -> Any:
+        # the event object matches the async mode (e.g. threading or gevent)
+        return self.socketio.server.eio.create_event()
+
     def start_background_task(self, target: Callable[[], None]) -> None:
         self.btask = self.socketio.start_background_task(target=target)
 
@@ -162,13 +181,33 @@ class WebSocket(Module):
         data = render_template(template)
         return Response(data)
 
-    def __api_stats(self) -> Dict[str, Any]:
+    def __api_stats(self) -> Response:
         self.dbgPrint("Answering stats Web API request")
-        return { 'result': 'ok', 'stats': self.__get_stats_dict() }
+        data = self.responseCache.get("api_stats", self.__get_stats_day(), self.database.getRevision(),
+                    lambda: json.dumps({ 'result': 'ok', 'stats': self.__get_stats_dict() }))
+        return Response(data, mimetype=WebSocket.MIME_JSON)
 
     def __api_state(self) -> Dict[str, Any]:
         self.dbgPrint("Answering state Web API request")
-        return { 'result': 'ok', 'state': self.__get_state_dict() }
+        if self.pluginManager is None:
+            self.fatal("PluginManager not available")
+
+        stateDict = self.__get_state_dict()
+        stateDict['action_states'] = self.pluginManager.getActionStates()
+        stateDict['response_cache'] = self.responseCache.getStats()
+        return { 'result': 'ok', 'state': stateDict }
+
+    def __api_events(self) -> Response:
+        self.dbgPrint("Answering events Web API request")
+        try:
+            params = WebSocket.__parse_alarm_events_params(request.args)
+        except ValueError as e:
+            return Response(json.dumps({ 'result': 'error', 'error': str(e) }), status=400, mimetype=WebSocket.MIME_JSON)
+
+        revision = self.database.getRevision()
+        data = self.responseCache.get("api_events", params, revision,
+                    lambda: json.dumps({ 'result': 'ok', 'events': self.__get_alarm_events_dict(params, revision) }))
+        return Response(data, mimetype=WebSocket.MIME_JSON)
 
     def __socket_connect(self) -> None:
         session["ClientID"] = self.clientCount
@@ -186,21 +225,31 @@ class WebSocket(Module):
             if isinstance(message['count'], int):
                 count = message['count']
 
-        totalEvents = self.database.getEventCount(textOnly = True)
-        count = count if count > 0 else totalEvents
-        alarmEvents = self.database.getLastEvents(count, textOnly = True)
+        revision = self.database.getRevision()
+        emit('last_alarm_events', self.responseCache.get("last_alarm_events", count, revision,
+                    lambda: EncodedPayload(self.__get_last_alarm_events_dict(count, revision))))
 
-        emit('last_alarm_events', {
-            'total_events': totalEvents,
-            'alarm_events': json.dumps([alarmEvent.toJSON() for alarmEvent in alarmEvents])
-        })
+    def __socket_get_alarm_events(self, message: Any = None) -> None:
+        self.dbgPrint(f"Answering get_alarm_events (Client {session['ClientID']})")
+
+        try:
+            params = WebSocket.__parse_alarm_events_params(message if isinstance(message, dict) else {})
+        except ValueError as e:
+            emit('alarm_events', {'error': str(e)})
+            return
+
+        revision = self.database.getRevision()
+        emit('alarm_events', self.responseCache.get("alarm_events", params, revision,
+                    lambda: EncodedPayload(self.__get_alarm_events_dict(params, revision))))
 
     def __socket_get_stats(self) -> None:
         self.dbgPrint(f"Answering get_stats (Client {session['ClientID']})")
-        emit('stats', self.__get_stats_dict())
+        emit('stats', self.responseCache.get("stats", self.__get_stats_day(), self.database.getRevision(),
+                    lambda: EncodedPayload(self.__get_stats_dict())))
 
     def __socket_get_state(self) -> None:
         # self.dbgPrint(f"Answering get_state (Client {session['ClientID']})")
+        # the source state is cached by the PluginManager (changes are broadcast to all clients)
         emit('state', self.__get_state_dict())
 
     def __socket_get_header(self) -> None:
@@ -217,15 +266,130 @@ class WebSocket(Module):
     def broadcastNews(self, news: str) -> None:
         self.__broadcast('news', {'news': news})
 
+    def broadcastState(self) -> None:
+        """Informs all clients about a change of the state (e.g. of the source state)."""
+        self.__broadcast('state', self.__get_state_dict())
+
     def broadcastAlarmEvent(self, alarmEvent: AlarmEvent) -> None:
         self.__broadcast('alarm_event', alarmEvent.toJSON())
 
-    def broadcastDatabaseChanged(self) -> None:
-        self.__broadcast('database_changed', { })
+    def broadcastDatabaseChanged(self, change: str = "", alarmEvent: Optional[AlarmEvent] = None) -> None:
+        """Informs all clients about a change of the database (with the new revision of the database).
+        Clients apply the changed alarm event (if any) to their alarm list
+        and request the whole alarm list only if they missed a change (i.e. a revision is skipped).
+
+        :param change: type of change (CHANGE_ADDED or CHANGE_UPDATED; empty if unknown)
+        :param alarmEvent: the added/updated alarm event (optional)"""
+        self.__broadcast('database_changed', {
+            'revision': self.database.getRevision(),
+            'change': change,
+            'alarm_event': alarmEvent.toJSON() if alarmEvent is not None else None
+        })
 
     def broadcastCalendarChanged(self) -> None:
         self.__broadcast('calendar_changed', { })
 
+    def __get_last_alarm_events_dict(self, count: int, revision: int) -> Dict[str, Any]:
+        totalEvents = self.database.getEventCount(textOnly = True)
+        count = count if count > 0 else totalEvents
+        alarmEvents = self.database.getLastEvents(count, textOnly = True)
+
+        lastAlarmEventsDict = {
+            'revision': revision,
+            'total_events': totalEvents,
+            'alarm_events': json.dumps([alarmEvent.toJSON() for alarmEvent in alarmEvents])
+        }
+
+        return lastAlarmEventsDict
+
+    @staticmethod
+    def __parse_alarm_events_params(message: Mapping[str, Any]) -> Tuple[Any, ...]:
+        """Validates the parameters of an alarm history request (from the Web API or Socket.IO).
+        Lists (flags and fields) may also be given as comma-separated strings.
+
+        :param message: mapping with the parameters of the request
+        :return: hashable tuple with limit, before_id, after_id, since, until, flags and fields (raises ValueError)"""
+
+        def parseInt(name: str) -> Optional[int]:
+            value = message.get(name, None)
+            if value is None or value == "":
+                return None
+            if isinstance(value, bool) or not isinstance(value, (int, str)):
+                raise ValueError(f"invalid {name}")
+            try:
+                return int(value)
+            except ValueError:
+                raise ValueError(f"invalid {name}") from None
+
+        def parseDate(name: str) -> str:
+            value = message.get(name, "")
+            if not isinstance(value, str):
+                raise ValueError(f"invalid {name}")
+            if value != "":
+                try:
+                    datetime.date.fromisoformat(value)
+                except ValueError:
+                    raise ValueError(f"invalid {name} (expected YYYY-MM-DD)") from None
+            return value
+
+        def parseList(name: str) -> Optional[Tuple[str, ...]]:
+            value = message.get(name, None)
+            if value is None or value == "":
+                return None
+            if isinstance(value, str):
+                value = value.split(",")
+            if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                raise ValueError(f"invalid {name}")
+            return tuple(v.strip() for v in value if v.strip() != "")
+
+        limit = parseInt("limit")
+        limit = WebSocket.DEFAULT_PAGE_SIZE if limit is None else limit
+        if limit < 1 or limit > WebSocket.MAX_PAGE_SIZE:
+            raise ValueError(f"invalid limit (expected 1 to {WebSocket.MAX_PAGE_SIZE})")
+
+        flags = parseList("flags")
+        if flags is not None:
+            flags = tuple(flag.upper() for flag in flags)
+
+        fields = parseList("fields")
+        if fields is not None:
+            knownFields = AlarmEvent.jsonFields()
+            for field in fields:
+                if field not in knownFields:
+                    raise ValueError(f"invalid field {field}")
+
+        return (limit, parseInt("before_id"), parseInt("after_id"), parseDate("since"), parseDate("until"), flags, fields)
+
+    def __get_alarm_events_dict(self, params: Tuple[Any, ...], revision: int) -> Dict[str, Any]:
+        (limit, beforeID, afterID, since, until, flags, fields) = params
+        (alarmEvents, more) = self.database.getEventPage(True, limit, beforeID = beforeID, afterID = afterID,
+                                    since = since, until = until, flags = list(flags) if flags is not None else None)
+
+        alarmEventList: List[Dict[str, Any]] = []
+        for alarmEvent in alarmEvents:
+            alarmEventDict = alarmEvent.toJSON()
+            if fields is not None:
+                # the ID is always included (it is required to request the next page)
+                alarmEventDict = {key: value for (key, value) in alarmEventDict.items() if key in fields or key == "eventID"}
+            alarmEventList.append(alarmEventDict)
+
+        alarmEventsDict = {
+            'revision': revision,
+            'total_events': self.database.getEventCount(textOnly = True),
+            'alarm_events': alarmEventList,
+            'more': more,
+            'next_before_id': alarmEvents[-1].eventID if len(alarmEvents) > 0 else beforeID, # cursor of the next (older) page
+            'next_after_id': alarmEvents[0].eventID if len(alarmEvents) > 0 else afterID     # cursor of the next (newer) page
+        }
+
+        return alarmEventsDict
+
+    @staticmethod
+    def __get_stats_day() -> str:
+        # the statistics for today, this month and this year also change at midnight
+        # (and not only when the revision of the database changes)
+        return datetime.date.today().isoformat()
+
     def __get_stats_dict(self) -> Dict[str, Any]:
         statsDict = {
             'total': self.database.getEventStats(DatabaseTimespan.TOTAL, textOnly = True),
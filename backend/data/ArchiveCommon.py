@@ -0,0 +1,255 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import re
+import sys
+import zlib
+import struct
+import datetime
+
+from array import array
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from backend.util.Module import Module
+from backend.data.Database import Database
+from backend.event.AlarmEvent import AlarmEvent
+
+class ArchiveCommon(Module):
+    """ArchiveCommon defines the binary columnar archive format used to export/import alarm events.
+    In contrast to CSV files, archives are compact and fast to read/write (but not human-readable).
+
+    An archive starts with a magic number and a schema (the name and the encoding of each column).
+    It is followed by blocks of up to BLOCK_SIZE alarm events and terminated by an empty block:
+
+        archive := MAGIC uint16(columns) (uint8(len) name uint8(encoding))* block* uint32(0)
+        block   := uint32(rows) (uint32(len) zlib(payload))*    (one payload per column in schema order)
+
+    Depending on the encoding, the payload of a column contains:
+
+        ENCODING_STRING     uint32(length)[rows] text                   (lengths in code points, text in UTF-8)
+        ENCODING_DICTIONARY uint32(entries) uint32(index)[rows] string(entries)
+        ENCODING_FLOAT      float64[rows]
+
+    All integers and floats are stored in little-endian byte order."""
+
+    MAGIC = b"SBARCH\x00\x01"
+
+    ENCODING_STRING     = 1
+    ENCODING_DICTIONARY = 2
+    ENCODING_FLOAT      = 3
+
+    BLOCK_SIZE = 10000 # maximum number of alarm events per block
+
+    COMPRESSION_LEVEL = 1
+
+    # (column name, AlarmEvent attribute, encoding)
+    COLUMNS: List[Tuple[str, str, int]] = [
+        ("Timestamp",         "timestamp",         ENCODING_STRING),
+        ("Event",             "event",             ENCODING_STRING),
+        ("EventDetails",      "eventDetails",      ENCODING_STRING),
+        ("Location",          "location",          ENCODING_STRING),
+        ("LocationDetails",   "locationDetails",   ENCODING_STRING),
+        ("Comment",           "comment",           ENCODING_STRING),
+        ("AlarmTimestamp",    "alarmTimestamp",    ENCODING_STRING),
+        ("LocationLatitude",  "locationLatitude",  ENCODING_FLOAT),
+        ("LocationLongitude", "locationLongitude", ENCODING_FLOAT),
+        ("Source",            "source",            ENCODING_DICTIONARY),
+        ("Sender",            "sender",            ENCODING_DICTIONARY),
+        ("Raw",               "raw",               ENCODING_STRING),
+        ("Flags",             "flags",             ENCODING_DICTIONARY),
+    ]
+
+    # fast path for timestamps in the (zero padded) format of the database
+    TIMESTAMP_FAST_PATH = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}") \
+                          if AlarmEvent.TIMESTAMP_FORMAT == "%Y-%m-%d %H:%M:%S" else None
+
+    UINT8  = struct.Struct("<B")
+    UINT16 = struct.Struct("<H")
+    UINT32 = struct.Struct("<I")
+
+    def __init__(self, database: Database, name: str) -> None:
+        super().__init__(name, settings = None, debug = False)
+        self._database = database
+
+    @staticmethod
+    def isValidTimestamp(timestamp: Any) -> bool:
+        """Checks whether a timestamp is formatted like the timestamps of the database (as required by the CSV importer).
+
+        :param timestamp: timestamp of an imported alarm event
+        :return: bool whether the timestamp is valid"""
+        if not isinstance(timestamp, str):
+            return False
+
+        try:
+            if ArchiveCommon.TIMESTAMP_FAST_PATH is not None and ArchiveCommon.TIMESTAMP_FAST_PATH.fullmatch(timestamp):
+                datetime.datetime.fromisoformat(timestamp) # raises a ValueError for invalid dates/times
+            else:
+                datetime.datetime.strptime(timestamp, AlarmEvent.TIMESTAMP_FORMAT)
+        except ValueError:
+            return False
+
+        return True
+
+    @staticmethod
+    def _readExactly(f: BinaryIO, size: int) -> bytes:
+        data = f.read(size)
+        if len(data) != size:
+            raise ValueError("Unexpected end of archive")
+        return data
+
+    @staticmethod
+    def _readUInt(f: BinaryIO, s: struct.Struct) -> int:
+        value: int = s.unpack(ArchiveCommon._readExactly(f, s.size))[0]
+        return value
+
+    @staticmethod
+    def _toLittleEndian(values: "array[Any]") -> bytes:
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values.tobytes()
+
+    @staticmethod
+    def _fromLittleEndian(typecode: str, data: bytes, offset: int, count: int) -> "array[Any]":
+        values = array(typecode)
+        end = offset + count * values.itemsize
+        if count < 0 or end > len(data):
+            raise ValueError("Invalid column payload")
+        values.frombytes(data[offset:end])
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    @staticmethod
+    def encodeColumn(encoding: int, values: List[Any]) -> bytes:
+        """Encodes the values of a column (without compression).
+
+        :param encoding: encoding of the column (ENCODING_STRING, ENCODING_DICTIONARY or ENCODING_FLOAT)
+        :param values: list with the values of the column (str or float)
+        :return: payload of the column"""
+        if encoding == ArchiveCommon.ENCODING_FLOAT:
+            return ArchiveCommon._toLittleEndian(array("d", values))
+
+        if encoding == ArchiveCommon.ENCODING_DICTIONARY:
+            index: Dict[str, int] = {}
+            indices = array("I", [index.setdefault(v, len(index)) for v in values])
+            return ArchiveCommon.UINT32.pack(len(index)) + \
+                   ArchiveCommon._toLittleEndian(indices) + \
+                   ArchiveCommon.encodeColumn(ArchiveCommon.ENCODING_STRING, list(index))
+
+        lengths = array("I", [len(v) for v in values])
+        return ArchiveCommon._toLittleEndian(lengths) + "".join(values).encode("utf-8", "surrogatepass")
+
+    @staticmethod
+    def decodeColumn(encoding: int, payload: bytes, rows: int) -> List[Any]:
+        """Decodes the values of a column (the inverse of encodeColumn).
+
+        :param encoding: encoding of the column (ENCODING_STRING, ENCODING_DICTIONARY or ENCODING_FLOAT)
+        :param payload: payload of the column (without compression)
+        :param rows: number of values stored in the column
+        :return: list with the values of the column (str or float)"""
+        (values, end) = ArchiveCommon.__decodeColumn(encoding, payload, 0, rows)
+        if end != len(payload):
+            raise ValueError("Invalid column payload")
+        return values
+
+    @staticmethod
+    def __decodeColumn(encoding: int, payload: bytes, offset: int, rows: int) -> Tuple[List[Any], int]:
+        if encoding == ArchiveCommon.ENCODING_FLOAT:
+            floats = ArchiveCommon._fromLittleEndian("d", payload, offset, rows)
+            return (floats.tolist(), offset + floats.itemsize * rows)
+
+        if encoding == ArchiveCommon.ENCODING_DICTIONARY:
+            if offset + ArchiveCommon.UINT32.size > len(payload):
+                raise ValueError("Invalid column payload")
+            entries = ArchiveCommon.UINT32.unpack_from(payload, offset)[0]
+            indices = ArchiveCommon._fromLittleEndian("I", payload, offset + ArchiveCommon.UINT32.size, rows)
+            offset += ArchiveCommon.UINT32.size + indices.itemsize * rows
+            (dictionary, offset) = ArchiveCommon.__decodeColumn(ArchiveCommon.ENCODING_STRING, payload, offset, entries)
+            if rows > 0 and max(indices) >= entries:
+                raise ValueError("Invalid column payload")
+            return ([dictionary[i] for i in indices], offset)
+
+        if encoding == ArchiveCommon.ENCODING_STRING:
+            lengths = ArchiveCommon._fromLittleEndian("I", payload, offset, rows)
+            offset += lengths.itemsize * rows
+            text = payload[offset:].decode("utf-8", "surrogatepass") # the text is always the last part of a payload
+            if sum(lengths) != len(text):
+                raise ValueError("Invalid column payload")
+
+            strings: List[str] = []
+            start = 0
+            for length in lengths:
+                strings.append(text[start:start + length])
+                start += length
+            return (strings, len(payload))
+
+        raise ValueError(f"Invalid column encoding {encoding}")
+
+    @staticmethod
+    def writeHeader(f: BinaryIO) -> None:
+        f.write(ArchiveCommon.MAGIC)
+        f.write(ArchiveCommon.UINT16.pack(len(ArchiveCommon.COLUMNS)))
+        for (name, _, encoding) in ArchiveCommon.COLUMNS:
+            encodedName = name.encode("utf-8")
+            f.write(ArchiveCommon.UINT8.pack(len(encodedName)) + encodedName + ArchiveCommon.UINT8.pack(encoding))
+
+    @staticmethod
+    def readHeader(f: BinaryIO) -> List[Tuple[str, int]]:
+        """Reads the magic number and the schema of an archive.
+
+        :param f: binary file positioned at the start of the archive
+        :return: list with the name and the encoding of each column"""
+        if ArchiveCommon._readExactly(f, len(ArchiveCommon.MAGIC)) != ArchiveCommon.MAGIC:
+            raise ValueError("Invalid archive (unknown file format or version)")
+
+        schema: List[Tuple[str, int]] = []
+        for _ in range(ArchiveCommon._readUInt(f, ArchiveCommon.UINT16)):
+            name = ArchiveCommon._readExactly(f, ArchiveCommon._readUInt(f, ArchiveCommon.UINT8)).decode("utf-8")
+            schema.append((name, ArchiveCommon._readUInt(f, ArchiveCommon.UINT8)))
+        return schema
+
+    @staticmethod
+    def writeBlock(f: BinaryIO, columns: List[List[Any]]) -> None:
+        """Writes a (non-empty) block of alarm events.
+
+        :param f: binary file the block is appended to
+        :param columns: list with the values of each column (in the order of COLUMNS)"""
+        f.write(ArchiveCommon.UINT32.pack(len(columns[0])))
+        for ((_, _, encoding), values) in zip(ArchiveCommon.COLUMNS, columns):
+            compressed = zlib.compress(ArchiveCommon.encodeColumn(encoding, values), ArchiveCommon.COMPRESSION_LEVEL)
+            f.write(ArchiveCommon.UINT32.pack(len(compressed)))
+            f.write(compressed)
+
+    @staticmethod
+    def writeFooter(f: BinaryIO) -> None:
+        f.write(ArchiveCommon.UINT32.pack(0)) # empty block
+
+    @staticmethod
+    def readBlock(f: BinaryIO, schema: List[Tuple[str, int]]) -> Optional[List[List[Any]]]:
+        """Reads the next block of an archive.
+
+        :param f: binary file positioned at the start of a block
+        :param schema: schema of the archive (as returned by readHeader)
+        :return: list with the values of each column (in schema order) or None at the end of the archive"""
+        rows = ArchiveCommon._readUInt(f, ArchiveCommon.UINT32)
+        if rows == 0:
+            return None
+
+        columns: List[List[Any]] = []
+        for (_, encoding) in schema:
+            compressed = ArchiveCommon._readExactly(f, ArchiveCommon._readUInt(f, ArchiveCommon.UINT32))
+            columns.append(ArchiveCommon.decodeColumn(encoding, zlib.decompress(compressed), rows))
+        return columns
@@ -0,0 +1,67 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, List, Optional
+
+from backend.data.ArchiveCommon import ArchiveCommon
+from backend.data.Database import Database
+
+class ArchiveExporter(ArchiveCommon):
+
+    def __init__(self, database: Database) -> None:
+        super().__init__(database, "exporter")
+
+    def exportEvents(self, filename: str, *, since: str = "", until: str = "", flags: Optional[List[str]] = None) -> int:
+        """Exports alarm events from the database into a binary columnar archive (see ArchiveCommon).
+        Alarm events are written block by block while they are read from the database.
+
+        :param filename: path of the archive
+        :param since: first alarm date to export (format YYYY-MM-DD; optional)
+        :param until: last alarm date to export (format YYYY-MM-DD; optional)
+        :param flags: list of flags of the alarm events to export (optional)
+        :return: 0 on success, 1 otherwise"""
+
+        try:
+            exportedCount = 0
+            attributes = [attribute for (_, attribute, _) in ArchiveCommon.COLUMNS]
+            # NULL values of the database are exported as empty strings (or zero)
+            defaults = [0.0 if encoding == ArchiveCommon.ENCODING_FLOAT else "" for (_, _, encoding) in ArchiveCommon.COLUMNS]
+            columns: List[List[Any]] = [[] for _ in attributes]
+
+            with open(filename, 'wb') as f:
+                self.writeHeader(f)
+
+                for alarm in self._database.iterEvents(textOnly = False, since = since, until = until, flags = flags):
+                    for (column, attribute, default) in zip(columns, attributes, defaults):
+                        value = getattr(alarm, attribute)
+                        column.append(value if value is not None else default)
+
+                    exportedCount += 1
+                    if exportedCount % ArchiveCommon.BLOCK_SIZE == 0:
+                        self.writeBlock(f, columns)
+                        columns = [[] for _ in attributes]
+
+                if len(columns[0]) > 0:
+                    self.writeBlock(f, columns)
+
+                self.writeFooter(f)
+
+            self.print(f"Exported {exportedCount} event(s) from the DB")
+            return 0
+
+        except Exception:
+            self.fatalContinue(f"Could not write archive ({filename})")
+            return 1
@@ -0,0 +1,100 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import BinaryIO, Iterator, List, Optional
+
+from backend.data.ArchiveCommon import ArchiveCommon
+from backend.data.Database import Database
+from backend.event.AlarmEvent import AlarmEvent
+
+class ArchiveImporter(ArchiveCommon):
+
+    CHUNK_SIZE     = 5000    # number of alarm events inserted at once
+    PROGRESS_STEP  = 100000  # number of alarm events between two progress messages
+
+    def __init__(self, database: Database) -> None:
+        super().__init__(database, "importer")
+        self.__invalidCount = 0
+        self.__nextProgress = ArchiveImporter.PROGRESS_STEP
+
+    def importEvents(self, filename: str) -> int:
+        """Imports alarm events from a binary columnar archive (see ArchiveCommon) into the database.
+        Columns unknown to this version are ignored, missing columns keep the default values of AlarmEvent.
+
+        :param filename: path of the archive
+        :return: 0 on success, 1 otherwise"""
+        self.__invalidCount = 0
+        self.__nextProgress = ArchiveImporter.PROGRESS_STEP
+
+        try:
+            with open(filename, 'rb') as f:
+                importedCount = self._database.addEvents(self.__readEvents(f),
+                                                         ArchiveImporter.CHUNK_SIZE, self.__printProgress)
+        except Exception:
+            self._database.rollback()
+            self.fatalContinue(f"Could not read archive ({filename})")
+            return 1
+
+        if importedCount < 0:
+            self._database.rollback()
+            self.fatalContinue("Could not import events into the DB")
+            return 1
+
+        self.print(f"Imported {importedCount} event(s) into the DB")
+
+        if self.__invalidCount > 0:
+            self.error(f"Ignored {self.__invalidCount} invalid event(s)")
+            return 1
+
+        return 0
+
+    def __printProgress(self, importedCount: int) -> None:
+        if importedCount >= self.__nextProgress:
+            self.print(f"Imported {importedCount} event(s)...")
+            self.__nextProgress = importedCount + ArchiveImporter.PROGRESS_STEP
+
+    def __readEvents(self, f: BinaryIO) -> Iterator[AlarmEvent]:
+        knownColumns = {name: (attribute, encoding) for (name, attribute, encoding) in ArchiveCommon.COLUMNS}
+
+        schema = self.readHeader(f)
+        attributes: List[Optional[str]] = []
+        for (name, encoding) in schema:
+            if name not in knownColumns:
+                attributes.append(None)
+                continue
+
+            (knownAttribute, knownEncoding) = knownColumns[name]
+            if (encoding == ArchiveCommon.ENCODING_FLOAT) != (knownEncoding == ArchiveCommon.ENCODING_FLOAT):
+                raise ValueError(f"Invalid encoding of column {name}")
+            attributes.append(knownAttribute)
+
+        while True:
+            columns = self.readBlock(f, schema)
+            if columns is None:
+                break
+
+            for row in zip(*columns):
+                alarmEvent = AlarmEvent()
+                for (attribute, value) in zip(attributes, row):
+                    if attribute is not None:
+                        setattr(alarmEvent, attribute, value)
+
+                # alarm events with invalid timestamps are ignored (like invalid lines of CSV files)
+                if not self.isValidTimestamp(alarmEvent.timestamp) or not self.isValidTimestamp(alarmEvent.alarmTimestamp):
+                    self.__invalidCount += 1
+                    continue
+
+                yield alarmEvent
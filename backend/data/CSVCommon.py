@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import re
 import datetime
 
 from backend.util.Module import Module
@@ -40,6 +41,12 @@ class CSVCommon(Module):
 
     TIMESTAMP_FORMAT_EXTERNAL = "%Y-%m-%d %H:%M:%S" # "%d.%m.%Y %H:%M"
 
+    # fast paths for timestamps that are already in the (zero padded) format of the database
+    # (only available as long as the external format matches the format of the database)
+    TIMESTAMP_FORMATS_MATCH = (TIMESTAMP_FORMAT_EXTERNAL == AlarmEvent.TIMESTAMP_FORMAT)
+    TIMESTAMP_FAST_PATH = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}") \
+                          if TIMESTAMP_FORMATS_MATCH and AlarmEvent.TIMESTAMP_FORMAT == "%Y-%m-%d %H:%M:%S" else None
+
     def __init__(self, database: Database, name: str) -> None:
         super().__init__(name, settings = None, debug = False)
         self._database = database
@@ -54,10 +61,17 @@ class CSVCommon(Module):
 
     @staticmethod
     def db2csvTimestamp(dbTimestamp: str) -> str:
+        if CSVCommon.TIMESTAMP_FORMATS_MATCH:
+            return dbTimestamp # timestamps in the database are already formatted accordingly
+
         timestamp = datetime.datetime.strptime(dbTimestamp, AlarmEvent.TIMESTAMP_FORMAT)
         return timestamp.strftime(CSVCommon.TIMESTAMP_FORMAT_EXTERNAL)
 
     @staticmethod
     def csv2dbTimestamp(csvTimestamp: str) -> str:
+        if CSVCommon.TIMESTAMP_FAST_PATH is not None and CSVCommon.TIMESTAMP_FAST_PATH.fullmatch(csvTimestamp):
+            datetime.datetime.fromisoformat(csvTimestamp) # raises a ValueError for invalid dates/times
+            return csvTimestamp
+
         timestamp = datetime.datetime.strptime(csvTimestamp, CSVCommon.TIMESTAMP_FORMAT_EXTERNAL)
         return timestamp.strftime(AlarmEvent.TIMESTAMP_FORMAT)
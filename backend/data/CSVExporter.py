@@ -16,18 +16,32 @@
 
 import csv
 
+from typing import Iterable, Iterator, List, Optional
+
 from backend.data.CSVCommon import CSVCommon
 from backend.data.Database import Database
+from backend.event.AlarmEvent import AlarmEvent
 
 class CSVExporter(CSVCommon):
 
     def __init__(self, database: Database) -> None:
         super().__init__(database, "exporter")
+        self.__exportedCount = 0
+
+    def exportEvents(self, filename: str, printHeader: bool = True, *,
+                     since: str = "", until: str = "", flags: Optional[List[str]] = None) -> int:
+        """Exports alarm events from the database into a CSV file.
+        Alarm events are written while they are read from the database (i.e. the memory consumption does not depend on the number of alarm events).
 
-    def exportEvents(self, filename: str, printHeader: bool = True) -> int:
+        :param filename: path of the CSV file
+        :param printHeader: bool whether the first line contains the names of the columns
+        :param since: first alarm date to export (format YYYY-MM-DD; optional)
+        :param until: last alarm date to export (format YYYY-MM-DD; optional)
+        :param flags: list of flags of the alarm events to export (optional)
+        :return: 0 on success, 1 otherwise"""
 
         try:
-            exportedCount = 0
+            self.__exportedCount = 0
 
             with open(filename, 'w', newline='') as f:
                 writer = csv.writer(f, delimiter=";", quotechar="\"", doublequote=True)
@@ -49,29 +63,31 @@ class CSVExporter(CSVCommon):
                     line[CSVCommon.COL_FLAGS]             = "Flags"
                     writer.writerow(line)
 
-                alarmEvents = self._database.getEvents(textOnly = False)
+                alarmEvents = self._database.iterEvents(textOnly = False, since = since, until = until, flags = flags)
+                writer.writerows(self.__csvLines(alarmEvents))
 
-                for alarm in alarmEvents:
-                    line = [""] * CSVExporter.TOTAL_COLS
-                    line[CSVCommon.COL_TIMESTAMP]         = self.db2csvTimestamp(alarm.timestamp)
-                    line[CSVCommon.COL_EVENT]             = self.db2csvText(alarm.event)
-                    line[CSVCommon.COL_EVENTDETAILS]      = self.db2csvText(alarm.eventDetails)
-                    line[CSVCommon.COL_LOCATION]          = self.db2csvText(alarm.location)
-                    line[CSVCommon.COL_LOCATIONDETAILS]   = self.db2csvText(alarm.locationDetails)
-                    line[CSVCommon.COL_COMMENT]           = self.db2csvText(alarm.comment)
-                    line[CSVCommon.COL_ALARMTIMESTAMP]    = self.db2csvTimestamp(alarm.alarmTimestamp)
-                    line[CSVCommon.COL_LOCATIONLATITUDE]  = str(alarm.locationLatitude)
-                    line[CSVCommon.COL_LOCATIONLONGITUDE] = str(alarm.locationLongitude)
-                    line[CSVCommon.COL_SOURCE]            = self.db2csvText(alarm.source)
-                    line[CSVCommon.COL_SENDER]            = self.db2csvText(alarm.sender)
-                    line[CSVCommon.COL_RAW]               = self.db2csvText(alarm.raw)
-                    line[CSVCommon.COL_FLAGS]             = self.db2csvText(alarm.flags)
-                    writer.writerow(line)
-                    exportedCount += 1
-
-            self.print(f"Exported {exportedCount} event(s) from the DB")
+            self.print(f"Exported {self.__exportedCount} event(s) from the DB")
             return 0
 
         except Exception:
             self.fatalContinue(f"Could not write CSV file ({filename})")
             return 1
+
+    def __csvLines(self, alarmEvents: Iterable[AlarmEvent]) -> Iterator[List[str]]:
+        for alarm in alarmEvents:
+            line = [""] * CSVExporter.TOTAL_COLS
+            line[CSVCommon.COL_TIMESTAMP]         = self.db2csvTimestamp(alarm.timestamp)
+            line[CSVCommon.COL_EVENT]             = self.db2csvText(alarm.event)
+            line[CSVCommon.COL_EVENTDETAILS]      = self.db2csvText(alarm.eventDetails)
+            line[CSVCommon.COL_LOCATION]          = self.db2csvText(alarm.location)
+            line[CSVCommon.COL_LOCATIONDETAILS]   = self.db2csvText(alarm.locationDetails)
+            line[CSVCommon.COL_COMMENT]           = self.db2csvText(alarm.comment)
+            line[CSVCommon.COL_ALARMTIMESTAMP]    = self.db2csvTimestamp(alarm.alarmTimestamp)
+            line[CSVCommon.COL_LOCATIONLATITUDE]  = str(alarm.locationLatitude)
+            line[CSVCommon.COL_LOCATIONLONGITUDE] = str(alarm.locationLongitude)
+            line[CSVCommon.COL_SOURCE]            = self.db2csvText(alarm.source)
+            line[CSVCommon.COL_SENDER]            = self.db2csvText(alarm.sender)
+            line[CSVCommon.COL_RAW]               = self.db2csvText(alarm.raw)
+            line[CSVCommon.COL_FLAGS]             = self.db2csvText(alarm.flags)
+            self.__exportedCount += 1
+            yield line
@@ -16,28 +16,60 @@
 
 import csv
 
+from typing import Iterator, TextIO
+
 from backend.data.CSVCommon import CSVCommon
 from backend.data.Database import Database
 from backend.event.AlarmEvent import AlarmEvent
 
 class CSVImporter(CSVCommon):
 
+    CHUNK_SIZE     = 5000    # number of alarm events inserted at once
+    PROGRESS_STEP  = 100000  # number of alarm events between two progress messages
+
     def __init__(self, database: Database) -> None:
         super().__init__(database, "importer")
+        self.__invalidCount = 0
+        self.__nextProgress = CSVImporter.PROGRESS_STEP
 
     def importEvents(self, filename: str, ignoreFirstLine: bool = True) -> int:
-        alarmList = []
+        self.__invalidCount = 0
+        self.__nextProgress = CSVImporter.PROGRESS_STEP
+
         try:
             with open(filename, 'r') as f:
-                reader = csv.reader(f, delimiter=";", quotechar="\"", doublequote=True)
-                alarmList = list(reader)
+                # the CSV file is read line by line while the alarm events are inserted in chunks
+                # (all within a single transaction that is rolled back in case of an error);
+                # the statistics are rebuilt by the database once all alarm events are inserted
+                importedCount = self._database.addEvents(self.__readEvents(f, ignoreFirstLine),
+                                                         CSVImporter.CHUNK_SIZE, self.__printProgress)
         except Exception:
+            self._database.rollback()
             self.fatalContinue(f"Could not read CSV file ({filename})")
             return 1
 
-        importedCount = 0
-        invalidCount = 0
-        for line, alarm in enumerate(alarmList):
+        if importedCount < 0:
+            self._database.rollback()
+            self.fatalContinue("Could not import events into the DB")
+            return 1
+
+        self.print(f"Imported {importedCount} event(s) into the DB")
+
+        if self.__invalidCount > 0:
+            self.error(f"Ignored {self.__invalidCount} invalid line(s)")
+            return 1
+
+        return 0
+
+    def __printProgress(self, importedCount: int) -> None:
+        if importedCount >= self.__nextProgress:
+            self.print(f"Imported {importedCount} event(s)...")
+            self.__nextProgress = importedCount + CSVImporter.PROGRESS_STEP
+
+    def __readEvents(self, f: TextIO, ignoreFirstLine: bool) -> Iterator[AlarmEvent]:
+        reader = csv.reader(f, delimiter=";", quotechar="\"", doublequote=True)
+
+        for line, alarm in enumerate(reader):
             if ignoreFirstLine and line == 0:
                 continue
 
@@ -47,7 +79,7 @@ class CSVImporter(CSVCommon):
             #      Important: adjust documentation accordingly
 
             if len(alarm) != CSVCommon.TOTAL_COLS:
-                invalidCount += 1
+                self.__invalidCount += 1
                 continue
 
             alarmEvent = AlarmEvent()
@@ -67,19 +99,7 @@ class CSVImporter(CSVCommon):
                 alarmEvent.raw               = self.csv2dbText(alarm[CSVCommon.COL_RAW])
                 alarmEvent.flags             = self.csv2dbText(alarm[CSVCommon.COL_FLAGS])
             except Exception: # invalid timestamp, float, ...
-                invalidCount += 1
+                self.__invalidCount += 1
                 continue
 
-            if self._database.addEvent(alarmEvent, verbose=False) < 0:
-                invalidCount +=1
-                continue
-
-            importedCount += 1
-
-        self.print(f"Imported {importedCount} event(s) into the DB")
-
-        if invalidCount > 0:
-            self.error(f"Ignored {invalidCount} invalid line(s)")
-            return 1
-
-        return 0
+            yield alarmEvent
@@ -15,17 +15,23 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import queue
 import sqlite3
 import atexit
 import datetime
+import contextlib
+import urllib.request
 
 from enum import Enum
 
-from typing import Optional, List, Any, Tuple, NoReturn
+import itertools
+
+from typing import Optional, List, Any, Tuple, Iterable, Iterator, Callable, NoReturn, Sequence
 
 from backend.event.AlarmEvent import AlarmEvent
 
 from backend.util.Module import Module
+from backend.util.Settings import Settings
 
 class DatabaseTimespan(Enum):
     TOTAL = "TOTAL"
@@ -37,11 +43,15 @@ class Database(Module):
     """The Database class is responsible for the persistent storage of AlarmEvents in an SQLite file.
     It enables features like the list of recent alarms or the statistics in the frontend.
     AlarmEvents stored in the database can be exported to a CSV file with the CSVExporter.
-    In addition, the CSVImporter allows importing events from a CSV file into the database."""
+    In addition, the CSVImporter allows importing events from a CSV file into the database.
+    By default, a single connection is used for reading and writing.
+    When the WAL mode is enabled, alarm events are written via a single connection
+    while reads are served by a pool of read-only connections (that only see committed alarm events)
+    so that reads do not block (and are not blocked by) writes."""
 
     DB_APPID   = 112
-    DB_VERSION = 1
 
+    # initial version of the schema (later versions are created by applying all the migrations in MIGRATIONS)
     SCHEMA = """
     CREATE TABLE "alarmevents" (
         "id"                 INTEGER PRIMARY KEY NOT NULL,
@@ -61,10 +71,144 @@ class Database(Module):
     )
     """
 
-    def __init__(self, filename: str = "", reset: bool = False, commit: bool = True) -> None:
-        super().__init__("database", settings = None, debug = False)
+    # The statistics table contains the number of alarm events per bucket (i.e. total, year, month and day) and flags.
+    # It is updated by triggers within the same transaction as the alarm events
+    # so that statistics can be retrieved with a point lookup (instead of scanning all alarm events).
+    # Bucket names are the formatted alarm timestamp (e.g. "2021", "2021-03" or "2021-03-14") or "TOTAL".
+    # NULL flags are counted as an empty BLOB (X'') that differs from any text (including empty flags),
+    # because text alarm events (FLAGS != 'BINARY') do not include alarm events with NULL flags.
+    TRIGGER_STATS_INSERT = """
+    CREATE TRIGGER "alarmstats_insert" AFTER INSERT ON "alarmevents" BEGIN
+        INSERT INTO alarmstats (bucket, flags, count)
+            SELECT bucket, IFNULL(NEW.flags, X''), 1 FROM (
+                SELECT 'TOTAL' AS bucket UNION ALL
+                SELECT strftime('%Y', NEW.alarmtimestamp) UNION ALL
+                SELECT strftime('%Y-%m', NEW.alarmtimestamp) UNION ALL
+                SELECT strftime('%Y-%m-%d', NEW.alarmtimestamp)
+            ) WHERE bucket IS NOT NULL
+            ON CONFLICT (bucket, flags) DO UPDATE SET count = count + 1;
+    END;
+    """
+
+    MIGRATION_STATS = """
+    CREATE TABLE "alarmstats" (
+        "bucket"             TEXT NOT NULL,
+        "flags"              TEXT NOT NULL,
+        "count"              INTEGER NOT NULL,
+        PRIMARY KEY ("bucket", "flags")
+    ) WITHOUT ROWID;
+    """ + TRIGGER_STATS_INSERT + """
+    CREATE TRIGGER "alarmstats_delete" AFTER DELETE ON "alarmevents" BEGIN
+        UPDATE alarmstats SET count = count - 1 WHERE flags = IFNULL(OLD.flags, X'') AND bucket IN (
+            'TOTAL',
+            strftime('%Y', OLD.alarmtimestamp),
+            strftime('%Y-%m', OLD.alarmtimestamp),
+            strftime('%Y-%m-%d', OLD.alarmtimestamp)
+        );
+        DELETE FROM alarmstats WHERE count <= 0;
+    END;
+
+    CREATE TRIGGER "alarmstats_update" AFTER UPDATE OF alarmtimestamp, flags ON "alarmevents" BEGIN
+        UPDATE alarmstats SET count = count - 1 WHERE flags = IFNULL(OLD.flags, X'') AND bucket IN (
+            'TOTAL',
+            strftime('%Y', OLD.alarmtimestamp),
+            strftime('%Y-%m', OLD.alarmtimestamp),
+            strftime('%Y-%m-%d', OLD.alarmtimestamp)
+        );
+        DELETE FROM alarmstats WHERE count <= 0;
+        INSERT INTO alarmstats (bucket, flags, count)
+            SELECT bucket, IFNULL(NEW.flags, X''), 1 FROM (
+                SELECT 'TOTAL' AS bucket UNION ALL
+                SELECT strftime('%Y', NEW.alarmtimestamp) UNION ALL
+                SELECT strftime('%Y-%m', NEW.alarmtimestamp) UNION ALL
+                SELECT strftime('%Y-%m-%d', NEW.alarmtimestamp)
+            ) WHERE bucket IS NOT NULL
+            ON CONFLICT (bucket, flags) DO UPDATE SET count = count + 1;
+    END;
+
+    INSERT INTO alarmstats (bucket, flags, count)
+        SELECT bucket, flags, COUNT(*) FROM (
+            SELECT 'TOTAL' AS bucket, IFNULL(flags, X'') AS flags FROM alarmevents UNION ALL
+            SELECT strftime('%Y', alarmtimestamp), IFNULL(flags, X'') FROM alarmevents UNION ALL
+            SELECT strftime('%Y-%m', alarmtimestamp), IFNULL(flags, X'') FROM alarmevents UNION ALL
+            SELECT strftime('%Y-%m-%d', alarmtimestamp), IFNULL(flags, X'') FROM alarmevents
+        ) WHERE bucket IS NOT NULL GROUP BY bucket, flags;
+    """
+
+    # The alarm date column contains the normalized date of the alarm timestamp (e.g. "2021-03-14")
+    # so that alarm events of a date range can be retrieved via an index.
+    # The flags index allows to retrieve (or count) text alarm events without reading all the binary alarm events.
+    MIGRATION_INDEXES = """
+    ALTER TABLE "alarmevents" ADD COLUMN "alarmdate" TEXT;
+    UPDATE alarmevents SET alarmdate = date(alarmtimestamp);
+    CREATE INDEX "alarmevents_flags" ON "alarmevents" ("flags", "id");
+    CREATE INDEX "alarmevents_alarmdate" ON "alarmevents" ("alarmdate", "flags");
+    """
+
+    # The geocode cache contains the results of address searches of the search location action (see GeocodeCache).
+    # The tables may already exist in files that were used by a previous version of the geocode cache.
+    MIGRATION_GEOCACHE = """
+    CREATE TABLE IF NOT EXISTS "geocache" (
+        "key"                TEXT PRIMARY KEY NOT NULL,
+        "found"              INTEGER,
+        "latitude"           REAL,
+        "longitude"          REAL,
+        "created"            REAL,
+        "lastused"           REAL
+    );
+    CREATE TABLE IF NOT EXISTS "geocachestate" (
+        "name"               TEXT PRIMARY KEY NOT NULL,
+        "value"              INTEGER
+    );
+    """
+
+    # The statistics are computed from the number of alarm events per day (via the alarm date index)
+    REBUILD_STATS = """
+    WITH days AS (
+        SELECT alarmdate AS day, IFNULL(flags, X'') AS flags, COUNT(*) AS count FROM alarmevents GROUP BY day, flags
+    )
+    INSERT INTO alarmstats (bucket, flags, count)
+        SELECT day, flags, count FROM days WHERE day IS NOT NULL UNION ALL
+        SELECT substr(day, 1, 7), flags, SUM(count) FROM days WHERE day IS NOT NULL GROUP BY substr(day, 1, 7), flags UNION ALL
+        SELECT substr(day, 1, 4), flags, SUM(count) FROM days WHERE day IS NOT NULL GROUP BY substr(day, 1, 4), flags UNION ALL
+        SELECT 'TOTAL', flags, SUM(count) FROM days GROUP BY flags
+    """
+
+    QUERY_INSERT = "INSERT INTO alarmevents (timestamp, event, eventdetails, location, locationdetails, comment, " \
+                   "alarmtimestamp, locationlatitude, locationlongitude, source, sender, raw, flags, alarmdate) " \
+                   "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, date(?))"
+
+    # columns of alarm events in the order expected by __alarmEventFromRow
+    EVENT_COLUMNS = "id, timestamp, event, eventdetails, location, locationdetails, comment, " \
+                    "alarmtimestamp, locationlatitude, locationlongitude, source, sender, raw, flags"
+
+    # MIGRATIONS[i] updates the schema from version i + 1 to version i + 2
+    MIGRATIONS = [
+        MIGRATION_STATS,    # v2
+        MIGRATION_INDEXES,  # v3
+        MIGRATION_GEOCACHE, # v4
+    ]
+
+    DB_VERSION = len(MIGRATIONS) + 1
+
+    def __init__(self, filename: str = "", reset: bool = False, commit: bool = True, settings: Optional[Settings] = None) -> None:
+        super().__init__("database", settings = settings, debug = False)
         self.__conn: Optional[sqlite3.Connection] = None
+        self.__readers: Optional['queue.Queue[sqlite3.Connection]'] = None
+        self.__readerConns: List[sqlite3.Connection] = []
         self.__filename = filename
+        self.__revision = 0
+        self.__pendingRevision = 0
+
+        self.__wal = False
+        self.__synchronous = "full"
+        self.__checkpoint = 1000
+        self.__readerCount = 2
+        if settings is not None:
+            self.__wal = settings.getBackendDatabaseWAL()
+            self.__synchronous = settings.getBackendDatabaseSynchronous()
+            self.__checkpoint = settings.getBackendDatabaseCheckpoint()
+            self.__readerCount = settings.getBackendDatabaseReaders()
 
         if filename != "":
             self.init(filename, reset, commit)
@@ -92,17 +236,69 @@ class Database(Module):
             self.__conn = self.__openExistingDatabase(self.__filename)
             self.__checkFile()
 
-    def __assertInitializedFailed(self) -> NoReturn:
-        self.fatal("Database is not yet initialized")
+        self.__initJournal()
+
+    def __initJournal(self) -> None:
+        if self.__conn is None: self.__assertInitializedFailed()
+
+        journalMode = "wal" if self.__wal else "delete"
+        try:
+            self.__conn.execute(f"pragma synchronous = {self.__synchronous}")
+            (mode,) = self.__conn.execute(f"pragma journal_mode = {journalMode}").fetchone()
+            if str(mode).lower() != journalMode:
+                self.fatal(f"Could not set journal mode of database file ({journalMode})")
+
+            if self.__wal:
+                self.__conn.execute(f"pragma wal_autocheckpoint = {self.__checkpoint}")
+                self.__openReaders()
+        except sqlite3.Error as e:
+            self.fatal("Failed to configure database", e)
+
+        self.dbgPrint(f"journal_mode = {journalMode} (synchronous = {self.__synchronous})")
+
+    def __openReaders(self) -> None:
+        # read-only connections in autocommit mode (i.e. every query sees the latest committed state);
+        # the pool ensures that each connection is used by a single thread at a time
+        uri = "file:" + urllib.request.pathname2url(os.path.abspath(self.__filename)) + "?mode=ro"
+        self.__readers = queue.Queue()
+        for _ in range(max(self.__readerCount, 1)):
+            conn = sqlite3.connect(uri, uri = True, check_same_thread = False, isolation_level = None)
+            self.__readerConns.append(conn)
+            self.__readers.put(conn)
+
+    def __closeReaders(self) -> None:
+        for conn in self.__readerConns:
+            conn.close()
+        self.__readerConns = []
+        self.__readers = None
+
+    @contextlib.contextmanager
+    def __reader(self) -> Iterator[sqlite3.Connection]:
+        if self.__readers is None:
+            if self.__conn is None: self.__assertInitializedFailed()
+            yield self.__conn
+            return
+
+        conn = self.__readers.get()
+        try:
+            yield conn
+        finally:
+            self.__readers.put(conn)
 
-    def __initAlarmEventList(self, eventDataList: List[List[Any]]) -> List[AlarmEvent]:
-        eventList = []
+    def __changed(self) -> None:
+        self.__pendingRevision += 1
+        if self.__readers is None:
+            # reads are served by the same connection and therefore immediately see the change
+            self.__revision = self.__pendingRevision
 
-        for event in eventDataList:
-            newEvent = Database.__alarmEventFromList(event)
-            eventList.append(newEvent)
+    def __assertInitializedFailed(self) -> NoReturn:
+        self.fatal("Database is not yet initialized")
 
-        return eventList
+    def __queryEvents(self, conn: sqlite3.Connection, query: str, params: Sequence[Any]) -> sqlite3.Cursor:
+        # the rows of the cursor are directly converted into AlarmEvents (without intermediate tuples)
+        cursor = conn.cursor()
+        cursor.row_factory = Database.__alarmEventFromRow
+        return cursor.execute(query, params)
 
     def __openExistingDatabase(self, filename: str) -> sqlite3.Connection:
         self.print("Opening existing database")
@@ -163,11 +359,14 @@ class Database(Module):
     def __initFile(self) -> None:
         if self.__setAppID(Database.DB_APPID) != 0:
             self.fatal("Could not set application ID of database file")
-        if self.__setVersion(Database.DB_VERSION) != 0:
+        if self.__setVersion(1) != 0:
             self.fatal("Could not set user version of database file")
 
         self.commit()
 
+        # a new database file is created with the initial schema and updated like an existing file
+        self.__migrateFile(1, verbose = False)
+
     def __checkFile(self) -> None:
         dbAppID = self.__getAppID()
         dbVersion = self.__getVersion()
@@ -181,16 +380,42 @@ class Database(Module):
         if dbVersion > Database.DB_VERSION:
             self.fatal(f"Database file has a user version that is too new (file: v{dbVersion}, supported: v{Database.DB_VERSION})")
 
+        if dbVersion < 1:
+            self.fatal(f"Database file has an invalid user version (file: v{dbVersion})")
+
         if dbVersion < Database.DB_VERSION:
-            pass #TODO: DB version older than current schema -> perform schema update
+            self.__migrateFile(dbVersion)
+
+    def __migrateFile(self, dbVersion: int, verbose: bool = True) -> None:
+        """Updates the schema of the database file to the current version by applying all the required migrations.
+        Each migration is applied in a separate transaction together with the update of the user version.
+        Therefore, an interrupted migration is rolled back completely and simply applied again on the next start.
+
+        :param dbVersion: current user version of the database file"""
+        if self.__conn is None: self.__assertInitializedFailed()
+
+        for version in range(dbVersion + 1, Database.DB_VERSION + 1):
+            if verbose:
+                self.print(f"Updating database file to v{version}")
+
+            migration = Database.MIGRATIONS[version - 2]
+            try:
+                self.__conn.commit()
+                self.__conn.executescript(f"BEGIN; {migration}; pragma user_version = {version}; COMMIT;")
+            except sqlite3.Error as e:
+                if self.__conn.in_transaction:
+                    self.__conn.rollback()
+                self.fatal(f"Failed to update database file to v{version}", e)
 
     def commit(self) -> None:
         if self.__conn:
             self.__conn.commit()
+            self.__revision = self.__pendingRevision
             self.print("Committed database")
 
     def close(self) -> None:
         if self.__conn:
+            self.__closeReaders()
             self.__conn.close()
             self.__conn = None
             self.print("Closed database")
@@ -198,18 +423,38 @@ class Database(Module):
     def commitAndClose(self) -> None:
         if self.__conn:
             self.__conn.commit()
+            self.__revision = self.__pendingRevision
+            self.__closeReaders()
             self.__conn.close()
             self.__conn = None
             self.print("Committed and closed database")
 
+    def getFilename(self) -> str:
+        """Returns the path of the database file (e.g. to store additional tables in the same file).
+
+        :return: string with the path of the database file (empty if the database is not initialized)"""
+        return self.__filename
+
+    def getRevision(self) -> int:
+        """Returns the revision of the database that is incremented whenever an alarm event is added, updated or removed
+        (allows clients to detect missed changes).
+        In WAL mode, the revision is only updated on commit (as reads do not see uncommitted changes before).
+
+        :return: int with the current revision"""
+        return self.__revision
+
+    def rollback(self) -> None:
+        if self.__conn:
+            self.__conn.rollback()
+            self.__pendingRevision = self.__revision
+            self.print("Rolled back database")
+
     def addEvent(self, alarmEvent: AlarmEvent, verbose: bool = True) -> int:
         if self.__conn is None: self.__assertInitializedFailed() # return -1
 
-        query = "INSERT INTO alarmevents (timestamp, event, eventdetails, location, locationdetails, comment, " \
-                "alarmtimestamp, locationlatitude, locationlongitude, source, sender, raw, flags) " \
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        query = Database.QUERY_INSERT
         try:
-            cursor = self.__conn.execute(query, Database.__tupleWithoutIDFromAlarmEvent(alarmEvent))
+            cursor = self.__conn.execute(query, Database.__tupleWithoutIDFromAlarmEvent(alarmEvent) + (alarmEvent.alarmTimestamp,))
 
             if cursor.rowcount != 1:
                 self.error("Could not add alarm event")
@@ -220,6 +465,7 @@ class Database(Module):
                 return -1
 
             alarmEvent.eventID = cursor.lastrowid
+            self.__changed()
 
             if verbose:
                 self.print(f"Added alarm event #{alarmEvent.eventID}")
@@ -228,19 +474,66 @@ class Database(Module):
             self.error("Could not add alarm event", e)
             return -1
 
+    def addEvents(self, alarmEvents: Iterable[AlarmEvent], chunkSize: int = 1000, progress: Optional[Callable[[int], None]] = None) -> int:
+        """Adds many alarm events at once (e.g. for an import).
+        The alarm events are consumed lazily and inserted in chunks within the current transaction
+        so that the memory consumption does not depend on the number of alarm events.
+        Instead of updating the statistics for each alarm event, the statistics are rebuilt afterwards.
+        In contrast to addEvent, the IDs of the added alarm events are not updated.
+
+        :param alarmEvents: iterable (e.g. a generator) with the alarm events to add
+        :param chunkSize: number of alarm events inserted with a single statement execution
+        :param progress: callable that is called with the number of added alarm events after each chunk (optional)
+        :return: number of added alarm events (or -1 in case of an error)"""
+        if self.__conn is None: self.__assertInitializedFailed() # return -1
+
+        query = Database.QUERY_INSERT
+        addedCount = 0
+        rows = (Database.__tupleWithoutIDFromAlarmEvent(alarmEvent) + (alarmEvent.alarmTimestamp,) for alarmEvent in alarmEvents)
+        try:
+            # the trigger is dropped within the transaction of the alarm events
+            # (a DDL statement does not begin a transaction implicitly, i.e. a rollback would lose the trigger otherwise)
+            if not self.__conn.in_transaction:
+                self.__conn.execute("BEGIN")
+            self.__conn.execute('DROP TRIGGER IF EXISTS "alarmstats_insert"')
+            try:
+                while True:
+                    chunk = list(itertools.islice(rows, max(chunkSize, 1)))
+                    if len(chunk) == 0:
+                        break
+
+                    self.__conn.executemany(query, chunk)
+                    addedCount += len(chunk)
+
+                    if progress is not None:
+                        progress(addedCount)
+            finally:
+                # the trigger is restored even in case of an error (i.e. also when the caller commits anyway)
+                self.rebuildStats()
+                self.__conn.execute(Database.TRIGGER_STATS_INSERT)
+                if addedCount > 0:
+                    self.__changed()
+        except sqlite3.Error as e:
+            self.error("Could not add alarm events", e)
+            return -1
+
+        return addedCount
+
     def updateEvent(self, alarmEvent: AlarmEvent, verbose: bool = True) -> int:
         if self.__conn is None: self.__assertInitializedFailed() # return -1
 
         query = "UPDATE alarmevents SET timestamp = ?, event = ?, eventdetails = ?, location = ?, locationdetails = ?, comment = ?, " \
-                "alarmtimestamp = ?, locationlatitude = ?, locationlongitude = ?, source = ?, sender = ?, raw = ?, flags = ? " \
+                "alarmtimestamp = ?, locationlatitude = ?, locationlongitude = ?, source = ?, sender = ?, raw = ?, flags = ?, alarmdate = date(?) " \
                 "WHERE id = ?"
         try:
-            cursor = self.__conn.execute(query, Database.__tupleWithoutIDFromAlarmEvent(alarmEvent) + (alarmEvent.eventID,))
+            cursor = self.__conn.execute(query, Database.__tupleWithoutIDFromAlarmEvent(alarmEvent) + (alarmEvent.alarmTimestamp, alarmEvent.eventID))
 
             if cursor.rowcount != 1:
                 self.error(f"Could not update alarm event #{alarmEvent.eventID}")
                 return -1
 
+            self.__changed()
+
             if verbose:
                 self.print(f"Updated alarm event #{alarmEvent.eventID}")
             return 0
@@ -262,6 +555,8 @@ class Database(Module):
                 self.error(f"Could not remove alarm event #{eventID}")
                 return -1
 
+            self.__changed()
+
             if verbose:
                 self.print(f"Removed alarm event #{eventID}")
             return 0
@@ -272,63 +567,144 @@ class Database(Module):
     def getEvent(self, eventID: int) -> Optional[AlarmEvent]:
         if self.__conn is None: self.__assertInitializedFailed() # return None
 
-        query = "SELECT * FROM alarmevents WHERE id = ?"
-        cursor = self.__conn.execute(query, (eventID,))
-        result = cursor.fetchone()
-        if result is not None:
-            return Database.__alarmEventFromList(result)
-
-        return None
+        query = "SELECT " + Database.EVENT_COLUMNS + " FROM alarmevents WHERE id = ?"
+        with self.__reader() as conn:
+            cursor = self.__queryEvents(conn, query, (eventID,))
+            result: Optional[AlarmEvent] = cursor.fetchone()
+        return result
 
     def getEvents(self, textOnly: bool) -> List[AlarmEvent]:
-        if self.__conn is None: self.__assertInitializedFailed() # return []
-
-        if textOnly:
-            query = "SELECT * FROM alarmevents WHERE FLAGS != '" + AlarmEvent.FLAGS_BINARY + "' ORDER BY id ASC"
-        else:
-            query = "SELECT * FROM alarmevents ORDER BY id ASC"
-        cursor = self.__conn.execute(query)
-        result = cursor.fetchall()
-        return self.__initAlarmEventList(result)
+        return list(self.iterEvents(textOnly))
+
+    def iterEvents(self, textOnly: bool, *, since: str = "", until: str = "", flags: Optional[List[str]] = None,
+                   batchSize: int = 1000) -> Iterator[AlarmEvent]:
+        """Iterates over the stored alarm events (ordered by ID) without loading all of them at once.
+
+        :param textOnly: bool whether binary alarm events are skipped
+        :param since: first alarm date to include (format YYYY-MM-DD; optional)
+        :param until: last alarm date to include (format YYYY-MM-DD; optional)
+        :param flags: list of flags of the alarm events to include (optional)
+        :param batchSize: number of alarm events fetched from the database at once
+        :return: iterator over AlarmEvents"""
+        if self.__conn is None: self.__assertInitializedFailed() # return
+
+        (conditions, params) = Database.__eventConditions(textOnly, since, until, flags)
+
+        query = "SELECT " + Database.EVENT_COLUMNS + " FROM alarmevents"
+        if len(conditions) > 0:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id ASC"
+
+        with self.__reader() as conn:
+            cursor = self.__queryEvents(conn, query, params)
+            while True:
+                result: List[AlarmEvent] = cursor.fetchmany(batchSize)
+                if len(result) == 0:
+                    break
+                yield from result
+
+    def getEventPage(self, textOnly: bool, limit: int, *, beforeID: Optional[int] = None, afterID: Optional[int] = None, #pylint: disable=too-many-arguments
+                     since: str = "", until: str = "", flags: Optional[List[str]] = None) -> Tuple[List[AlarmEvent], bool]:
+        """Returns a page of stored alarm events (newest first) selected with keyset cursors instead of offsets
+        (so that the duration of a request does not depend on the position of the page).
+        Without cursors the newest alarm events are returned. With afterID (and without beforeID)
+        the alarm events directly following afterID are returned (e.g. to catch up on missed alarm events).
+
+        :param textOnly: bool whether binary alarm events are skipped
+        :param limit: maximum number of alarm events of the page
+        :param beforeID: only alarm events with a smaller ID are returned (optional)
+        :param afterID: only alarm events with a larger ID are returned (optional)
+        :param since: first alarm date to include (format YYYY-MM-DD; optional)
+        :param until: last alarm date to include (format YYYY-MM-DD; optional)
+        :param flags: list of flags of the alarm events to include (optional)
+        :return: tuple with the list of AlarmEvents (ordered by descending ID) and a bool whether more alarm events are available
+                 (i.e. older alarm events or - when only afterID is given - newer alarm events)"""
+        if self.__conn is None: self.__assertInitializedFailed() # return ([], False)
+
+        (conditions, params) = Database.__eventConditions(textOnly, since, until, flags)
+        if beforeID is not None:
+            conditions.append("id < ?")
+            params.append(beforeID)
+        if afterID is not None:
+            conditions.append("id > ?")
+            params.append(afterID)
+
+        ascending = (afterID is not None and beforeID is None)
+
+        query = "SELECT " + Database.EVENT_COLUMNS + " FROM alarmevents"
+        if len(conditions) > 0:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id ASC LIMIT ?" if ascending else " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1) # one additional alarm event tells whether there are more alarm events
+
+        with self.__reader() as conn:
+            cursor = self.__queryEvents(conn, query, params)
+            alarmEvents: List[AlarmEvent] = cursor.fetchall()
+
+        more = len(alarmEvents) > limit
+        del alarmEvents[limit:]
+        if ascending:
+            alarmEvents.reverse()
+        return (alarmEvents, more)
 
     def getLastEvents(self, count: int, textOnly: bool) -> List[AlarmEvent]:
         if self.__conn is None: self.__assertInitializedFailed() # return []
 
         if textOnly:
-            query = "SELECT * FROM alarmevents WHERE FLAGS != '" + AlarmEvent.FLAGS_BINARY + "' ORDER BY id DESC LIMIT ?"
+            query = "SELECT " + Database.EVENT_COLUMNS + " FROM alarmevents WHERE FLAGS != '" + AlarmEvent.FLAGS_BINARY + "' ORDER BY id DESC LIMIT ?"
         else:
-            query = "SELECT * FROM alarmevents ORDER BY id DESC LIMIT ?"
-        cursor = self.__conn.execute(query, (count,))
-        result = cursor.fetchall()
-        return self.__initAlarmEventList(result)
+            query = "SELECT " + Database.EVENT_COLUMNS + " FROM alarmevents ORDER BY id DESC LIMIT ?"
+        with self.__reader() as conn:
+            cursor = self.__queryEvents(conn, query, (count,))
+            result: List[AlarmEvent] = cursor.fetchall()
+        return result
 
     def getEventCount(self, textOnly: bool) -> int:
-        if self.__conn is None: self.__assertInitializedFailed() # return 0
-
-        if textOnly:
-            query = "SELECT COUNT(*) FROM alarmevents WHERE FLAGS != '" + AlarmEvent.FLAGS_BINARY + "'"
-        else:
-            query = "SELECT COUNT(*) FROM alarmevents"
-        cursor = self.__conn.execute(query)
-        (count,) = cursor.fetchone()
-        return int(count)
+        return self.getEventStats(DatabaseTimespan.TOTAL, textOnly)
 
     def getEventStats(self, timespan: DatabaseTimespan, textOnly: bool) -> int:
         if self.__conn is None: self.__assertInitializedFailed() # return 0
 
         if timespan == DatabaseTimespan.TOTAL:
-            return self.getEventCount(textOnly=textOnly)
+            bucket = DatabaseTimespan.TOTAL.value
+        else:
+            moment = datetime.datetime.now()
+            bucket = moment.strftime(timespan.value)
 
-        moment = datetime.datetime.now()
-        currentTimespan = moment.strftime(timespan.value)
         if textOnly:
-            query = "SELECT COUNT(*) FROM alarmevents WHERE FLAGS != '" + AlarmEvent.FLAGS_BINARY + "' AND strftime('" + timespan.value + "', alarmtimestamp) == ?"
+            query = "SELECT IFNULL(SUM(count), 0) FROM alarmstats WHERE bucket = ? AND flags NOT IN ('" + AlarmEvent.FLAGS_BINARY + "', X'')"
         else:
-            query = "SELECT COUNT(*) FROM alarmevents WHERE strftime('" + timespan.value + "', alarmtimestamp) == ?"
-        cursor = self.__conn.execute(query, (currentTimespan,))
-        (count,) = cursor.fetchone()
+            query = "SELECT IFNULL(SUM(count), 0) FROM alarmstats WHERE bucket = ?"
+        with self.__reader() as conn:
+            cursor = conn.execute(query, (bucket,))
+            (count,) = cursor.fetchone()
         return int(count)
 
+    def rebuildStats(self) -> None:
+        """Recomputes the statistics table from all stored alarm events
+        (e.g. after a bulk import or to repair the statistics)."""
+        if self.__conn is None: self.__assertInitializedFailed()
+
+        self.__conn.execute("DELETE FROM alarmstats")
+        self.__conn.execute(Database.REBUILD_STATS)
+
+    @staticmethod
+    def __eventConditions(textOnly: bool, since: str, until: str, flags: Optional[List[str]]) -> Tuple[List[str], List[Any]]:
+        conditions: List[str] = []
+        params: List[Any] = []
+        if textOnly:
+            conditions.append("FLAGS != '" + AlarmEvent.FLAGS_BINARY + "'")
+        if since != "":
+            conditions.append("alarmdate >= ?")
+            params.append(since)
+        if until != "":
+            conditions.append("alarmdate <= ?")
+            params.append(until)
+        if flags is not None:
+            conditions.append("flags IN (" + ", ".join(["?"] * len(flags)) + ")")
+            params.extend(flags)
+        return (conditions, params)
+
     @classmethod
     def __tupleWithoutIDFromAlarmEvent(cls, alarmEvent: AlarmEvent) -> Tuple[Any, ...]:
         return (
@@ -353,24 +729,26 @@ class Database(Module):
     def __tupleWithIDFromAlarmEvent(cls, alarmEvent: AlarmEvent) -> Tuple[Any, ...]:
         return (alarmEvent.eventID,) + cls.__tupleWithoutIDFromAlarmEvent(alarmEvent)
 
-    @classmethod
-    def __alarmEventFromList(cls, eventData: List[Any]) -> AlarmEvent:
-        alarmEvent = AlarmEvent(eventData[0])
-
-        alarmEvent.timestamp          = eventData[1]
-
-        alarmEvent.event              = eventData[2]
-        alarmEvent.eventDetails       = eventData[3]
-        alarmEvent.location           = eventData[4]
-        alarmEvent.locationDetails    = eventData[5]
-        alarmEvent.comment            = eventData[6]
-        alarmEvent.alarmTimestamp     = eventData[7]
-        alarmEvent.locationLatitude   = eventData[8]
-        alarmEvent.locationLongitude  = eventData[9]
-
-        alarmEvent.source             = eventData[10]
-        alarmEvent.sender             = eventData[11]
-        alarmEvent.raw                = eventData[12]
-        alarmEvent.flags              = eventData[13]
+    @staticmethod
+    def __alarmEventFromRow(cursor: sqlite3.Cursor, row: Tuple[Any, ...]) -> AlarmEvent:
+        # the constructor is bypassed because all the fields are initialized from the row anyway
+        alarmEvent = AlarmEvent.__new__(AlarmEvent)
+
+        (alarmEvent.eventID,
+         alarmEvent.timestamp,
+
+         alarmEvent.event,
+         alarmEvent.eventDetails,
+         alarmEvent.location,
+         alarmEvent.locationDetails,
+         alarmEvent.comment,
+         alarmEvent.alarmTimestamp,
+         alarmEvent.locationLatitude,
+         alarmEvent.locationLongitude,
+
+         alarmEvent.source,
+         alarmEvent.sender,
+         alarmEvent.raw,
+         alarmEvent.flags) = row
 
         return alarmEvent
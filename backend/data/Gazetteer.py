@@ -0,0 +1,313 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import re
+import csv
+import bisect
+
+from typing import Dict, List, Optional, Tuple
+
+from backend.data.GeocodeCache import GeocodeCache, Coordinates
+from backend.util.Module import Module
+
+class GazetteerLocation: #pylint: disable=too-few-public-methods
+    """Result of a search in the Gazetteer (with the same attributes as the locations returned by the geocoders of geopy)."""
+
+    __slots__ = ("address", "latitude", "longitude")
+
+    def __init__(self, address: str, latitude: float, longitude: float) -> None:
+        self.address = address
+        self.latitude = latitude
+        self.longitude = longitude
+
+class _GazetteerStreet: #pylint: disable=too-few-public-methods
+    """All the known houses of a street within a city."""
+
+    __slots__ = ("name", "city", "normalizedCity", "houses", "numbers")
+
+    def __init__(self, name: str, city: str) -> None:
+        self.name = name
+        self.city = city
+        self.normalizedCity = GeocodeCache.normalizeText(city)
+        self.houses: Dict[str, Coordinates] = {}                     # normalized house number -> location
+        self.numbers: List[Tuple[int, float, float]] = []            # numeric house numbers and locations (sorted)
+
+class _GazetteerTrieNode: #pylint: disable=too-few-public-methods
+    """Node of the trie of all normalized street names."""
+
+    __slots__ = ("children", "street")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _GazetteerTrieNode] = {}
+        self.street: Optional[str] = None
+
+class Gazetteer(Module):
+    """The Gazetteer is a local (offline) geocoder for the area of the fire department.
+    It loads the locations of all houses (city, street, house number, latitude and longitude) from a CSV file
+    (e.g. an extract of OpenStreetMap) and keeps them in memory. Street names are stored in a trie
+    that allows finding misspelled street names (with a bounded edit distance) without comparing all streets.
+    Unknown house numbers are interpolated between the neighbouring house numbers of the street
+    (streets of other cities than the specified one and house numbers beyond the known houses are not found)."""
+
+    # supported column names (e.g. osmconvert --csv="addr:city addr:street addr:housenumber @lat @lon" --csv-headline)
+    COLUMNS = {
+        'city':        ["city", "addr:city"],
+        'street':      ["street", "addr:street"],
+        'housenumber': ["housenumber", "addr:housenumber"],
+        'latitude':    ["latitude", "lat", "@lat"],
+        'longitude':   ["longitude", "lon", "@lon"],
+    }
+
+    DELIMITERS = [";", "\t", ","]
+
+    HOUSE_NUMBER = re.compile(r"^(\d+)\s*([a-z]?)$")
+
+    MAX_FUZZY_RESULTS = 1024 # number of remembered searches for misspelled street names
+
+    def __init__(self, moduleName: str, filename: str) -> None:
+        """Loads the gazetteer from the specified CSV file.
+
+        :param moduleName: string representing the name of the owner of the gazetteer (used for log messages)
+        :param filename: path of the CSV file (with a header line that names the columns)"""
+        super().__init__(moduleName)
+        self.__streets: Dict[str, List[_GazetteerStreet]] = {}   # normalized street name -> streets (in different cities)
+        self.__trie = _GazetteerTrieNode()
+        self.__fuzzyResults: Dict[str, List[Tuple[int, str]]] = {}
+        self.__houseCount = 0
+
+        try:
+            self.__load(filename)
+        except Exception as e:
+            self.fatal(f"Failed to load gazetteer ({filename})", e)
+
+        self.print(f"Loaded gazetteer with {self.__houseCount} houses in {len(self.__streets)} streets")
+
+    def __len__(self) -> int:
+        return self.__houseCount
+
+    def __load(self, filename: str) -> None:
+        with open(filename, 'r', newline='', encoding='utf-8') as f:
+            header = f.readline()
+            delimiter = next((d for d in Gazetteer.DELIMITERS if d in header), Gazetteer.DELIMITERS[0])
+            names = [name.strip().lower() for name in header.strip("\r\n").split(delimiter)]
+
+            indices: Dict[str, int] = {}
+            for (column, aliases) in Gazetteer.COLUMNS.items():
+                for alias in aliases:
+                    if alias in names:
+                        indices[column] = names.index(alias)
+                        break
+                else:
+                    raise ValueError(f"Missing column {column}")
+
+            streets: Dict[Tuple[str, str], _GazetteerStreet] = {}
+            for row in csv.reader(f, delimiter=delimiter):
+                if len(row) < len(names):
+                    continue
+
+                street = row[indices['street']].strip()
+                if street == "":
+                    continue
+
+                try:
+                    coordinates = (float(row[indices['latitude']]), float(row[indices['longitude']]))
+                except ValueError:
+                    continue
+
+                city = row[indices['city']].strip()
+                normalizedStreet = GeocodeCache.normalizeText(street)
+                streetKey = (normalizedStreet, GeocodeCache.normalizeText(city))
+                gazetteerStreet = streets.get(streetKey)
+                if gazetteerStreet is None:
+                    gazetteerStreet = _GazetteerStreet(street, city)
+                    streets[streetKey] = gazetteerStreet
+                    self.__streets.setdefault(normalizedStreet, []).append(gazetteerStreet)
+                    self.__insert(normalizedStreet)
+
+                houseNumber = GeocodeCache.normalizeText(row[indices['housenumber']]).replace(" ", "")
+                gazetteerStreet.houses.setdefault(houseNumber, coordinates)
+                match = Gazetteer.HOUSE_NUMBER.match(houseNumber)
+                if match is not None:
+                    gazetteerStreet.numbers.append((int(match.group(1)),) + coordinates)
+                self.__houseCount += 1
+
+        for gazetteerStreet in streets.values():
+            # a single location per numeric house number (e.g. 5 instead of 5a)
+            numbers: Dict[int, Tuple[int, float, float]] = {}
+            for entry in sorted(gazetteerStreet.numbers):
+                plain = gazetteerStreet.houses.get(str(entry[0]))
+                numbers.setdefault(entry[0], (entry[0],) + plain if plain is not None else entry)
+            gazetteerStreet.numbers = sorted(numbers.values())
+
+    def __insert(self, normalizedStreet: str) -> None:
+        node = self.__trie
+        for char in normalizedStreet:
+            child = node.children.get(char)
+            if child is None:
+                child = _GazetteerTrieNode()
+                node.children[char] = child
+            node = child
+        node.street = normalizedStreet
+
+    def __findStreets(self, normalizedStreet: str) -> List[Tuple[int, str]]:
+        """Returns all street names within the allowed edit distance of the specified street name (best matches first)."""
+        # the allowed number of typos depends on the length of the street name
+        maxDistance = 0 if len(normalizedStreet) < 4 else (1 if len(normalizedStreet) < 8 else 2)
+        if maxDistance == 0:
+            return []
+
+        results = self.__fuzzyResults.get(normalizedStreet)
+        if results is not None:
+            return results
+
+        results = []
+        firstRow = [min(column, maxDistance + 1) for column in range(len(normalizedStreet) + 1)]
+        for (char, child) in self.__trie.children.items():
+            Gazetteer.__searchTrie(child, char, 1, normalizedStreet, firstRow, maxDistance, results)
+        results.sort()
+
+        # the gazetteer is used by multiple threads (but a lost update of the remembered results does not matter)
+        if len(self.__fuzzyResults) >= Gazetteer.MAX_FUZZY_RESULTS:
+            self.__fuzzyResults.clear()
+        self.__fuzzyResults[normalizedStreet] = results
+        return results
+
+    @staticmethod
+    def __searchTrie(node: _GazetteerTrieNode, char: str, depth: int, word: str, previousRow: List[int], #pylint: disable=too-many-arguments,too-many-positional-arguments
+                     maxDistance: int, results: List[Tuple[int, str]]) -> None:
+        # computes the next row of the levenshtein distance matrix for the prefix represented by the node;
+        # only the diagonal band of the matrix that may contain distances within the maximum distance is computed
+        # (other distances are capped) and subtrees are skipped as soon as all prefixes exceed the maximum distance
+        limit = maxDistance + 1
+        currentRow = [limit] * (len(word) + 1)
+        currentRow[0] = min(depth, limit)
+        for column in range(max(1, depth - maxDistance), min(len(word), depth + maxDistance) + 1):
+            currentRow[column] = min(previousRow[column - 1] + (word[column - 1] != char),
+                                     previousRow[column] + 1, currentRow[column - 1] + 1, limit)
+
+        if node.street is not None and currentRow[-1] <= maxDistance:
+            results.append((currentRow[-1], node.street))
+
+        if min(currentRow) <= maxDistance:
+            for (childChar, child) in node.children.items():
+                Gazetteer.__searchTrie(child, childChar, depth + 1, word, currentRow, maxDistance, results)
+
+    @staticmethod
+    def __locateHouse(street: _GazetteerStreet, houseNumber: str) -> Optional[Coordinates]:
+        coordinates = street.houses.get(houseNumber)
+        if coordinates is not None:
+            return coordinates
+
+        match = Gazetteer.HOUSE_NUMBER.match(houseNumber)
+        if match is None or len(street.numbers) == 0:
+            # the first house of the street (e.g. for alarms without a house number)
+            return street.houses[next(iter(street.houses))] if len(street.houses) > 0 else None
+
+        number = int(match.group(1))
+        index = bisect.bisect_left(street.numbers, (number,))
+        if index < len(street.numbers) and street.numbers[index][0] == number:
+            # e.g. 5b is located at 5 (or 5a)
+            return street.numbers[index][1:]
+
+        if index == 0 or index == len(street.numbers):
+            # house numbers beyond the known houses of the street cannot be located
+            return None
+
+        # interpolation between the neighbouring house numbers
+        (lowerNumber, lowerLatitude, lowerLongitude) = street.numbers[index - 1]
+        (upperNumber, upperLatitude, upperLongitude) = street.numbers[index]
+        ratio = (number - lowerNumber) / (upperNumber - lowerNumber)
+        return (lowerLatitude + (upperLatitude - lowerLatitude) * ratio,
+                lowerLongitude + (upperLongitude - lowerLongitude) * ratio)
+
+    @staticmethod
+    def __splitAddress(tokens: List[str]) -> Tuple[List[str], str, List[str]]:
+        # splits the tokens of an address into the tokens before the house number, the house number and the remaining tokens
+        for (index, token) in enumerate(tokens):
+            if token[0].isdigit() and Gazetteer.HOUSE_NUMBER.match(token) is not None:
+                if index + 1 < len(tokens) and len(tokens[index + 1]) == 1 and tokens[index + 1].isalpha():
+                    return (tokens[:index], token + tokens[index + 1], tokens[index + 2:]) # e.g. 5 a
+                return (tokens[:index], token, tokens[index + 1:])
+        return (tokens, "", [])
+
+    @staticmethod
+    def __getCityPenalty(candidateCity: str, street: _GazetteerStreet) -> Optional[int]:
+        # streets in the specified city are preferred over streets without a city (streets of other cities are ignored)
+        if candidateCity in ("", street.normalizedCity):
+            return 0
+        if street.normalizedCity == "":
+            return 2
+        if street.normalizedCity in candidateCity or candidateCity in street.normalizedCity:
+            return 1
+        return None
+
+    def __findBestStreet(self, candidates: List[Tuple[str, List[str]]], fuzzy: bool) -> Optional[_GazetteerStreet]:
+        bestRank: Optional[Tuple[int, int]] = None
+        bestStreet: Optional[_GazetteerStreet] = None
+        for (candidateCity, streetTokens) in candidates:
+            normalizedStreet = " ".join(streetTokens)
+            if fuzzy:
+                streetNames = self.__findStreets(normalizedStreet)
+            else:
+                streetNames = [(0, normalizedStreet)] if normalizedStreet in self.__streets else []
+
+            for (distance, streetName) in streetNames:
+                for street in self.__streets[streetName]:
+                    cityPenalty = Gazetteer.__getCityPenalty(candidateCity, street)
+                    if cityPenalty is None:
+                        continue
+                    rank = (cityPenalty, distance)
+                    if bestRank is None or rank < bestRank:
+                        (bestRank, bestStreet) = (rank, street)
+
+        return bestStreet
+
+    def search(self, location: str, locationDetails: str) -> Optional[GazetteerLocation]:
+        """Searches the location of an address.
+
+        :param location: string with the location of an alarm event (e.g. the city; may be empty)
+        :param locationDetails: string with the location details of an alarm event (e.g. street and house number)
+        :return: GazetteerLocation if the street (in the specified city) and the house are known, None otherwise"""
+        (streetTokens, houseNumber, remainingTokens) = Gazetteer.__splitAddress(GeocodeCache.normalizeText(locationDetails).split())
+        city = " ".join(GeocodeCache.normalizeText(location).split() + remainingTokens)
+
+        # without a separate location, the leading tokens may represent the city
+        candidates = [(city, streetTokens)]
+        if city == "":
+            candidates.extend((" ".join(streetTokens[:i]), streetTokens[i:]) for i in range(1, len(streetTokens)))
+
+        # misspelled street names are only searched when no street name of the city matches exactly
+        street = self.__findBestStreet(candidates, False)
+        if street is None:
+            street = self.__findBestStreet(candidates, True)
+        if street is None:
+            return None
+
+        coordinates = Gazetteer.__locateHouse(street, houseNumber)
+        if coordinates is None:
+            return None
+
+        address = f"{street.name} {houseNumber}".strip()
+        if street.city != "":
+            address += f", {street.city}"
+        return GazetteerLocation(address, coordinates[0], coordinates[1])
+
+    def geocode(self, query: str) -> Optional[GazetteerLocation]:
+        """Searches the location of an address (compatible with the geocoders of geopy).
+
+        :param query: string with the address (e.g. city, street and house number)
+        :return: GazetteerLocation if the street is known, None otherwise"""
+        return self.search("", query)
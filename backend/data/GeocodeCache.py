@@ -0,0 +1,247 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import re
+import time
+import sqlite3
+import atexit
+import threading
+import collections
+
+from typing import Any, Dict, List, Optional, OrderedDict, Set, Tuple
+
+from backend.util.Module import Module
+from backend.data.Database import Database
+
+Coordinates = Tuple[float, float] # latitude and longitude
+
+class GeocodeCache(Module):
+    """The GeocodeCache stores the results of address searches (geocoding) persistently in the table geocache
+    of the database file (next to the alarm events), because alarms are often received for the same addresses.
+    Addresses are normalized (e.g. case and abbreviations) before they are used as key.
+    Unsuccessful searches are cached as well (for a shorter duration) to avoid repeating them for every alarm.
+    All entries are kept in memory (least recently used entries are evicted once the maximum size is reached)
+    so that lookups do not require any I/O. The GeocodeCache is thread-safe.
+    The tables of the cache are created by the migrations of the Database (i.e. the Database has to be opened first)."""
+
+    # the cache is prewarmed with the locations of historical alarm events (newest first, i.e. newer locations win);
+    # only alarm events that were added since the last prewarming are considered
+    PREWARM = """
+    INSERT INTO geocache (key, found, latitude, longitude, created, lastused)
+        SELECT geocache_key(location, locationdetails), 1, locationlatitude, locationlongitude, ?, ? FROM alarmevents
+        WHERE id > ? AND location != '' AND locationdetails != '' AND (locationlatitude != 0.0 OR locationlongitude != 0.0)
+        ORDER BY id DESC
+    ON CONFLICT (key) DO UPDATE SET found = excluded.found, latitude = excluded.latitude, longitude = excluded.longitude,
+        created = excluded.created WHERE geocache.found = 0
+    """
+
+    STATE_PREWARMED_ID = "prewarmed_id"
+
+    # normalization of addresses: abbreviations are expanded, punctuation and redundant whitespace are removed
+    ABBREVIATIONS = [
+        (re.compile(r"str\b"), "strasse"),
+        (re.compile(r"pl\b"), "platz"),
+    ]
+    PUNCTUATION = re.compile(r"[^\w]+")
+
+    def __init__(self, moduleName: str, filename: str, maxEntries: int, ttl: float, negativeTTL: float) -> None:
+        """Opens (or creates) the geocode cache in the specified database file and loads all valid entries.
+
+        :param moduleName: string representing the name of the owner of the cache (used for log messages)
+        :param filename: path of the database file (an empty string creates a cache that is not persisted)
+        :param maxEntries: maximum number of cached addresses
+        :param ttl: duration (in seconds) found locations are cached
+        :param negativeTTL: duration (in seconds) unsuccessful searches are cached"""
+        super().__init__(moduleName)
+        self.__lock = threading.Lock()
+        self.__persistent = (filename != "")
+        self.__maxEntries = max(maxEntries, 1)
+        self.__ttl = ttl
+        self.__negativeTTL = negativeTTL
+        self.__entries: OrderedDict[str, Tuple[Optional[Coordinates], float]] = collections.OrderedDict()
+        self.__used: Set[str] = set() # keys whose last use is not yet stored in the database
+        self.__hits = 0
+        self.__misses = 0
+
+        try:
+            # the connection is used by the worker threads of the action (serialized by the lock)
+            self.__conn = sqlite3.connect(filename if self.__persistent else ":memory:", check_same_thread=False)
+            self.__conn.create_function("geocache_key", 2, GeocodeCache.normalizeAddress, deterministic=True)
+            if not self.__persistent:
+                self.__conn.executescript(Database.MIGRATION_GEOCACHE)
+            elif self.__conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'geocache'").fetchone() is None:
+                self.fatal(f"Failed to open geocode cache ({filename} is not an up-to-date database file)")
+        except sqlite3.Error as e:
+            self.fatal(f"Failed to open geocode cache ({filename})", e)
+
+        self.__load()
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+        self.flush()
+        with self.__lock:
+            self.__conn.close()
+
+    @staticmethod
+    def normalizeAddress(location: str, locationDetails: str) -> str:
+        """Returns the normalized address used as key of the cache
+        (e.g. "Hauptstr. 5, Musterdorf" and "HAUPTSTRASSE 5 Musterdorf" share the same key).
+
+        :param location: string with the location of an alarm event (e.g. the city)
+        :param locationDetails: string with the location details of an alarm event (e.g. street and house number)
+        :return: string with the normalized address"""
+        return GeocodeCache.normalizeText(location + " " + locationDetails)
+
+    @staticmethod
+    def normalizeText(text: str) -> str:
+        """Returns the normalized representation of a part of an address (e.g. a street name).
+
+        :param text: string with (a part of) an address
+        :return: string with the normalized text"""
+        text = GeocodeCache.PUNCTUATION.sub(" ", text.casefold())
+        for (pattern, replacement) in GeocodeCache.ABBREVIATIONS:
+            text = pattern.sub(replacement, text)
+        return " ".join(text.split())
+
+    def __expired(self, coordinates: Optional[Coordinates], created: float, now: float) -> bool:
+        ttl = self.__ttl if coordinates is not None else self.__negativeTTL
+        return created + ttl <= now
+
+    def __load(self) -> None:
+        now = time.time()
+        with self.__lock:
+            # expired entries are removed and the most recently used entries are loaded (oldest first)
+            self.__conn.execute("DELETE FROM geocache WHERE (found != 0 AND created <= ?) OR (found = 0 AND created <= ?)",
+                                (now - self.__ttl, now - self.__negativeTTL))
+            rows = self.__conn.execute("SELECT key, found, latitude, longitude, created FROM geocache "
+                                       "ORDER BY lastused DESC LIMIT ?", (self.__maxEntries,)).fetchall()
+            self.__conn.execute("DELETE FROM geocache WHERE key NOT IN (SELECT key FROM geocache ORDER BY lastused DESC LIMIT ?)",
+                                (self.__maxEntries,))
+            self.__conn.commit()
+
+            self.__entries.clear()
+            for (key, found, latitude, longitude, created) in reversed(rows):
+                self.__entries[key] = ((latitude, longitude) if found != 0 else None, created)
+
+    def __evict(self) -> None:
+        evicted: List[Tuple[str]] = []
+        while len(self.__entries) > self.__maxEntries:
+            (key, _) = self.__entries.popitem(last=False)
+            self.__used.discard(key)
+            evicted.append((key,))
+        if len(evicted) > 0:
+            self.__conn.executemany("DELETE FROM geocache WHERE key = ?", evicted)
+
+    def prewarm(self) -> int:
+        """Adds the locations of all alarm events that were stored in the database file since the last call
+        (alarm events without an address or location are skipped). Cached unsuccessful searches are replaced.
+
+        :return: number of added (or replaced) entries"""
+        if not self.__persistent:
+            return 0
+
+        self.flush()
+
+        now = time.time()
+        with self.__lock:
+            try:
+                row = self.__conn.execute("SELECT value FROM geocachestate WHERE name = ?", (GeocodeCache.STATE_PREWARMED_ID,)).fetchone()
+                prewarmedID = row[0] if row is not None else 0
+                (lastID,) = self.__conn.execute("SELECT IFNULL(MAX(id), 0) FROM alarmevents").fetchone()
+                if lastID <= prewarmedID:
+                    return 0
+
+                cursor = self.__conn.execute(GeocodeCache.PREWARM, (now, now, prewarmedID))
+                added = int(cursor.rowcount)
+                self.__conn.execute("INSERT OR REPLACE INTO geocachestate (name, value) VALUES (?, ?)",
+                                    (GeocodeCache.STATE_PREWARMED_ID, lastID))
+                self.__conn.commit()
+            except sqlite3.Error as e:
+                self.__conn.rollback()
+                self.error("Failed to prewarm geocode cache", e)
+                return 0
+
+        self.__load()
+        return added
+
+    def lookup(self, location: str, locationDetails: str) -> Tuple[bool, Optional[Coordinates]]:
+        """Looks up the location of an address in the cache (without any I/O).
+
+        :param location: string with the location of an alarm event (e.g. the city)
+        :param locationDetails: string with the location details of an alarm event (e.g. street and house number)
+        :return: tuple with a bool whether the address is cached and the coordinates (None if the search was unsuccessful)"""
+        key = GeocodeCache.normalizeAddress(location, locationDetails)
+        now = time.time()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or self.__expired(entry[0], entry[1], now):
+                if entry is not None:
+                    del self.__entries[key]
+                    self.__used.discard(key)
+                self.__misses += 1
+                return (False, None)
+
+            self.__entries.move_to_end(key)
+            self.__used.add(key)
+            self.__hits += 1
+            return (True, entry[0])
+
+    def store(self, location: str, locationDetails: str, coordinates: Optional[Coordinates]) -> None:
+        """Stores the result of an address search in the cache.
+
+        :param location: string with the location of an alarm event (e.g. the city)
+        :param locationDetails: string with the location details of an alarm event (e.g. street and house number)
+        :param coordinates: tuple with latitude and longitude (or None if the search was unsuccessful)"""
+        key = GeocodeCache.normalizeAddress(location, locationDetails)
+        now = time.time()
+        (latitude, longitude) = coordinates if coordinates is not None else (0.0, 0.0)
+        with self.__lock:
+            self.__entries[key] = (coordinates, now)
+            self.__entries.move_to_end(key)
+            self.__used.discard(key)
+            try:
+                self.__conn.execute("INSERT OR REPLACE INTO geocache (key, found, latitude, longitude, created, lastused) "
+                                    "VALUES (?, ?, ?, ?, ?, ?)", (key, int(coordinates is not None), latitude, longitude, now, now))
+                self.__evict()
+                self.__conn.commit()
+            except sqlite3.Error as e:
+                self.__conn.rollback()
+                self.error("Failed to store geocode cache entry", e)
+
+    def flush(self) -> None:
+        """Stores the last use of all entries that were looked up since the last call
+        (required for the eviction of the least recently used entries after a restart)."""
+        now = time.time()
+        with self.__lock:
+            if len(self.__used) == 0:
+                return
+
+            used = [(now, key) for key in self.__used]
+            self.__used.clear()
+            try:
+                self.__conn.executemany("UPDATE geocache SET lastused = ? WHERE key = ?", used)
+                self.__conn.commit()
+            except sqlite3.Error as e:
+                self.__conn.rollback()
+                self.error("Failed to update geocode cache", e)
+
+    def getState(self) -> Dict[str, Any]:
+        """Returns the state of the cache (e.g. for the state Web API).
+
+        :return: dict with the number of cached entries, hits and misses"""
+        with self.__lock:
+            return {'entries': len(self.__entries), 'hits': self.__hits, 'misses': self.__misses}
@@ -0,0 +1,207 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+import sqlite3
+import atexit
+import threading
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.util.Module import Module
+
+class OutboxItem: #pylint: disable=too-few-public-methods
+    """An OutboxItem represents a single outbound notification (e.g. a request to a messaging service)."""
+
+    def __init__(self, row: Tuple[int, str, str, str, int, float]) -> None:
+        (self.itemID, self.key, self.target, self.request, self.attempts, self.created) = row
+
+class Outbox(Module):
+    """The Outbox is a durable queue of outbound notifications stored in an SQLite file.
+    Notifications are enqueued by Action plugins (without waiting for the network) and delivered by a background sender.
+    Failed deliveries are retried later on; pending notifications survive a restart (or crash) of the backend.
+    Each notification has an idempotency key that prevents queuing (and sending) the same notification twice.
+    The Outbox is thread-safe."""
+
+    DB_APPID   = 113
+    DB_VERSION = 1
+
+    STATE_PENDING = "pending"
+    STATE_SENT    = "sent"
+    STATE_FAILED  = "failed"
+
+    SCHEMA = """
+    CREATE TABLE "outbox" (
+        "id"                 INTEGER PRIMARY KEY NOT NULL,
+        "key"                TEXT UNIQUE NOT NULL,
+        "target"             TEXT,
+        "request"            TEXT,
+        "state"              TEXT,
+        "attempts"           INTEGER,
+        "created"            REAL,
+        "nextattempt"        REAL,
+        "finished"           REAL,
+        "lasterror"          TEXT
+    );
+    CREATE INDEX "outbox_state_nextattempt" ON "outbox" ("state", "nextattempt");
+    """
+
+    def __init__(self, moduleName: str, filename: str) -> None:
+        """Opens (or creates) the outbox file and schedules all pending notifications for immediate delivery.
+
+        :param moduleName: string representing the name of the owner of the outbox (used for log messages)
+        :param filename: path of the SQLite file"""
+        super().__init__(moduleName)
+        self.__lock = threading.Lock()
+
+        dbExists = os.path.exists(filename)
+        try:
+            # the connection is used by the event loop and the background sender (serialized by the lock)
+            self.__conn = sqlite3.connect(filename, check_same_thread=False)
+            if not dbExists:
+                self.__conn.executescript(Outbox.SCHEMA)
+                self.__conn.execute(f"pragma application_id = {Outbox.DB_APPID}")
+                self.__conn.execute(f"pragma user_version = {Outbox.DB_VERSION}")
+        except sqlite3.Error as e:
+            self.fatal(f"Failed to open outbox ({filename})", e)
+
+        (dbAppID,) = self.__conn.execute("pragma application_id").fetchone()
+        if dbAppID != Outbox.DB_APPID:
+            self.fatal(f"Outbox file has an invalid application ID (file: id{dbAppID}, expected: id{Outbox.DB_APPID})")
+
+        # crash recovery: notifications that were pending (or in flight) are delivered right away
+        self.__execute("UPDATE outbox SET nextattempt = ? WHERE state = ? AND nextattempt > ?",
+                       (time.time(), Outbox.STATE_PENDING, time.time()))
+
+        pending = self.getPendingCount()
+        if pending > 0:
+            self.print(f"Recovered {pending} pending notifications")
+
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+        with self.__lock:
+            self.__conn.close()
+
+    def __execute(self, query: str, parameters: Any = ()) -> int:
+        # the transaction is rolled back on errors (e.g. database is locked) so that the outbox is not left locked
+        with self.__lock, self.__conn:
+            cursor = self.__conn.execute(query, parameters)
+            return int(cursor.rowcount)
+
+    def __fetchall(self, query: str, parameters: Any = ()) -> List[Any]:
+        with self.__lock:
+            return self.__conn.execute(query, parameters).fetchall()
+
+    def enqueue(self, key: str, target: str, request: str, deduplicationDuration: float = 0.0) -> bool:
+        """Adds a notification to the outbox (without any network activity).
+        A notification is not added if a notification with the same key is still pending
+        or was finished within the deduplication duration.
+
+        :param key: idempotency key of the notification (e.g. a hash of the message and the target)
+        :param target: string describing the recipient (e.g. a group)
+        :param request: string with the request that delivers the notification
+        :param deduplicationDuration: duration (in seconds) a finished notification prevents identical notifications
+        :return: bool whether the notification was added"""
+        now = time.time()
+        with self.__lock, self.__conn:
+            # remove an identical notification that was finished before the deduplication duration
+            self.__conn.execute("DELETE FROM outbox WHERE key = ? AND state != ? AND created <= ?",
+                                (key, Outbox.STATE_PENDING, now - deduplicationDuration))
+            cursor = self.__conn.execute("INSERT OR IGNORE INTO outbox (key, target, request, state, attempts, created, nextattempt) "
+                                         "VALUES (?, ?, ?, ?, 0, ?, ?)", (key, target, request, Outbox.STATE_PENDING, now, now))
+            return cursor.rowcount == 1
+
+    def acquireDueItems(self, leaseDuration: float, limit: int = 16) -> List[OutboxItem]:
+        """Returns pending notifications that are due for delivery and leases them
+        (i.e. they are not returned again before the lease duration expires).
+
+        :param leaseDuration: duration (in seconds) after which the delivery is considered as failed
+        :param limit: maximum number of notifications returned
+        :return: list of notifications that have to be delivered"""
+        now = time.time()
+        with self.__lock, self.__conn:
+            rows = self.__conn.execute("SELECT id, key, target, request, attempts, created FROM outbox "
+                                       "WHERE state = ? AND nextattempt <= ? ORDER BY nextattempt LIMIT ?",
+                                       (Outbox.STATE_PENDING, now, limit)).fetchall()
+            items = [OutboxItem(row) for row in rows]
+            self.__conn.executemany("UPDATE outbox SET nextattempt = ? WHERE id = ?",
+                                    [(now + leaseDuration, item.itemID) for item in items])
+        return items
+
+    def getNextAttempt(self) -> Optional[float]:
+        """Returns the time of the next due notification.
+
+        :return: timestamp (as returned by time.time) or None if there are no pending notifications"""
+        rows = self.__fetchall("SELECT MIN(nextattempt) FROM outbox WHERE state = ?", (Outbox.STATE_PENDING,))
+        return None if rows[0][0] is None else float(rows[0][0])
+
+    def markSent(self, item: OutboxItem) -> None:
+        self.__execute("UPDATE outbox SET state = ?, attempts = ?, finished = ? WHERE id = ?",
+                       (Outbox.STATE_SENT, item.attempts + 1, time.time(), item.itemID))
+
+    def markFailed(self, item: OutboxItem, error: str) -> None:
+        """Gives up on a notification that can not be delivered (e.g. because it was rejected by the service).
+
+        :param item: notification that failed
+        :param error: string describing the reason"""
+        self.__execute("UPDATE outbox SET state = ?, attempts = ?, finished = ?, lasterror = ? WHERE id = ?",
+                       (Outbox.STATE_FAILED, item.attempts + 1, time.time(), error, item.itemID))
+
+    def markRetry(self, item: OutboxItem, delay: float, error: str) -> None:
+        self.__execute("UPDATE outbox SET attempts = ?, nextattempt = ?, lasterror = ? WHERE id = ?",
+                       (item.attempts + 1, time.time() + delay, error, item.itemID))
+
+    def expire(self, maxAge: float) -> int:
+        """Gives up on pending notifications that are older than the specified age.
+
+        :param maxAge: maximum age (in seconds) of pending notifications
+        :return: number of expired notifications"""
+        now = time.time()
+        return self.__execute("UPDATE outbox SET state = ?, finished = ?, lasterror = 'expired' WHERE state = ? AND created < ?",
+                              (Outbox.STATE_FAILED, now, Outbox.STATE_PENDING, now - maxAge))
+
+    def purge(self, retentionDuration: float) -> int:
+        """Removes finished notifications that are older than the specified duration.
+
+        :param retentionDuration: duration (in seconds) finished notifications are kept
+        :return: number of removed notifications"""
+        return self.__execute("DELETE FROM outbox WHERE state != ? AND created < ?",
+                              (Outbox.STATE_PENDING, time.time() - retentionDuration))
+
+    def getPendingCount(self) -> int:
+        rows = self.__fetchall("SELECT COUNT(*) FROM outbox WHERE state = ?", (Outbox.STATE_PENDING,))
+        return int(rows[0][0])
+
+    def getState(self) -> Dict[str, Any]:
+        """Returns the delivery state of the outbox (e.g. for the state Web API).
+
+        :return: dict with the number of notifications per state and details on the oldest pending notification"""
+        state: Dict[str, Any] = {Outbox.STATE_PENDING: 0, Outbox.STATE_SENT: 0, Outbox.STATE_FAILED: 0}
+        for (itemState, count) in self.__fetchall("SELECT state, COUNT(*) FROM outbox GROUP BY state"):
+            state[itemState] = count
+
+        rows = self.__fetchall("SELECT created, attempts, lasterror FROM outbox WHERE state = ? ORDER BY created LIMIT 1",
+                               (Outbox.STATE_PENDING,))
+        if len(rows) > 0:
+            (created, attempts, lastError) = rows[0]
+            state['oldest_pending_age'] = round(time.time() - created, 1)
+            state['oldest_pending_attempts'] = attempts
+            state['oldest_pending_error'] = lastError or ""
+
+        return state
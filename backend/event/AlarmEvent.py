@@ -28,6 +28,9 @@ class AlarmEvent(SourceEvent):
 
     NO_ID = -1
 
+    __slots__ = ("eventID", "event", "eventDetails", "location", "locationDetails", "comment", "alarmTimestamp",
+                 "locationLatitude", "locationLongitude", "flags")
+
     def __init__(self, eventID: int = -1) -> None:
         super().__init__()
 
@@ -24,6 +24,8 @@ class SettingEvent(SourceEvent):
     FLAGS_INVALID = "INVALID"
     FLAGS_VALID   = "VALID"
 
+    __slots__ = ("key", "value", "flags")
+
     def __init__(self) -> None:
         super().__init__()
 
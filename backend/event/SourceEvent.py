@@ -14,7 +14,9 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Dict, Any
+import operator
+
+from typing import Any, Callable, Dict, Tuple
 
 class SourceEvent:
     """SourceEvents are a generic representation of events from various sources.
@@ -34,6 +36,13 @@ class SourceEvent:
 
     TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+    # events are stored in slots instead of a per-instance dict (subclasses have to declare their own slots);
+    # this reduces the memory consumption of events (e.g. in caches) and speeds up attribute access
+    __slots__ = ("source", "sender", "raw", "timestamp")
+
+    # JSON encoders (i.e. the names of all slots and a getter for their values) cached per event class
+    __jsonEncoders: Dict[type, Tuple[Tuple[str, ...], Callable[[Any], Tuple[Any, ...]]]] = {}
+
     def __init__(self) -> None:
         self.source    = SourceEvent.SOURCE_UNKNOWN
         self.sender    = ""
@@ -52,5 +61,27 @@ class SourceEvent:
     def __repr__(self) -> str:
         return f"SourceEvent Source={self.source}"
 
+    @classmethod
+    def __jsonEncoder(cls) -> Tuple[Tuple[str, ...], Callable[[Any], Tuple[Any, ...]]]:
+        encoder = SourceEvent.__jsonEncoders.get(cls)
+        if encoder is None:
+            # the fields of base classes come first (as in the dict of an object without slots)
+            fields = tuple(field for c in reversed(cls.__mro__) for field in c.__dict__.get("__slots__", ()))
+            encoder = (fields, operator.attrgetter(*fields))
+            SourceEvent.__jsonEncoders[cls] = encoder
+        return encoder
+
+    @classmethod
+    def jsonFields(cls) -> Tuple[str, ...]:
+        """Returns the names of all fields included in the JSON representation of events of this class.
+
+        :return: tuple with the names of the fields"""
+        return cls.__jsonEncoder()[0]
+
     def toJSON(self) -> Dict[str, Any]:
-        return self.__dict__
+        """Returns the JSON representation of the event.
+        The returned dict is a new object (i.e. modifying it does not modify the event).
+
+        :return: dict that maps the names of all fields to their values"""
+        (fields, getter) = self.__jsonEncoder()
+        return dict(zip(fields, getter(self)))
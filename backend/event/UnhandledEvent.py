@@ -25,6 +25,8 @@ class UnhandledEvent(SourceEvent):
     CAUSE_UNPARSABLE_MESSAGE = "UNPARSABLE_MESSAGE"
     CAUSE_IGNORED_SENDER     = "IGNORED_SENDER"
 
+    __slots__ = ("cause",)
+
     def __init__(self, cause: str) -> None:
         super().__init__()
 
@@ -14,6 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import datetime
+
 from typing import Optional
 
 from backend.util.Plugin import Plugin
@@ -24,7 +26,7 @@ class MessageParser(Plugin):
     """MessageParser plugins help SourceDriver plugins to parse received SourceEvents
     that consist of text messages (e.g. SMS).
     MessageParser plugins have a unique name, implement the methods specified below
-    and have to be registered with the PluginManager.
+    and have to be registered with the PluginRegistry.
     They can retrieve settings from their respective section of the configuration file with the helper methods
     provided by the Plugin base class. In addition, they can print log/debug/error messages with the helper methods
     provided by the Module base class."""
@@ -40,14 +42,23 @@ class MessageParser(Plugin):
         :param multipleInstances: boolean that specifies whether multiple (named) instances of this parser plugin are supported"""
         super().__init__(MessageParser.PLUGIN_TYPE, parserPluginName, instanceName, settings, multipleInstances)
 
-    def parseMessage(self, sourceEvent: SourceEvent, lastEvent: Optional[SourceEvent]) -> Optional[SourceEvent]:
+    def parseMessage(self, sourceEvent: SourceEvent) -> Optional[SourceEvent]:
         """This method is called by a SourceDriver plugin to parse the raw content (i.e. plain text) of a SourceEvent.
         It returns a SourceEvent (e.g. an AlarmEvent) that is augmented with all the parsed information.
-        The last SourceEvent from the corresponding source is provided to this method to allow
-        merging of consecutive source events.
+        Parsers that merge consecutive source events (e.g. fragments of a message) keep the required state themselves
+        and return the updated (previously returned) SourceEvent in that case.
 
         :param sourceEvent: SourceEvent (with raw data) that has to be parsed
-        :param lastEvent: Last received (and parsed) SourceEvent or a subclass thereof (for potential merges)
 
         :return: Parsed SourceEvent (typically a subclass of SourceEvent like AlarmEvent) augmented with the parsed information"""
         return None
+
+    def retrievePendingEvent(self, timestamp: datetime.datetime) -> Optional[SourceEvent]:
+        """This method is called periodically by a SourceDriver plugin to retrieve updates of previously returned
+        SourceEvents that were held back by the parser (e.g. merged fragments that only changed the raw text of a message)
+        as soon as no further fragments are expected.
+
+        :param timestamp: current time (compared with the reception time of the held back SourceEvents)
+
+        :return: Updated SourceEvent or None if there are no pending updates"""
+        return None
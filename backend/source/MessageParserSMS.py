@@ -14,12 +14,12 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import re
 import datetime
 import string
+import collections
 
-from typing import List, Optional
-
-from enum import Enum
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 
 from backend.util.Settings import Settings
 from backend.event.AlarmEvent import AlarmEvent
@@ -28,20 +28,99 @@ from backend.event.UnhandledEvent import UnhandledEvent
 from backend.event.SourceEvent import SourceEvent
 from backend.source.MessageParser import MessageParser
 
+class AlarmMessageState: #pylint: disable=too-few-public-methods
+    """AlarmMessageState stores the state of the parser for an alarm message that may be continued by further fragments
+    (i.e. non-standard multipart SMS). The last line of the message so far is kept separately (together with the
+    information required to undo its effects) as it may be completed by the next fragment."""
+
+    def __init__(self, alarmEvent: AlarmEvent, timestamp: datetime.datetime) -> None:
+        self.alarmEvent = alarmEvent
+        self.timestamp = timestamp # reception of the first fragment
+        self.fields: Dict[str, List[str]] = {}
+        self.activeRule: Optional[Tuple[str, str]] = None # (field, continuation field) of the last keyword
+        self.pendingLine = ""
+        self.pendingUndo: Tuple[Optional[Tuple[str, str]], str, Optional[List[str]]] = (None, "", None)
+        self.parsedTimestamp = ("", "")
+        self.rawPending = False # the raw text changed since the alarm event was returned the last time
+
 class MessageParserSMS(MessageParser):
-    TIMESTAMP_LENGTH_LONG  = 19
     TIMESTAMP_FORMAT_LONG  = "%d.%m.%Y %H:%M:%S"
-
-    TIMESTAMP_LENGTH_SHORT = 16
     TIMESTAMP_FORMAT_SHORT = "%d.%m.%Y %H:%M"
 
+    FIELD_TIMESTAMP        = "timestamp"
+    FIELD_LOCATION         = "location" # location and location details (separated by a comma)
+    FIELD_LOCATION_DETAILS = "location_details"
+    FIELD_EVENT            = "event"
+    FIELD_EVENT_DETAILS    = "event_details"
+    FIELD_COMMENT          = "comment"
+    FIELD_IGNORE           = "ignore"   # only allowed for continuation lines
+    FIELDS = [FIELD_TIMESTAMP, FIELD_LOCATION, FIELD_LOCATION_DETAILS, FIELD_EVENT, FIELD_EVENT_DETAILS, FIELD_COMMENT]
+
+    FIELD_ATTRIBUTES = {
+        FIELD_TIMESTAMP:        "alarmTimestamp",
+        FIELD_LOCATION:         "location",
+        FIELD_LOCATION_DETAILS: "locationDetails",
+        FIELD_EVENT:            "event",
+        FIELD_EVENT_DETAILS:    "eventDetails",
+        FIELD_COMMENT:          "comment",
+    }
+
+    # default alarm message format (see docs/Configuration.md):
+    # keywords at the beginning of a line start a field, the following lines (without keyword)
+    # are appended to the same field unless another continuation field is specified
+    DEFAULT_ALARM_KEYWORDS      = ["Alarmzeit:=timestamp", "EO:=location", "STW:=event", "Bem:=comment"]
+    DEFAULT_ALARM_CONTINUATIONS = ["timestamp=ignore", "location=event_details"] # next line after the location is the event details (has no prefix)
+    DEFAULT_ALARM_REQUIRED      = ["event", "location"]
+    DEFAULT_TIMESTAMP_FORMATS   = [TIMESTAMP_FORMAT_LONG, TIMESTAMP_FORMAT_SHORT]
+
     def __init__(self, instanceName: str, settings: Settings) -> None:
-        super().__init__("sms", instanceName, settings)
+        super().__init__("sms", instanceName, settings, multipleInstances=True) # e.g. one instance per alarm format
         self.__mergeDuration = self.getSettingInt("merge_duration", 90) # merge non-standard multipart SMS within 90 seconds
         self.__alarmHeader = self.getSettingString("alarm_header", "SMS Alarm")
         self.__alarmSenders = self.getSettingList("alarm_senders", [])
-
-    def parseMessage(self, sourceEvent: SourceEvent, lastEvent: Optional[SourceEvent]) -> Optional[SourceEvent]:
+        self.__timestampFormats = self.getSettingList("alarm_timestamp_formats", MessageParserSMS.DEFAULT_TIMESTAMP_FORMATS)
+        self.__alarmRules: Dict[str, Tuple[str, str]] = {}
+        self.__finalField = ""
+        self.__requiredAttributes: List[str] = []
+        self.__reassemblyBuffer: Dict[str, AlarmMessageState] = {} # alarm messages that may be continued (by sender)
+        self.__pendingEvents: Deque[AlarmEvent] = collections.deque() # alarm events with held back changes of the raw text
+        self.__lineMatcher = self.__compileAlarmFormat(self.getSettingList("alarm_keywords", MessageParserSMS.DEFAULT_ALARM_KEYWORDS),
+                                  self.getSettingList("alarm_continuations", MessageParserSMS.DEFAULT_ALARM_CONTINUATIONS),
+                                  self.getSettingList("alarm_required", MessageParserSMS.DEFAULT_ALARM_REQUIRED))
+
+    def __compileAlarmFormat(self, keywords: List[str], continuations: List[str], required: List[str]) -> Callable[[str], Optional["re.Match[str]"]]:
+        """Compiles the configured alarm message format into a single regex that matches the header and all keywords
+        at the beginning of a line (in the configured order) and a table that maps each keyword to its fields."""
+        continuationFields: Dict[str, str] = {}
+        for continuation in continuations:
+            (field, _, continuationField) = [x.strip() for x in continuation.partition("=")]
+            if field not in MessageParserSMS.FIELDS or continuationField not in MessageParserSMS.FIELDS + [MessageParserSMS.FIELD_IGNORE]:
+                self.fatal(f"Invalid alarm continuation {continuation}")
+            continuationFields[field] = continuationField
+
+        for keywordMapping in keywords:
+            (keyword, _, field) = [x.strip() for x in keywordMapping.rpartition("=")]
+            if keyword == "" or field not in MessageParserSMS.FIELDS:
+                self.fatal(f"Invalid alarm keyword {keywordMapping}")
+            if keyword not in self.__alarmRules: # the first matching keyword wins (like a chain of startswith checks)
+                self.__alarmRules[keyword] = (field, continuationFields.get(field, field))
+
+        if len(self.__alarmRules) == 0:
+            self.fatal("No alarm keywords configured")
+
+        self.__finalField = list(self.__alarmRules.values())[-1][0] # the last keyword starts the final field
+        for field in required:
+            if field not in MessageParserSMS.FIELDS:
+                self.fatal(f"Invalid required alarm field {field}")
+            self.__requiredAttributes.append(MessageParserSMS.FIELD_ATTRIBUTES[field])
+
+        alternatives = [self.__alarmHeader] + list(self.__alarmRules)
+        return re.compile("|".join(re.escape(keyword) for keyword in alternatives)).match
+
+
+    def parseMessage(self, sourceEvent: SourceEvent) -> Optional[SourceEvent]:
+        # the reassembly buffer of the parser is used to merge multipart SMS
+        # (so that fragments of alarm messages from multiple senders can be received at the same time)
         if self.isEmpty(sourceEvent):
             return None
 
@@ -54,25 +133,12 @@ class MessageParserSMS(MessageParser):
             return self.parseSettingMessage(sourceEvent)
 
         # Bullshit workaround for long (non-standard) multipart SMS (two or more "independent" SMS)
-        # -> merge current and last alarm SMS and parse alarm message again
-        if (lastEvent is not None) and isinstance(lastEvent, AlarmEvent):
-            # last event was an alarm event
-            lastAlarm = lastEvent
-            if lastAlarm.sender == sourceEvent.sender:
-                # last alarm event had the same sender
-                tsLast       = datetime.datetime.strptime(lastAlarm.timestamp, AlarmEvent.TIMESTAMP_FORMAT)
-                tsCurrent    = datetime.datetime.strptime(sourceEvent.timestamp, AlarmEvent.TIMESTAMP_FORMAT)
-                tsDelta      = tsCurrent - tsLast
-                deltaSeconds = tsDelta.total_seconds()
-                if 0 <= deltaSeconds <= self.__mergeDuration:
-                    # last alarm event received not too long ago
-                    if self.hasAlarmHeader(lastAlarm):
-                        # last alarm event had an alarm header
-                        # (we only merge with last alarm events that had an alarm header but it is not required
-                        # that the last alarm event was already valid in its incomplete variant)
-                        self.print("Merging with previous alarm message (time delta: " + str(deltaSeconds) + " seconds)")
-                        lastAlarm.raw = lastAlarm.raw + sourceEvent.raw
-                        return self.parseAlarmMessage(lastAlarm)
+        # -> continue parsing the last alarm message of the same sender with the current SMS
+        # (we only merge with alarm messages that had an alarm header but it is not required
+        # that the last alarm event was already valid in its incomplete variant)
+        state = self.__getReassemblyState(sourceEvent)
+        if state is not None:
+            return self.__mergeAlarmMessage(state, sourceEvent)
 
         # Message with no alarm header but sent from an alarm sender
         if len(self.__alarmSenders) != 0 and sourceEvent.sender in self.__alarmSenders:
@@ -83,106 +149,186 @@ class MessageParserSMS(MessageParser):
         self.error("Received unhandled message (unparsable message - no alarm header, no alarm sender)")
         return UnhandledEvent.fromSourceEvent(sourceEvent, UnhandledEvent.CAUSE_UNPARSABLE_MESSAGE)
 
+    def __mergeAlarmMessage(self, state: AlarmMessageState, sourceEvent: SourceEvent) -> Optional[SourceEvent]:
+        alarmEvent = state.alarmEvent
+        alarmEvent.raw = alarmEvent.raw + sourceEvent.raw
+        if self.__parseAlarmText(state, sourceEvent.raw):
+            state.rawPending = False
+            return alarmEvent
+
+        # the changed raw text is returned with the next change of a field (or when the merge duration expires)
+        # to avoid updating the database and the frontend for each fragment
+        self.print("Merged with previous alarm message (only the raw text changed)")
+        state.rawPending = True
+        return None
+
+    def retrievePendingEvent(self, timestamp: datetime.datetime) -> Optional[SourceEvent]:
+        self.__expireReassemblyStates(timestamp)
+        return self.__pendingEvents.popleft() if len(self.__pendingEvents) > 0 else None
+
+    def __expireReassemblyStates(self, timestamp: datetime.datetime) -> None:
+        """Removes all states of alarm messages that are older than the merge duration."""
+        mergeWindow = datetime.timedelta(seconds = self.__mergeDuration)
+        for sender in [sender for (sender, state) in self.__reassemblyBuffer.items() if timestamp - state.timestamp > mergeWindow]:
+            self.__removeReassemblyState(sender)
+
+    def __removeReassemblyState(self, sender: str) -> None:
+        # held back changes of the raw text are returned by retrievePendingEvent
+        state = self.__reassemblyBuffer.pop(sender)
+        if state.rawPending:
+            self.__pendingEvents.append(state.alarmEvent)
+
+    def __getReassemblyState(self, sourceEvent: SourceEvent) -> Optional[AlarmMessageState]:
+        """Returns the state of the last alarm message of the sender (if it was received within the merge duration)
+        and removes all states of alarm messages that are older than the merge duration."""
+        try:
+            timestamp = datetime.datetime.strptime(sourceEvent.timestamp, AlarmEvent.TIMESTAMP_FORMAT)
+        except ValueError:
+            return None
+
+        self.__expireReassemblyStates(timestamp)
+
+        state = self.__reassemblyBuffer.get(sourceEvent.sender)
+        if state is None or timestamp < state.timestamp:
+            return None
+
+        deltaSeconds = (timestamp - state.timestamp).total_seconds()
+        self.print(f"Merging with previous alarm message (time delta: {deltaSeconds} seconds)")
+        return state
+
     def parseAlarmMessage(self, sourceEvent: SourceEvent) -> AlarmEvent:
-        alarmEvent = None
-        if isinstance(sourceEvent, AlarmEvent):
-            # source event was parsed before and is actually/already a merged alarm event
-            # (its former version is thus already stored in the database with a unique ID)
-            # -> use the alarm event directly to preserve data like the unique ID
-            alarmEvent = sourceEvent
-        else:
-            # create an alarm event from the new/unparsed source event
-            alarmEvent = AlarmEvent.fromSourceEvent(sourceEvent)
+        alarmEvent = AlarmEvent.fromSourceEvent(sourceEvent)
 
-        alarmEvent.flags = AlarmEvent.FLAGS_INVALID
+        try:
+            timestamp = datetime.datetime.strptime(alarmEvent.timestamp, AlarmEvent.TIMESTAMP_FORMAT)
+        except ValueError:
+            timestamp = datetime.datetime.now()
 
-        rawLines = self.getRawLines(alarmEvent)
-
-        class ParserState(Enum):
-            INITIAL = -1
-            TIMESTAMP = 0
-            LOCATION_AND_LOCATION_DETAILS = 1
-            EVENT_DETAILS = 2
-            EVENT = 3
-            COMMENT = 4
-
-        activeKeyID = ParserState.INITIAL
-
-        aTimestamp        = ""
-        aLocationComplete = ""
-        aEvent            = ""
-        aEventDetails     = ""
-        aComment          = ""
-
-        for line in rawLines:
-            # detect new sections through keywords and/or relative line locations ...
-            if line.startswith(self.__alarmHeader):
-                activeKeyID = ParserState.INITIAL
-                continue # skip header (first line)
-            if line.startswith('Alarmzeit:'):
-                aTimestamp = line.replace('Alarmzeit:', '', 1)
-                activeKeyID = ParserState.TIMESTAMP
-            elif line.startswith('EO:'):
-                aLocationComplete = line.replace('EO:', '', 1)
-                # activeKeyID = ParserState.LOCATION_AND_LOCATION_DETAILS # only one line ?
-                activeKeyID = ParserState.EVENT_DETAILS # next line is event details (has no prefix)
-            # elif line.startswith('SW:'):
-            #     aEventDetails = line.replace('SW:', '', 1)
-            #     activeKeyID = ParserState.EVENT_DETAILS
-            elif line.startswith('STW:'):
-                aEvent = line.replace('STW:', '', 1)
-                activeKeyID = ParserState.EVENT
-            elif line.startswith('Bem:'):
-                aComment = line.replace('Bem:', '', 1)
-                activeKeyID = ParserState.COMMENT
-
-            # append remaining lines of the active sections to the corresponding variables ...
-            elif activeKeyID == ParserState.TIMESTAMP:
-                continue # ignore additional timestamp lines
-            elif activeKeyID == ParserState.LOCATION_AND_LOCATION_DETAILS:
-                aLocationComplete = '\n'.join([aLocationComplete, line])
-            elif activeKeyID == ParserState.EVENT_DETAILS:
-                aEventDetails = '\n'.join([aEventDetails, line])
-            elif activeKeyID == ParserState.EVENT:
-                aEvent = '\n'.join([aEvent, line])
-            elif activeKeyID == ParserState.COMMENT:
-                aComment = '\n'.join([aComment, line])
-            else:
-                self.error("Parsing error: unknown line, ignoring...")
+        state = AlarmMessageState(alarmEvent, timestamp)
+        state.fields = {field: [] for field in MessageParserSMS.FIELDS}
+        if alarmEvent.sender in self.__reassemblyBuffer:
+            self.__removeReassemblyState(alarmEvent.sender)
+        self.__reassemblyBuffer[alarmEvent.sender] = state # a new alarm message replaces the last one of the sender
+
+        self.__parseAlarmText(state, alarmEvent.raw)
+        return alarmEvent
 
-        alarmEvent.event = aEvent.strip()
-        alarmEvent.eventDetails = aEventDetails.strip()
-        alarmEvent.comment = aComment.strip()
+    def __parseAlarmText(self, state: AlarmMessageState, text: str) -> bool:
+        """Continues parsing an alarm message with the given text and updates the corresponding alarm event.
 
-        aLocationStripped = aLocationComplete.strip(string.whitespace + ",")
+        :param state: state of the parser for the alarm message
+        :param text: (next part of the) raw text of the alarm message
+        :return: bool whether the content of the alarm event changed"""
+
+        # undo the last (possibly incomplete) line and parse it again together with the new text
+        (activeRule, undoField, undoLines) = state.pendingUndo
+        state.activeRule = activeRule
+        if undoField != "":
+            if undoLines is None:
+                state.fields[undoField].pop()
+            else:
+                state.fields[undoField] = undoLines
+
+        lines = (state.pendingLine + text).split("\n") # split will always return at least [""]
+        state.pendingLine = lines[-1]
+
+        for line in lines[:-1]:
+            self.__parseAlarmLine(state, line)
+        state.pendingUndo = self.__parseAlarmLine(state, state.pendingLine)
+
+        return self.__updateAlarmEvent(state)
+
+    def __parseAlarmLine(self, state: AlarmMessageState, line: str) -> Tuple[Optional[Tuple[str, str]], str, Optional[List[str]]]:
+        """Parses a single line of an alarm message.
+
+        :return: information required to undo the line (previous rule, changed field and previous lines of the field)"""
+        previousRule = state.activeRule
+
+        # detect new sections through keywords (or the header) ...
+        match = self.__lineMatcher(line)
+        if match is not None:
+            keyword = match.group(0)
+            if keyword == self.__alarmHeader:
+                state.activeRule = None # skip header (first line)
+                return (previousRule, "", None)
+
+            state.activeRule = self.__alarmRules[keyword]
+            field = state.activeRule[0]
+            previousLines = state.fields[field]
+            state.fields[field] = [line[len(keyword):]]
+            return (previousRule, field, previousLines)
+
+        # append remaining lines of the active sections to the corresponding fields ...
+        if previousRule is not None:
+            field = previousRule[1]
+            if field != MessageParserSMS.FIELD_IGNORE:
+                state.fields[field].append(line)
+                return (previousRule, field, None)
+            return (previousRule, "", None)
+
+        self.error("Parsing error: unknown line, ignoring...")
+        return (previousRule, "", None)
+
+    def __updateAlarmEvent(self, state: AlarmMessageState) -> bool:
+        alarmEvent = state.alarmEvent
+        fields = state.fields
+        previousContent = self.__getAlarmContent(alarmEvent)
+
+        alarmEvent.event = "\n".join(fields[MessageParserSMS.FIELD_EVENT]).strip()
+        alarmEvent.eventDetails = "\n".join(fields[MessageParserSMS.FIELD_EVENT_DETAILS]).strip()
+        alarmEvent.comment = "\n".join(fields[MessageParserSMS.FIELD_COMMENT]).strip()
+
+        aLocationStripped = "\n".join(fields[MessageParserSMS.FIELD_LOCATION]).strip(string.whitespace + ",")
         aLocationParts = aLocationStripped.split(",", 2)
+        aLocationDetails = "\n".join(fields[MessageParserSMS.FIELD_LOCATION_DETAILS]).strip()
         alarmEvent.location = aLocationParts[0].strip() if (len(aLocationParts) > 0) else ""
-        alarmEvent.locationDetails = aLocationParts[1].strip() if (len(aLocationParts) > 1) else ""
+        if aLocationDetails != "":
+            alarmEvent.locationDetails = aLocationDetails
+        else:
+            alarmEvent.locationDetails = aLocationParts[1].strip() if (len(aLocationParts) > 1) else ""
 
-        try:
-            aTimestampStripped = aTimestamp.strip()
-            if len(aTimestampStripped) == MessageParserSMS.TIMESTAMP_LENGTH_LONG:
-                ats = datetime.datetime.strptime(aTimestampStripped, MessageParserSMS.TIMESTAMP_FORMAT_LONG)
-                alarmEvent.alarmTimestamp = ats.strftime(AlarmEvent.TIMESTAMP_FORMAT)
-            elif len(aTimestampStripped) == MessageParserSMS.TIMESTAMP_LENGTH_SHORT:
-                ats = datetime.datetime.strptime(aTimestampStripped, MessageParserSMS.TIMESTAMP_FORMAT_SHORT)
-                alarmEvent.alarmTimestamp = ats.strftime(AlarmEvent.TIMESTAMP_FORMAT)
-        except Exception:
-            self.error("Parsing error: invalid timestamp format")
+        aTimestampStripped = "\n".join(fields[MessageParserSMS.FIELD_TIMESTAMP]).strip()
+        if aTimestampStripped == "":
             alarmEvent.alarmTimestamp = alarmEvent.timestamp
+        elif aTimestampStripped != state.parsedTimestamp[0]: # the timestamp is only parsed again if it changed
+            state.parsedTimestamp = (aTimestampStripped, self.__parseTimestamp(aTimestampStripped, alarmEvent.timestamp))
+            alarmEvent.alarmTimestamp = state.parsedTimestamp[1]
+        else:
+            alarmEvent.alarmTimestamp = state.parsedTimestamp[1]
 
         # We require three things for a valid alarm event:
-        #  - we at least parsed until the beginning of the last field (comment) - and thus end of the event field
-        #  - we retrieved at least a (complete) event – we do not care about the event details though
-        #  - we retrieved at least a (complete) location - we do not care about the location details though
-        if activeKeyID == ParserState.COMMENT and alarmEvent.event != "" and alarmEvent.location != "":
-            self.print("Received alarm message (valid)")
+        #  - we at least parsed until the beginning of the last field (e.g. comment) - and thus end of the previous fields
+        #  - we retrieved all required fields (e.g. event and location) – we do not care about other fields though
+        activeRule = state.activeRule
+        if activeRule is not None and activeRule[0] == self.__finalField and all(getattr(alarmEvent, attribute) != "" for attribute in self.__requiredAttributes):
             alarmEvent.flags = AlarmEvent.FLAGS_VALID
         else:
-            self.error("Received alarm message (invalid - missing information)")
             alarmEvent.flags = AlarmEvent.FLAGS_INVALID
 
-        return alarmEvent
+        changed = (self.__getAlarmContent(alarmEvent) != previousContent)
+        if changed or alarmEvent.noID:
+            if alarmEvent.valid:
+                self.print("Received alarm message (valid)")
+            else:
+                self.error("Received alarm message (invalid - missing information)")
+
+        return changed
+
+    @staticmethod
+    def __getAlarmContent(alarmEvent: AlarmEvent) -> Tuple[str, ...]:
+        return (alarmEvent.event, alarmEvent.eventDetails, alarmEvent.location, alarmEvent.locationDetails,
+                alarmEvent.comment, alarmEvent.alarmTimestamp, alarmEvent.flags)
+
+    def __parseTimestamp(self, timestamp: str, defaultTimestamp: str) -> str:
+        for timestampFormat in self.__timestampFormats:
+            try:
+                ats = datetime.datetime.strptime(timestamp, timestampFormat)
+                return ats.strftime(AlarmEvent.TIMESTAMP_FORMAT)
+            except ValueError:
+                continue
+
+        self.error("Parsing error: invalid timestamp format")
+        return defaultTimestamp
 
     def fallbackAlarmMessage(self, sourceEvent: SourceEvent) -> AlarmEvent:
         self.error("Received alarm message (invalid - no alarm header)")
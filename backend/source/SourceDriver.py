@@ -20,6 +20,7 @@ from typing import Optional, List
 
 from backend.util.Plugin import Plugin
 from backend.util.Settings import Settings
+from backend.util.EventQueue import EventQueue
 from backend.source.MessageParser import MessageParser
 from backend.event.SourceEvent import SourceEvent
 
@@ -30,7 +31,7 @@ class SourceState(IntEnum):
 class SourceDriver(Plugin):
     """SourceDriver plugins implement the reception of SourceEvents like an alarm SMS from sources like a cellular modem.
     SourceDriver plugins have a unique name, implement the methods specified below
-    and have to be registered with the PluginManager.
+    and have to be registered with the PluginRegistry.
     They can retrieve settings from their respective section of the configuration file with the helper methods
     provided by the Plugin base class. In addition, they can print log/debug/error messages with the helper methods
     provided by the Module base class."""
@@ -47,10 +48,52 @@ class SourceDriver(Plugin):
         :param multipleInstances: boolean that specifies whether multiple (named) instances of this source plugin are supported"""
         super().__init__(SourceDriver.PLUGIN_TYPE, sourcePluginName, instanceName, settings, multipleInstances)
         self.parser = parser
+        self.__eventQueue: Optional[EventQueue] = None
+
+    def attachEventQueue(self, eventQueue: EventQueue) -> None:
+        """Attaches the EventQueue of the event loop to the SourceDriver plugin.
+        This method is called by the PluginManager during initialization of the plugin.
+
+        :param eventQueue: EventQueue that SourceEvents can be pushed into"""
+        self.__eventQueue = eventQueue
+
+    def hasEventQueue(self) -> bool:
+        """Returns whether an EventQueue is attached to the SourceDriver plugin.
+
+        :return: bool whether SourceEvents can be pushed with pushEvent"""
+        return self.__eventQueue is not None
+
+    def pushEvent(self, sourceEvent: SourceEvent) -> bool:
+        """Pushes a SourceEvent into the EventQueue and immediately wakes up the event loop.
+        SourceDriver plugins that are notified about new events by another thread (e.g. by a callback)
+        should use this method instead of waiting to be polled via retrieveEvent.
+        Signal handlers should not use this method (they only record the signal and call wakeup instead).
+
+        :param sourceEvent: SourceEvent (or a subclass thereof) that has to be handled
+        :return: bool whether the SourceEvent was pushed (False if no EventQueue is attached)"""
+        if self.__eventQueue is None:
+            return False
+
+        self.__eventQueue.push(sourceEvent)
+        return True
+
+    def wakeup(self) -> bool:
+        """Wakes up the event loop so that retrieveEvent is called as soon as possible
+        (e.g. when new data is available but the SourceEvent still has to be created during polling
+        or when a signal handler recorded a received signal).
+
+        :return: bool whether the event loop was woken up (False if no EventQueue is attached)"""
+        if self.__eventQueue is None:
+            return False
+
+        self.__eventQueue.wakeup()
+        return True
 
     def retrieveEvent(self) -> Optional[SourceEvent]:
         """This method is called periodically by the background task in order to
         retrieve SourceEvents from the SourceDriver plugin.
+        It is called at least every loop_sleep_duration seconds and whenever the event loop was woken up.
+        SourceDriver plugins that are able to push their SourceEvents with pushEvent may always return None.
 
         Important: The execution of this function should only consume a limited amount of time
         to avoid delaying Action handlers or the processing of other SourceEvents.
@@ -62,7 +105,8 @@ class SourceDriver(Plugin):
         return None
 
     def getSourceState(self) -> SourceState:
-        """This method is called periodically to retrieve the current state of the source.
+        """This method is called periodically by the event loop to retrieve the current state of the source
+        (the overall state is cached and changes are broadcast to all clients).
         It represents whether the source is working as intended or not (e.g. no cell reception)
         and is visualized in the status bar of the frontend.
 
@@ -76,6 +76,10 @@ class SourceDriverDummy(SourceDriver):
         elif signum == signal.SIGUSR2:
             self.__triggerSetting = True
 
+        # the event is generated when the event loop polls the source (it is woken up to do so right away);
+        # the signal handler may interrupt the event loop at any point and therefore only records the signal
+        self.wakeup()
+
     def __generateBinaryEvent(self) -> AlarmEvent:
         binaryEvent = AlarmEvent()
 
@@ -14,9 +14,14 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Optional
+import time
+import datetime
+import queue
+import importlib
+import threading
+import collections
 
-import gammu #pylint: disable=import-error
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
 
 from backend.source.SourceDriver import SourceDriver, SourceState
 from backend.source.MessageParser import MessageParser
@@ -25,37 +30,130 @@ from backend.event.UnhandledEvent import UnhandledEvent
 from backend.util.Settings import Settings
 
 class SourceDriverSMS(SourceDriver):
-
-    def __init__(self, instanceName: str, settings: Settings, parser: MessageParser) -> None:
-        super().__init__("sms", instanceName, settings, parser)
+    """The SMS source receives alarm messages with the help of the gammu library.
+    All (blocking) modem I/O is performed by a dedicated modem thread that processes a queue of commands
+    (and periodically scans for stored SMS and probes the network state on its own timers).
+    Received messages and changes of the source state are posted back to the event loop,
+    which parses the messages without ever waiting for the modem."""
+
+    COMMAND_SCAN    = "scan"
+    COMMAND_NETWORK = "network"
+    COMMAND_STOP    = "stop"
+
+    DEPENDENCIES = [SourceDriver.DEPENDENCY_PARSER]
+
+    def __init__(self, instanceName: str, settings: Settings, parser: MessageParser, backend: Any = None) -> None:
+        """Constructs the SMS source and starts the modem thread.
+
+        :param instanceName: optional string representing a unique instance name of the source plugin
+        :param settings: reference to the Settings object
+        :param parser: reference to the parser plugin used to parse the received messages
+        :param backend: gammu module or a compatible replacement (e.g. a fake backend for tests; optional)"""
+        super().__init__("sms", instanceName, settings, parser, multipleInstances=True) # e.g. one instance per modem
         self.__gammuConfig = self.getSettingFilename("gammu_config", "/etc/gammu-smsdrc")
         self.__allowlist   = self.getSettingList("allowlist", [])
         self.__denylist   = self.getSettingList("denylist", [])
-        self.__lastEvent: Optional[SourceEvent] = None
+        self.__pollInterval = self.getSettingFloat("poll_interval", 1.0)       # scan for stored SMS every second
+        self.__networkInterval = self.getSettingFloat("network_interval", 10.0) # probe the network state every 10 seconds
         self.__lastSourceState: Optional[SourceState] = None
+        self.__sourceState = SourceState.ERROR
+        self.__receivedEvents: Deque[SourceEvent] = collections.deque() # received (but not yet parsed) SMS
+        self.__undeletedMessages: Set[Tuple[Tuple[int, ...], str, str]] = set() # received SMS that could not be deleted (locations, timestamp, sender)
+        self.__commands: "queue.Queue[str]" = queue.Queue()
 
-        self.__gsm = gammu.StateMachine()
+        self.__gammu = backend if backend is not None else importlib.import_module("gammu")
+        self.__gsm = self.__gammu.StateMachine()
         try:
             self.__gsm.ReadConfig(Filename=self.__gammuConfig)
             self.__gsm.Init()
-        except gammu.ERR_CANTOPENFILE:
+        except self.__gammu.ERR_CANTOPENFILE:
             self.fatal("Config file not found")
-        except gammu.ERR_DEVICENOTEXIST:
+        except self.__gammu.ERR_DEVICENOTEXIST:
             self.fatal("Modem device is not available")
         except Exception as e:
             self.fatal("Could not initialize SMS driver", e)
 
         # make sure we log changes of the source state as early as possible
-        self.getSourceState()
+        self.__probeNetwork()
+
+        self.__thread = threading.Thread(target=self.__modemLoop, name=f"{self}:modem", daemon=True)
+        self.__thread.start()
+
+    def requestScan(self) -> None:
+        """Requests an immediate scan for stored SMS (without waiting for the next poll)."""
+        self.__commands.put(SourceDriverSMS.COMMAND_SCAN)
+
+    def requestNetworkProbe(self) -> None:
+        """Requests an immediate check of the network state (without waiting for the next probe)."""
+        self.__commands.put(SourceDriverSMS.COMMAND_NETWORK)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stops the modem thread (after the currently running command is completed).
+
+        :param timeout: maximum duration to wait for the modem thread (in seconds; None waits indefinitely)"""
+        self.__commands.put(SourceDriverSMS.COMMAND_STOP)
+        self.__thread.join(timeout)
+
+    def __modemLoop(self) -> None:
+        try:
+            self.__pollModem()
+        except Exception as e:
+            # without the modem thread no more SMS are received (the event loop has to learn about that)
+            self.error(f"Modem thread failed ({e})")
+            self.__setSourceState(SourceState.ERROR)
+
+    def __pollModem(self) -> None:
+        nextScan = time.monotonic()
+        nextProbe = time.monotonic() + self.__networkInterval
+
+        while True:
+            try:
+                command: Optional[str] = self.__commands.get(timeout = max(min(nextScan, nextProbe) - time.monotonic(), 0.0))
+            except queue.Empty:
+                command = None
+
+            if command == SourceDriverSMS.COMMAND_STOP:
+                break
+
+            try:
+                if command == SourceDriverSMS.COMMAND_SCAN or time.monotonic() >= nextScan:
+                    nextScan = time.monotonic() + self.__pollInterval
+                    self.__receiveMessages()
+
+                if command == SourceDriverSMS.COMMAND_NETWORK or time.monotonic() >= nextProbe:
+                    nextProbe = time.monotonic() + self.__networkInterval
+                    self.__probeNetwork()
+            except Exception as e:
+                # Module.error cannot format exception objects (log the message only to keep the thread alive)
+                self.error(f"Modem I/O failed ({e})")
+                self.__setSourceState(SourceState.ERROR)
 
     def retrieveEvent(self) -> Optional[SourceEvent]:
-        if self.__gsm is None or self.parser is None:
+        if self.parser is None:
             return None
 
-        # make sure we log changes of the source state before checking for stored SMS
-        # (regardless of the source state and network reception)
-        self.getSourceState()
+        # SMS received by the modem thread are served one after another (without any modem I/O)
+        while len(self.__receivedEvents) > 0:
+            sourceEvent = self.__receivedEvents.popleft()
+
+            if not SourceDriver.isSenderAllowed(allowlist=self.__allowlist, denylist=self.__denylist, sender=sourceEvent.sender):
+                self.error("Received unhandled message (ignored sender)")
+                return UnhandledEvent.fromSourceEvent(sourceEvent, UnhandledEvent.CAUSE_IGNORED_SENDER)
 
+            parsedSourceEvent = self.parser.parseMessage(sourceEvent)
+
+            if parsedSourceEvent is not None:
+                return parsedSourceEvent
+
+        # updates held back by the parser (e.g. raw text of merged SMS) are returned when no further SMS are expected
+        return self.parser.retrievePendingEvent(datetime.datetime.now())
+
+    def __receiveMessages(self) -> None:
+        """Reads all stored SMS from the modem, queues all complete messages (in the order of their reception)
+        and deletes them from the modem (incomplete multipart SMS are kept until all parts are available).
+        Messages that could not be deleted are only queued once (their deletion is retried by the next scans).
+        This method is only called by the modem thread."""
+        gammu = self.__gammu
         start = True
         cursms = None
         sms = []
@@ -65,6 +163,8 @@ class SourceDriverSMS(SourceDriver):
         status = self.__gsm.GetSMSStatus()
 
         remain = status['SIMUsed'] + status['PhoneUsed'] + status['TemplatesUsed']
+        if remain == 0:
+            self.__undeletedMessages.clear()
 
         try:
             while remain > 0:
@@ -83,86 +183,88 @@ class SourceDriverSMS(SourceDriver):
             # It can happen when reported status does not match real counts
             self.error("Failed to read all messages")
 
-        # while True:
-        #     try:
-        #         if start:
-        #             cursms = self.__gsm.GetNextSMS(Start = True, Folder = 0)
-        #             start = False
-        #         else:
-        #             cursms = self.__gsm.GetNextSMS(Location = cursms[0]['Location'], Folder = 0)
-        #
-        #         sms.append(cursms)
-        #     except gammu.ERR_EMPTY:
-        #         break
-
         if start:
-            return None
+            return
 
         data = gammu.LinkSMS(sms)
 
-        rawText   = ""
-        sender    = ""
-        timeStamp = ""
-        foundMessage = False
-        locs = []
+        messages: List[Tuple[str, SourceEvent]] = []
+        undeletedMessages: Set[Tuple[Tuple[int, ...], str, str]] = set()
 
         for x in data:
-            v = gammu.DecodeSMS(x)
-
             m = x[0]
+            locs = tuple(part['Location'] for part in x)
+            messageKey = (locs, str(m['DateTime']), m['Number'])
 
             # all parts of multipart SMS received ?
             if m['UDH']['AllParts'] > len(x):
+                # remaining parts of a queued message (of which some parts were deleted) are deleted again
+                for undeletedKey in self.__undeletedMessages:
+                    if undeletedKey[1:] == messageKey[1:] and set(locs) <= set(undeletedKey[0]):
+                        if not self.__deleteMessage(locs):
+                            undeletedMessages.add(undeletedKey)
+                        break
                 continue
 
-            timeStamp    = str(m['DateTime'])
-            sender       = m['Number']
-
-            for m in x:
-                locs.append(m['Location'])
-
-            if v is None:
-                rawText += m['Text'] # .encode('utf-8')
-            else:
-                for e in v['Entries']:
-                    if e['Buffer'] is not None:
-                        rawText += e['Buffer'] # .encode('utf-8')
+            if not self.__deleteMessage(locs):
+                undeletedMessages.add(messageKey)
 
-            foundMessage = True
-            break
+            if messageKey in self.__undeletedMessages:
+                continue # the message was already queued by a previous scan
 
-        if not foundMessage:
-            return None
+            sourceEvent = SourceEvent()
+            sourceEvent.source = SourceEvent.SOURCE_SMS
+            sourceEvent.timestamp = str(m['DateTime'])
+            sourceEvent.sender = m['Number']
+            sourceEvent.raw = self.__decodeText(x)
+            messages.append((sourceEvent.timestamp, sourceEvent))
 
-        for loc in locs:
-            self.__gsm.DeleteSMS(Location = loc, Folder = 0)
+        # messages that are not stored anymore (e.g. deleted by a retry) are forgotten
+        self.__undeletedMessages = undeletedMessages
 
-        self.clrPrint("Received SMS from " + sender + " (timestamp " + timeStamp + ")")
-        self.dbgPrint(rawText)
+        # the SMS are handled in the order of their reception (e.g. to merge non-standard multipart SMS)
+        messages.sort(key = lambda message: message[0])
 
-        sourceEvent = SourceEvent()
-        sourceEvent.source = SourceEvent.SOURCE_SMS
-        sourceEvent.timestamp = timeStamp
-        sourceEvent.sender = sender
-        sourceEvent.raw = rawText
+        for (_, sourceEvent) in messages:
+            self.clrPrint("Received SMS from " + sourceEvent.sender + " (timestamp " + sourceEvent.timestamp + ")")
+            self.dbgPrint(sourceEvent.raw)
+            self.__receivedEvents.append(sourceEvent)
 
-        if not SourceDriver.isSenderAllowed(allowlist=self.__allowlist, denylist=self.__denylist, sender=sender):
-            self.error("Received unhandled message (ignored sender)")
-            return UnhandledEvent.fromSourceEvent(sourceEvent, UnhandledEvent.CAUSE_IGNORED_SENDER)
+        if len(messages) > 1:
+            self.print(f"Received {len(messages)} SMS at once")
 
-        parsedSourceEvent = self.parser.parseMessage(sourceEvent, self.__lastEvent)
+        if len(messages) > 0:
+            self.wakeup() # the event loop retrieves the messages as soon as possible
 
-        if parsedSourceEvent is not None:
-            self.__lastEvent = parsedSourceEvent
-
-        return parsedSourceEvent
-
-    def getSourceState(self) -> SourceState:
+    def __deleteMessage(self, locs: Tuple[int, ...]) -> bool:
+        deleted = True
+        for loc in locs:
+            try:
+                self.__gsm.DeleteSMS(Location = loc, Folder = 0)
+            except Exception as e:
+                self.error(f"Failed to delete message (location {loc}): {e}")
+                deleted = False
+        return deleted
+
+    def __decodeText(self, parts: List[Dict[str, Any]]) -> str:
+        rawText = ""
+        v = self.__gammu.DecodeSMS(parts)
+        if v is None:
+            for part in parts:
+                rawText += part['Text'] # .encode('utf-8')
+        else:
+            for e in v['Entries']:
+                if e['Buffer'] is not None:
+                    rawText += e['Buffer'] # .encode('utf-8')
+        return rawText
+
+    def __probeNetwork(self) -> None:
+        """Checks the network state of the modem (only called during initialization and by the modem thread)."""
         sourceState = SourceState.ERROR
 
         networkSignal = None
         networkInfo = None
-        if self.__gsm is not None and self.parser is not None:
+        if self.parser is not None:
             try:
                 networkInfo = self.__gsm.GetNetworkInfo()
 
@@ -174,18 +276,26 @@ class SourceDriverSMS(SourceDriver):
             except Exception:
                 pass
 
+        if self.isDebug() and self.__lastSourceState != sourceState:
+            if networkInfo is not None:
+                self.dbgPrint(f"Network info: {networkInfo}")
+
+            if networkSignal is not None:
+                self.dbgPrint(f"Network signal: {networkSignal}")
+
+        self.__setSourceState(sourceState)
+
+    def __setSourceState(self, sourceState: SourceState) -> None:
         if self.__lastSourceState is None or self.__lastSourceState != sourceState:
             if sourceState == SourceState.OK:
                 self.clrPrint(f"Source state changed to {sourceState.name}")
             else:
                 self.error(f"Source state changed to {sourceState.name}")
 
-            if self.isDebug() and networkInfo is not None:
-                self.dbgPrint(f"Network info: {networkInfo}")
-
-            if self.isDebug() and networkSignal is not None:
-                self.dbgPrint(f"Network signal: {networkSignal}")
-
             self.__lastSourceState = sourceState
+            self.__sourceState = sourceState
+            self.wakeup() # the event loop learns about the changed source state as soon as possible
 
-        return sourceState
+    def getSourceState(self) -> SourceState:
+        # the network state is probed by the modem thread (without blocking the caller)
+        return self.__sourceState
@@ -0,0 +1,213 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import copy
+import time
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from backend.action.Action import Action
+from backend.event.SourceEvent import SourceEvent
+from backend.util.Module import Module
+from backend.util.Settings import Settings
+
+class ActionDispatcher(Module):
+    """The ActionDispatcher passes SourceEvents to the configured Action plugins.
+    In sequential mode all Action plugins handle a SourceEvent one after another (in the configured order).
+    In concurrent mode a dependency graph of the Action plugins is derived from their dispatch hints:
+    Action plugins that use an enriched SourceEvent (e.g. update_database) wait for all preceding Action plugins
+    that enrich the SourceEvent (e.g. search_location) - at most until the deadline of those plugins is reached.
+    Action plugins that support concurrent handling run on their own worker thread so that slow plugins
+    (e.g. network requests) do not delay independent plugins or the processing of the next SourceEvent.
+    All other Action plugins run on the event loop (in the configured order).
+    Action plugins on worker threads handle a copy of the SourceEvent. The changes of enriching plugins are applied
+    to the SourceEvent when they finish before their deadline (late results are discarded, since dependent plugins
+    may already have used the SourceEvent). Deadlines are counted from the moment a worker starts handling the SourceEvent.
+    The duration each Action plugin required to handle the last SourceEvent is recorded."""
+
+    MODE_SEQUENTIAL = "sequential"
+    MODE_CONCURRENT = "concurrent"
+
+    def __init__(self, settings: Settings, actionPlugins: List[Action], wakeupEvent: Any) -> None:
+        """Constructs an ActionDispatcher for a list of Action plugins.
+
+        :param settings: reference to the Settings object
+        :param actionPlugins: list of Action plugins (in the configured order)
+        :param wakeupEvent: event object (as created by WebSocket.create_event) used to wait for worker threads"""
+        super().__init__("dispatcher", settings)
+        self.__actionPlugins = actionPlugins
+        self.__wakeupEvent = wakeupEvent
+        self.__concurrent = (settings.getBackendActionDispatch() == ActionDispatcher.MODE_CONCURRENT)
+        self.__timings: Dict[str, float] = {}
+        self.__dependencies: Dict[Action, List[Action]] = {}
+        self.__executors: Dict[Action, ThreadPoolExecutor] = {}
+        self.__cyclicFutures: Dict[Action, 'Future[None]'] = {}
+
+        if self.__concurrent:
+            enrichingPlugins: List[Action] = []
+            for actionPlugin in self.__actionPlugins:
+                if actionPlugin.USES_ENRICHED_EVENT:
+                    self.__dependencies[actionPlugin] = list(enrichingPlugins)
+                else:
+                    self.__dependencies[actionPlugin] = []
+
+                if actionPlugin.ENRICHES_EVENT:
+                    enrichingPlugins.append(actionPlugin)
+
+                if actionPlugin.CONCURRENT:
+                    # a single worker per plugin serializes calls of the same plugin
+                    self.__executors[actionPlugin] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=str(actionPlugin))
+
+                dependencies = ",".join(str(a) for a in self.__dependencies[actionPlugin])
+                mode = "worker" if actionPlugin.CONCURRENT else "event loop"
+                self.dbgPrint(f"{actionPlugin} runs on {mode} (depends on: {dependencies or 'none'})")
+
+    def getTimings(self) -> Dict[str, float]:
+        """Returns the duration each Action plugin required to handle the last SourceEvent.
+
+        :return: dict that maps the names of the Action plugins to durations (in seconds)"""
+        return dict(self.__timings)
+
+    def __runHandleEvent(self, actionPlugin: Action, sourceEvent: SourceEvent) -> None:
+        startTime = time.monotonic()
+        try:
+            actionPlugin.handleEvent(sourceEvent)
+        except Exception as e:
+            self.error(f"{actionPlugin}.handleEvent(sourceEvent) caused an unhandled exception", e)
+
+        duration = time.monotonic() - startTime
+        self.__timings[str(actionPlugin)] = duration
+        self.dbgPrint(f"{actionPlugin} handled event in {duration * 1000.0:.1f} ms")
+        if duration > actionPlugin.getDeadline():
+            self.error(f"{actionPlugin} exceeded its deadline ({actionPlugin.getDeadline():.1f} s)")
+
+    def __runHandleEventOnWorker(self, actionPlugin: Action, sourceEvent: SourceEvent, startTimes: Dict[Action, float]) -> None:
+        startTimes[actionPlugin] = time.monotonic() # the worker may still have been busy with a previous SourceEvent
+        self.__runHandleEvent(actionPlugin, sourceEvent)
+
+    @staticmethod
+    def __applyChanges(sourceEvent: SourceEvent, submittedEvent: Dict[str, Any], enrichedEvent: SourceEvent) -> None:
+        # only fields changed by the plugin are applied (concurrent plugins may enrich different fields)
+        for (field, value) in enrichedEvent.toJSON().items():
+            if value != submittedEvent[field]:
+                setattr(sourceEvent, field, value)
+
+    def __runHandleCyclic(self, actionPlugin: Action) -> None:
+        try:
+            actionPlugin.handleCyclic()
+        except Exception as e:
+            self.error(f"{actionPlugin}.handleCyclic() raised an unhandled exception", e)
+
+    def __wakeup(self, _future: 'Future[None]') -> None:
+        self.__wakeupEvent.set()
+
+    def handleEvent(self, sourceEvent: SourceEvent) -> None:
+        """Handles a SourceEvent by passing the event to all the Action plugins.
+        In concurrent mode this method returns as soon as all Action plugins that run on the event loop are done
+        (Action plugins running on worker threads may still be busy).
+
+        :param sourceEvent: SourceEvent that has to be handled by all the Action plugins"""
+        if not self.__concurrent:
+            for actionPlugin in self.__actionPlugins:
+                self.__runHandleEvent(actionPlugin, sourceEvent)
+            return
+
+        futures: Dict[Action, 'Future[None]'] = {}
+        deadlines: Dict[Action, float] = {}
+        startTimes: Dict[Action, float] = {}
+        copies: Dict[Action, SourceEvent] = {}
+        submittedEvents: Dict[Action, Dict[str, Any]] = {}
+        finished: List[Action] = []
+        remaining = list(self.__actionPlugins)
+
+        def getDeadline(actionPlugin: Action) -> float:
+            # until the worker starts, the deadline is counted from the submission of the SourceEvent
+            startTime = startTimes.get(actionPlugin, None)
+            if startTime is None:
+                return deadlines[actionPlugin]
+            return max(deadlines[actionPlugin], startTime + actionPlugin.getDeadline())
+
+        def isFinished(actionPlugin: Action) -> bool:
+            if actionPlugin in finished:
+                return True
+
+            future = futures.get(actionPlugin, None)
+            if future is not None and future.done():
+                if actionPlugin.ENRICHES_EVENT:
+                    ActionDispatcher.__applyChanges(sourceEvent, submittedEvents[actionPlugin], copies[actionPlugin])
+                finished.append(actionPlugin)
+                return True
+
+            if actionPlugin in deadlines and time.monotonic() >= getDeadline(actionPlugin):
+                self.error(f"{actionPlugin} exceeded its deadline (continuing without it and discarding its changes)")
+                finished.append(actionPlugin)
+                return True
+
+            return False
+
+        def isReady(actionPlugin: Action) -> bool:
+            return all(isFinished(d) for d in self.__dependencies[actionPlugin])
+
+        while len(remaining) > 0:
+            # start all concurrent plugins whose dependencies are satisfied
+            for actionPlugin in list(remaining):
+                if actionPlugin.CONCURRENT and isReady(actionPlugin):
+                    remaining.remove(actionPlugin)
+                    deadlines[actionPlugin] = time.monotonic() + actionPlugin.getDeadline()
+                    copies[actionPlugin] = copy.copy(sourceEvent)
+                    submittedEvents[actionPlugin] = sourceEvent.toJSON()
+                    future = self.__executors[actionPlugin].submit(self.__runHandleEventOnWorker, actionPlugin, copies[actionPlugin], startTimes)
+                    future.add_done_callback(self.__wakeup)
+                    futures[actionPlugin] = future
+
+            # run the next plugin on the event loop (keeping the configured order)
+            nextPlugin: Optional[Action] = None
+            for actionPlugin in remaining:
+                if not actionPlugin.CONCURRENT:
+                    nextPlugin = actionPlugin
+                    break
+
+            if nextPlugin is not None and isReady(nextPlugin):
+                remaining.remove(nextPlugin)
+                self.__runHandleEvent(nextPlugin, sourceEvent)
+                finished.append(nextPlugin)
+                continue
+
+            if len(remaining) == 0:
+                break
+
+            # wait until a worker finished or the next deadline is reached
+            self.__wakeupEvent.clear()
+            if any(isFinished(a) for a in futures if a not in finished):
+                continue
+
+            timeout = min(getDeadline(a) for a in futures if a not in finished) - time.monotonic()
+            self.__wakeupEvent.wait(max(timeout, 0.0))
+
+    def handleCyclic(self) -> None:
+        """Allows Action plugins to perform housekeeping operations
+        in the same order as specified in the configuration file.
+        In concurrent mode, Action plugins with a worker thread perform their housekeeping on that thread
+        (unless the last housekeeping operation is still in progress)."""
+        for actionPlugin in self.__actionPlugins:
+            executor = self.__executors.get(actionPlugin, None)
+            if executor is None:
+                self.__runHandleCyclic(actionPlugin)
+            else:
+                lastFuture = self.__cyclicFutures.get(actionPlugin, None)
+                if lastFuture is None or lastFuture.done():
+                    self.__cyclicFutures[actionPlugin] = executor.submit(self.__runHandleCyclic, actionPlugin)
@@ -0,0 +1,74 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import collections
+
+from typing import Any, Deque, Optional
+
+from backend.event.SourceEvent import SourceEvent
+
+class EventQueue:
+    """The EventQueue is a wakeable FIFO queue for SourceEvents.
+    SourceDriver plugins push received SourceEvents into the queue (e.g. from another thread)
+    while the event loop blocks on the queue until either a new SourceEvent arrives or a deadline is reached.
+    The wakeup event has to be created by the WebSocket to match the async mode of the backend
+    (e.g. threading or gevent) so that waiting for the queue does not block the webserver."""
+
+    def __init__(self, wakeupEvent: Any) -> None:
+        """Constructs an empty EventQueue.
+
+        :param wakeupEvent: event object (as created by WebSocket.create_event) used to wake up a waiting event loop"""
+        self.__events: Deque[SourceEvent] = collections.deque()
+        self.__wakeupEvent = wakeupEvent
+
+    def __len__(self) -> int:
+        return len(self.__events)
+
+    def push(self, sourceEvent: SourceEvent) -> None:
+        """Appends a SourceEvent to the queue and wakes up the event loop (if it is waiting).
+
+        :param sourceEvent: SourceEvent that has to be handled by the event loop"""
+        self.__events.append(sourceEvent)
+        self.__wakeupEvent.set()
+
+    def wakeup(self) -> None:
+        """Wakes up the event loop without pushing a SourceEvent
+        (e.g. to poll SourceDriver plugins that have new data available)."""
+        self.__wakeupEvent.set()
+
+    def pop(self) -> Optional[SourceEvent]:
+        """Removes and returns the oldest SourceEvent from the queue without blocking.
+
+        :return: SourceEvent if the queue was not empty, None otherwise"""
+        try:
+            return self.__events.popleft()
+        except IndexError:
+            return None
+
+    def wait(self, timeout: float) -> bool:
+        """Blocks until a SourceEvent is available, the queue is woken up or the timeout expires.
+
+        :param timeout: maximum duration to wait (in seconds)
+        :return: bool whether the queue was woken up before the timeout expired"""
+        if len(self.__events) > 0:
+            return True
+
+        # the wakeup event is cleared only after waiting so that a wakeup
+        # requested while the event loop was busy is not lost
+        # (a stale wakeup only causes an additional polling of the SourceDrivers)
+        woken = bool(self.__wakeupEvent.wait(max(timeout, 0.0)))
+        self.__wakeupEvent.clear()
+        return woken or len(self.__events) > 0
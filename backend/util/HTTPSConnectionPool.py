@@ -0,0 +1,174 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import ssl
+import time
+import threading
+import http.client as HTTPClient
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.util.Module import Module
+
+class _PooledConnection: #pylint: disable=too-few-public-methods
+
+    def __init__(self, connection: HTTPClient.HTTPSConnection) -> None:
+        self.connection = connection
+        self.timestamp = time.monotonic() # time of the last successful use
+
+class HTTPSConnectionPool(Module):
+    """The HTTPSConnectionPool keeps a number of persistent (keep-alive) HTTPS connections to a single host.
+    Connections are established in advance (warmup) so that the TLS handshake is not on the critical path of a request.
+    Idle connections are re-established after a maximum idle duration (refresh) since servers tend to close them.
+    The pool is thread-safe and allows concurrent requests (one per connection)."""
+
+    RETRY_EXCEPTIONS = (HTTPClient.RemoteDisconnected, HTTPClient.CannotSendRequest, HTTPClient.BadStatusLine,
+                        ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+
+    def __init__(self, host: str, port: int = 443, timeout: float = 5.0, size: int = 1,
+                 maxIdleDuration: float = 30.0, *, sslContext: Optional[ssl.SSLContext] = None) -> None:
+        """Constructs an (empty) HTTPSConnectionPool.
+
+        :param host: hostname of the server
+        :param port: port number of the server
+        :param timeout: timeout for connecting and requests (in seconds)
+        :param size: number of connections established by warmup/refresh
+        :param maxIdleDuration: duration after which idle connections are re-established (in seconds)
+        :param sslContext: SSL context used for the connections (optional; default context if not given)"""
+        super().__init__("httpspool")
+        self.__host = host
+        self.__port = port
+        self.__timeout = timeout
+        self.__size = size
+        self.__maxIdleDuration = maxIdleDuration
+        self.__sslContext = sslContext
+        self.__lock = threading.Lock()
+        self.__warmupLock = threading.Lock()
+        self.__idleConnections: List[_PooledConnection] = []
+        self.__connects = 0
+
+    def getState(self) -> Dict[str, Any]:
+        """Returns the number of connections established so far (i.e. the number of TLS handshakes)
+        and the number of idle connections that are currently available.
+
+        :return: dict with the state of the pool"""
+        with self.__lock:
+            return {'connects': self.__connects, 'idle': len(self.__idleConnections)}
+
+    def __connect(self) -> _PooledConnection:
+        connection = HTTPClient.HTTPSConnection(self.__host, self.__port, timeout=self.__timeout, context=self.__sslContext)
+        connection.connect()
+        with self.__lock:
+            self.__connects += 1
+        return _PooledConnection(connection)
+
+    def __acquire(self) -> Optional[_PooledConnection]:
+        with self.__lock:
+            while len(self.__idleConnections) > 0:
+                pooledConnection = self.__idleConnections.pop() # most recently used first
+                if time.monotonic() - pooledConnection.timestamp < self.__maxIdleDuration:
+                    return pooledConnection
+                pooledConnection.connection.close()
+        return None
+
+    def __release(self, pooledConnection: _PooledConnection) -> None:
+        with self.__lock:
+            self.__idleConnections.append(pooledConnection)
+
+    def warmup(self) -> bool:
+        """Establishes connections until the configured number of idle connections is available.
+
+        :return: bool whether all connections could be established"""
+        with self.__warmupLock:
+            with self.__lock:
+                missing = self.__size - len(self.__idleConnections)
+
+            for _ in range(missing):
+                try:
+                    self.__release(self.__connect())
+                except Exception as e:
+                    self.error(f"Failed to connect to {self.__host} ({e})")
+                    return False
+
+        return True
+
+    def refresh(self) -> bool:
+        """Closes connections that have been idle for too long and re-establishes them
+        (blocks until the connections are established, i.e. should not be called by the event loop).
+
+        :return: bool whether all connections could be established"""
+        now = time.monotonic()
+        expired: List[_PooledConnection] = []
+        with self.__lock:
+            for pooledConnection in list(self.__idleConnections):
+                if now - pooledConnection.timestamp >= self.__maxIdleDuration:
+                    self.__idleConnections.remove(pooledConnection)
+                    expired.append(pooledConnection)
+
+        for pooledConnection in expired:
+            pooledConnection.connection.close()
+
+        return self.warmup()
+
+    def close(self) -> None:
+        """Closes all idle connections."""
+        with self.__lock:
+            connections = self.__idleConnections
+            self.__idleConnections = []
+
+        for pooledConnection in connections:
+            pooledConnection.connection.close()
+
+    def request(self, method: str, url: str) -> Tuple[int, bytes]:
+        """Sends a request via an idle connection of the pool (or via a new connection if none is available).
+        A request on a reused connection that was closed by the server is retried once on a new connection.
+
+        :param method: HTTP method (e.g. GET)
+        :param url: URL of the request (without host)
+        :return: tuple of the HTTP status code and the response body"""
+        pooledConnection = self.__acquire()
+        reused = pooledConnection is not None
+        if pooledConnection is None:
+            pooledConnection = self.__connect()
+
+        try:
+            result = self.__request(pooledConnection, method, url)
+        except HTTPSConnectionPool.RETRY_EXCEPTIONS:
+            pooledConnection.connection.close()
+            if not reused:
+                raise
+            pooledConnection = self.__connect()
+            result = self.__request(pooledConnection, method, url)
+
+        return result
+
+    def __request(self, pooledConnection: _PooledConnection, method: str, url: str) -> Tuple[int, bytes]:
+        connection = pooledConnection.connection
+        try:
+            connection.request(method, url)
+            response = connection.getresponse()
+            body = response.read()
+        except Exception:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            pooledConnection.timestamp = time.monotonic()
+            self.__release(pooledConnection)
+
+        return (response.status, body)
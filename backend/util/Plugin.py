@@ -14,6 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import threading
+
 from typing import Dict, List, Tuple, TYPE_CHECKING
 
 from backend.util.Module import Module
@@ -30,7 +32,20 @@ class Plugin(Module):
 
     NAME_SEPARATOR = ":"
 
+    # Dependencies that are passed to the constructor of a plugin as keyword arguments (see PluginRegistry):
+    # DEPENDENCY_DATABASE            - reference to the Database
+    # DEPENDENCY_WEBSOCKET           - reference to the WebSocket
+    # DEPENDENCY_DISPLAYPOWERMANAGER - reference to the DisplayPowerManager
+    # DEPENDENCY_PARSER              - MessageParser plugin selected for a SourceDriver plugin
+    DEPENDENCY_DATABASE            = "database"
+    DEPENDENCY_WEBSOCKET           = "webSocket"
+    DEPENDENCY_DISPLAYPOWERMANAGER = "displayPowerManager"
+    DEPENDENCY_PARSER              = "parser"
+
+    DEPENDENCIES: List[str] = []
+
     existingInstances: Dict[str, List[str]] = {}
+    existingInstancesLock = threading.Lock() # plugins may be initialized in parallel
 
     def __init__(self, pluginType: str, pluginName: str, instanceName: str, settings: 'Settings', multipleInstances: bool = False) -> None:
         """Constructs a Plugin of a certain type with a specific name and access to settings and initializes it.
@@ -52,22 +67,23 @@ class Plugin(Module):
         self.instanceName = instanceName
         self.settings = settings
 
-        if fullPluginName not in Plugin.existingInstances:
-            Plugin.existingInstances[fullPluginName] = []
+        with Plugin.existingInstancesLock:
+            if fullPluginName not in Plugin.existingInstances:
+                Plugin.existingInstances[fullPluginName] = []
 
-        instancesOfPlugin = Plugin.existingInstances[fullPluginName]
+            instancesOfPlugin = Plugin.existingInstances[fullPluginName]
 
-        if len(instancesOfPlugin) > 0:
-            #TODO: move these (unique name, multi instance) checks into the PluginManager ?
+            if len(instancesOfPlugin) > 0:
+                #TODO: move these (unique name, multi instance) checks into the PluginManager ?
 
-            if multipleInstances is False:
-                self.fatal("Only one instances of this plugin is supported")
+                if multipleInstances is False:
+                    self.fatal("Only one instances of this plugin is supported")
 
-            if instanceName in instancesOfPlugin:
-                iName = instanceName if instanceName != "" else "<NONE>"
-                self.fatal(f"Instance name ({iName}) is already in use for this plugin")
+                if instanceName in instancesOfPlugin:
+                    iName = instanceName if instanceName != "" else "<NONE>"
+                    self.fatal(f"Instance name ({iName}) is already in use for this plugin")
 
-        instancesOfPlugin.append(instanceName)
+            instancesOfPlugin.append(instanceName)
 
     def isDebug(self) -> bool:
         """Returns whether the plugin is in debug mode (True) or not (False).
@@ -14,17 +14,21 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import importlib
+import time
 
-from typing import List, Optional, TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
 
 from backend.source.SourceDriver import SourceDriver, SourceState
 from backend.source.MessageParser import MessageParser
 from backend.event.SourceEvent import SourceEvent
 from backend.action.Action import Action
 
+from backend.util.ActionDispatcher import ActionDispatcher
 from backend.util.Module import Module
 from backend.util.Plugin import Plugin
+from backend.util.PluginRegistry import PluginRegistry
+from backend.util.EventQueue import EventQueue
 from backend.util.Settings import Settings
 from backend.util.DisplayPowerManager import DisplayPowerManager
 from backend.data.Database import Database
@@ -34,150 +38,140 @@ if TYPE_CHECKING:
 
 class PluginManager(Module):
     """The PluginManager reads all configured SourceDriver, MessageParser and Action plugins from the configuration file
-    and initializes them accordingly.
+    and initializes them accordingly (with the help of the PluginRegistry).
     During normal operation, it enables retrieving SourceEvents from all the configured SourceDriver plugins
     and handling of these SourceEvents by passing them to all configured Action plugins."""
 
     def __init__(self, settings: Settings, database: Database, webSocket: 'WebSocket', displayPowerManager: DisplayPowerManager) -> None:
         super().__init__("situationboard", settings)
         self.__settings = settings
-        self.__database = database
         self.__webSocket = webSocket
-        self.__displayPowerManager = displayPowerManager
         self.__sourcePlugins: List[SourceDriver] = []
         self.__actionPlugins: List[Action] = []
-
-    def __loadParserPlugin(self, source: str, parserIdentifier: str) -> MessageParser:
+        self.__eventQueue = EventQueue(webSocket.create_event())
+        self.__actionDispatcher: Optional[ActionDispatcher] = None
+        self.__initTimings: Dict[str, float] = {}
+        self.__sourceState = SourceState.OK # updated by the event loop (see updateSourceState)
+        self.__dependencies: Dict[str, Any] = {
+            Plugin.DEPENDENCY_DATABASE: database,
+            Plugin.DEPENDENCY_WEBSOCKET: webSocket,
+            Plugin.DEPENDENCY_DISPLAYPOWERMANAGER: displayPowerManager,
+        }
+
+    def __createParserPlugin(self, source: str, parserIdentifier: str) -> MessageParser:
         (parser, instanceName) = Plugin.splitPluginIdentifier(parserIdentifier)
         self.print(f"Init parser plugin {parser} (for source plugin {source})")
         parserPlugin: Optional[MessageParser] = None
+        startTime = time.monotonic()
 
-        try:
-            if source == "sms":
-                if parser == "sms":
-                    parserModule = importlib.import_module("backend.source.MessageParserSMS")
-                    parserPlugin = parserModule.MessageParserSMS(instanceName, self.__settings)
-                else:
-                    self.fatal(f"Invalid parser plugin {parser} for source plugin {source}")
-            else:
-                self.fatal(f"No parser plugin available/required for source plugin {source}")
+        if parser not in PluginRegistry.getPluginNames(PluginRegistry.TYPE_PARSER):
+            self.fatal(f"Invalid parser plugin {parser} for source plugin {source}")
 
+        try:
+            parserPlugin = PluginRegistry.createPlugin(PluginRegistry.TYPE_PARSER, parser, instanceName, self.__settings, self.__dependencies)
         except Exception as e:
             self.fatal(f"An exception occurred during init of parser plugin {parser}", e)
 
         if parserPlugin is None:
             self.fatal(f"No parser plugin for source plugin {source}")
 
+        self.__initTimings[f"{PluginRegistry.TYPE_PARSER}:{parserIdentifier}"] = time.monotonic() - startTime
         return parserPlugin
 
-    def initPlugins(self) -> None:
-        self.__initSourcePlugins()
-        self.__initActionPlugins()
+    def __createSourcePlugin(self, sourceIdentifier: str) -> SourceDriver:
+        (source, instanceName) = Plugin.splitPluginIdentifier(sourceIdentifier)
+        self.print(f"Init source plugin {source}")
+        sourcePlugin: Optional[SourceDriver] = None
+        startTime = time.monotonic()
 
-    def __initSourcePlugins(self) -> None:
-        if len(self.__sourcePlugins) > 0:
-            return
+        if source not in PluginRegistry.getPluginNames(PluginRegistry.TYPE_SOURCE):
+            self.fatal(f"Invalid source plugin {source}")
 
-        sources = self.__settings.getBackendSources()
-        for sourceIdentifier in sources:
-            (source, instanceName) = Plugin.splitPluginIdentifier(sourceIdentifier)
-            self.print(f"Init source plugin {source}")
-            sourcePlugin: Optional[SourceDriver] = None
+        try:
+            dependencies = self.__dependencies
+            sourceClass = PluginRegistry.loadPlugin(PluginRegistry.TYPE_SOURCE, source)
+            if Plugin.DEPENDENCY_PARSER in sourceClass.DEPENDENCIES:
+                parserIdentifier = self.__settings.getString(f"source_{source}", "parser", source)
+                parserPlugin = self.__createParserPlugin(source, parserIdentifier)
+                dependencies = dict(dependencies, **{Plugin.DEPENDENCY_PARSER: parserPlugin})
+            sourcePlugin = PluginRegistry.createPlugin(PluginRegistry.TYPE_SOURCE, source, instanceName, self.__settings, dependencies)
+        except Exception as e:
+            self.fatal(f"An exception occurred during init of source plugin {source}", e)
 
-            try:
-                if source == "sms":
-                    parserIdentifier = self.__settings.getString("source_sms", "parser", "sms")
-                    parserPlugin = self.__loadParserPlugin(source, parserIdentifier)
-                    sourceModule = importlib.import_module("backend.source.SourceDriverSMS")
-                    sourcePlugin = sourceModule.SourceDriverSMS(instanceName, self.__settings, parserPlugin)
-                elif source == "binary":
-                    sourceModule = importlib.import_module("backend.source.SourceDriverBinary")
-                    sourcePlugin = sourceModule.SourceDriverBinary(instanceName, self.__settings) # no parser required
-                elif source == "dummy":
-                    sourceModule = importlib.import_module("backend.source.SourceDriverDummy")
-                    sourcePlugin = sourceModule.SourceDriverDummy(instanceName, self.__settings) # no parser required
-                elif source == "scanner":
-                    self.fatal("Scanner source plugin not yet implemented")
-                elif source == "webapi":
-                    self.fatal("Web API source plugin not yet implemented")
-                elif source == "fax":
-                    self.fatal("Fax source plugin not yet implemented")
-                elif source == "mail":
-                    self.fatal("Mail source plugin not yet implemented")
-                else:
-                    self.fatal(f"Invalid source plugin {source}")
+        if sourcePlugin is None:
+            self.fatal(f"Could not init source plugin {source}")
 
-            except Exception as e:
-                self.fatal(f"An exception occurred during init of source plugin {source}", e)
+        self.__initTimings[f"{PluginRegistry.TYPE_SOURCE}:{sourceIdentifier}"] = time.monotonic() - startTime # including the parser
+        return sourcePlugin
 
-            if sourcePlugin is not None:
-                self.__sourcePlugins.append(sourcePlugin)
+    def __createActionPlugin(self, actionIdentifier: str) -> Action:
+        (action, instanceName) = Plugin.splitPluginIdentifier(actionIdentifier)
+        self.print(f"Init action plugin {action}")
+        actionPlugin: Optional[Action] = None
+        startTime = time.monotonic()
 
-        if len(self.__sourcePlugins) == 0:
-            self.fatal("No source plugins configured!")
+        if action not in PluginRegistry.getPluginNames(PluginRegistry.TYPE_ACTION):
+            self.fatal(f"Invalid action plugin {action}")
 
-    def __initActionPlugins(self) -> None:
-        if len(self.__actionPlugins) > 0:
+        try:
+            actionPlugin = PluginRegistry.createPlugin(PluginRegistry.TYPE_ACTION, action, instanceName, self.__settings, self.__dependencies)
+        except Exception as e:
+            self.fatal(f"An exception occurred during init of action plugin {action}", e)
+
+        if actionPlugin is None:
+            self.fatal(f"Could not init action plugin {action}")
+
+        self.__initTimings[f"{PluginRegistry.TYPE_ACTION}:{actionIdentifier}"] = time.monotonic() - startTime
+        return actionPlugin
+
+    def initPlugins(self) -> None:
+        """Initializes all configured SourceDriver, MessageParser and Action plugins (in the order specified in the configuration file).
+        The Action plugins are independent of each other and are initialized in parallel on worker threads
+        (see plugin_init_workers setting of the backend) while the SourceDriver plugins are initialized
+        on the calling thread (e.g. because signal handlers can only be registered by the main thread)."""
+        if len(self.__sourcePlugins) > 0 or len(self.__actionPlugins) > 0:
             return
 
+        sources = self.__settings.getBackendSources()
         actions = self.__settings.getBackendActions()
-        for actionIdentifier in actions:
-            (action, instanceName) = Plugin.splitPluginIdentifier(actionIdentifier)
+        workers = self.__settings.getBackendPluginInitWorkers()
 
-            self.print(f"Init action plugin {action}")
-            actionPlugin: Optional[Action] = None
+        if workers <= 1:
+            self.__sourcePlugins = [self.__createSourcePlugin(source) for source in sources]
+            self.__actionPlugins = [self.__createActionPlugin(action) for action in actions]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plugin-init") as executor:
+                actionFutures = [executor.submit(self.__createActionPlugin, action) for action in actions]
+                self.__sourcePlugins = [self.__createSourcePlugin(source) for source in sources]
+                # errors (and the termination caused by fatal errors) are passed on by the futures
+                self.__actionPlugins = [future.result() for future in actionFutures]
 
-            try:
-                if action == "search_location":
-                    actionModule = importlib.import_module("backend.action.ActionSearchLocation")
-                    actionPlugin = actionModule.ActionSearchLocation(instanceName, self.__settings)
-                elif action == "update_database":
-                    actionModule = importlib.import_module("backend.action.ActionUpdateDatabase")
-                    actionPlugin = actionModule.ActionUpdateDatabase(instanceName, self.__settings, self.__database, self.__webSocket)
-                elif action == "update_settings":
-                    actionModule = importlib.import_module("backend.action.ActionUpdateSettings")
-                    actionPlugin = actionModule.ActionUpdateSettings(instanceName, self.__settings)
-                elif action == "update_frontend":
-                    actionModule = importlib.import_module("backend.action.ActionUpdateFrontend")
-                    actionPlugin = actionModule.ActionUpdateFrontend(instanceName, self.__settings, self.__webSocket)
-                elif action == "update_calendar":
-                    actionModule = importlib.import_module("backend.action.ActionUpdateCalendar")
-                    actionPlugin = actionModule.ActionUpdateCalendar(instanceName, self.__settings, self.__webSocket)
-                elif action == "activate_screen":
-                    actionModule = importlib.import_module("backend.action.ActionActivateScreen")
-                    actionPlugin = actionModule.ActionActivateScreen(instanceName, self.__settings, self.__displayPowerManager)
-                elif action == "send_poweralarm":
-                    actionModule = importlib.import_module("backend.action.ActionSendMessagePowerAlarm")
-                    actionPlugin = actionModule.ActionSendMessagePowerAlarm(instanceName, self.__settings)
-                elif action == "toggle_outlet":
-                    actionModule = importlib.import_module("backend.action.ActionToggleOutlet")
-                    actionPlugin = actionModule.ActionToggleOutlet(instanceName, self.__settings)
-                elif action == "toggle_output":
-                    actionModule = importlib.import_module("backend.action.ActionToggleOutput")
-                    actionPlugin = actionModule.ActionToggleOutput(instanceName, self.__settings)
-                elif action == "write_file":
-                    actionModule = importlib.import_module("backend.action.ActionWriteFile")
-                    actionPlugin = actionModule.ActionWriteFile(instanceName, self.__settings)
-                else:
-                    self.fatal(f"Invalid action plugin {action}")
+        for sourcePlugin in self.__sourcePlugins:
+            sourcePlugin.attachEventQueue(self.__eventQueue)
 
-            except Exception as e:
-                self.fatal(f"An exception occurred during init of action plugin {action}", e)
+        self.updateSourceState()
 
-            if actionPlugin is not None:
-                self.__actionPlugins.append(actionPlugin)
+        if len(self.__sourcePlugins) == 0:
+            self.fatal("No source plugins configured!")
 
         if len(self.__actionPlugins) == 0:
             self.fatal("No action plugins configured!")
 
+        self.__actionDispatcher = ActionDispatcher(self.__settings, self.__actionPlugins, self.__webSocket.create_event())
+
     def retrieveEvent(self) -> Optional[SourceEvent]:
-        """Tries to retrieve the next SourceEvent by asking the configured SourceDrivers for SourceEvents
+        """Tries to retrieve the next SourceEvent.
+        SourceEvents pushed into the EventQueue are returned first (in the order they were pushed).
+        Afterwards, the configured SourceDrivers are asked for SourceEvents
         in the same order as specified in the configuration file.
         The first SourceEvent found is returned immediately, postponing the handling of SourceEvents
         available from other SourceDrivers.
 
         :return: SourceEvent (or a subclass thereof) if a event was available, None otherwise"""
-        sourceEvent = None
+        sourceEvent = self.__eventQueue.pop()
+        if sourceEvent is not None:
+            return sourceEvent
+
         for sourceDriver in self.__sourcePlugins:
             sourceEvent = None
             try:
@@ -192,11 +186,18 @@ class PluginManager(Module):
 
         return sourceEvent
 
-    def getSourceState(self) -> SourceState:
-        """Returns the overall state of all configured SourceDriver plugins
-        (for visualization in the status bar of the frontend).
+    def waitForEvent(self, timeout: float) -> bool:
+        """Blocks until a SourceDriver pushes a SourceEvent (or wakes up the event loop) or the timeout expires.
 
-        :return: SourceState representing the overall state of all sources"""
+        :param timeout: maximum duration to wait (in seconds)
+        :return: bool whether the event loop was woken up before the timeout expired"""
+        return self.__eventQueue.wait(timeout)
+
+    def updateSourceState(self) -> bool:
+        """Determines the overall state of all configured SourceDriver plugins and caches it
+        (called by the event loop so that the SourceDrivers are queried independently of the number of clients).
+
+        :return: bool whether the overall state changed"""
         state = SourceState.OK
         for sourceDriver in self.__sourcePlugins:
             s = SourceState.ERROR
@@ -210,25 +211,60 @@ class PluginManager(Module):
                 state = SourceState.ERROR
                 # break
 
-        return state
+        changed = (state != self.__sourceState)
+        self.__sourceState = state
+        return changed
 
-    def handleEvent(self, sourceEvent: SourceEvent) -> None:
-        """Handles a SourceEvent by passing the event to all the Action plugins
-        in the same order as specified in the configuration file.
+    def getSourceState(self) -> SourceState:
+        """Returns the (cached) overall state of all configured SourceDriver plugins
+        (for visualization in the status bar of the frontend).
 
-        :param sourceEvent: SourceEvent that has to be handled by all the Action plugins"""
+        :return: SourceState representing the overall state of all sources"""
+        return self.__sourceState
+
+    def getActionStates(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the state information of all Action plugins that provide state information.
+
+        :return: dict that maps the names of the Action plugins to their state information"""
+        states: Dict[str, Dict[str, Any]] = {}
         for actionHandler in self.__actionPlugins:
             try:
-                actionHandler.handleEvent(sourceEvent)
+                state = actionHandler.getState()
             except Exception as e:
-                self.error(f"{actionHandler}.handleEvent(sourceEvent) caused an unhandled exception", e)
+                self.error(f"{actionHandler}.getState() caused an unhandled exception", e)
+                continue
+
+            if len(state) > 0:
+                states[str(actionHandler)] = state
 
+        return states
+
+    def handleEvent(self, sourceEvent: SourceEvent) -> None:
+        """Handles a SourceEvent by passing the event to all the Action plugins
+        in the same order as specified in the configuration file
+        (or according to their dependencies when the concurrent action dispatch is enabled).
+
+        :param sourceEvent: SourceEvent that has to be handled by all the Action plugins"""
+        if self.__actionDispatcher is not None:
+            self.__actionDispatcher.handleEvent(sourceEvent)
 
     def handleCyclic(self) -> None:
         """Allows Action plugins to perform housekeeping operations
         in the same order as specified in the configuration file."""
-        for actionHandler in self.__actionPlugins:
-            try:
-                actionHandler.handleCyclic()
-            except Exception as e:
-                self.error(f"{actionHandler}.handleCyclic() raised an unhandled exception", e)
+        if self.__actionDispatcher is not None:
+            self.__actionDispatcher.handleCyclic()
+
+    def getActionTimings(self) -> Dict[str, float]:
+        """Returns the duration each Action plugin required to handle the last SourceEvent.
+
+        :return: dict that maps the names of the Action plugins to durations (in seconds)"""
+        if self.__actionDispatcher is not None:
+            return self.__actionDispatcher.getTimings()
+
+        return {}
+
+    def getInitTimings(self) -> Dict[str, float]:
+        """Returns the duration the initialization of each plugin required (e.g. for profiling the startup).
+
+        :return: dict that maps the identifiers of the plugins (e.g. action:search_location) to durations (in seconds)"""
+        return dict(self.__initTimings)
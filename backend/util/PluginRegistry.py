@@ -0,0 +1,152 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import importlib
+import threading
+
+from typing import Any, Dict, List, Tuple
+
+class PluginRegistry:
+    """The PluginRegistry maps the names of source, parser and action plugins to the classes that implement them.
+    Plugins are registered with a target string ("module:Class") and the module is only imported
+    when the plugin is actually configured (so that heavy dependencies like geopy, gammu or RPi.GPIO
+    are only loaded when they are required).
+    In addition to the built-in plugins, third-party packages can provide plugins with entry points
+    in the groups situationboard.sources, situationboard.parsers and situationboard.actions
+    (or register them with the register method before the plugins are initialized).
+    The dependencies of a plugin (like the database or the WebSocket) are declared by the DEPENDENCIES
+    attribute of the plugin class and are passed to its constructor as keyword arguments."""
+
+    TYPE_SOURCE = "source"
+    TYPE_PARSER = "parser"
+    TYPE_ACTION = "action"
+
+    ENTRY_POINT_GROUPS = {
+        TYPE_SOURCE: "situationboard.sources",
+        TYPE_PARSER: "situationboard.parsers",
+        TYPE_ACTION: "situationboard.actions",
+    }
+
+    TARGET_SEPARATOR = ":"
+
+    __registry: Dict[Tuple[str, str], str] = {
+        (TYPE_SOURCE, "sms"):             "backend.source.SourceDriverSMS:SourceDriverSMS",
+        (TYPE_SOURCE, "binary"):          "backend.source.SourceDriverBinary:SourceDriverBinary",
+        (TYPE_SOURCE, "dummy"):           "backend.source.SourceDriverDummy:SourceDriverDummy",
+        (TYPE_PARSER, "sms"):             "backend.source.MessageParserSMS:MessageParserSMS",
+        (TYPE_ACTION, "search_location"): "backend.action.ActionSearchLocation:ActionSearchLocation",
+        (TYPE_ACTION, "update_database"): "backend.action.ActionUpdateDatabase:ActionUpdateDatabase",
+        (TYPE_ACTION, "update_settings"): "backend.action.ActionUpdateSettings:ActionUpdateSettings",
+        (TYPE_ACTION, "update_frontend"): "backend.action.ActionUpdateFrontend:ActionUpdateFrontend",
+        (TYPE_ACTION, "update_calendar"): "backend.action.ActionUpdateCalendar:ActionUpdateCalendar",
+        (TYPE_ACTION, "activate_screen"): "backend.action.ActionActivateScreen:ActionActivateScreen",
+        (TYPE_ACTION, "send_poweralarm"): "backend.action.ActionSendMessagePowerAlarm:ActionSendMessagePowerAlarm",
+        (TYPE_ACTION, "toggle_outlet"):   "backend.action.ActionToggleOutlet:ActionToggleOutlet",
+        (TYPE_ACTION, "toggle_output"):   "backend.action.ActionToggleOutput:ActionToggleOutput",
+        (TYPE_ACTION, "write_file"):      "backend.action.ActionWriteFile:ActionWriteFile",
+    }
+
+    __entryPointsLoaded = False
+    __lock = threading.Lock() # plugins may be loaded in parallel
+
+    @staticmethod
+    def register(pluginType: str, pluginName: str, target: str) -> None:
+        """Registers a plugin (or replaces the registration of a plugin with the same name).
+
+        :param pluginType: type of the plugin (TYPE_SOURCE, TYPE_PARSER or TYPE_ACTION)
+        :param pluginName: name of the plugin as used in the configuration file
+        :param target: string with the module and the class that implement the plugin (e.g. "package.module:Class")"""
+        if pluginType not in PluginRegistry.ENTRY_POINT_GROUPS:
+            raise ValueError(f"Invalid plugin type {pluginType}")
+
+        if PluginRegistry.TARGET_SEPARATOR not in target:
+            raise ValueError(f"Invalid target {target} (expected module:Class)")
+
+        with PluginRegistry.__lock:
+            PluginRegistry.__registry[(pluginType, pluginName)] = target
+
+    @staticmethod
+    def getPluginNames(pluginType: str) -> List[str]:
+        """Returns the names of all registered plugins of a type (including the plugins provided by entry points).
+
+        :param pluginType: type of the plugins (TYPE_SOURCE, TYPE_PARSER or TYPE_ACTION)
+        :return: sorted list with the names of the plugins"""
+        PluginRegistry.__loadEntryPoints()
+        with PluginRegistry.__lock:
+            return sorted(name for (t, name) in PluginRegistry.__registry if t == pluginType)
+
+    @staticmethod
+    def loadPlugin(pluginType: str, pluginName: str) -> Any:
+        """Imports the module of a registered plugin (if required) and returns the class of the plugin.
+
+        :param pluginType: type of the plugin (TYPE_SOURCE, TYPE_PARSER or TYPE_ACTION)
+        :param pluginName: name of the plugin as used in the configuration file
+        :return: class that implements the plugin (raises KeyError for unknown plugins)"""
+        PluginRegistry.__loadEntryPoints()
+        with PluginRegistry.__lock:
+            target = PluginRegistry.__registry.get((pluginType, pluginName), None)
+
+        if target is None:
+            raise KeyError(f"Unknown {pluginType} plugin {pluginName}")
+
+        (moduleName, _, className) = target.partition(PluginRegistry.TARGET_SEPARATOR)
+        module = importlib.import_module(moduleName)
+        return getattr(module, className)
+
+    @staticmethod
+    def createPlugin(pluginType: str, pluginName: str, instanceName: str, settings: Any, dependencies: Dict[str, Any]) -> Any:
+        """Creates an instance of a registered plugin.
+        Only the dependencies declared by the plugin class are passed to its constructor.
+
+        :param pluginType: type of the plugin (TYPE_SOURCE, TYPE_PARSER or TYPE_ACTION)
+        :param pluginName: name of the plugin as used in the configuration file
+        :param instanceName: optional string representing a unique instance name of the plugin
+        :param settings: reference to the Settings object
+        :param dependencies: dict that maps the names of all available dependencies to the objects
+        :return: new instance of the plugin (raises KeyError for unknown plugins or missing dependencies)"""
+        pluginClass = PluginRegistry.loadPlugin(pluginType, pluginName)
+
+        kwargs: Dict[str, Any] = {}
+        for dependency in getattr(pluginClass, "DEPENDENCIES", []):
+            if dependency not in dependencies:
+                raise KeyError(f"Missing dependency {dependency} of {pluginType} plugin {pluginName}")
+            kwargs[dependency] = dependencies[dependency]
+
+        return pluginClass(instanceName, settings, **kwargs)
+
+    @staticmethod
+    def __loadEntryPoints() -> None:
+        with PluginRegistry.__lock:
+            if PluginRegistry.__entryPointsLoaded:
+                return
+            PluginRegistry.__entryPointsLoaded = True
+
+            try:
+                metadata = importlib.import_module("importlib.metadata")
+                entryPoints = metadata.entry_points()
+            except Exception:
+                return # entry points are not supported (Python < 3.8)
+
+            for (pluginType, group) in PluginRegistry.ENTRY_POINT_GROUPS.items():
+                if hasattr(entryPoints, "select"):
+                    groupEntryPoints = entryPoints.select(group = group)
+                else:
+                    groupEntryPoints = entryPoints.get(group, []) # Python < 3.10
+
+                # only the target is stored (the module is imported when the plugin is configured)
+                # and plugins that are already registered are not replaced by plugins with the same name
+                for entryPoint in groupEntryPoints:
+                    PluginRegistry.__registry.setdefault((pluginType, entryPoint.name), entryPoint.value)
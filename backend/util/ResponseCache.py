@@ -0,0 +1,150 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import json
+import collections
+import threading
+
+from typing import Any, Callable, Dict, Hashable, OrderedDict, Tuple
+
+class EncodedPayload: #pylint: disable=too-few-public-methods
+    """An EncodedPayload is the JSON encoding of a Socket.IO payload that is done once and reused for every client.
+    It is inserted into the Socket.IO packets as is by PayloadJSON (instead of being encoded for each emit)."""
+
+    __slots__ = ('encoded',)
+
+    def __init__(self, data: Any) -> None:
+        self.encoded = json.dumps(data, separators=(',', ':'))
+
+class PayloadJSON:
+    """PayloadJSON is a json module for Socket.IO that inserts EncodedPayloads into packets without encoding them again."""
+
+    @staticmethod
+    def dumps(obj: Any, **kwargs: Any) -> str:
+        if isinstance(obj, list) and any(isinstance(item, EncodedPayload) for item in obj):
+            # packet data is a list with the event name and the arguments
+            return "[" + ",".join(item.encoded if isinstance(item, EncodedPayload) else json.dumps(item, **kwargs) for item in obj) + "]"
+        return json.dumps(obj, **kwargs)
+
+    @staticmethod
+    def loads(s: Any, **kwargs: Any) -> Any:
+        return json.loads(s, **kwargs)
+
+class _Flight: #pylint: disable=too-few-public-methods
+    """A _Flight represents the creation of a payload that other requests for the same payload wait for."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.payload: Any = None
+        self.failed = True
+
+class ResponseCache:
+    """The ResponseCache stores the (already encoded) payloads of read-only requests
+    so that identical requests (e.g. from many clients reconnecting at the same time)
+    only require a single database query and a single JSON encoding.
+    Entries are identified by the endpoint, the parameters of the request and the revision of the database.
+    Therefore, changing the database automatically invalidates all existing entries
+    (outdated entries are not used anymore and are evicted in least-recently-used order).
+    Concurrent requests for a payload that is not cached yet wait for a single producer (single flight)."""
+
+    DEFAULT_SIZE = 32
+
+    def __init__(self, size: int = DEFAULT_SIZE) -> None:
+        """Constructs an empty ResponseCache.
+
+        :param size: maximum number of cached payloads (0 disables the cache)"""
+        self.__size = max(size, 0)
+        self.__entries: OrderedDict[Tuple[str, Hashable, int], Any] = collections.OrderedDict()
+        self.__flights: Dict[Tuple[str, Hashable, int], _Flight] = {}
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__shared = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, endpoint: str, params: Hashable, revision: int, producer: Callable[[], Any]) -> Any:
+        """Returns the cached payload for a request or creates (and caches) the payload with the given producer.
+
+        :param endpoint: name of the requested endpoint
+        :param params: hashable representation of all request parameters that affect the payload
+        :param revision: current revision of the database
+        :param producer: callable that creates the (encoded) payload on a cache miss
+        :return: the cached or newly created payload"""
+        if self.__size == 0:
+            with self.__lock:
+                self.__misses += 1
+            return producer()
+
+        key = (endpoint, params, revision)
+
+        with self.__lock:
+            if key in self.__entries:
+                self.__entries.move_to_end(key)
+                self.__hits += 1
+                return self.__entries[key]
+
+            flight = self.__flights.get(key, None)
+            if flight is None:
+                flight = _Flight()
+                self.__flights[key] = flight
+                self.__misses += 1
+                producing = True
+            else:
+                self.__shared += 1
+                producing = False
+
+        if not producing:
+            # another request is already creating the payload
+            flight.done.wait()
+            if not flight.failed:
+                return flight.payload
+            return producer()
+
+        try:
+            flight.payload = producer()
+            flight.failed = False
+        finally:
+            with self.__lock:
+                del self.__flights[key]
+                if not flight.failed:
+                    self.__entries[key] = flight.payload
+                    self.__entries.move_to_end(key)
+                    while len(self.__entries) > self.__size:
+                        self.__entries.popitem(last = False)
+            flight.done.set()
+
+        return flight.payload
+
+    def clear(self) -> None:
+        """Removes all cached payloads (the hit/miss counters are retained)."""
+        with self.__lock:
+            self.__entries.clear()
+
+    def getStats(self) -> Dict[str, int]:
+        """Returns the statistics of the cache.
+
+        :return: dict with the number of cache hits, cache misses, shared misses and cached payloads"""
+        with self.__lock:
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'shared': self.__shared,
+                'entries': len(self.__entries),
+                'size': self.__size
+            }
@@ -184,8 +184,33 @@ class Settings(Module):
     def getBackendWebAPI(self) -> bool:
         return self.getBoolean(Settings.SECTION_BACKEND, "web_api", False)
 
-    def getBackendLoopSleepDuration(self) -> int:
-        return self.getInt(Settings.SECTION_BACKEND, "loop_sleep_duration", 1) # in seconds
+    def getBackendLoopSleepDuration(self) -> float:
+        return self.getFloat(Settings.SECTION_BACKEND, "loop_sleep_duration", 1.0) # in seconds
+
+    def getBackendActionDispatch(self) -> str:
+        availableModes = ["sequential", "concurrent"]
+        defaultMode = "sequential"
+        return self.getOption(Settings.SECTION_BACKEND, "action_dispatch", availableModes, defaultMode)
+
+    def getBackendResponseCacheSize(self) -> int:
+        return self.getInt(Settings.SECTION_BACKEND, "response_cache_size", 32)
+
+    def getBackendDatabaseWAL(self) -> bool:
+        return self.getBoolean(Settings.SECTION_BACKEND, "database_wal", False)
+
+    def getBackendDatabaseSynchronous(self) -> str:
+        availableModes = ["off", "normal", "full"]
+        defaultMode = "full"
+        return self.getOption(Settings.SECTION_BACKEND, "database_synchronous", availableModes, defaultMode)
+
+    def getBackendDatabaseCheckpoint(self) -> int:
+        return self.getInt(Settings.SECTION_BACKEND, "database_checkpoint", 1000) # in pages
+
+    def getBackendDatabaseReaders(self) -> int:
+        return self.getInt(Settings.SECTION_BACKEND, "database_readers", 2)
+
+    def getBackendPluginInitWorkers(self) -> int:
+        return self.getInt(Settings.SECTION_BACKEND, "plugin_init_workers", 4) # 1 = one plugin after another
 
     def getBackendSources(self) -> List[str]:
         return self.getList(Settings.SECTION_BACKEND, "sources", [])
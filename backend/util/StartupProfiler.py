@@ -0,0 +1,173 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+import time
+import builtins
+import importlib
+import threading
+import contextlib
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from backend.util.Module import Module
+
+class StartupProfiler(Module):
+    """The StartupProfiler records the duration of the different startup phases of the backend
+    (e.g. loading of the settings, opening of the database and initialization of the plugins)
+    and the import times of all modules that are imported while it is active.
+    Imports are tracked by wrapping the import statement and importlib.import_module
+    (so that the lazy imports of the PluginRegistry are included).
+    Disabled profilers do not track anything (and do not cause any overhead besides the method calls)."""
+
+    DEFAULT_IMPORT_BUDGET = 0.05 # in seconds
+    DEFAULT_REPORT_IMPORTS = 15
+
+    def __init__(self, enabled: bool, *, startTime: Optional[float] = None, importBudget: float = DEFAULT_IMPORT_BUDGET) -> None:
+        """Constructs a StartupProfiler.
+
+        :param enabled: bool whether the startup is profiled
+        :param startTime: value of time.perf_counter() the timings are relative to (e.g. the start of the application; optional)
+        :param importBudget: duration an import should take at most (in seconds; slower imports are highlighted in the report)"""
+        super().__init__("profiler", settings = None, debug = False)
+        self.enabled = enabled
+        self.__startTime = startTime if startTime is not None else time.perf_counter()
+        self.__importBudget = importBudget
+        self.__lock = threading.Lock()
+        self.__phases: List[Tuple[str, float]] = []
+        self.__marks: List[Tuple[str, float]] = []
+        self.__imports: Dict[str, Tuple[float, float]] = {} # module -> (cumulative duration, self duration)
+        self.__importStack = threading.local()
+        self.__originalImport: Optional[Callable[..., Any]] = None
+        self.__originalImportModule: Optional[Callable[..., Any]] = None
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Context manager that records the duration of a startup phase.
+
+        :param name: name of the phase"""
+        if not self.enabled:
+            yield
+            return
+
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addPhase(name, time.perf_counter() - startTime)
+
+    def addPhase(self, name: str, duration: float) -> None:
+        """Records the duration of a startup phase that was measured elsewhere.
+
+        :param name: name of the phase
+        :param duration: duration of the phase (in seconds)"""
+        if self.enabled:
+            with self.__lock:
+                self.__phases.append((name, duration))
+
+    def mark(self, name: str) -> None:
+        """Records the point in time a milestone of the startup was reached (relative to the start time).
+
+        :param name: name of the milestone (e.g. "accepting alarms")"""
+        if self.enabled:
+            with self.__lock:
+                self.__marks.append((name, time.perf_counter() - self.__startTime))
+
+    def getPhases(self) -> List[Tuple[str, float]]:
+        with self.__lock:
+            return list(self.__phases)
+
+    def getImports(self) -> Dict[str, Tuple[float, float]]:
+        with self.__lock:
+            return dict(self.__imports)
+
+    def startImportTracking(self) -> None:
+        """Starts tracking the import times of all modules that are not yet imported."""
+        if not self.enabled or self.__originalImport is not None:
+            return
+
+        self.__originalImport = builtins.__import__
+        self.__originalImportModule = importlib.import_module
+        builtins.__import__ = self.__trackedImport
+        importlib.import_module = self.__trackedImportModule
+
+    def stopImportTracking(self) -> None:
+        """Stops tracking the import times (and restores the original import functions)."""
+        if self.__originalImport is not None:
+            builtins.__import__ = self.__originalImport
+            importlib.import_module = self.__originalImportModule # type: ignore
+            self.__originalImport = None
+            self.__originalImportModule = None
+
+    def __track(self, name: str, importFunction: Callable[[], Any]) -> Any:
+        if name in sys.modules:
+            return importFunction()
+
+        # nested imports are part of the cumulative duration but not of the self duration of the importing module
+        stack: List[float] = getattr(self.__importStack, "children", [])
+        self.__importStack.children = stack
+        stack.append(0.0)
+        startTime = time.perf_counter()
+        try:
+            return importFunction()
+        finally:
+            duration = time.perf_counter() - startTime
+            children = stack.pop()
+            if len(stack) > 0:
+                stack[-1] += duration
+            with self.__lock:
+                if name not in self.__imports:
+                    self.__imports[name] = (duration, duration - children)
+
+    def __trackedImport(self, name: str, globals: Any = None, locals: Any = None, fromlist: Any = (), level: int = 0) -> Any: #pylint: disable=redefined-builtin
+        originalImport = self.__originalImport
+        assert originalImport is not None
+        if level != 0: # relative imports are recorded as part of the importing module
+            return originalImport(name, globals, locals, fromlist, level)
+        return self.__track(name, lambda: originalImport(name, globals, locals, fromlist, level))
+
+    def __trackedImportModule(self, name: str, package: Optional[str] = None) -> Any:
+        originalImportModule = self.__originalImportModule
+        assert originalImportModule is not None
+        return self.__track(name, lambda: originalImportModule(name, package))
+
+    def report(self, limit: int = DEFAULT_REPORT_IMPORTS) -> None:
+        """Prints all recorded phases and milestones and the slowest imports.
+
+        :param limit: maximum number of imports that are printed"""
+        if not self.enabled:
+            return
+
+        with self.__lock:
+            phases = list(self.__phases)
+            marks = list(self.__marks)
+            imports = sorted(self.__imports.items(), key = lambda i: i[1][0], reverse = True)
+
+        self.clrPrint("Startup phases:")
+        for (name, duration) in phases:
+            self.print(f"  {duration * 1000.0:9.1f} ms  {name}")
+
+        for (name, timestamp) in marks:
+            self.clrPrint(f"Startup milestone after {timestamp * 1000.0:.1f} ms: {name}")
+
+        if len(imports) > 0:
+            self.clrPrint(f"Slowest imports (of {len(imports)} imported modules; cumulative / self):")
+            for (name, (cumulative, selfDuration)) in imports[:limit]:
+                message = f"  {cumulative * 1000.0:9.1f} ms {selfDuration * 1000.0:9.1f} ms  {name}"
+                if cumulative > self.__importBudget:
+                    self.error(f"{message} (exceeds import budget of {self.__importBudget * 1000.0:.0f} ms)")
+                else:
+                    self.print(message)
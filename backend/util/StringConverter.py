@@ -14,40 +14,35 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import re
+
 class StringConverter:
     """StringConverter provides helper functions to store multiline text in a single line (and restore it).
     It is used for CSV files, the configuration file and console output."""
 
+    # a backslash starts an escape sequence that is terminated by an 'n' (line break) or a backslash;
+    # other characters within an escape sequence are kept as they are (and a trailing escape sequence is ignored)
+    __ESCAPE_SEQUENCE = re.compile(r"\\([^n\\]*)(n|\\|\Z)")
+    __ESCAPED_CHARACTERS = {"n": "\n", "\\": "\\", "": ""}
+
+    @staticmethod
+    def __unescape(match: "re.Match[str]") -> str:
+        return match.group(1) + StringConverter.__ESCAPED_CHARACTERS[match.group(2)]
+
     @staticmethod
     def singleline2string(csvText: str) -> str:
-        dbText = ""
-        act = False
+        if "\\" not in csvText:
+            return csvText
 
-        for c in csvText:
-            if act is False and c == '\\':
-                act = True
-            elif act is True and c == 'n':
-                dbText += '\n'
-                act = False
-            elif act is True and c == '\\':
-                dbText += '\\'
-                act = False
-            else:
-                dbText += c
+        # fast path for texts that only contain the escape sequences created by string2singleline:
+        # splitting at escaped backslashes pairs the backslashes the same way as scanning from left to right
+        parts = csvText.split("\\\\")
+        if all(part.count("\\") == part.count("\\n") for part in parts):
+            return "\\".join([part.replace("\\n", "\n") for part in parts])
 
-        return dbText
+        return StringConverter.__ESCAPE_SEQUENCE.sub(StringConverter.__unescape, csvText)
 
 
     @staticmethod
     def string2singleline(dbText: str) -> str:
-        csvText = ""
-
-        for c in dbText:
-            if c == '\\':
-                csvText += '\\\\'
-            elif c == '\n':
-                csvText += '\\n'
-            else:
-                csvText += c
-
-        return csvText
+        return dbText.replace("\\", "\\\\").replace("\n", "\\n")
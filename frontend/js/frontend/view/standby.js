@@ -60,10 +60,6 @@ export default class StandbyView extends View {
             $('#header').text(this.dataHeader);
         });
 
-        this.frontend.registerSocketHandler('database_changed', (data) => {
-            // Ignored for now - we update alarm list and stats in becomesVisible()
-        });
-
         this.frontend.registerSocketHandler('calendar_changed', (data) => {
             this.log("Updating calendar... (backend event)");
             const timestamp = new Date();
@@ -82,7 +78,7 @@ export default class StandbyView extends View {
     }
 
     becomesVisible() {
-        this.alarmListWidget.update();
+        this.alarmListWidget.refresh(); // alarm list is updated incrementally (via database_changed)
         this.statsWidget.update();
     }
 
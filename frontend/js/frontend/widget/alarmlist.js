@@ -25,49 +25,124 @@ export default class AlarmListWidget extends ListWidget {
 
     constructor(frontend, view) {
         super(frontend, view, 'alarmevents');
+
+        this.alarmEvents = [];   // newest alarm events first
+        this.totalEvents = 0;
+        this.revision = null;    // null -> not yet synchronized with the backend
     }
 
     init() {
-        this.frontend.registerSocketHandler('last_alarm_events', (data) => {
-            //this.log("data: " + JSON.stringify(data));=
-            const totalEvents = data['total_events'];
-            //this.log("totalEvents: " + totalEvents);
-            const alarmEvents = jQuery.parseJSON(data['alarm_events']);
-            //this.log("alarmEvents: " + JSON.stringify(alarmEvents));
-
-            this.startListUpdate();
-
-            alarmEvents.forEach((alarmEvent) => {
-                // create a list entry
-                const alarmNumber = totalEvents - this.listEntryCount(); //alarmEvent.eventID;
-                const alarmDateTime = moment(alarmEvent.alarmTimestamp);
-                const alarmDateString = alarmDateTime.format(this.language.dateFormat + ' – ' + this.language.timeFormatLong);
-                const alarmDateWeekday = this.language.weekdays[alarmDateTime.day()];
-                let alarmText = '';
-
-                if(alarmEvent.flags == "VALID"){
-                    if(alarmEvent.event != "" && alarmEvent.location != ""){
-                        alarmText = alarmEvent.event + ', ' + alarmEvent.location;
-                    }else{ // either event or location is not set (print the other one only)
-                        alarmText = alarmEvent.event + alarmEvent.location;
-                    }
-                }else{
-                    alarmText = this.language.textAlarm;
-                }
+        this.frontend.registerSocketHandler('alarm_events', (data) => {
+            //this.log("data: " + JSON.stringify(data));
+            if('error' in data){
+                this.error("Failed to retrieve alarm events (" + data['error'] + ")");
+                return;
+            }
 
-                this.addListEntry('#' + alarmNumber + ' – ' + alarmDateWeekday + ', ' + alarmDateString, alarmText);
-            });
+            this.revision = data['revision'];
+            this.totalEvents = data['total_events'];
+            //this.log("totalEvents: " + this.totalEvents);
+            this.alarmEvents = data['alarm_events'];
+            //this.log("alarmEvents: " + JSON.stringify(this.alarmEvents));
 
-            if(this.listEntryCount() > 0){
-                this.finalizeListUpdate();
-            }else{
-                this.showMessage(this.language.textAlarmHistory, this.language.textNoAlarmEntries);
+            this._render();
+        });
+
+        this.frontend.registerSocketHandler('database_changed', (data) => {
+            const revision = data['revision'];
+
+            if(this.revision !== null && revision <= this.revision){
+                return; // change is already known
+            }
+
+            if(this.revision === null || revision != this.revision + 1 || data['alarm_event'] === null){
+                // at least one change was missed (or is unknown) -> resynchronize the whole alarm list
+                this.revision = null;
+                this.update();
+                return;
+            }
+
+            this.revision = revision;
+            if(this._applyChange(data['change'], data['alarm_event'])){
+                this._render();
             }
         });
     }
 
     update() {
-        this.frontend.socketSendParams('get_last_alarm_events', {count: this.settings.maxAlarmEvents});
+        // only the fields shown in the list are requested (e.g. without the raw message)
+        this.frontend.socketSendParams('get_alarm_events', {
+            limit: this.settings.maxAlarmEvents,
+            fields: ['alarmTimestamp', 'event', 'location', 'flags']
+        });
+    }
+
+    refresh() {
+        // the alarm list is kept up to date by database_changed events
+        // and has to be requested only if it is not yet synchronized
+        if(this.revision === null){
+            this.update();
+        }
+    }
+
+    _applyChange(change, alarmEvent) {
+        if(alarmEvent.flags == "BINARY"){
+            return false; // binary alarm events are not part of the alarm list
+        }
+
+        if(change == "added"){
+            this.totalEvents += 1;
+            this.alarmEvents.unshift(alarmEvent);
+            if(this.alarmEvents.length > this.settings.maxAlarmEvents){
+                this.alarmEvents.length = this.settings.maxAlarmEvents;
+            }
+            return true;
+        }
+
+        if(change == "updated"){
+            const index = this.alarmEvents.findIndex((e) => e.eventID == alarmEvent.eventID);
+            if(index >= 0){
+                this.alarmEvents[index] = alarmEvent;
+                return true;
+            }
+            return false; // updated alarm event is not shown
+        }
+
+        // unknown change -> resynchronize the whole alarm list
+        this.revision = null;
+        this.update();
+        return false;
+    }
+
+    _render() {
+        this.startListUpdate();
+
+        this.alarmEvents.forEach((alarmEvent) => {
+            // create a list entry
+            const alarmNumber = this.totalEvents - this.listEntryCount(); //alarmEvent.eventID;
+            const alarmDateTime = moment(alarmEvent.alarmTimestamp);
+            const alarmDateString = alarmDateTime.format(this.language.dateFormat + ' – ' + this.language.timeFormatLong);
+            const alarmDateWeekday = this.language.weekdays[alarmDateTime.day()];
+            let alarmText = '';
+
+            if(alarmEvent.flags == "VALID"){
+                if(alarmEvent.event != "" && alarmEvent.location != ""){
+                    alarmText = alarmEvent.event + ', ' + alarmEvent.location;
+                }else{ // either event or location is not set (print the other one only)
+                    alarmText = alarmEvent.event + alarmEvent.location;
+                }
+            }else{
+                alarmText = this.language.textAlarm;
+            }
+
+            this.addListEntry('#' + alarmNumber + ' – ' + alarmDateWeekday + ', ' + alarmDateString, alarmText);
+        });
+
+        if(this.listEntryCount() > 0){
+            this.finalizeListUpdate();
+        }else{
+            this.showMessage(this.language.textAlarmHistory, this.language.textNoAlarmEntries);
+        }
     }
 
 }
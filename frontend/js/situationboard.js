@@ -54,7 +54,7 @@ export default class Frontend {
 
         this.socket;
         this.latencyTimes = [];
-        this.latencyStartTime;
+        this.latencyStartTime = 0;
         this.avgLatency = 0;
 
         switch(this.settings.language){
@@ -120,6 +120,9 @@ export default class Frontend {
             this.log('Connected with ' + server);
 
             this.viewManager.connected();
+
+            // request the current state once (changes of the state are broadcast by the backend)
+            this.requestState();
         });
 
         this.socket.on('disconnect', () => {
@@ -142,21 +145,25 @@ export default class Frontend {
                 this.sourceState = SourceState.ERROR;
             }
 
-            const latency = (new Date).getTime() - this.latencyStartTime;
-            this.latencyTimes.push(latency);
-            this.latencyTimes = this.latencyTimes.slice(-30); // keep last 30 samples to calculate average
-            let sum = 0;
-            for(let i = 0; i < this.latencyTimes.length; i++){
-                sum += this.latencyTimes[i];
+            if(this.latencyStartTime != 0){
+                // only answers to our own requests are used to measure the latency (and not broadcast state changes)
+                const latency = (new Date).getTime() - this.latencyStartTime;
+                this.latencyStartTime = 0;
+                this.latencyTimes.push(latency);
+                this.latencyTimes = this.latencyTimes.slice(-30); // keep last 30 samples to calculate average
+                let sum = 0;
+                for(let i = 0; i < this.latencyTimes.length; i++){
+                    sum += this.latencyTimes[i];
+                }
+                this.avgLatency = Math.round(10 * sum / this.latencyTimes.length) / 10;
             }
-            this.avgLatency = Math.round(10 * sum / this.latencyTimes.length) / 10;
         });
 
         // set timer for state handler
+        // (changes of the state are pushed by the backend; the request only measures the latency and catches up on missed changes)
         window.setInterval(() => {
-            this.latencyStartTime = (new Date).getTime();
-            this.socketSend('get_state');
-        }, 500);
+            this.requestState();
+        }, 10000);
 
         this.viewManager.init();
         this.standbyView.show();
@@ -172,6 +179,11 @@ export default class Frontend {
         }
     }
 
+    requestState() {
+        this.latencyStartTime = (new Date).getTime();
+        this.socketSend('get_state');
+    }
+
     registerSocketHandler(name, handler) {
         this.socket.on(name, handler);
     }
@@ -0,0 +1,171 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import time
+import datetime
+import threading
+
+from typing import Any, Dict, List, Optional, Set
+
+class _FakeStateMachine:
+
+    def __init__(self, fakeGammu: 'FakeGammu') -> None:
+        self.__fake = fakeGammu
+
+    def __call(self, name: str) -> None:
+        with self.__fake.lock:
+            self.__fake.calls.append(name)
+            self.__fake.callers.add(threading.current_thread())
+        time.sleep(self.__fake.delay) # simulated serial port I/O
+
+    def ReadConfig(self, Filename: str = "") -> None: #pylint: disable=invalid-name
+        self.__call("ReadConfig")
+
+    def Init(self) -> None: #pylint: disable=invalid-name
+        self.__call("Init")
+
+    def GetSMSStatus(self) -> Dict[str, int]: #pylint: disable=invalid-name
+        self.__call("GetSMSStatus")
+        with self.__fake.lock:
+            if self.__fake.statusFailures > 0:
+                self.__fake.statusFailures -= 1
+                raise FakeGammu.ERR_UNKNOWN()
+            return {'SIMUsed': len(self.__fake.stored), 'PhoneUsed': 0, 'TemplatesUsed': 0}
+
+    def GetNextSMS(self, Folder: int = 0, Start: bool = False, Location: int = 0) -> List[Dict[str, Any]]: #pylint: disable=invalid-name
+        self.__call("GetNextSMS")
+        with self.__fake.lock:
+            locations = sorted(self.__fake.stored.keys())
+            if not Start:
+                locations = [loc for loc in locations if loc > Location]
+            if len(locations) == 0:
+                raise FakeGammu.ERR_EMPTY()
+            return [self.__fake.stored[locations[0]]]
+
+    def DeleteSMS(self, Folder: int = 0, Location: int = 0) -> None: #pylint: disable=invalid-name
+        self.__call("DeleteSMS")
+        with self.__fake.lock:
+            if self.__fake.deleteFailures > 0:
+                self.__fake.deleteFailures -= 1
+                raise FakeGammu.ERR_UNKNOWN()
+            del self.__fake.stored[Location]
+
+    def GetNetworkInfo(self) -> Dict[str, str]: #pylint: disable=invalid-name
+        self.__call("GetNetworkInfo")
+        with self.__fake.lock:
+            return {'NetworkCode': self.__fake.networkCode, 'NetworkName': ""}
+
+    def GetSignalQuality(self) -> Dict[str, int]: #pylint: disable=invalid-name
+        self.__call("GetSignalQuality")
+        return {'SignalStrength': -60, 'SignalPercent': 70, 'BitErrorRate': -1}
+
+class FakeGammu:
+    """Scriptable replacement for the gammu module (as far as it is used by the SMS source).
+    Tests store received (multipart) SMS with receive and change the network reception with setNetwork.
+    All calls of the state machine are recorded and can be slowed down to simulate a slow modem
+    (or fail to simulate a modem that does not delete SMS or fails to report its status)."""
+
+    class ERR_EMPTY(Exception): #pylint: disable=invalid-name
+        pass
+
+    class ERR_CANTOPENFILE(Exception): #pylint: disable=invalid-name
+        pass
+
+    class ERR_DEVICENOTEXIST(Exception): #pylint: disable=invalid-name
+        pass
+
+    class ERR_UNKNOWN(Exception): #pylint: disable=invalid-name
+        pass
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.calls: List[str] = []
+        self.callers: Set[threading.Thread] = set() # threads that called the state machine
+        self.stored: Dict[int, Dict[str, Any]] = {}
+        self.networkCode = "262 01"
+        self.deleteFailures = 0 # number of failing DeleteSMS calls
+        self.statusFailures = 0 # number of failing GetSMSStatus calls
+        self.__nextLocation = 1
+        self.__nextID = 1
+
+    def StateMachine(self) -> _FakeStateMachine: #pylint: disable=invalid-name
+        return _FakeStateMachine(self)
+
+    def receive(self, sender: str, text: str, *, timestamp: Optional[datetime.datetime] = None,
+                parts: int = 1, partNumbers: Optional[List[int]] = None) -> None:
+        """Stores a received SMS on the fake modem.
+        Long texts can be split into multiple parts (of which only a subset may be stored).
+
+        :param sender: phone number of the sender
+        :param text: text of the (complete) message
+        :param timestamp: time of the reception (now if not specified)
+        :param parts: number of parts the message is split into
+        :param partNumbers: numbers of the parts that are stored (all parts if not specified)"""
+        if timestamp is None:
+            timestamp = datetime.datetime.now().replace(microsecond=0)
+
+        size = -(-len(text) // parts)
+        with self.lock:
+            messageID = self.__nextID
+            self.__nextID += 1
+            for partNumber in (partNumbers if partNumbers is not None else range(1, parts + 1)):
+                udh = {'AllParts': parts, 'ID8bit': messageID if parts > 1 else -1, 'PartNumber': partNumber if parts > 1 else -1}
+                self.stored[self.__nextLocation] = {
+                    'Location': self.__nextLocation,
+                    'DateTime': timestamp,
+                    'Number': sender,
+                    'Text': text[(partNumber - 1) * size:partNumber * size],
+                    'UDH': udh,
+                }
+                self.__nextLocation += 1
+
+    def setNetwork(self, networkCode: str) -> None:
+        """Changes the network reception of the fake modem (an empty network code means no reception)."""
+        with self.lock:
+            self.networkCode = networkCode
+
+    def getCalls(self, name: str) -> int:
+        with self.lock:
+            return self.calls.count(name)
+
+    @staticmethod
+    def LinkSMS(sms: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]: #pylint: disable=invalid-name
+        linked: List[List[Dict[str, Any]]] = []
+        multipart: Dict[Any, List[Dict[str, Any]]] = {}
+        for entries in sms:
+            for entry in entries:
+                udh = entry['UDH']
+                if udh['AllParts'] <= 1:
+                    linked.append([entry])
+                else:
+                    key = (entry['Number'], udh['ID8bit'])
+                    if key not in multipart:
+                        multipart[key] = []
+                        linked.append(multipart[key])
+                    multipart[key].append(entry)
+
+        for parts in multipart.values():
+            parts.sort(key = lambda entry: entry['UDH']['PartNumber'])
+
+        return linked
+
+    @staticmethod
+    def DecodeSMS(parts: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]: #pylint: disable=invalid-name
+        if len(parts) <= 1:
+            return None
+
+        return {'Entries': [{'ID': 'ConcatenatedTextLong', 'Buffer': "".join(part['Text'] for part in parts)}]}
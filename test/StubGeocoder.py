@@ -0,0 +1,50 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import time
+import threading
+
+from typing import Dict, List, Optional, Tuple
+
+class StubLocation: #pylint: disable=too-few-public-methods
+    """Location as returned by the geocoders of geopy."""
+
+    def __init__(self, address: str, latitude: float, longitude: float) -> None:
+        self.address = address
+        self.latitude = latitude
+        self.longitude = longitude
+
+class StubGeocoder: #pylint: disable=too-few-public-methods
+    """Local replacement of a geopy geocoder (like Nominatim) that resolves a fixed set of addresses
+    after a simulated network delay and records all requests."""
+
+    def __init__(self, addresses: Dict[str, Tuple[float, float]], delay: float = 0.0) -> None:
+        self.addresses = addresses
+        self.delay = delay
+        self.requests: List[str] = []
+        self.error: Optional[Exception] = None # raised by geocode (e.g. to simulate network issues)
+        self.lock = threading.Lock()
+
+    def geocode(self, query: str) -> Optional[StubLocation]:
+        with self.lock:
+            self.requests.append(query)
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        if query not in self.addresses:
+            return None
+        (latitude, longitude) = self.addresses[query]
+        return StubLocation(query, latitude, longitude)
@@ -0,0 +1,100 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import ssl
+import time
+import socket
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List
+
+class _StubHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1" # keep-alive
+
+    def setup(self) -> None:
+        super().setup()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # headers and body are written separately
+        server: StubHTTPSServer = self.server # type: ignore
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.connectDelay) # simulated round trips of the TLS handshake
+
+    def do_GET(self) -> None: #pylint: disable=invalid-name
+        server: StubHTTPSServer = self.server # type: ignore
+        server.responding.wait()
+        time.sleep(server.requestDelay) # simulated round trip of the request
+        with server.lock:
+            server.requests.append(self.path)
+            failure = server.failures > 0
+            if failure:
+                server.failures -= 1
+        body = b'{"status": "error"}' if failure else b'{"status": "ok"}'
+        self.send_response(server.failureStatus if failure else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None: #pylint: disable=redefined-builtin
+        pass
+
+class StubHTTPSServer(ThreadingHTTPServer):
+    """Local HTTPS server (with a self-signed certificate for localhost) that answers all GET requests with a JSON response.
+    It records all requests and the number of connections and can simulate network latency
+    as well as a number of failed requests (answered with status 503 by default).
+    Requests are held back while responding is cleared."""
+
+    CERTIFICATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "stub_https.pem")
+
+    daemon_threads = True
+
+    def __init__(self, connectDelay: float = 0.0, requestDelay: float = 0.0) -> None:
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.connectDelay = connectDelay
+        self.requestDelay = requestDelay
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests: List[str] = []
+        self.failures = 0
+        self.failureStatus = 503
+        self.responding = threading.Event()
+        self.responding.set()
+
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(StubHTTPSServer.CERTIFICATE)
+        # the handshake is performed by the handler threads (not by the accepting thread)
+        self.socket = context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return int(self.server_address[1])
+
+    @staticmethod
+    def clientContext() -> ssl.SSLContext:
+        """Returns a client SSL context that trusts the certificate of the stub server."""
+        return ssl.create_default_context(cafile=StubHTTPSServer.CERTIFICATE)
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self.__thread.join()
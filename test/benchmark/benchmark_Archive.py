@@ -0,0 +1,86 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Compares the file size and the import/export throughput of the binary columnar archive with the CSV file format.
+
+Run it from the repository root with: python -m test.benchmark.benchmark_Archive [-a ALARMS]"""
+
+import os
+import time
+import argparse
+
+from typing import Callable
+
+from test.benchmark.benchmark_CSVImport import writeCSV
+
+from backend.data.CSVImporter import CSVImporter
+from backend.data.CSVExporter import CSVExporter
+from backend.data.ArchiveImporter import ArchiveImporter
+from backend.data.ArchiveExporter import ArchiveExporter
+from backend.data.Database import Database
+from backend.util.AppInfo import AppInfo
+from backend.util.Module import Module
+
+def measure(operation: Callable[[], int]) -> float:
+    startTime = time.perf_counter()
+    result = operation()
+    duration = time.perf_counter() - startTime
+    assert(result == 0)
+    return duration
+
+def measureImport(databaseFilename: str, importer: Callable[[Database], int]) -> float:
+    database = Database(databaseFilename, reset = True, commit = False)
+    duration = measure(lambda: importer(database))
+    database.close()
+    return duration
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Archive benchmark")
+    parser.add_argument("-a", "--alarms", help="number of alarm events in the database", default=200000, type=int)
+    args = parser.parse_args()
+
+    Module.PLAIN_TEXT_OUTPUT = True
+
+    appInfo = AppInfo()
+    inFilename = os.path.join(appInfo.path, ".temp/benchmark_archive_in.csv")
+    csvFilename = os.path.join(appInfo.path, ".temp/benchmark_archive_out.csv")
+    archiveFilename = os.path.join(appInfo.path, ".temp/benchmark_archive_out.sbarchive")
+    databaseFilename = os.path.join(appInfo.path, ".temp/benchmark_archive.sqlite")
+    os.makedirs(os.path.dirname(inFilename), exist_ok=True)
+    writeCSV(inFilename, args.alarms)
+
+    database = Database(databaseFilename, reset = True, commit = False)
+    CSVImporter(database).importEvents(inFilename)
+    database.commit()
+    csvExport = measure(lambda: CSVExporter(database).exportEvents(csvFilename))
+    archiveExport = measure(lambda: ArchiveExporter(database).exportEvents(archiveFilename))
+    database.close()
+
+    csvImport = measureImport(databaseFilename, lambda d: CSVImporter(d).importEvents(csvFilename))
+    archiveImport = measureImport(databaseFilename, lambda d: ArchiveImporter(d).importEvents(archiveFilename))
+
+    csvSize = os.path.getsize(csvFilename) / (1024.0 * 1024.0)
+    archiveSize = os.path.getsize(archiveFilename) / (1024.0 * 1024.0)
+
+    print(f"alarm events:                    {args.alarms}")
+    print(f"file size:                       CSV {csvSize:.1f} MiB, archive {archiveSize:.1f} MiB")
+    print(f"CSV export:                      {csvExport:.1f} s ({args.alarms / csvExport:.0f} events/s)")
+    print(f"archive export:                  {archiveExport:.1f} s ({args.alarms / archiveExport:.0f} events/s)")
+    print(f"CSV import:                      {csvImport:.1f} s ({args.alarms / csvImport:.0f} events/s)")
+    print(f"archive import:                  {archiveImport:.1f} s ({args.alarms / archiveImport:.0f} events/s)")
+
+if __name__ == "__main__":
+    main()
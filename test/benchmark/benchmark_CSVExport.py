@@ -0,0 +1,106 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Measures the throughput and the memory consumption of exporting a large database into a CSV file.
+
+The previous implementation (loading all alarm events into a list before writing them)
+is compared to the streaming export that writes the alarm events while they are read from the database.
+Run it from the repository root with: python -m test.benchmark.benchmark_CSVExport [-a ALARMS]"""
+
+import os
+import csv
+import time
+import argparse
+import datetime
+import tracemalloc
+
+from typing import Callable, Tuple
+
+from test.benchmark.benchmark_CSVImport import writeCSV
+
+from backend.data.CSVCommon import CSVCommon
+from backend.data.CSVImporter import CSVImporter
+from backend.data.CSVExporter import CSVExporter
+from backend.data.Database import Database
+from backend.util.AppInfo import AppInfo
+from backend.util.Module import Module
+
+def exportList(database: Database, filename: str) -> None:
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter=";", quotechar="\"", doublequote=True)
+        for alarm in database.getEvents(textOnly = False):
+            line = [""] * CSVCommon.TOTAL_COLS
+            line[CSVCommon.COL_TIMESTAMP]         = datetime.datetime.strptime(alarm.timestamp, CSVCommon.TIMESTAMP_FORMAT_EXTERNAL).strftime(CSVCommon.TIMESTAMP_FORMAT_EXTERNAL)
+            line[CSVCommon.COL_EVENT]             = CSVCommon.db2csvText(alarm.event)
+            line[CSVCommon.COL_EVENTDETAILS]      = CSVCommon.db2csvText(alarm.eventDetails)
+            line[CSVCommon.COL_LOCATION]          = CSVCommon.db2csvText(alarm.location)
+            line[CSVCommon.COL_LOCATIONDETAILS]   = CSVCommon.db2csvText(alarm.locationDetails)
+            line[CSVCommon.COL_COMMENT]           = CSVCommon.db2csvText(alarm.comment)
+            line[CSVCommon.COL_ALARMTIMESTAMP]    = datetime.datetime.strptime(alarm.alarmTimestamp, CSVCommon.TIMESTAMP_FORMAT_EXTERNAL).strftime(CSVCommon.TIMESTAMP_FORMAT_EXTERNAL)
+            line[CSVCommon.COL_LOCATIONLATITUDE]  = str(alarm.locationLatitude)
+            line[CSVCommon.COL_LOCATIONLONGITUDE] = str(alarm.locationLongitude)
+            line[CSVCommon.COL_SOURCE]            = CSVCommon.db2csvText(alarm.source)
+            line[CSVCommon.COL_SENDER]            = CSVCommon.db2csvText(alarm.sender)
+            line[CSVCommon.COL_RAW]               = CSVCommon.db2csvText(alarm.raw)
+            line[CSVCommon.COL_FLAGS]             = CSVCommon.db2csvText(alarm.flags)
+            writer.writerow(line)
+
+def exportStreaming(database: Database, filename: str) -> None:
+    CSVExporter(database).exportEvents(filename, printHeader = False)
+
+def measure(exporter: Callable[[], None]) -> Tuple[float, float]:
+    # the duration is measured without tracing memory allocations (which slows down the export considerably)
+    startTime = time.perf_counter()
+    exporter()
+    duration = time.perf_counter() - startTime
+
+    tracemalloc.start()
+    exporter()
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (duration, peak / (1024.0 * 1024.0))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CSV export benchmark")
+    parser.add_argument("-a", "--alarms", help="number of alarm events in the database", default=200000, type=int)
+    args = parser.parse_args()
+
+    Module.PLAIN_TEXT_OUTPUT = True
+
+    appInfo = AppInfo()
+    csvFilename = os.path.join(appInfo.path, ".temp/benchmark_export_in.csv")
+    outFilename = os.path.join(appInfo.path, ".temp/benchmark_export_out.csv")
+    databaseFilename = os.path.join(appInfo.path, ".temp/benchmark_export.sqlite")
+    os.makedirs(os.path.dirname(csvFilename), exist_ok=True)
+    writeCSV(csvFilename, args.alarms)
+
+    database = Database(databaseFilename, reset = True, commit = False)
+    CSVImporter(database).importEvents(csvFilename)
+    database.commit()
+
+    (durationOld, peakOld) = measure(lambda: exportList(database, outFilename))
+    (durationNew, peakNew) = measure(lambda: exportStreaming(database, outFilename))
+
+    database.close()
+
+    print(f"alarm events:                    {args.alarms}")
+    print(f"list based export:               {durationOld:.1f} s ({args.alarms / durationOld:.0f} events/s, peak {peakOld:.1f} MiB)")
+    print(f"streaming export:                {durationNew:.1f} s ({args.alarms / durationNew:.0f} events/s, peak {peakNew:.1f} MiB)")
+
+if __name__ == "__main__":
+    main()
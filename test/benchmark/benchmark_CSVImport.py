@@ -0,0 +1,114 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Measures the throughput and the memory consumption of importing a large CSV file into the database.
+
+The previous implementation (reading the whole file into a list and adding the alarm events one after another)
+is compared to the streaming import that inserts the alarm events in chunks.
+Run it from the repository root with: python -m test.benchmark.benchmark_CSVImport [-a ALARMS]"""
+
+import os
+import csv
+import time
+import datetime
+import argparse
+import tracemalloc
+
+from typing import Callable, Tuple
+
+from backend.data.CSVCommon import CSVCommon
+from backend.data.CSVImporter import CSVImporter
+from backend.data.Database import Database
+from backend.event.AlarmEvent import AlarmEvent
+from backend.util.AppInfo import AppInfo
+from backend.util.Module import Module
+
+def writeCSV(filename: str, alarms: int) -> None:
+    start = datetime.datetime(2010, 1, 1)
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter=";", quotechar="\"", doublequote=True)
+        writer.writerow(["Header"] * CSVCommon.TOTAL_COLS)
+        for i in range(alarms):
+            timestamp = (start + datetime.timedelta(minutes = 37 * i)).strftime(CSVCommon.TIMESTAMP_FORMAT_EXTERNAL)
+            writer.writerow([timestamp, f"B{i % 5}", "Brand Wohnhaus", f"Musterstraße {i % 200}", "Musterdorf", "",
+                             timestamp, "48.1", "11.5", "SMS", "112", f"raw message {i}", AlarmEvent.FLAGS_VALID])
+
+def importPerEvent(database: Database, filename: str) -> None:
+    with open(filename, 'r') as f:
+        alarmList = list(csv.reader(f, delimiter=";", quotechar="\"", doublequote=True))
+
+    for alarm in alarmList[1:]:
+        alarmEvent = AlarmEvent()
+        alarmEvent.timestamp         = CSVCommon.csv2dbTimestamp(alarm[CSVCommon.COL_TIMESTAMP])
+        alarmEvent.event             = CSVCommon.csv2dbText(alarm[CSVCommon.COL_EVENT])
+        alarmEvent.eventDetails      = CSVCommon.csv2dbText(alarm[CSVCommon.COL_EVENTDETAILS])
+        alarmEvent.location          = CSVCommon.csv2dbText(alarm[CSVCommon.COL_LOCATION])
+        alarmEvent.locationDetails   = CSVCommon.csv2dbText(alarm[CSVCommon.COL_LOCATIONDETAILS])
+        alarmEvent.comment           = CSVCommon.csv2dbText(alarm[CSVCommon.COL_COMMENT])
+        alarmEvent.alarmTimestamp    = CSVCommon.csv2dbTimestamp(alarm[CSVCommon.COL_ALARMTIMESTAMP])
+        alarmEvent.locationLatitude  = float(alarm[CSVCommon.COL_LOCATIONLATITUDE])
+        alarmEvent.locationLongitude = float(alarm[CSVCommon.COL_LOCATIONLONGITUDE])
+        alarmEvent.source            = CSVCommon.csv2dbText(alarm[CSVCommon.COL_SOURCE])
+        alarmEvent.sender            = CSVCommon.csv2dbText(alarm[CSVCommon.COL_SENDER])
+        alarmEvent.raw               = CSVCommon.csv2dbText(alarm[CSVCommon.COL_RAW])
+        alarmEvent.flags             = CSVCommon.csv2dbText(alarm[CSVCommon.COL_FLAGS])
+        database.addEvent(alarmEvent, verbose = False)
+
+def importStreaming(database: Database, filename: str) -> None:
+    CSVImporter(database).importEvents(filename)
+
+def measure(databaseFilename: str, importer: Callable[[Database], None]) -> Tuple[float, float]:
+    # the duration is measured without tracing memory allocations (which slows down the import considerably)
+    database = Database(databaseFilename, reset = True, commit = False)
+    startTime = time.perf_counter()
+    importer(database)
+    database.commit()
+    duration = time.perf_counter() - startTime
+    database.close()
+
+    database = Database(databaseFilename, reset = True, commit = False)
+    tracemalloc.start()
+    importer(database)
+    database.commit()
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    database.close()
+
+    return (duration, peak / (1024.0 * 1024.0))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CSV import benchmark")
+    parser.add_argument("-a", "--alarms", help="number of alarm events in the CSV file", default=200000, type=int)
+    args = parser.parse_args()
+
+    Module.PLAIN_TEXT_OUTPUT = True
+
+    appInfo = AppInfo()
+    csvFilename = os.path.join(appInfo.path, ".temp/benchmark_import.csv")
+    databaseFilename = os.path.join(appInfo.path, ".temp/benchmark_import.sqlite")
+    os.makedirs(os.path.dirname(csvFilename), exist_ok=True)
+    writeCSV(csvFilename, args.alarms)
+
+    (durationOld, peakOld) = measure(databaseFilename, lambda database: importPerEvent(database, csvFilename))
+    (durationNew, peakNew) = measure(databaseFilename, lambda database: importStreaming(database, csvFilename))
+
+    print(f"alarm events:                    {args.alarms}")
+    print(f"per event import:                {durationOld:.1f} s ({args.alarms / durationOld:.0f} events/s, peak {peakOld:.1f} MiB)")
+    print(f"streaming import:                {durationNew:.1f} s ({args.alarms / durationNew:.0f} events/s, peak {peakNew:.1f} MiB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Measures the latency between the arrival of an alarm at a SourceDriver and its handling by the Action plugins.
+
+Alarms are triggered via SIGALRM of the SourceDriverDummy while the event loop of the backend runs in a separate thread.
+Run it from the repository root with: python -m test.benchmark.benchmark_EventLoop [-n ITERATIONS]"""
+
+import os
+import sys
+import time
+import shutil
+import signal
+import argparse
+import threading
+import statistics
+
+from typing import List
+
+from SituationBoard import SituationBoardBackend
+from backend.data.Database import Database
+from backend.event.SourceEvent import SourceEvent
+from backend.util.AppInfo import AppInfo
+from backend.util.Settings import Settings
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Event loop latency benchmark")
+    parser.add_argument("-n", "--iterations", help="number of alarms",                        default=100, type=int)
+    parser.add_argument("-l", "--loop",       help="loop_sleep_duration (in seconds)",         default=1.0, type=float)
+    parser.add_argument("-p", "--pause",      help="pause between two alarms (in seconds)",    default=0.05, type=float)
+    args = parser.parse_args()
+
+    appInfo = AppInfo()
+    settingsFilenameOrig = os.path.join(appInfo.path, "misc/setup/situationboard_default.conf")
+    settingsFilename = os.path.join(appInfo.path, ".temp/benchmark.conf")
+    databaseFilename = os.path.join(appInfo.path, ".temp/benchmark.sqlite")
+    os.makedirs(os.path.dirname(settingsFilename), exist_ok=True)
+    shutil.copy(settingsFilenameOrig, settingsFilename)
+
+    settings = Settings(settingsFilename, appInfo.path)
+    settings.setString(Settings.SECTION_BACKEND, "sources", "dummy")
+    settings.setString(Settings.SECTION_BACKEND, "actions", "update_database,update_frontend")
+    settings.setFloat(Settings.SECTION_BACKEND, "loop_sleep_duration", args.loop)
+
+    database = Database(databaseFilename, reset = True)
+
+    backend = SituationBoardBackend(appInfo, settings, database)
+    backend.pluginManager.initPlugins()
+    backend.webSocket.init(backend.pluginManager)
+
+    handled = threading.Event()
+    handledTimes: List[float] = []
+    handleEvent = backend.pluginManager.handleEvent
+
+    def timedHandleEvent(sourceEvent: SourceEvent) -> None:
+        handleEvent(sourceEvent)
+        handledTimes.append(time.perf_counter())
+        handled.set()
+
+    setattr(backend.pluginManager, "handleEvent", timedHandleEvent)
+
+    def triggerAlarms() -> None:
+        time.sleep(args.pause)
+
+        latencies: List[float] = []
+        for _ in range(args.iterations):
+            handled.clear()
+            triggerTime = time.perf_counter()
+            os.kill(os.getpid(), signal.SIGALRM)
+            if not handled.wait(10.0 + args.loop):
+                print("Alarm was not handled in time", file=sys.stderr)
+                break
+            latencies.append((handledTimes[-1] - triggerTime) * 1000.0)
+            time.sleep(args.pause)
+
+        if len(latencies) > 0:
+            print(f"alarms:              {len(latencies)}")
+            print(f"loop_sleep_duration: {args.loop:.3f} s")
+            print(f"latency p50:         {statistics.median(latencies):.3f} ms")
+            print(f"latency p99:         {percentile(latencies, 99.0):.3f} ms")
+            print(f"latency max:         {max(latencies):.3f} ms")
+
+        # the backend terminates on SIGTERM (the database is committed and closed automatically)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    # signals are handled by the main thread which therefore has to run the event loop
+    # (just like the database, which may only be used by the thread that created it)
+    triggerThread = threading.Thread(target=triggerAlarms, daemon=True)
+    triggerThread.start()
+    backend.backgroundTask()
+
+if __name__ == "__main__":
+    main()
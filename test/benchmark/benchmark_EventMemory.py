@@ -0,0 +1,132 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Measures the memory consumption and the duration of loading a large number of alarm events from the database.
+
+The previous representation (dict based events that are initialized attribute by attribute from the rows of the cursor)
+is compared to the slotted AlarmEvents that are created directly by the row factory of the cursor.
+Run it from the repository root with: python -m test.benchmark.benchmark_EventMemory [-a ALARMS]"""
+
+import os
+import gc
+import time
+import argparse
+import sqlite3
+import tracemalloc
+
+from typing import Any, Callable, List, Tuple
+
+from test.benchmark.benchmark_CSVImport import writeCSV
+
+from backend.data.CSVImporter import CSVImporter
+from backend.data.Database import Database
+from backend.util.AppInfo import AppInfo
+from backend.util.Module import Module
+
+class DictAlarmEvent: #pylint: disable=too-few-public-methods
+    """Previous dict based representation of AlarmEvents."""
+
+    def __init__(self, eventID: int = -1) -> None:
+        self.source            = ""
+        self.sender            = ""
+        self.raw               = ""
+        self.timestamp         = ""
+        self.eventID           = eventID
+        self.event             = ""
+        self.eventDetails      = ""
+        self.location          = ""
+        self.locationDetails   = ""
+        self.comment           = ""
+        self.alarmTimestamp    = ""
+        self.locationLatitude  = 0.0
+        self.locationLongitude = 0.0
+        self.flags             = ""
+
+def loadDictEvents(databaseFilename: str) -> List[Any]:
+    conn = sqlite3.connect(databaseFilename)
+    alarmEvents: List[Any] = []
+    for eventData in conn.execute("SELECT * FROM alarmevents ORDER BY id DESC").fetchall():
+        alarmEvent = DictAlarmEvent(eventData[0])
+        alarmEvent.timestamp         = eventData[1]
+        alarmEvent.event             = eventData[2]
+        alarmEvent.eventDetails      = eventData[3]
+        alarmEvent.location          = eventData[4]
+        alarmEvent.locationDetails   = eventData[5]
+        alarmEvent.comment           = eventData[6]
+        alarmEvent.alarmTimestamp    = eventData[7]
+        alarmEvent.locationLatitude  = eventData[8]
+        alarmEvent.locationLongitude = eventData[9]
+        alarmEvent.source            = eventData[10]
+        alarmEvent.sender            = eventData[11]
+        alarmEvent.raw               = eventData[12]
+        alarmEvent.flags             = eventData[13]
+        alarmEvents.append(alarmEvent)
+    conn.close()
+    return alarmEvents
+
+def measure(loader: Callable[[], List[Any]]) -> Tuple[float, float, float]:
+    # the duration is measured without tracing memory allocations (which slows down loading considerably)
+    gc.collect()
+    startTime = time.perf_counter()
+    alarmEvents = loader()
+    duration = time.perf_counter() - startTime
+    count = len(alarmEvents)
+    del alarmEvents
+
+    gc.collect()
+    tracemalloc.start()
+    alarmEvents = loader()
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del alarmEvents
+
+    # the memory that remains allocated is attributed to the loaded alarm events
+    return (duration, current / count, peak / (1024.0 * 1024.0))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="AlarmEvent memory benchmark")
+    parser.add_argument("-a", "--alarms", help="number of alarm events in the database", default=100000, type=int)
+    args = parser.parse_args()
+
+    Module.PLAIN_TEXT_OUTPUT = True
+
+    appInfo = AppInfo()
+    csvFilename = os.path.join(appInfo.path, ".temp/benchmark_memory.csv")
+    databaseFilename = os.path.join(appInfo.path, ".temp/benchmark_memory.sqlite")
+    os.makedirs(os.path.dirname(csvFilename), exist_ok=True)
+    writeCSV(csvFilename, args.alarms)
+
+    database = Database(databaseFilename, reset = True, commit = False)
+    CSVImporter(database).importEvents(csvFilename)
+    database.commit()
+
+    (durationOld, sizeOld, peakOld) = measure(lambda: loadDictEvents(databaseFilename))
+    (durationNew, sizeNew, peakNew) = measure(lambda: database.getLastEvents(args.alarms, textOnly = False))
+
+    startTime = time.perf_counter()
+    for alarmEvent in database.getLastEvents(args.alarms, textOnly = False):
+        alarmEvent.toJSON()
+    durationJSON = time.perf_counter() - startTime
+
+    database.close()
+
+    print(f"alarm events:                    {args.alarms}")
+    print(f"dict based events:               {durationOld:.2f} s, {sizeOld:.0f} bytes/event (peak {peakOld:.1f} MiB)")
+    print(f"slotted events (row factory):    {durationNew:.2f} s, {sizeNew:.0f} bytes/event (peak {peakNew:.1f} MiB)")
+    print(f"JSON encoding (slotted events):  {durationJSON:.2f} s (including loading)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Measures the loading time of a generated gazetteer and the time of exact, misspelled and unknown address searches.
+
+Run it from the repository root with: python -m test.benchmark.benchmark_Gazetteer [-s STREETS]"""
+
+import os
+import time
+import argparse
+import statistics
+
+from typing import Dict, List, Tuple
+
+from backend.data.Gazetteer import Gazetteer
+from backend.util.AppInfo import AppInfo
+
+SYLLABLES = ["berg", "tal", "wald", "feld", "bach", "hof", "linden", "eichen", "birken", "kirch", "mühl", "sonnen"]
+SUFFIXES  = ["straße", "weg", "gasse", "allee", "ring"]
+
+def generateGazetteer(filename: str, streets: int, houses: int) -> List[str]:
+    """Writes a gazetteer with unique street names (all in the same city).
+
+    :param filename: name of the gazetteer file
+    :param streets: number of streets
+    :param houses: number of houses per street
+    :return: list with the names of the streets"""
+    names: List[str] = []
+    combinations = len(SYLLABLES) * len(SYLLABLES) * len(SUFFIXES)
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write("city;street;housenumber;latitude;longitude\n")
+        for i in range(streets):
+            street = SYLLABLES[i % len(SYLLABLES)].capitalize() + SYLLABLES[i // len(SYLLABLES) % len(SYLLABLES)] + \
+                     SUFFIXES[i // len(SYLLABLES) // len(SYLLABLES) % len(SUFFIXES)]
+            if i >= combinations:
+                street = f"{'Obere ' * (i // combinations)}{street}"
+            names.append(street)
+            for house in range(1, houses + 1):
+                f.write(f"Musterdorf;{street};{house};{50.0 + i * 0.001};{12.0 + house * 0.0001}\n")
+    return names
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Gazetteer benchmark")
+    parser.add_argument("-s", "--streets", help="number of streets",          default=2000, type=int)
+    parser.add_argument("-H", "--houses",  help="number of houses per street", default=20,   type=int)
+    parser.add_argument("-q", "--queries", help="number of queries per kind",  default=200,  type=int)
+    args = parser.parse_args()
+
+    appInfo = AppInfo()
+    filename = os.path.join(appInfo.path, ".temp/benchmark_gazetteer.csv")
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    streets = generateGazetteer(filename, args.streets, args.houses)
+
+    startTime = time.perf_counter()
+    gazetteer = Gazetteer("benchmark", filename)
+    loadDuration = time.perf_counter() - startTime
+
+    queries: Dict[str, List[Tuple[str, str]]] = {"exact": [], "misspelled": [], "without city": [], "unknown": []}
+    for i in range(args.queries):
+        street = streets[i * 7919 % len(streets)]
+        house = i % args.houses + 1
+        queries["exact"].append(("Musterdorf", f"{street} {house}"))
+        queries["misspelled"].append(("Musterdorf", f"{street[:-2]}{street[-1]} {house}"))
+        queries["without city"].append(("", f"Musterdorf {street} {house}"))
+        queries["unknown"].append(("Musterdorf", f"Unbekannte Straße {house}"))
+
+    print(f"addresses:     {len(gazetteer)}")
+    print(f"load duration: {loadDuration:.2f} s")
+    print(f"{'query':<14} {'p50 ms':>8} {'max ms':>8}")
+    for (kind, searches) in queries.items():
+        durations: List[float] = []
+        for (location, locationDetails) in searches:
+            startTime = time.perf_counter()
+            gazetteer.search(location, locationDetails)
+            durations.append((time.perf_counter() - startTime) * 1000.0)
+        print(f"{kind:<14} {statistics.median(durations):>8.3f} {max(durations):>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Measures the time the search location action needs for cached and uncached addresses.
+
+The online geocoder is replaced by test/StubGeocoder.py with a simulated network delay.
+Run it from the repository root with: python -m test.benchmark.benchmark_GeocodeCache [-r ROUNDS]"""
+
+import os
+import time
+import shutil
+import argparse
+import statistics
+
+from typing import Dict, List, Tuple
+
+from test.StubGeocoder import StubGeocoder
+
+from backend.action.ActionSearchLocation import ActionSearchLocation
+from backend.data.Database import Database
+from backend.event.AlarmEvent import AlarmEvent
+from backend.util.AppInfo import AppInfo
+from backend.util.Settings import Settings
+
+def search(action: ActionSearchLocation, location: str, locationDetails: str) -> float:
+    alarmEvent = AlarmEvent()
+    alarmEvent.event = "Brand"
+    alarmEvent.location = location
+    alarmEvent.locationDetails = locationDetails
+    alarmEvent.flags = AlarmEvent.FLAGS_VALID
+
+    startTime = time.perf_counter()
+    action.handleEvent(alarmEvent)
+    return (time.perf_counter() - startTime) * 1000.0
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Geocode cache benchmark")
+    parser.add_argument("-a", "--addresses", help="number of different addresses",                      default=100,  type=int)
+    parser.add_argument("-r", "--rounds",    help="number of searches per address",                     default=20,   type=int)
+    parser.add_argument("-d", "--delay",     help="simulated delay of the online geocoder (in seconds)", default=0.02, type=float)
+    args = parser.parse_args()
+
+    appInfo = AppInfo()
+    settingsFilenameOrig = os.path.join(appInfo.path, "misc/setup/situationboard_default.conf")
+    settingsFilename = os.path.join(appInfo.path, ".temp/benchmark.conf")
+    databaseFilename = os.path.join(appInfo.path, ".temp/benchmark_geocode.sqlite")
+    os.makedirs(os.path.dirname(settingsFilename), exist_ok=True)
+    shutil.copy(settingsFilenameOrig, settingsFilename)
+
+    settings = Settings(settingsFilename, appInfo.path)
+    settings.setString("action:search_location", "geocoder", ActionSearchLocation.GEOCODER_NOMINATIM)
+    database = Database(databaseFilename, reset = True)
+
+    addresses: Dict[str, Tuple[float, float]] = {f"Musterdorf Hauptstraße {i}": (48.0 + i * 0.001, 11.0) for i in range(1, args.addresses + 1)}
+    geocoder = StubGeocoder(addresses, args.delay)
+    action = ActionSearchLocation("", settings, database, geocoder)
+
+    # the first round searches all addresses online (the following rounds are served by the cache)
+    misses: List[float] = []
+    hits: List[float] = []
+    for r in range(args.rounds):
+        for address in addresses:
+            (location, locationDetails) = address.split(" ", 1)
+            duration = search(action, location, locationDetails)
+            (misses if r == 0 else hits).append(duration)
+
+    database.commitAndClose()
+
+    print(f"addresses:              {args.addresses} ({args.rounds} searches each)")
+    print(f"simulated network:      {args.delay * 1000.0:.0f} ms")
+    print(f"online requests:        {len(geocoder.requests)}")
+    print(f"uncached search p50:    {statistics.median(misses):.3f} ms")
+    print(f"cached search p50:      {statistics.median(hits):.3f} ms")
+
+if __name__ == "__main__":
+    main()
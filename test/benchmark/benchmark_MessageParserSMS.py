@@ -0,0 +1,157 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Measures the throughput and the memory allocations of the different paths of the SMS message parser.
+
+The corpora of alarm, setting, unhandled and multipart messages are generated from the fixtures
+of test/test_MessageParserSMS.py (combined with realistic field values).
+Run it from the repository root with: python -m test.benchmark.benchmark_MessageParserSMS [-m MESSAGES]"""
+
+import os
+import ast
+import functools
+import time
+import random
+import shutil
+import argparse
+import datetime
+import itertools
+import contextlib
+import tracemalloc
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.event.SourceEvent import SourceEvent
+from backend.source.MessageParserSMS import MessageParserSMS
+from backend.util.AppInfo import AppInfo
+from backend.util.Settings import Settings
+
+ALARM_SENDER = "+49112" # alarm sender of the default configuration
+
+# messages are received after the merge duration of each other (unless a timestamp is given) so that they are not merged
+RECEPTION_TIMES = (datetime.datetime.now() + datetime.timedelta(seconds = 100 * i) for i in itertools.count())
+
+EVENTS    = ["B 2", "B 3 Person", "THL 1", "THL VU P", "RD 1", "ABC 2", "Brandmeldeanlage"]
+DETAILS   = ["Brand Wohnhaus", "Technische Hilfe / #T2719#klein#Straße reinigen", "Person in Notlage", "Rauchentwicklung"]
+LOCATIONS = ["Musterort - Mustergemeinde, Musterstraße 1", "Musterdorf, Hauptstr. 112", "Industriegebiet Musterstadt, Versandzentrum"]
+COMMENTS  = ["Längere Ölspur\nBeginn kurz vor Aussiedlerhof", "Anrufer vor Ort", "", "Zufahrt über Hof\nSchlüssel bei Nachbar\nHydrant defekt"]
+PROVIDER  = ["Ihr Guthaben beträgt 5,00 EUR.", "Willkommen im Netz", "Sie haben 2 Anrufe in Abwesenheit"]
+
+def loadFixtures() -> List[str]:
+    """Returns all SMS texts used as fixtures in test/test_MessageParserSMS.py."""
+    appInfo = AppInfo()
+    with open(os.path.join(appInfo.path, "test/test_MessageParserSMS.py"), 'r') as f:
+        tree = ast.parse(f.read())
+
+    fixtures: List[str] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+            if any(isinstance(t, ast.Name) and t.id.startswith("sms") for t in node.targets):
+                fixtures.append(node.value.value)
+    return fixtures
+
+def createParser(instanceName: str) -> MessageParserSMS:
+    appInfo = AppInfo()
+    settingsFilenameOrig = os.path.join(appInfo.path, "misc/setup/situationboard_default.conf")
+    settingsFilename = os.path.join(appInfo.path, ".temp/benchmark_parser.conf")
+    os.makedirs(os.path.dirname(settingsFilename), exist_ok=True)
+    shutil.copy(settingsFilenameOrig, settingsFilename)
+    return MessageParserSMS(instanceName, Settings(settingsFilename, appInfo.path))
+
+def newMessage(raw: str, sender: str = "112", timestamp: Optional[datetime.datetime] = None) -> SourceEvent:
+    sourceEvent = SourceEvent()
+    sourceEvent.source = SourceEvent.SOURCE_SMS
+    sourceEvent.sender = sender
+    sourceEvent.raw = raw
+    sourceEvent.timestamp = (timestamp or next(RECEPTION_TIMES)).strftime(SourceEvent.TIMESTAMP_FORMAT)
+    return sourceEvent
+
+def alarmMessage(rnd: random.Random) -> str:
+    alarmTime = datetime.datetime(2020, 1, 1) + datetime.timedelta(seconds = rnd.randrange(365 * 24 * 3600))
+    return "\n".join([rnd.choice(["SMS Alarm", "SMS Alarm ILS BA-FO"]),
+                      f"Alarmzeit: {alarmTime.strftime(MessageParserSMS.TIMESTAMP_FORMAT_LONG)}",
+                      f"EO: {rnd.choice(LOCATIONS)}",
+                      rnd.choice(DETAILS),
+                      f"STW: {rnd.choice(EVENTS)}",
+                      f"Bem: {rnd.choice(COMMENTS)}"])
+
+def generateCorpora(messages: int, seed: int = 112) -> Dict[str, List[List[SourceEvent]]]:
+    """Generates corpora for each parser path.
+    Each entry is a sequence of messages that is parsed in order (the messages of a sequence may be merged by the parser).
+
+    :param messages: number of messages per parser path
+    :param seed: seed of the random number generator
+    :return: dict that maps the parser path to the corresponding message sequences"""
+    rnd = random.Random(seed)
+    fixtures = loadFixtures()
+    now = datetime.datetime.now()
+
+    corpora: Dict[str, List[List[SourceEvent]]] = {"alarm": [], "alarm sender": [], "setting": [], "unhandled": [], "fixtures": [], "multipart (4 parts)": []}
+    for i in range(messages):
+        corpora["alarm"].append([newMessage(alarmMessage(rnd))])
+        corpora["alarm sender"].append([newMessage(rnd.choice(DETAILS), sender = ALARM_SENDER)])
+        corpora["setting"].append([newMessage(f"header=Freiwillige Feuerwehr {i}\n{rnd.choice(COMMENTS)}")])
+        corpora["unhandled"].append([newMessage(rnd.choice(PROVIDER))])
+        corpora["fixtures"].append([newMessage(fixtures[i % len(fixtures)])])
+
+        alarm = alarmMessage(rnd)
+        cuts = sorted(rnd.sample(range(len("SMS Alarm") + 1, len(alarm)), 3))
+        parts = [alarm[a:b] for (a, b) in zip([0] + cuts, cuts + [len(alarm)])]
+        corpora["multipart (4 parts)"].append([newMessage(part, timestamp = now) for part in parts])
+
+    return corpora
+
+def parseSequences(parser: MessageParserSMS, sequences: List[List[SourceEvent]]) -> None:
+    for sequence in sequences:
+        for sourceEvent in sequence:
+            # the source driver passes a copy of the raw message
+            parser.parseMessage(newCopy(sourceEvent))
+
+def newCopy(sourceEvent: SourceEvent) -> SourceEvent:
+    copy = SourceEvent()
+    copy.copyDataFrom(sourceEvent)
+    return copy
+
+def measure(operation: Callable[[], None]) -> Tuple[float, float]:
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        startTime = time.perf_counter()
+        operation()
+        duration = time.perf_counter() - startTime
+
+        tracemalloc.start()
+        operation()
+        (_, peak) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return (duration, peak / 1024.0)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SMS message parser benchmark")
+    parser.add_argument("-m", "--messages", help="number of messages per parser path", default=20000, type=int)
+    args = parser.parse_args()
+
+    messageParser = createParser("benchmark")
+    corpora = generateCorpora(args.messages)
+
+    # allocations are reported as the peak of the traced memory while parsing all messages of a parser path
+    print(f"{'parser path':<22} {'messages/s':>12} {'peak KiB':>10}")
+    for (path, sequences) in corpora.items():
+        messageCount = sum(len(sequence) for sequence in sequences)
+        (duration, peak) = measure(functools.partial(parseSequences, messageParser, sequences))
+        print(f"{path:<22} {messageCount / duration:>12.0f} {peak:>10.1f}")
+
+if __name__ == "__main__":
+    main()
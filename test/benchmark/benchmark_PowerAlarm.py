@@ -0,0 +1,107 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Measures the time until all PowerAlarm groups are notified of an alarm (using a local stub HTTPS server).
+
+The time includes queuing the messages in the outbox and their delivery by the background sender.
+The previous implementation (one new HTTPS connection per group, groups notified one after another)
+is compared to the pooled connections that are established in advance and used concurrently.
+Run it from the repository root with: python -m test.benchmark.benchmark_PowerAlarm [-n ITERATIONS]"""
+
+import os
+import time
+import shutil
+import argparse
+import statistics
+import http.client as HTTPClient
+
+from typing import List
+
+from test.StubHTTPSServer import StubHTTPSServer
+
+from backend.action.ActionSendMessagePowerAlarm import ActionSendMessagePowerAlarm
+from backend.event.AlarmEvent import AlarmEvent
+from backend.util.AppInfo import AppInfo
+from backend.util.Plugin import Plugin
+from backend.util.Settings import Settings
+
+GROUPS = ["NODETAILS", "REDUCED", "FULL", "TABLET"]
+
+def sendSequential(server: StubHTTPSServer, iteration: int) -> None:
+    for group in GROUPS:
+        connection = HTTPClient.HTTPSConnection("localhost", server.port, timeout=5, context=StubHTTPSServer.clientContext())
+        connection.connect()
+        connection.request("GET", f"/api/custom/?kuerzel={group}&text={iteration}")
+        connection.getresponse().read()
+        connection.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PowerAlarm notification benchmark")
+    parser.add_argument("-n", "--iterations", help="number of alarms",                                  default=20,   type=int)
+    parser.add_argument("-c", "--connect",    help="simulated delay of the TLS handshake (in seconds)", default=0.1,  type=float)
+    parser.add_argument("-r", "--request",    help="simulated delay of a request (in seconds)",         default=0.05, type=float)
+    args = parser.parse_args()
+
+    appInfo = AppInfo()
+    settingsFilenameOrig = os.path.join(appInfo.path, "misc/setup/situationboard_default.conf")
+    settingsFilename = os.path.join(appInfo.path, ".temp/benchmark.conf")
+    os.makedirs(os.path.dirname(settingsFilename), exist_ok=True)
+    shutil.copy(settingsFilenameOrig, settingsFilename)
+
+    server = StubHTTPSServer(args.connect, args.request)
+    server.start()
+
+    settings = Settings(settingsFilename, appInfo.path)
+    section = ActionSendMessagePowerAlarm.PLUGIN_TYPE + Plugin.NAME_SEPARATOR + "send_poweralarm"
+    settings.setString(section, "api_key", "NO_API_KEY")
+    for group in GROUPS:
+        settings.setString(section, f"api_group_{group.lower()}", group)
+    settings.setString(section, "api_url", "localhost")
+    settings.setInt(section, "api_port", server.port)
+    settings.setInt(section, "deduplication_duration", 0)
+    outboxFilename = os.path.join(appInfo.path, ".temp/benchmark_outbox.sqlite")
+    if os.path.exists(outboxFilename):
+        os.remove(outboxFilename)
+    settings.setString(section, "outbox_file", outboxFilename)
+
+    action = ActionSendMessagePowerAlarm("", settings, sslContext=StubHTTPSServer.clientContext())
+    action.handleCyclic() # waits for the connections established at startup
+
+    sequential: List[float] = []
+    for i in range(args.iterations):
+        startTime = time.perf_counter()
+        sendSequential(server, i)
+        sequential.append((time.perf_counter() - startTime) * 1000.0)
+
+    pooled: List[float] = []
+    for i in range(args.iterations):
+        alarmEvent = AlarmEvent()
+        alarmEvent.flags = AlarmEvent.FLAGS_VALID
+        alarmEvent.event = f"Alarm {i}"
+        startTime = time.perf_counter()
+        action.handleEvent(alarmEvent)
+        action.waitForDelivery(10.0)
+        pooled.append((time.perf_counter() - startTime) * 1000.0)
+
+    server.stop()
+
+    print(f"alarms:                          {args.iterations} ({len(GROUPS)} groups each)")
+    print(f"simulated handshake/request:     {args.connect * 1000.0:.0f} ms / {args.request * 1000.0:.0f} ms")
+    print(f"sequential new connections p50:  {statistics.median(sequential):.1f} ms")
+    print(f"concurrent pooled p50:           {statistics.median(pooled):.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Measures how long the event loop is blocked by the SMS source while the (simulated) modem is slow.
+
+The modem is replaced by test/FakeGammu.py with a delay per modem call.
+Run it from the repository root with: python -m test.benchmark.benchmark_SourceDriverSMS [-m MESSAGES]"""
+
+import os
+import time
+import shutil
+import argparse
+import threading
+import statistics
+
+from typing import List
+
+from test.FakeGammu import FakeGammu
+
+from backend.source.MessageParserSMS import MessageParserSMS
+from backend.source.SourceDriverSMS import SourceDriverSMS
+from backend.util.AppInfo import AppInfo
+from backend.util.EventQueue import EventQueue
+from backend.util.Settings import Settings
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SMS source latency benchmark")
+    parser.add_argument("-m", "--messages", help="number of received messages",                  default=20,  type=int)
+    parser.add_argument("-d", "--delay",    help="simulated delay of a modem call (in seconds)", default=0.2, type=float)
+    args = parser.parse_args()
+
+    appInfo = AppInfo()
+    settingsFilenameOrig = os.path.join(appInfo.path, "misc/setup/situationboard_default.conf")
+    settingsFilename = os.path.join(appInfo.path, ".temp/benchmark.conf")
+    os.makedirs(os.path.dirname(settingsFilename), exist_ok=True)
+    shutil.copy(settingsFilenameOrig, settingsFilename)
+
+    settings = Settings(settingsFilename, appInfo.path)
+    settings.setFloat("source:sms:benchmark", "poll_interval", 0.0)
+    settings.setFloat("source:sms:benchmark", "network_interval", 0.0)
+
+    fakeGammu = FakeGammu()
+    source = SourceDriverSMS("benchmark", settings, MessageParserSMS("benchmark", settings), backend = fakeGammu)
+    source.attachEventQueue(EventQueue(threading.Event()))
+    fakeGammu.delay = args.delay
+
+    # each iteration of the event loop retrieves an event and checks the source state
+    blocked: List[float] = []
+    received = 0
+    for i in range(args.messages):
+        fakeGammu.receive("123", f"message {i}")
+    deadline = time.monotonic() + args.messages * args.delay * 10.0 + 10.0
+    while received < args.messages and time.monotonic() < deadline:
+        startTime = time.perf_counter()
+        sourceEvent = source.retrieveEvent()
+        source.getSourceState()
+        blocked.append((time.perf_counter() - startTime) * 1000.0)
+        if sourceEvent is not None:
+            received += 1
+        time.sleep(0.01)
+
+    fakeGammu.delay = 0.0
+    source.stop(5.0)
+
+    print(f"received messages:       {received} of {args.messages}")
+    print(f"simulated modem call:    {args.delay * 1000.0:.0f} ms")
+    print(f"event loop blocked p50:  {statistics.median(blocked):.3f} ms")
+    print(f"event loop blocked max:  {max(blocked):.3f} ms")
+
+if __name__ == "__main__":
+    main()
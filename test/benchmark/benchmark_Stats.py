@@ -0,0 +1,107 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Measures the duration of retrieving the alarm statistics (total, year, month, today) from a large database.
+
+The previous implementation (counting all alarm events with strftime for every timespan)
+is compared to the lookup in the statistics table that is maintained by the database.
+Run it from the repository root with: python -m test.benchmark.benchmark_Stats [-a ALARMS] [-n ITERATIONS]"""
+
+import os
+import time
+import random
+import sqlite3
+import datetime
+import argparse
+import statistics
+
+from typing import List
+
+from backend.data.Database import Database, DatabaseTimespan
+from backend.event.AlarmEvent import AlarmEvent
+from backend.util.AppInfo import AppInfo
+
+TIMESPANS = [DatabaseTimespan.TOTAL, DatabaseTimespan.YEAR, DatabaseTimespan.MONTH, DatabaseTimespan.TODAY]
+
+def getStatsScan(conn: sqlite3.Connection, textOnly: bool) -> List[int]:
+    result = []
+    now = datetime.datetime.now()
+    flagsCondition = "FLAGS != '" + AlarmEvent.FLAGS_BINARY + "'" if textOnly else "1"
+    for timespan in TIMESPANS:
+        if timespan == DatabaseTimespan.TOTAL:
+            cursor = conn.execute("SELECT COUNT(*) FROM alarmevents WHERE " + flagsCondition)
+        else:
+            query = "SELECT COUNT(*) FROM alarmevents WHERE " + flagsCondition + " AND strftime('" + timespan.value + "', alarmtimestamp) == ?"
+            cursor = conn.execute(query, (now.strftime(timespan.value),))
+        (count,) = cursor.fetchone()
+        result.append(int(count))
+    return result
+
+def getStatsTable(database: Database, textOnly: bool) -> List[int]:
+    return [database.getEventStats(timespan, textOnly) for timespan in TIMESPANS]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Alarm statistics benchmark")
+    parser.add_argument("-a", "--alarms",     help="number of synthetic alarm events", default=100000, type=int)
+    parser.add_argument("-n", "--iterations", help="number of statistics requests",    default=20,     type=int)
+    args = parser.parse_args()
+
+    appInfo = AppInfo()
+    databaseFilename = os.path.join(appInfo.path, ".temp/benchmark_stats.sqlite")
+    os.makedirs(os.path.dirname(databaseFilename), exist_ok=True)
+
+    database = Database(databaseFilename, reset = True, commit = False)
+
+    random.seed(112)
+    now = datetime.datetime.now()
+    startTime = time.perf_counter()
+    for i in range(args.alarms):
+        alarmEvent = AlarmEvent()
+        alarmEvent.flags = AlarmEvent.FLAGS_BINARY if i % 4 == 0 else AlarmEvent.FLAGS_VALID
+        alarmTimestamp = now - datetime.timedelta(minutes = random.randint(0, 10 * 365 * 24 * 60))
+        alarmEvent.alarmTimestamp = alarmTimestamp.strftime(AlarmEvent.TIMESTAMP_FORMAT)
+        alarmEvent.timestamp = alarmEvent.alarmTimestamp
+        alarmEvent.event = f"Event {i}"
+        database.addEvent(alarmEvent, verbose = False)
+    database.commit()
+    insertDuration = time.perf_counter() - startTime
+
+    conn = sqlite3.connect(databaseFilename)
+
+    scan: List[float] = []
+    table: List[float] = []
+    for _ in range(args.iterations):
+        startTime = time.perf_counter()
+        resultScan = getStatsScan(conn, textOnly = True) + getStatsScan(conn, textOnly = False)
+        scan.append((time.perf_counter() - startTime) * 1000.0)
+
+        startTime = time.perf_counter()
+        resultTable = getStatsTable(database, textOnly = True) + getStatsTable(database, textOnly = False)
+        table.append((time.perf_counter() - startTime) * 1000.0)
+
+        assert(resultScan == resultTable)
+
+    conn.close()
+    database.close()
+
+    print(f"alarm events:                    {args.alarms} (inserted in {insertDuration:.1f} s)")
+    print(f"statistics:                      {resultTable}")
+    print(f"strftime scan p50:               {statistics.median(scan):.2f} ms")
+    print(f"statistics table p50:            {statistics.median(table):.3f} ms")
+
+if __name__ == "__main__":
+    main()
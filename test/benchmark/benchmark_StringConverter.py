@@ -0,0 +1,51 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Compares the previous (character by character) StringConverter implementation with the current one.
+
+The conversions are measured for realistic raw SMS alarm messages of increasing length
+(the original implementation is quadratic in the length of the text).
+Run it from the repository root with: python -m test.benchmark.benchmark_StringConverter [-r REPETITIONS]"""
+
+import argparse
+import timeit
+import functools
+
+from test.test_StringConverter import singleline2stringReference, string2singlelineReference
+
+from backend.util.StringConverter import StringConverter
+
+RAW_SMS = "SMS Alarm\nAlarmzeit: 24.06.2019 01:02:03\nEO: Musterdorf, Musterstr. 112\nBrand Wohnhaus\n" \
+          "STW: B 3 Person\nBem: Rauchentwicklung\\Keller\nPersonen im Gebäude\n"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="StringConverter benchmark")
+    parser.add_argument("-r", "--repetitions", help="number of conversions per text", default=200, type=int)
+    args = parser.parse_args()
+
+    print(f"{'text length':>12} {'old to single line':>20} {'new to single line':>20} {'old from single line':>22} {'new from single line':>22}")
+    for multiplier in [1, 10, 100, 1000]:
+        text = RAW_SMS * multiplier
+        singleLine = StringConverter.string2singleline(text)
+        results = [timeit.timeit(functools.partial(string2singlelineReference, text), number = args.repetitions),
+                   timeit.timeit(functools.partial(StringConverter.string2singleline, text), number = args.repetitions),
+                   timeit.timeit(functools.partial(singleline2stringReference, singleLine), number = args.repetitions),
+                   timeit.timeit(functools.partial(StringConverter.singleline2string, singleLine), number = args.repetitions)]
+        (old2, new2, oldFrom, newFrom) = [1000000.0 * r / args.repetitions for r in results]
+        print(f"{len(text):>12} {old2:>17.1f} us {new2:>17.1f} us {oldFrom:>19.1f} us {newFrom:>19.1f} us")
+
+if __name__ == "__main__":
+    main()
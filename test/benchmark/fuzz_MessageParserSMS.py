@@ -0,0 +1,153 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Fuzzing harness for the SMS message parser.
+
+Mutations of the fixtures of test/test_MessageParserSMS.py are parsed to detect unhandled exceptions.
+In addition, pathological inputs of growing size are parsed to detect super-linear parse times:
+the growth exponent of the parse time is estimated from the smallest and the largest input
+and inputs with an exponent above the threshold are flagged (exit code 1).
+Run it from the repository root with: python -m test.benchmark.fuzz_MessageParserSMS [-m MUTATIONS]"""
+
+import os
+import sys
+import math
+import time
+import random
+import argparse
+import datetime
+import contextlib
+
+from typing import Callable, List
+
+from test.benchmark.benchmark_MessageParserSMS import loadFixtures, createParser, newMessage, ALARM_SENDER
+
+from backend.event.SourceEvent import SourceEvent
+from backend.source.MessageParserSMS import MessageParserSMS
+
+TOKENS = ["SMS Alarm", "Alarmzeit:", "EO:", "STW:", "Bem:", "=", ",", "\\", "\\n", "\n", "\n\n", " ", "\r\n", "ä", "\U0001F692",
+          "24.06.2019 01:02:03", "24.06.2019 01:02", "99.99.9999 99:99:99"]
+
+def mutate(text: str, rnd: random.Random) -> str:
+    """Applies a random mutation (insertion, deletion, duplication or truncation) to a text."""
+    position = rnd.randint(0, len(text))
+    mutation = rnd.randrange(5)
+    if mutation == 0:
+        return text[:position] + rnd.choice(TOKENS) + text[position:]
+    if mutation == 1:
+        return text[:position] + text[position + rnd.randint(1, 8):]
+    if mutation == 2:
+        return text[:position] + text[position:] * 2
+    if mutation == 3:
+        return text[:position]
+    lines = text.split("\n")
+    rnd.shuffle(lines)
+    return "\n".join(lines)
+
+def generateMutations(count: int, seed: int = 112) -> List[str]:
+    rnd = random.Random(seed)
+    fixtures = loadFixtures()
+    mutations: List[str] = []
+    for _ in range(count):
+        text = rnd.choice(fixtures)
+        for _ in range(rnd.randint(1, 4)):
+            text = mutate(text, rnd)
+        mutations.append(text)
+    return mutations
+
+def parseMessages(parser: MessageParserSMS, messages: List[SourceEvent]) -> None:
+    for sourceEvent in messages:
+        parser.parseMessage(sourceEvent)
+
+# pathological inputs of (roughly) size n: each one returns the messages that are parsed in order
+def longLine(n: int) -> List[SourceEvent]:
+    return [newMessage("SMS Alarm\nBem: " + "x" * n)]
+
+def manyLines(n: int) -> List[SourceEvent]:
+    return [newMessage("SMS Alarm\nBem: " + "x\n" * (n // 2))]
+
+def manyKeywords(n: int) -> List[SourceEvent]:
+    return [newMessage("SMS Alarm\n" + "STW: e\nEO: l, d\n" * (n // 16))]
+
+def manyCommas(n: int) -> List[SourceEvent]:
+    return [newMessage("SMS Alarm\nEO: " + "," * n + "\nSTW: e\nBem: c")]
+
+def manyHeaders(n: int) -> List[SourceEvent]:
+    return [newMessage("SMS Alarm\n" * (n // 10))]
+
+def longSetting(n: int) -> List[SourceEvent]:
+    return [newMessage("key=" + "=" * n)]
+
+def longUnhandled(n: int) -> List[SourceEvent]:
+    return [newMessage("x" * n), newMessage("y" * n, sender = ALARM_SENDER)]
+
+def multipartFragments(n: int) -> List[SourceEvent]:
+    # n characters split into fragments of 100 characters (merged with the previous alarm message one after another)
+    now = datetime.datetime.now()
+    return [newMessage("SMS Alarm\nBem: ", timestamp = now)] + [newMessage("x" * 99 + "\n", timestamp = now) for _ in range(n // 100)]
+
+INPUTS = [longLine, manyLines, manyKeywords, manyCommas, manyHeaders, longSetting, longUnhandled, multipartFragments]
+
+def measure(parser: MessageParserSMS, generator: Callable[[int], List[SourceEvent]], n: int, repetitions: int) -> float:
+    best = math.inf
+    for _ in range(repetitions):
+        messages = generator(n)
+        startTime = time.perf_counter()
+        parseMessages(parser, messages)
+        best = min(best, time.perf_counter() - startTime)
+    return best
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SMS message parser fuzzing harness")
+    parser.add_argument("-m", "--mutations", help="number of mutated fixtures",                  default=20000, type=int)
+    parser.add_argument("-s", "--size",      help="size of the smallest pathological input",     default=2000,  type=int)
+    parser.add_argument("-g", "--growth",    help="size factor of the largest pathological input", default=16,  type=int)
+    parser.add_argument("-t", "--threshold", help="maximum growth exponent of the parse time",    default=1.3,   type=float)
+    args = parser.parse_args()
+
+    messageParser = createParser("fuzz")
+    flagged = 0
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        exceptions: List[str] = []
+        for text in generateMutations(args.mutations):
+            try:
+                messageParser.parseMessage(newMessage(text))
+                messageParser.parseMessage(newMessage(text, sender = ALARM_SENDER))
+            except Exception as e:
+                exceptions.append(f"{text!r}: {e!r}")
+
+        exponents = []
+        for generator in INPUTS:
+            small = measure(messageParser, generator, args.size, 5)
+            large = measure(messageParser, generator, args.size * args.growth, 3)
+            exponents.append((generator.__name__, math.log(max(large, 1e-9) / max(small, 1e-9)) / math.log(args.growth), large))
+
+    print(f"mutations: {args.mutations} ({len(exceptions)} unhandled exception(s))")
+    for exception in exceptions[:10]:
+        print(f"  {exception}")
+    flagged += len(exceptions)
+
+    print(f"{'pathological input':<22} {'exponent':>10} {'largest input':>16}")
+    for (name, exponent, duration) in exponents:
+        superLinear = exponent > args.threshold
+        flagged += 1 if superLinear else 0
+        print(f"{name:<22} {exponent:>10.2f} {1000.0 * duration:>13.1f} ms{'  <- super-linear' if superLinear else ''}")
+
+    sys.exit(1 if flagged > 0 else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+import shutil
+import threading
+
+from typing import List, Optional
+
+from backend.action.Action import Action
+from backend.event.AlarmEvent import AlarmEvent
+from backend.event.SourceEvent import SourceEvent
+from backend.util.ActionDispatcher import ActionDispatcher
+from backend.util.AppInfo import AppInfo
+from backend.util.Settings import Settings
+
+class _ActionTest(Action):
+
+    GATE_TIMEOUT = 5.0
+
+    def __init__(self, name: str, instanceName: str, settings: Settings, log: List[str], delay: float = 0.0, *, gate: Optional[threading.Event] = None) -> None:
+        super().__init__(name, instanceName, settings, True)
+        self.log = log
+        self.delay = delay
+        self.gate = gate # handling an event blocks until the gate is opened by the test
+
+    def waitForGate(self) -> None:
+        if self.gate is not None:
+            self.gate.wait(self.GATE_TIMEOUT)
+        time.sleep(self.delay)
+
+    def handleEvent(self, sourceEvent: SourceEvent) -> None:
+        self.waitForGate()
+        if isinstance(sourceEvent, AlarmEvent):
+            self.log.append(f"{self.pluginName}:{sourceEvent.locationLatitude}")
+
+class _ActionTestEnrich(_ActionTest):
+
+    CONCURRENT          = True
+    ENRICHES_EVENT      = True
+    USES_ENRICHED_EVENT = False
+
+    DEFAULT_DEADLINE = 1.0
+
+    def handleEvent(self, sourceEvent: SourceEvent) -> None:
+        self.waitForGate()
+        if isinstance(sourceEvent, AlarmEvent):
+            sourceEvent.locationLatitude = 1.0
+        self.log.append(f"{self.pluginName}:done")
+
+class _ActionTestEnrichBusy(_ActionTestEnrich):
+
+    CYCLIC_DELAY = 0.4
+
+    def handleCyclic(self) -> None:
+        time.sleep(self.CYCLIC_DELAY)
+
+class _ActionTestIndependent(_ActionTest):
+
+    CONCURRENT          = True
+    USES_ENRICHED_EVENT = False
+
+class Test_ActionDispatcher:
+
+    def setup_class(self) -> None:
+        #pylint: disable=W0201
+        appInfo = AppInfo()
+        settingsFilenameOrig = os.path.join(appInfo.path, "misc/setup/situationboard_default.conf")
+        settingsFilename = os.path.join(appInfo.path, ".temp/situationboard.conf")
+
+        shutil.copy(settingsFilenameOrig, settingsFilename)
+
+        self.settings = Settings(settingsFilename, appInfo.path)
+
+    def __createActions(self, instanceName: str, log: List[str], enrichGate: Optional[threading.Event] = None, independentGate: Optional[threading.Event] = None) -> List[Action]:
+        return [
+            _ActionTestEnrich("test_enrich", instanceName, self.settings, log, gate = enrichGate),
+            _ActionTest("test_database", instanceName, self.settings, log),
+            _ActionTestIndependent("test_outlet", instanceName, self.settings, log, gate = independentGate),
+            _ActionTest("test_frontend", instanceName, self.settings, log),
+        ]
+
+    def test_sequential(self) -> None:
+        self.settings.setString(Settings.SECTION_BACKEND, "action_dispatch", ActionDispatcher.MODE_SEQUENTIAL)
+        log: List[str] = []
+        dispatcher = ActionDispatcher(self.settings, self.__createActions("sequential", log), threading.Event())
+        dispatcher.handleEvent(AlarmEvent())
+        assert(log == ["test_enrich:done", "test_database:1.0", "test_outlet:1.0", "test_frontend:1.0"])
+        assert(len(dispatcher.getTimings()) == 4)
+
+    def test_concurrent(self) -> None:
+        self.settings.setString(Settings.SECTION_BACKEND, "action_dispatch", ActionDispatcher.MODE_CONCURRENT)
+        log: List[str] = []
+        independentGate = threading.Event()
+        wakeupEvent = threading.Event()
+        dispatcher = ActionDispatcher(self.settings, self.__createActions("concurrent", log, independentGate = independentGate), wakeupEvent)
+
+        dispatcher.handleEvent(AlarmEvent())
+
+        # dependent plugins see the enriched event; the blocked independent plugin does not delay them
+        assert(log == ["test_enrich:done", "test_database:1.0", "test_frontend:1.0"])
+        assert("action:test_outlet:concurrent" not in dispatcher.getTimings())
+
+        # the dispatcher wakes up the event loop once the independent plugin is done
+        wakeupEvent.clear()
+        independentGate.set()
+        assert(wakeupEvent.wait(_ActionTest.GATE_TIMEOUT))
+        assert(log[3] == "test_outlet:0.0" or log[3] == "test_outlet:1.0")
+        assert("action:test_outlet:concurrent" in dispatcher.getTimings())
+
+    def test_concurrent_deadline(self) -> None:
+        self.settings.setString(Settings.SECTION_BACKEND, "action_dispatch", ActionDispatcher.MODE_CONCURRENT)
+        self.settings.setFloat("action:test_enrich:deadline", "deadline", 0.1)
+        log: List[str] = []
+        enrichGate = threading.Event()
+        wakeupEvent = threading.Event()
+        dispatcher = ActionDispatcher(self.settings, self.__createActions("deadline", log, enrichGate = enrichGate), wakeupEvent)
+
+        alarmEvent = AlarmEvent()
+        dispatcher.handleEvent(alarmEvent)
+
+        # dependent plugins stop waiting for the blocked enriching plugin after its deadline
+        assert("test_enrich:done" not in log)
+        assert("test_database:0.0" in log)
+        assert("test_frontend:0.0" in log)
+
+        wakeupEvent.clear()
+        enrichGate.set()
+        assert(wakeupEvent.wait(_ActionTest.GATE_TIMEOUT))
+        assert("test_enrich:done" in log)
+
+        # the late result is discarded (it would not be stored or shown anyway)
+        assert(alarmEvent.locationLatitude == 0.0)
+
+    def test_concurrent_deadline_start(self) -> None:
+        self.settings.setString(Settings.SECTION_BACKEND, "action_dispatch", ActionDispatcher.MODE_CONCURRENT)
+        self.settings.setFloat("action:test_enrich_busy:deadline_start", "deadline", 0.6)
+        log: List[str] = []
+        actions: List[Action] = [
+            _ActionTestEnrichBusy("test_enrich_busy", "deadline_start", self.settings, log, 0.4),
+            _ActionTest("test_database", "deadline_start", self.settings, log),
+        ]
+        dispatcher = ActionDispatcher(self.settings, actions, threading.Event())
+
+        # the worker is busy with housekeeping first (the deadline is counted once it handles the event)
+        dispatcher.handleCyclic()
+        alarmEvent = AlarmEvent()
+        dispatcher.handleEvent(alarmEvent)
+
+        assert(log == ["test_enrich_busy:done", "test_database:1.0"])
+        assert(alarmEvent.locationLatitude == 1.0)
@@ -0,0 +1,192 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import shutil
+
+from typing import Tuple
+
+from test.StubGeocoder import StubGeocoder
+
+from backend.util.AppInfo import AppInfo
+from backend.util.Settings import Settings
+from backend.data.Database import Database
+from backend.data.GeocodeCache import GeocodeCache
+from backend.event.AlarmEvent import AlarmEvent
+from backend.action.ActionSearchLocation import ActionSearchLocation
+
+class Test_ActionSearchLocation:
+
+    NETWORK_DELAY = 0.02
+
+    ADDRESSES = {
+        "Musterdorf Hauptstraße 1": (48.1, 11.1),
+        "Musterdorf Bahnhofstraße 2": (48.2, 11.2),
+        "Musterdorf Marktplatz 3": (48.3, 11.3),
+        "Nachbardorf Kirchweg 4": (48.4, 11.4),
+        "Nachbardorf Am Bach 5": (48.5, 11.5),
+    }
+
+    def setup_class(self) -> None:
+        #pylint: disable=W0201
+        self.appInfo = AppInfo()
+        settingsFilenameOrig = os.path.join(self.appInfo.path, "misc/setup/situationboard_default.conf")
+        settingsFilename = os.path.join(self.appInfo.path, ".temp/situationboard.conf")
+        databaseFilename = os.path.join(self.appInfo.path, ".temp/geocode.sqlite")
+
+        shutil.copy(settingsFilenameOrig, settingsFilename)
+
+        self.settings = Settings(settingsFilename, self.appInfo.path)
+        self.database = Database(databaseFilename, reset = True)
+
+        # historical alarm event with a known location (used for prewarming the cache)
+        historicalEvent = self.__createEvent("Altdorf", "Schulstr. 6")
+        (historicalEvent.locationLatitude, historicalEvent.locationLongitude) = (47.6, 10.6)
+        self.database.addEvent(historicalEvent)
+        self.database.addEvent(self.__createEvent("Altdorf", "Ohne Koordinaten 7"))
+        self.database.commit()
+
+        # local gazetteer with the network geocoder as fallback
+        gazetteerFilename = os.path.join(self.appInfo.path, ".temp/geocode_gazetteer.csv")
+        with open(gazetteerFilename, 'w', encoding='utf-8') as f:
+            f.write("city;street;housenumber;latitude;longitude\n")
+            f.write("Feuerwehrdorf;Wachenstraße;1;49.1;12.1\n")
+            f.write("Feuerwehrdorf;Wachenstraße;11;49.1;12.2\n")
+        self.settings.setString("action:search_location", "geocoder", ActionSearchLocation.GEOCODER_GAZETTEER_NOMINATIM)
+        self.settings.setString("action:search_location", "gazetteer_file", gazetteerFilename)
+
+        self.geocoder = StubGeocoder(Test_ActionSearchLocation.ADDRESSES, Test_ActionSearchLocation.NETWORK_DELAY)
+        self.action = ActionSearchLocation("", self.settings, self.database, self.geocoder)
+
+    @staticmethod
+    def __createEvent(location: str, locationDetails: str) -> AlarmEvent:
+        alarmEvent = AlarmEvent()
+        alarmEvent.event = "Brand"
+        alarmEvent.location = location
+        alarmEvent.locationDetails = locationDetails
+        alarmEvent.flags = AlarmEvent.FLAGS_VALID
+        return alarmEvent
+
+    def __search(self, location: str, locationDetails: str) -> Tuple[float, float]:
+        alarmEvent = self.__createEvent(location, locationDetails)
+        self.action.handleEvent(alarmEvent)
+        return (alarmEvent.locationLatitude, alarmEvent.locationLongitude)
+
+    def test_normalize_address(self) -> None:
+        key = GeocodeCache.normalizeAddress("Musterdorf", "Hauptstraße 1")
+        assert(key == "musterdorf hauptstrasse 1")
+        assert(GeocodeCache.normalizeAddress("MUSTERDORF", "Hauptstr. 1") == key)
+        assert(GeocodeCache.normalizeAddress(" Musterdorf,", "  Hauptstrasse  1 ") == key)
+        assert(GeocodeCache.normalizeAddress("Musterdorf", "Marktpl. 3") == "musterdorf marktplatz 3")
+        assert(GeocodeCache.normalizeAddress("Musterdorf", "Hauptstraße 10") != key)
+
+    def test_prewarm(self) -> None:
+        requests = len(self.geocoder.requests)
+        assert(self.__search("Altdorf", "Schulstraße 6") == (47.6, 10.6))
+        assert(len(self.geocoder.requests) == requests)
+
+        # alarm events without coordinates are not cached
+        assert(self.__search("Altdorf", "Ohne Koordinaten 7") == (0.0, 0.0))
+        assert(len(self.geocoder.requests) == requests + 1)
+
+    def test_hit_rate(self) -> None:
+        requests = len(self.geocoder.requests)
+        hits = self.action.getState()['geocode_cache']['hits']
+        addresses = list(Test_ActionSearchLocation.ADDRESSES.items())
+        rounds = 20
+
+        for r in range(rounds):
+            for (address, coordinates) in addresses:
+                (location, locationDetails) = address.split(" ", 1)
+                if r % 2 == 1:
+                    # alternative spelling of the same address
+                    (location, locationDetails) = (location.upper(), locationDetails.replace("straße", "str."))
+
+                searches = len(self.geocoder.requests)
+                assert(self.__search(location, locationDetails) == coordinates)
+
+                # only the first search of an address is forwarded to the (slow) online geocoder
+                assert(len(self.geocoder.requests) == searches + (1 if r == 0 else 0))
+
+        misses = len(self.geocoder.requests) - requests
+        hitRate = 1.0 - misses / (rounds * len(addresses))
+        assert(misses == len(addresses))
+        assert(hitRate == 0.95)
+
+        state = self.action.getState()['geocode_cache']
+        assert(state['hits'] - hits == (rounds - 1) * len(addresses))
+
+    def test_gazetteer(self) -> None:
+        requests = len(self.geocoder.requests)
+        assert(self.__search("Feuerwehrdorf", "Wachenstr. 1") == (49.1, 12.1))
+        assert(self.__search("Feuerwehrdorf", "Wachenstrase 11") == (49.1, 12.2))
+        assert(len(self.geocoder.requests) == requests)
+
+        # addresses that are not in the gazetteer are searched online
+        Test_ActionSearchLocation.ADDRESSES["Feuerwehrdorf Wiesenweg 9"] = (49.9, 12.9)
+        assert(self.__search("Feuerwehrdorf", "Wiesenweg 9") == (49.9, 12.9))
+        assert(len(self.geocoder.requests) == requests + 1)
+
+        # streets of other cities and unknown house numbers are searched online as well
+        Test_ActionSearchLocation.ADDRESSES["Löschdorf Wachenstraße 1"] = (49.5, 12.5)
+        assert(self.__search("Löschdorf", "Wachenstraße 1") == (49.5, 12.5))
+        Test_ActionSearchLocation.ADDRESSES["Feuerwehrdorf Wachenstraße 99"] = (49.2, 12.3)
+        assert(self.__search("Feuerwehrdorf", "Wachenstraße 99") == (49.2, 12.3))
+        assert(len(self.geocoder.requests) == requests + 3)
+
+    def test_negative_cache(self) -> None:
+        requests = len(self.geocoder.requests)
+        assert(self.__search("Nirgendwo", "Unbekannter Weg 1") == (0.0, 0.0))
+        assert(self.__search("Nirgendwo", "Unbekannter Weg 1") == (0.0, 0.0))
+        assert(len(self.geocoder.requests) == requests + 1)
+
+    def test_errors_not_cached(self) -> None:
+        requests = len(self.geocoder.requests)
+        self.geocoder.error = TimeoutError("network unreachable")
+        try:
+            assert(self.__search("Nachbardorf", "Neuer Weg 8") == (0.0, 0.0))
+        finally:
+            self.geocoder.error = None
+
+        Test_ActionSearchLocation.ADDRESSES["Nachbardorf Neuer Weg 8"] = (48.8, 11.8)
+        assert(self.__search("Nachbardorf", "Neuer Weg 8") == (48.8, 11.8))
+        assert(len(self.geocoder.requests) == requests + 2)
+
+    def test_persistence(self) -> None:
+        filename = os.path.join(self.appInfo.path, ".temp/geocode_cache.sqlite")
+        # the tables of the cache are created by the migrations of the database
+        Database(filename, reset = True).commitAndClose()
+
+        cache = GeocodeCache("test", filename, 2, 3600.0, 60.0)
+        cache.store("Musterdorf", "Hauptstraße 1", (48.1, 11.1))
+        cache.store("Musterdorf", "Bahnhofstraße 2", (48.2, 11.2))
+        cache.store("Nirgendwo", "Unbekannter Weg 1", None)        # evicts the least recently used entry
+        assert(cache.lookup("Musterdorf", "Hauptstraße 1") == (False, None))
+        assert(cache.lookup("Nirgendwo", "Unbekannter Weg 1") == (True, None))
+        assert(cache.lookup("Musterdorf", "Bahnhofstraße 2") == (True, (48.2, 11.2)))
+        cache.close()
+
+        # entries (and their last use) survive a restart
+        cache = GeocodeCache("test", filename, 1, 3600.0, 60.0)
+        assert(cache.lookup("Musterdorf", "Bahnhofstr. 2") == (True, (48.2, 11.2)))
+        assert(cache.lookup("Nirgendwo", "Unbekannter Weg 1") == (False, None))
+        cache.close()
+
+        # expired entries are not returned
+        cache = GeocodeCache("test", filename, 2, 0.0, 0.0)
+        assert(cache.lookup("Musterdorf", "Bahnhofstraße 2") == (False, None))
+        assert(cache.getState() == {'entries': 0, 'hits': 0, 'misses': 1})
+        cache.close()
@@ -15,7 +15,14 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import time
 import shutil
+import sqlite3
+import threading
+
+from typing import Callable
+
+from test.StubHTTPSServer import StubHTTPSServer
 
 from backend.util.AppInfo import AppInfo
 from backend.util.Settings import Settings
@@ -42,13 +49,13 @@ class Test_ActionSendMessagePowerAlarm:
 
     def setup_class(self) -> None:
         #pylint: disable=W0201
-        appInfo = AppInfo()
-        settingsFilenameOrig = os.path.join(appInfo.path, "misc/setup/situationboard_default.conf")
-        settingsFilename = os.path.join(appInfo.path, ".temp/situationboard.conf")
+        self.appInfo = AppInfo()
+        settingsFilenameOrig = os.path.join(self.appInfo.path, "misc/setup/situationboard_default.conf")
+        settingsFilename = os.path.join(self.appInfo.path, ".temp/situationboard.conf")
 
         shutil.copy(settingsFilenameOrig, settingsFilename)
 
-        self.settings = Settings(settingsFilename, appInfo.path)
+        self.settings = Settings(settingsFilename, self.appInfo.path)
 
         section = ActionSendMessagePowerAlarm.PLUGIN_TYPE + Plugin.NAME_SEPARATOR + "send_poweralarm"
         self.settings.setString(section, "api_key", "NO_API_KEY")
@@ -265,6 +272,181 @@ class Test_ActionSendMessagePowerAlarm:
         msg = self.action.sendUnhandledEvent(unhandledEvent, ActionSendMessagePowerAlarm.API_GROUP_ADMIN)
         assert(not msg.isEmpty())
 
+    def test_send_via_stub_server(self) -> None:
+        server = StubHTTPSServer(connectDelay=0.1, requestDelay=0.05)
+        server.start()
+
+        action = self.__createStubAction("stub", server)
+        assert(self.__waitFor(lambda: action.getState()['connections']['idle'] == 4, 2.0)) # connections are established at startup
+        assert(server.connections == 4)
+
+        # handling the event only queues the messages (it does not wait for any response)
+        server.responding.clear()
+        alarmEvent = self.__createAlarmEvent(flags=AlarmEvent.FLAGS_VALID)
+        action.handleEvent(alarmEvent)
+        assert(len(server.requests) == 0)
+        assert(action.getState()['outbox']['pending'] == 4)
+        server.responding.set()
+
+        # all groups are notified concurrently via the established connections (without further handshakes)
+        assert(action.waitForDelivery(5.0))
+        assert(server.connections == 4)
+        assert(len(server.requests) == 4)
+        for group in ["API_GROUP_NODETAILS", "API_GROUP_REDUCED", "API_GROUP_FULL", "API_GROUP_TABLET"]:
+            assert(any(f"kuerzel={group}&" in r for r in server.requests))
+
+        # identical messages are not sent again
+        action.handleEvent(alarmEvent)
+        assert(action.waitForDelivery(1.0))
+        assert(len(server.requests) == 4)
+
+        outboxState = action.getState()['outbox']
+        assert(outboxState['sent'] == 4)
+        assert(outboxState['pending'] == 0)
+
+        action.stop(5.0)
+        server.stop()
+
+    def test_send_retry(self) -> None:
+        server = StubHTTPSServer()
+        server.failures = 2
+        server.start()
+
+        action = self.__createStubAction("retry", server)
+        action.handleEvent(self.__createAlarmEvent(flags=AlarmEvent.FLAGS_VALID))
+
+        # failed requests are retried (with backoff) until all groups are notified
+        assert(action.waitForDelivery(5.0))
+        assert(len(server.requests) == 6)
+        outboxState = action.getState()['outbox']
+        assert(outboxState['sent'] == 4)
+        assert(outboxState['failed'] == 0)
+
+        action.stop(5.0)
+        server.stop()
+
+    def test_send_failed(self) -> None:
+        server = StubHTTPSServer()
+        server.failures = 1
+        server.failureStatus = 403
+        server.start()
+
+        action = self.__createStubAction("rejected", server)
+        action.handleEvent(self.__createAlarmEvent(flags=AlarmEvent.FLAGS_VALID))
+
+        # rejected requests are not retried
+        assert(action.waitForDelivery(5.0))
+        assert(len(server.requests) == 4)
+        outboxState = action.getState()['outbox']
+        assert(outboxState['sent'] == 3)
+        assert(outboxState['failed'] == 1)
+
+        action.stop(5.0)
+        server.stop()
+
+    def test_send_retry_duration(self) -> None:
+        server = StubHTTPSServer()
+        server.failures = 4
+        server.start()
+
+        # the retry duration expires before the first retry
+        action = self.__createStubAction("expired", server, retryDuration=2, retryBackoff=5.0)
+        action.handleEvent(self.__createAlarmEvent(flags=AlarmEvent.FLAGS_VALID))
+
+        assert(action.waitForDelivery(5.0))
+        assert(len(server.requests) == 4)
+        outboxState = action.getState()['outbox']
+        assert(outboxState['sent'] == 0)
+        assert(outboxState['failed'] == 4)
+
+        action.stop(5.0)
+        server.stop()
+
+    def test_refresh_backoff(self) -> None:
+        server = StubHTTPSServer()
+        server.start()
+        server.stop() # PowerAlarm is unreachable
+
+        action = self.__createStubAction("backoff", server)
+
+        # a failed refresh of the connections (in the background) is not retried immediately
+        action.handleCyclic()
+        assert(self.__waitFor(lambda: action.getState()['connections']['refreshFailures'] == 1, 2.0))
+        for _ in range(3):
+            action.handleCyclic()
+        time.sleep(0.1)
+        assert(action.getState()['connections']['refreshFailures'] == 1)
+
+        action.stop(5.0)
+
+    def test_outbox_unavailable(self) -> None:
+        server = StubHTTPSServer()
+        server.start()
+
+        action = self.__createStubAction("unavailable", server)
+        outboxFilename = os.path.join(self.appInfo.path, ".temp/outbox_unavailable.sqlite")
+
+        # the messages are leased by the sender while the server holds back its responses
+        server.responding.clear()
+        action.handleEvent(self.__createAlarmEvent(flags=AlarmEvent.FLAGS_VALID))
+        assert(self.__waitFor(lambda: self.__countLeased(outboxFilename) == 4, 5.0))
+
+        # the outbox becomes unavailable before the deliveries are recorded
+        conn = sqlite3.connect(outboxFilename)
+        conn.execute("ALTER TABLE outbox RENAME TO outbox_unavailable")
+        conn.commit()
+        server.responding.set()
+        assert(self.__waitFor(lambda: action.getState()['sender']['errors'] > 0, 5.0))
+
+        # the sender keeps running and delivers the messages again as soon as the outbox is available
+        conn.execute("ALTER TABLE outbox_unavailable RENAME TO outbox")
+        conn.execute("UPDATE outbox SET nextattempt = 0")
+        conn.commit()
+        conn.close()
+        assert(action.waitForDelivery(10.0))
+        assert(action.getState()['outbox']['sent'] == 4)
+        assert(len(server.requests) == 8)
+
+        # the sender thread and the workers of the executor end when the action is stopped
+        action.stop(5.0)
+        assert(not any(thread.name.startswith(str(action)) for thread in threading.enumerate()))
+        server.stop()
+
+    @staticmethod
+    def __countLeased(outboxFilename: str) -> int:
+        conn = sqlite3.connect(outboxFilename)
+        try:
+            (count,) = conn.execute("SELECT COUNT(*) FROM outbox WHERE state = 'pending' AND nextattempt > ?", (time.time() + 1.0,)).fetchone()
+            return int(count)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def __waitFor(condition: Callable[[], bool], timeout: float) -> bool:
+        endTime = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() >= endTime:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def __createStubAction(self, instanceName: str, server: StubHTTPSServer,
+                           retryDuration: int = 600, retryBackoff: float = 0.05) -> ActionSendMessagePowerAlarm:
+        section = ActionSendMessagePowerAlarm.PLUGIN_TYPE + Plugin.NAME_SEPARATOR + "send_poweralarm" + Plugin.NAME_SEPARATOR + instanceName
+        for key in ["api_key", "api_group_nodetails", "api_group_reduced", "api_group_full", "api_group_tablet", "api_group_admin"]:
+            self.settings.setString(section, key, key.upper())
+        self.settings.setString(section, "api_url", "localhost")
+        self.settings.setInt(section, "api_port", server.port)
+        self.settings.setFloat(section, "retry_backoff", retryBackoff)
+        self.settings.setInt(section, "retry_duration", retryDuration)
+
+        outboxFilename = os.path.join(self.appInfo.path, f".temp/outbox_{instanceName}.sqlite")
+        if os.path.exists(outboxFilename):
+            os.remove(outboxFilename)
+        self.settings.setString(section, "outbox_file", outboxFilename)
+
+        return ActionSendMessagePowerAlarm(instanceName, self.settings, sslContext=StubHTTPSServer.clientContext())
+
     def __createSettingEvent(self, flags: str) -> SettingEvent:
         settingEvent = SettingEvent()
         settingEvent.key = Test_ActionSendMessagePowerAlarm.SETTING_KEY
@@ -0,0 +1,169 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sqlite3
+import filecmp
+
+from backend.util.AppInfo import AppInfo
+from backend.data.ArchiveCommon import ArchiveCommon
+from backend.data.ArchiveImporter import ArchiveImporter
+from backend.data.ArchiveExporter import ArchiveExporter
+from backend.data.CSVImporter import CSVImporter
+from backend.data.CSVExporter import CSVExporter
+from backend.data.Database import Database
+from backend.event.AlarmEvent import AlarmEvent
+
+class Test_Archive:
+
+    def test_columns(self) -> None:
+        strings = ["", "Test\n;\\Test", "äöüß\"'", "\U0001F692", ""]
+        payload = ArchiveCommon.encodeColumn(ArchiveCommon.ENCODING_STRING, strings)
+        assert(ArchiveCommon.decodeColumn(ArchiveCommon.ENCODING_STRING, payload, len(strings)) == strings)
+
+        flags = ["VALID", "INVALID", "VALID", "BINARY", "VALID"]
+        payload = ArchiveCommon.encodeColumn(ArchiveCommon.ENCODING_DICTIONARY, flags)
+        assert(ArchiveCommon.decodeColumn(ArchiveCommon.ENCODING_DICTIONARY, payload, len(flags)) == flags)
+
+        floats = [0.0, 1.12, -13.2, 48.137154, 11.576124]
+        payload = ArchiveCommon.encodeColumn(ArchiveCommon.ENCODING_FLOAT, floats)
+        assert(ArchiveCommon.decodeColumn(ArchiveCommon.ENCODING_FLOAT, payload, len(floats)) == floats)
+
+    def test_archive(self) -> None:
+        appInfo = AppInfo()
+        dbFilename = os.path.join(appInfo.path, ".temp/archive.sqlite")
+        inFilename = os.path.join(appInfo.path, "docs/dummy.csv")
+        archiveFilename = os.path.join(appInfo.path, ".temp/dummy.sbarchive")
+        outFilename = os.path.join(appInfo.path, ".temp/dummy_archive.csv")
+
+        # import data from CSV and export it into an archive (with multiple blocks)
+        d = Database(dbFilename, reset = True)
+        assert(CSVImporter(d).importEvents(inFilename) == 0)
+        eventCount = d.getEventCount(textOnly = False)
+
+        blockSize = ArchiveCommon.BLOCK_SIZE
+        ArchiveCommon.BLOCK_SIZE = 4
+        try:
+            assert(ArchiveExporter(d).exportEvents(archiveFilename) == 0)
+        finally:
+            ArchiveCommon.BLOCK_SIZE = blockSize
+        d.close()
+
+        # import the archive into a new database and compare the CSV export with the original CSV file
+        d = Database(dbFilename, reset = True)
+        assert(ArchiveImporter(d).importEvents(archiveFilename) == 0)
+        assert(d.getEventCount(textOnly = False) == eventCount)
+        assert(CSVExporter(d).exportEvents(outFilename) == 0)
+        assert(filecmp.cmp(inFilename, outFilename, shallow=False))
+        d.close()
+
+        # the archive is considerably smaller than the CSV file
+        assert(os.path.getsize(archiveFilename) < os.path.getsize(inFilename))
+
+    def test_corner_cases(self) -> None:
+        appInfo = AppInfo()
+        dbFilename = os.path.join(appInfo.path, ".temp/archive.sqlite")
+        archiveFilename = os.path.join(appInfo.path, ".temp/corner.sbarchive")
+        content = "Test\n;\\Test\nTest\"äöüß\"\"äöüß'äöüß''äöüß\näöüß"
+
+        d = Database(dbFilename, reset = True)
+        aeAdded = AlarmEvent()
+        aeAdded.timestamp = "2021-03-14 09:05:00"
+        aeAdded.event = content
+        aeAdded.comment = content
+        aeAdded.alarmTimestamp = "2021-03-14 09:04:00"
+        aeAdded.locationLatitude = 1.12
+        aeAdded.locationLongitude = -13.2
+        aeAdded.raw = content
+        aeAdded.flags = AlarmEvent.FLAGS_VALID
+        eventID = d.addEvent(aeAdded)
+        assert(ArchiveExporter(d).exportEvents(archiveFilename) == 0)
+        d.close()
+
+        d = Database(dbFilename, reset = True)
+        assert(ArchiveImporter(d).importEvents(archiveFilename) == 0)
+        aeLoaded = d.getEvent(eventID)
+        assert(aeLoaded is not None)
+        assert(aeLoaded.event == content)
+        assert(aeLoaded.comment == content)
+        assert(aeLoaded.raw == content)
+        assert(aeLoaded.locationLatitude == 1.12)
+        assert(aeLoaded.locationLongitude == -13.2)
+        assert(aeLoaded.alarmTimestamp == aeAdded.alarmTimestamp)
+        assert(aeLoaded.flags == AlarmEvent.FLAGS_VALID)
+        assert(d.getEventCount(textOnly = True) == 1)
+        d.close()
+
+    def test_null_and_invalid_events(self) -> None:
+        appInfo = AppInfo()
+        dbFilename = os.path.join(appInfo.path, ".temp/archive.sqlite")
+        archiveFilename = os.path.join(appInfo.path, ".temp/null.sbarchive")
+
+        d = Database(dbFilename, reset = True)
+        for alarmTimestamp in ["2021-03-14 09:04:00", "2021-02-30 09:04:00", "invalid"]:
+            aeAdded = AlarmEvent()
+            aeAdded.timestamp = "2021-03-14 09:05:00"
+            aeAdded.alarmTimestamp = alarmTimestamp
+            aeAdded.flags = AlarmEvent.FLAGS_VALID
+            d.addEvent(aeAdded)
+        d.commitAndClose()
+
+        # columns of older database files may contain NULL values
+        conn = sqlite3.connect(dbFilename)
+        conn.execute("UPDATE alarmevents SET comment = NULL, sender = NULL, locationlatitude = NULL")
+        conn.commit()
+        conn.close()
+
+        d = Database(dbFilename, reset = False)
+        assert(ArchiveExporter(d).exportEvents(archiveFilename) == 0)
+        d.close()
+
+        # alarm events with invalid timestamps are ignored
+        d = Database(dbFilename, reset = True)
+        assert(ArchiveImporter(d).importEvents(archiveFilename) == 1)
+        events = d.getEvents(textOnly = False)
+        assert(len(events) == 1)
+        assert(events[0].alarmTimestamp == "2021-03-14 09:04:00")
+        assert(events[0].comment == "")
+        assert(events[0].sender == "")
+        assert(events[0].locationLatitude == 0.0)
+        d.close()
+
+    def test_invalid_archive(self) -> None:
+        appInfo = AppInfo()
+        dbFilename = os.path.join(appInfo.path, ".temp/archive.sqlite")
+        inFilename = os.path.join(appInfo.path, "docs/dummy.csv")
+        archiveFilename = os.path.join(appInfo.path, ".temp/truncated.sbarchive")
+
+        d = Database(dbFilename, reset = True)
+        assert(CSVImporter(d).importEvents(inFilename) == 0)
+        assert(ArchiveExporter(d).exportEvents(archiveFilename) == 0)
+        d.close()
+
+        with open(archiveFilename, 'rb') as f:
+            data = f.read()
+        with open(archiveFilename, 'wb') as f:
+            f.write(data[:len(data) - 10])
+
+        # a truncated archive is rejected without importing any alarm events
+        d = Database(dbFilename, reset = True)
+        assert(ArchiveImporter(d).importEvents(archiveFilename) == 1)
+        assert(d.getEventCount(textOnly = False) == 0)
+
+        # a CSV file is not accepted as archive
+        assert(ArchiveImporter(d).importEvents(inFilename) == 1)
+        assert(d.getEventCount(textOnly = False) == 0)
+        d.close()
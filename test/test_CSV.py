@@ -18,9 +18,12 @@ import os
 import filecmp
 import datetime
 
+import pytest
+
 from backend.util.AppInfo import AppInfo
 from backend.data.CSVImporter import CSVImporter
 from backend.data.CSVExporter import CSVExporter
+from backend.data.CSVCommon import CSVCommon
 from backend.data.Database import Database
 from backend.event.AlarmEvent import AlarmEvent
 
@@ -108,3 +111,75 @@ class Test_CSV:
 
         # close database
         d.close()
+
+    def test_invalid_lines(self) -> None:
+        appInfo = AppInfo()
+        dbFilename = os.path.join(appInfo.path, ".temp/situationboard.sqlite")
+        inFilename = os.path.join(appInfo.path, "docs/dummy.csv")
+        csvFilename = os.path.join(appInfo.path, ".temp/invalid.csv")
+
+        with open(inFilename, 'r') as f:
+            lines = f.readlines()
+        validCount = len(lines) - 1
+        with open(csvFilename, 'w') as f:
+            f.writelines(lines)
+            f.write("too;few;columns\n")
+            f.write("invalid timestamp" + lines[-1][lines[-1].index(";"):])
+
+        # check that valid lines are imported even though invalid lines are ignored
+        d = Database(dbFilename, reset = True)
+        i = CSVImporter(d)
+        result = i.importEvents(csvFilename)
+        assert(result == 1)
+        assert(d.getEventCount(textOnly = False) == validCount)
+
+        # check that the statistics are still updated for new alarm events after the import
+        alarmEvent = AlarmEvent()
+        alarmEvent.alarmTimestamp = datetime.datetime.now().strftime(AlarmEvent.TIMESTAMP_FORMAT)
+        d.addEvent(alarmEvent)
+        assert(d.getEventCount(textOnly = False) == validCount + 1)
+        d.close()
+
+    def test_export_filters(self) -> None:
+        appInfo = AppInfo()
+        dbFilename = os.path.join(appInfo.path, ".temp/situationboard.sqlite")
+        inFilename = os.path.join(appInfo.path, "docs/dummy.csv")
+        outFilename = os.path.join(appInfo.path, ".temp/filtered.csv")
+
+        d = Database(dbFilename, reset = True)
+        i = CSVImporter(d)
+        assert(i.importEvents(inFilename) == 0)
+        binaryEvent = AlarmEvent()
+        binaryEvent.timestamp = "2019-06-01 10:00:00"
+        binaryEvent.alarmTimestamp = "2019-06-01 10:00:00"
+        binaryEvent.flags = AlarmEvent.FLAGS_BINARY
+        d.addEvent(binaryEvent)
+
+        # the dummy data contains 15 valid alarm events on 2018-01-01 and 12 valid alarm events on 2019-01-01
+        e = CSVExporter(d)
+        assert(e.exportEvents(outFilename, since = "2018-01-01", until = "2019-12-31") == 0)
+        assert(self.__countLines(outFilename) == 1 + 15 + 12 + 1)
+        assert(e.exportEvents(outFilename, since = "2018-01-01", until = "2019-12-31", flags = [AlarmEvent.FLAGS_VALID]) == 0)
+        assert(self.__countLines(outFilename) == 1 + 15 + 12)
+        assert(e.exportEvents(outFilename, printHeader = False, flags = [AlarmEvent.FLAGS_BINARY]) == 0)
+        assert(self.__countLines(outFilename) == 1)
+        assert(e.exportEvents(outFilename, since = "2030-01-01") == 0)
+        assert(self.__countLines(outFilename) == 1)
+
+        d.close()
+
+    @staticmethod
+    def __countLines(filename: str) -> int:
+        with open(filename, 'r') as f:
+            return sum(1 for _ in f)
+
+    def test_timestamps(self) -> None:
+        # timestamps that are already in the format of the database (fast path)
+        assert(CSVCommon.csv2dbTimestamp("2021-03-14 09:05:00") == "2021-03-14 09:05:00")
+        with pytest.raises(ValueError):
+            CSVCommon.csv2dbTimestamp("2021-02-30 09:05:00")
+
+        # timestamps that are not zero padded (slow path)
+        assert(CSVCommon.csv2dbTimestamp("2021-3-14 9:05:00") == "2021-03-14 09:05:00")
+        with pytest.raises(ValueError):
+            CSVCommon.csv2dbTimestamp("14.03.2021 09:05")
@@ -16,9 +16,15 @@
 
 import os
 import copy
+import shutil
+import sqlite3
 import datetime
+import threading
+
+from typing import Iterator, List
 
 from backend.util.AppInfo import AppInfo
+from backend.util.Settings import Settings
 from backend.data.Database import Database, DatabaseTimespan
 from backend.event.AlarmEvent import AlarmEvent
 from backend.event.SourceEvent import SourceEvent
@@ -36,6 +42,7 @@ class Test_Database:
 
         # check that creating a database works and yields an empty database
         db = Database(databaseFilename, reset = True)
+        assert(db.getRevision() == 0)
         assert(db.getEventCount(textOnly = False) == 0)
         assert(db.getEventCount(textOnly = True) == 0)
         assert(db.getEvent(1302) is None)
@@ -58,8 +65,10 @@ class Test_Database:
         newEvent1 = self.__createBinaryEvent()
         newEventTemp1 = copy.deepcopy(newEvent1)
         assert(db.updateEvent(newEventTemp1) != 0)
+        assert(db.getRevision() == 0)
         eventID1 = db.addEvent(newEventTemp1)
         assert(eventID1 != AlarmEvent.NO_ID)
+        assert(db.getRevision() == 1)
         assert(newEventTemp1.eventID == eventID1)
         assert(db.getEventCount(textOnly = False) == 1)
         assert(db.getEventCount(textOnly = True) == 0)
@@ -139,8 +148,10 @@ class Test_Database:
         assert(event2Updated.eventID == eventID2)
         self.__compareEvents(event2Updated, newEvent2Updated)
 
-        # check that deleting an event by ID succeeds
+        # check that deleting an event by ID succeeds (and increments the revision)
+        revision = dbr.getRevision()
         assert(dbr.removeEventID(eventID1) == 0)
+        assert(dbr.getRevision() == revision + 1)
         assert(dbr.getEventCount(textOnly = False) == 1)
         assert(dbr.getEventCount(textOnly = True) == 1)
         assert(dbr.getEvent(eventID1) is None)
@@ -160,11 +171,243 @@ class Test_Database:
         assert(len(dbr.getLastEvents(maxLastEvents, textOnly = True)) == 0)
 
         # check that deleting non-existent events fails
+        revision = dbr.getRevision()
         assert(dbr.removeEvent(event1) != 0)
         assert(dbr.removeEventID(eventID2) != 0)
+        assert(dbr.getRevision() == revision)
 
         dbr.commitAndClose()
 
+    def test_stats(self) -> None:
+        appInfo = AppInfo()
+        databaseFilename = os.path.join(appInfo.path, ".temp/situationboard_stats.sqlite")
+
+        db = Database(databaseFilename, reset = True)
+
+        # add events of today, of the last year and without a valid alarm timestamp
+        textEvent = self.__createTextEvent()
+        binaryEvent = self.__createBinaryEvent()
+        oldEvent = self.__createTextEvent()
+        oldEvent.alarmTimestamp = (datetime.datetime.now() - datetime.timedelta(days = 400)).strftime(AlarmEvent.TIMESTAMP_FORMAT)
+        invalidEvent = self.__createTextEvent()
+        invalidEvent.alarmTimestamp = "invalid"
+        for event in [textEvent, binaryEvent, oldEvent, invalidEvent]:
+            assert(db.addEvent(event) != AlarmEvent.NO_ID)
+
+        self.__checkStats(db, [4, 2, 2, 2], [3, 1, 1, 1])
+
+        # check that updating the flags or the alarm timestamp of an event updates the statistics
+        textEvent.flags = AlarmEvent.FLAGS_BINARY
+        assert(db.updateEvent(textEvent) == 0)
+        self.__checkStats(db, [4, 2, 2, 2], [2, 0, 0, 0])
+        oldEvent.alarmTimestamp = textEvent.alarmTimestamp
+        assert(db.updateEvent(oldEvent) == 0)
+        self.__checkStats(db, [4, 3, 3, 3], [2, 1, 1, 1])
+
+        # check that removing events updates the statistics
+        assert(db.removeEvent(binaryEvent) == 0)
+        assert(db.removeEvent(invalidEvent) == 0)
+        self.__checkStats(db, [2, 2, 2, 2], [1, 1, 1, 1])
+
+        # check that rebuilding the statistics yields the same result
+        db.rebuildStats()
+        self.__checkStats(db, [2, 2, 2, 2], [1, 1, 1, 1])
+        db.commit()
+
+        # check that rolling back a failed import keeps the statistics up to date
+        def failingEvents() -> Iterator[AlarmEvent]:
+            yield self.__createTextEvent()
+            raise ValueError("invalid event")
+        try:
+            db.addEvents(failingEvents(), chunkSize = 1)
+            assert(False)
+        except ValueError:
+            db.rollback()
+        self.__checkStats(db, [2, 2, 2, 2], [1, 1, 1, 1])
+        assert(db.addEvent(self.__createTextEvent()) != AlarmEvent.NO_ID)
+        self.__checkStats(db, [3, 3, 3, 3], [2, 2, 2, 2])
+
+        db.commitAndClose()
+
+    def test_event_page(self) -> None:
+        appInfo = AppInfo()
+        databaseFilename = os.path.join(appInfo.path, ".temp/situationboard_page.sqlite")
+
+        db = Database(databaseFilename, reset = True)
+        assert(db.getEventPage(True, 10) == ([], False))
+
+        # add 25 text events (with one alarm date per event) and one binary event
+        eventIDs: List[int] = []
+        for day in range(25):
+            event = self.__createTextEvent()
+            event.alarmTimestamp = (datetime.datetime(2021, 1, 1) + datetime.timedelta(days = day)).strftime(AlarmEvent.TIMESTAMP_FORMAT)
+            event.flags = AlarmEvent.FLAGS_VALID if day % 2 == 0 else AlarmEvent.FLAGS_INVALID
+            eventIDs.append(db.addEvent(event))
+        binaryID = db.addEvent(self.__createBinaryEvent())
+
+        # page through all text events (newest first) with keyset cursors
+        pagedIDs: List[int] = []
+        beforeID = None
+        while True:
+            (events, more) = db.getEventPage(True, 10, beforeID = beforeID)
+            pagedIDs.extend(e.eventID for e in events)
+            if not more:
+                break
+            beforeID = events[-1].eventID
+        assert(pagedIDs == list(reversed(eventIDs)))
+
+        # binary events are only included if requested
+        (events, more) = db.getEventPage(False, 1)
+        assert([e.eventID for e in events] == [binaryID])
+        assert(more)
+
+        # newer events directly following a known event (still ordered newest first)
+        (events, more) = db.getEventPage(True, 3, afterID = eventIDs[4])
+        assert([e.eventID for e in events] == [eventIDs[7], eventIDs[6], eventIDs[5]])
+        assert(more)
+
+        # events between two events
+        (events, more) = db.getEventPage(True, 10, beforeID = eventIDs[10], afterID = eventIDs[6])
+        assert([e.eventID for e in events] == [eventIDs[9], eventIDs[8], eventIDs[7]])
+        assert(not more)
+
+        # date range and flag filters
+        (events, more) = db.getEventPage(True, 10, since = "2021-01-03", until = "2021-01-06")
+        assert([e.eventID for e in events] == [eventIDs[5], eventIDs[4], eventIDs[3], eventIDs[2]])
+        (events, more) = db.getEventPage(True, 10, since = "2021-01-03", until = "2021-01-06", flags = [AlarmEvent.FLAGS_VALID])
+        assert([e.eventID for e in events] == [eventIDs[4], eventIDs[2]])
+        assert(not more)
+
+        db.commitAndClose()
+
+    def test_update_file(self) -> None:
+        appInfo = AppInfo()
+        databaseFilename = os.path.join(appInfo.path, ".temp/situationboard_update.sqlite")
+        if os.path.exists(databaseFilename):
+            os.remove(databaseFilename)
+
+        # create a database file with the first version of the schema (without statistics and indexes)
+        timestamp = datetime.datetime.now().strftime(AlarmEvent.TIMESTAMP_FORMAT)
+        conn = sqlite3.connect(databaseFilename)
+        conn.executescript(Database.SCHEMA)
+        conn.execute(f"pragma application_id = {Database.DB_APPID}")
+        conn.execute("pragma user_version = 1")
+        conn.execute("INSERT INTO alarmevents (alarmtimestamp, flags) VALUES (?, ?)", (timestamp, AlarmEvent.FLAGS_VALID))
+        conn.execute("INSERT INTO alarmevents (alarmtimestamp, flags) VALUES (?, ?)", (timestamp, AlarmEvent.FLAGS_BINARY))
+        conn.execute("INSERT INTO alarmevents (alarmtimestamp, flags) VALUES (?, ?)", (timestamp, ""))
+        conn.execute("INSERT INTO alarmevents (alarmtimestamp, flags) VALUES (?, ?)", (timestamp, None))
+        conn.commit()
+        conn.close()
+
+        # check that opening the database updates the file and computes the statistics
+        # (alarm events with NULL flags are no text alarm events, but alarm events with empty flags are)
+        db = Database(databaseFilename, reset = False)
+        self.__checkStats(db, [4, 4, 4, 4], [2, 2, 2, 2])
+        db.commitAndClose()
+
+        # check that all migrations were applied (and that reopening the database does not apply them again)
+        db = Database(databaseFilename, reset = False)
+        self.__checkStats(db, [4, 4, 4, 4], [2, 2, 2, 2])
+        assert(db.getEventCount(textOnly = True) == len(db.getEvents(textOnly = True)))
+        db.rebuildStats()
+        self.__checkStats(db, [4, 4, 4, 4], [2, 2, 2, 2])
+        db.commitAndClose()
+
+        conn = sqlite3.connect(databaseFilename)
+        (version,) = conn.execute("pragma user_version").fetchone()
+        assert(version == Database.DB_VERSION)
+        indexes = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+        assert("alarmevents_flags" in indexes)
+        assert("alarmevents_alarmdate" in indexes)
+        tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        assert("geocache" in tables)
+        assert("geocachestate" in tables)
+        alarmDates = [alarmDate for (alarmDate,) in conn.execute("SELECT alarmdate FROM alarmevents")]
+        assert(alarmDates == [timestamp[:10]] * 4)
+        conn.close()
+
+    def test_wal(self) -> None:
+        appInfo = AppInfo()
+        databaseFilename = os.path.join(appInfo.path, ".temp/situationboard_wal.sqlite")
+        settingsFilenameOrig = os.path.join(appInfo.path, "misc/setup/situationboard_default.conf")
+        settingsFilename = os.path.join(appInfo.path, ".temp/situationboard_wal.conf")
+        shutil.copy(settingsFilenameOrig, settingsFilename)
+
+        settings = Settings(settingsFilename, appInfo.path)
+        settings.setBoolean(Settings.SECTION_BACKEND, "database_wal", True)
+        settings.setString(Settings.SECTION_BACKEND, "database_synchronous", "normal")
+        settings.setInt(Settings.SECTION_BACKEND, "database_readers", 3)
+
+        db = Database(databaseFilename, reset = True, settings = settings)
+
+        # check that uncommitted changes are neither visible to readers nor reflected by the revision
+        assert(db.addEvent(self.__createTextEvent()) != AlarmEvent.NO_ID)
+        assert(db.getEventCount(textOnly = False) == 0)
+        assert(db.getRevision() == 0)
+        db.commit()
+        assert(db.getEventCount(textOnly = False) == 1)
+        assert(db.getRevision() == 1)
+
+        # hammer the readers while alarm events are inserted (and committed) one after another
+        insertCount = 200
+        stopReaders = threading.Event()
+        errors: List[str] = []
+
+        def reader() -> None:
+            lastCount = 0
+            while not stopReaders.is_set():
+                try:
+                    count = db.getEventCount(textOnly = False)
+                    lastEvents = db.getLastEvents(10, textOnly = True)
+                    stats = db.getEventStats(DatabaseTimespan.TODAY, textOnly = False)
+                except Exception as e: # pylint: disable=broad-except
+                    errors.append(str(e))
+                    return
+                if count < lastCount or stats < count or len(lastEvents) > 10:
+                    errors.append(f"inconsistent read (count {count}, last count {lastCount}, stats {stats})")
+                    return
+                lastCount = count
+
+        readers = [threading.Thread(target=reader) for _ in range(4)]
+        for r in readers:
+            r.start()
+
+        for _ in range(insertCount):
+            assert(db.addEvent(self.__createTextEvent(), verbose = False) != AlarmEvent.NO_ID)
+            db.commit()
+
+        stopReaders.set()
+        for r in readers:
+            r.join()
+
+        assert(len(errors) == 0)
+        assert(db.getEventCount(textOnly = False) == insertCount + 1)
+        assert(db.getRevision() == insertCount + 1)
+
+        # check that a pending write transaction does not block readers
+        # (with a short busy timeout a blocked reader fails with "database is locked" instead of waiting)
+        assert(db.addEvent(self.__createTextEvent(), verbose = False) != AlarmEvent.NO_ID)
+        assert(db.getEventCount(textOnly = False) == insertCount + 1)
+        conn = sqlite3.connect(databaseFilename, timeout = 0.1)
+        (count,) = conn.execute("SELECT COUNT(*) FROM alarmevents").fetchone()
+        conn.close()
+        assert(count == insertCount + 1)
+        db.commitAndClose()
+
+        # check that reopening the database without WAL mode restores the default journal mode
+        db = Database(databaseFilename, reset = False)
+        assert(db.getEventCount(textOnly = False) == insertCount + 2)
+        db.commitAndClose()
+        conn = sqlite3.connect(databaseFilename)
+        (journalMode,) = conn.execute("pragma journal_mode").fetchone()
+        conn.close()
+        assert(journalMode == "delete")
+
+    def __checkStats(self, db: Database, expectedAll: List[int], expectedText: List[int]) -> None:
+        timespans = [DatabaseTimespan.TOTAL, DatabaseTimespan.YEAR, DatabaseTimespan.MONTH, DatabaseTimespan.TODAY]
+        assert([db.getEventStats(timespan, textOnly = False) for timespan in timespans] == expectedAll)
+        assert([db.getEventStats(timespan, textOnly = True) for timespan in timespans] == expectedText)
+
     def __createBinaryEvent(self) -> AlarmEvent:
         moment = datetime.datetime.now()
         timestamp = moment.strftime(AlarmEvent.TIMESTAMP_FORMAT)
@@ -0,0 +1,95 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+import shutil
+import signal
+import threading
+
+from backend.util.AppInfo import AppInfo
+from backend.util.Settings import Settings
+from backend.util.EventQueue import EventQueue
+from backend.source.SourceDriverDummy import SourceDriverDummy
+from backend.event.SourceEvent import SourceEvent
+from backend.event.AlarmEvent import AlarmEvent
+
+class Test_EventQueue:
+
+    def setup_class(self) -> None:
+        #pylint: disable=W0201
+        appInfo = AppInfo()
+        settingsFilenameOrig = os.path.join(appInfo.path, "misc/setup/situationboard_default.conf")
+        settingsFilename = os.path.join(appInfo.path, ".temp/situationboard.conf")
+
+        shutil.copy(settingsFilenameOrig, settingsFilename)
+
+        self.settings = Settings(settingsFilename, appInfo.path)
+
+    def test_empty(self) -> None:
+        eventQueue = EventQueue(threading.Event())
+        assert(len(eventQueue) == 0)
+        assert(eventQueue.pop() is None)
+        assert(not eventQueue.wait(0.0))
+        assert(not eventQueue.wait(0.01))
+        eventQueue.wakeup()
+        assert(eventQueue.wait(0.0))
+        assert(not eventQueue.wait(0.0))
+
+    def test_push_pop(self) -> None:
+        eventQueue = EventQueue(threading.Event())
+        event1 = SourceEvent()
+        event2 = SourceEvent()
+        eventQueue.push(event1)
+        eventQueue.push(event2)
+        assert(len(eventQueue) == 2)
+        assert(eventQueue.wait(10.0))
+        assert(eventQueue.pop() is event1)
+        assert(eventQueue.pop() is event2)
+        assert(eventQueue.pop() is None)
+
+    def test_wait_push_from_thread(self) -> None:
+        eventQueue = EventQueue(threading.Event())
+        event = SourceEvent()
+        timer = threading.Timer(0.05, eventQueue.push, [event])
+        start = time.monotonic()
+        timer.start()
+        assert(eventQueue.wait(10.0))
+        assert(time.monotonic() - start < 5.0)
+        assert(eventQueue.pop() is event)
+        timer.join()
+
+    def test_wakeup(self) -> None:
+        eventQueue = EventQueue(threading.Event())
+        eventQueue.wakeup()
+        assert(eventQueue.wait(10.0))
+        assert(eventQueue.pop() is None)
+
+    def test_source_driver_push(self) -> None:
+        eventQueue = EventQueue(threading.Event())
+        sourceDriver = SourceDriverDummy("", self.settings)
+        assert(not sourceDriver.hasEventQueue())
+        sourceDriver.attachEventQueue(eventQueue)
+        assert(sourceDriver.hasEventQueue())
+
+        # the signal handler wakes up the event loop that generates exactly one alarm event when polling the source
+        os.kill(os.getpid(), signal.SIGALRM)
+        assert(eventQueue.wait(10.0))
+        assert(eventQueue.pop() is None)
+        alarmEvent = sourceDriver.retrieveEvent()
+        assert(isinstance(alarmEvent, AlarmEvent))
+        assert(alarmEvent.valid)
+        assert(sourceDriver.retrieveEvent() is None)
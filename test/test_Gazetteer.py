@@ -0,0 +1,121 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+
+from typing import List, Optional, Tuple
+
+from backend.util.AppInfo import AppInfo
+from backend.data.Gazetteer import Gazetteer
+
+class Test_Gazetteer:
+
+    STREETS = 2000
+    HOUSES = 20
+
+    def setup_class(self) -> None:
+        #pylint: disable=W0201
+        appInfo = AppInfo()
+        self.filename = os.path.join(appInfo.path, ".temp/gazetteer.csv")
+        self.osmFilename = os.path.join(appInfo.path, ".temp/gazetteer_osm.csv")
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+
+        syllables = ["berg", "tal", "wald", "feld", "bach", "hof", "linden", "eichen", "birken", "kirch", "mühl", "sonnen"]
+        suffixes = ["straße", "weg", "gasse", "allee", "ring"]
+        prefixes = ["", "Obere ", "Untere "]
+
+        self.streets: List[str] = []
+        with open(self.filename, 'w', encoding='utf-8') as f:
+            f.write("city;street;housenumber;latitude;longitude\n")
+            f.write("Musterdorf;Hauptstraße;1;48.0;11.0\n")
+            f.write("Musterdorf;Hauptstraße;3;48.0;11.2\n")
+            f.write("Musterdorf;Hauptstraße;9;48.0;11.8\n")
+            f.write("Musterdorf;Hauptstraße;9a;48.1;11.8\n")
+            f.write("Nachbardorf;Hauptstraße;1;47.0;10.0\n")
+            f.write("Musterdorf;Am Marktplatz;;48.5;11.5\n")
+            f.write("Musterdorf;Invalid;1;x;y\n")
+            for i in range(Test_Gazetteer.STREETS):
+                # unique street names (without numbers that would be mistaken for house numbers)
+                combinations = len(syllables) * len(syllables) * len(suffixes)
+                street = prefixes[i // combinations] + syllables[i % len(syllables)].capitalize() + \
+                         syllables[i // len(syllables) % len(syllables)] + suffixes[i // len(syllables) // len(syllables) % len(suffixes)]
+                self.streets.append(street)
+                for house in range(1, Test_Gazetteer.HOUSES + 1):
+                    f.write(f"Musterdorf;{street};{house};{50.0 + i * 0.001};{12.0 + house * 0.0001}\n")
+
+        # format of osmconvert (with headline and a different separator)
+        with open(self.osmFilename, 'w', encoding='utf-8') as f:
+            f.write("addr:city\taddr:street\taddr:housenumber\t@lat\t@lon\n")
+            f.write("Musterdorf\tBahnhofstraße\t2\t48.2\t11.2\n")
+
+        self.gazetteer = Gazetteer("test", self.filename)
+
+    def __search(self, location: str, locationDetails: str) -> Optional[Tuple[float, float]]:
+        result = self.gazetteer.search(location, locationDetails)
+        return (round(result.latitude, 6), round(result.longitude, 6)) if result is not None else None
+
+    def test_load(self) -> None:
+        assert(len(self.gazetteer) == 6 + Test_Gazetteer.STREETS * Test_Gazetteer.HOUSES)
+
+        gazetteer = Gazetteer("test", self.osmFilename)
+        assert(len(gazetteer) == 1)
+        result = gazetteer.geocode("Musterdorf Bahnhofstr. 2")
+        assert(result is not None)
+        assert(result.address == "Bahnhofstraße 2, Musterdorf")
+        assert((result.latitude, result.longitude) == (48.2, 11.2))
+
+    def test_search(self) -> None:
+        assert(self.__search("Musterdorf", "Hauptstraße 1") == (48.0, 11.0))
+        assert(self.__search("MUSTERDORF", "Hauptstr. 3") == (48.0, 11.2))
+        assert(self.__search("Musterdorf", "Hauptstraße 9 a") == (48.1, 11.8))
+        assert(self.__search("Musterdorf", "Hauptstraße 9b") == (48.0, 11.8))
+        assert(self.__search("Nachbardorf", "Hauptstraße 1") == (47.0, 10.0))
+        assert(self.__search("Musterdorf", "Am Marktplatz") == (48.5, 11.5))
+        assert(self.__search("", "Musterdorf Hauptstraße 1") == (48.0, 11.0))
+        assert(self.__search("Musterdorf", "Unbekannte Straße 1") is None)
+        assert(self.__search("Musterdorf", "Invalid 1") is None)
+
+    def test_house_numbers(self) -> None:
+        assert(self.__search("Musterdorf", "Hauptstraße 2") == (48.0, 11.1))   # interpolated
+        assert(self.__search("Musterdorf", "Hauptstraße 6") == (48.0, 11.5))   # interpolated
+        assert(self.__search("Musterdorf", "Hauptstraße 99") is None)          # beyond the last house
+        assert(self.__search("Musterdorf", "Hauptstraße 0") is None)           # before the first house
+        assert(self.__search("Musterdorf", "Hauptstraße") == (48.0, 11.0))     # first house
+
+    def test_city(self) -> None:
+        # streets of other cities are not returned (even if the street name matches)
+        assert(self.__search("Berlin", "Hauptstraße 1") is None)
+        assert(self.__search("", "Berlin Hauptstraße 1") is None)
+        assert(self.__search("Nachbardorf", "Am Marktplatz") is None)
+        assert(self.__search("Nachbardorf", "Am Marktpaltz") is None)
+        assert(self.__search("Musterdorf - Mustergemeinde", "Hauptstraße 1") == (48.0, 11.0))
+
+    def test_fuzzy(self) -> None:
+        assert(self.__search("Musterdorf", "Hauptstrase 3") == (48.0, 11.2))
+        assert(self.__search("Musterdorf", "Haupstraße 3") == (48.0, 11.2))
+        assert(self.__search("Musterdorf", "Am Marktpaltz") == (48.5, 11.5))
+        assert(self.__search("Musterdorf", "Hauptgasse 3") is None)
+
+    def test_large_gazetteer(self) -> None:
+        # the generated streets are found among all others (even if misspelled)
+        for i in range(0, Test_Gazetteer.STREETS, 97):
+            street = self.streets[i]
+            house = i % Test_Gazetteer.HOUSES + 1
+            coordinates = (round(50.0 + i * 0.001, 6), round(12.0 + house * 0.0001, 6))
+            assert(self.__search("Musterdorf", f"{street} {house}") == coordinates)
+            assert(self.__search("MUSTERDORF", f"{street.upper()} {house}") == coordinates)
+            assert(self.__search("Musterdorf", f"{street[:-2]}{street[-1]} {house}") == coordinates)   # misspelled
+            assert(self.__search("", f"Musterdorf {street} {house}") == coordinates)
@@ -18,6 +18,10 @@ import os
 import datetime
 import shutil
 
+from typing import Dict
+
+from test.benchmark.fuzz_MessageParserSMS import generateMutations
+
 from backend.util.AppInfo import AppInfo
 from backend.util.Settings import Settings
 from backend.source.MessageParserSMS import MessageParserSMS
@@ -29,6 +33,10 @@ from backend.event.UnhandledEvent import UnhandledEvent
 
 class Test_MessageParserSMS:
 
+    # reception time of the messages of the current test
+    receptionTime = datetime.datetime.now()
+    defaultTimestamp = receptionTime.strftime(AlarmEvent.TIMESTAMP_FORMAT)
+
     def setup_class(self) -> None:
         #pylint: disable=W0201
         appInfo = AppInfo()
@@ -44,9 +52,21 @@ class Test_MessageParserSMS:
         self.defaultSender = "112"
         self.alarmSender = "+49112" # alarm sender set in config
         self.settingSender = "123"
-        self.defaultTimestamp = datetime.datetime.now().strftime(AlarmEvent.TIMESTAMP_FORMAT)
         self.eid = 1302
 
+    def setup_method(self) -> None:
+        # messages of one test must not be merged with alarm messages of previous tests
+        # (i.e. they are received after the merge duration of the previous test)
+        self.__nextReceptionTime()
+
+    def __nextReceptionTime(self) -> None:
+        Test_MessageParserSMS.receptionTime += datetime.timedelta(seconds = 100)
+        Test_MessageParserSMS.defaultTimestamp = Test_MessageParserSMS.receptionTime.strftime(AlarmEvent.TIMESTAMP_FORMAT)
+
+    def __later(self, seconds: int) -> datetime.datetime:
+        # the merge duration starts at the (second resolution) timestamp of the first fragment
+        return datetime.datetime.strptime(self.defaultTimestamp, AlarmEvent.TIMESTAMP_FORMAT) + datetime.timedelta(seconds = seconds)
+
     def __new_message(self, raw: str, sender: str = "", timestamp: str = "", source: str = "") -> SourceEvent:
         sourceEvent = SourceEvent()
         sourceEvent.source = source if source != "" else SourceEvent.SOURCE_SMS
@@ -78,21 +98,21 @@ class Test_MessageParserSMS:
         # parse empty message (should return None)
         sms = ""
         se = self.__new_message(sms)
-        m = self.p.parseMessage(se, None)
+        m = self.p.parseMessage(se)
         assert(m is None)
 
     def test_empty_message_alarm_sender(self) -> None:
         # parse empty message from alarm sender (should return None)
         sms = ""
         se = self.__new_message(sms)
-        m = self.p.parseMessage(se, None)
+        m = self.p.parseMessage(se)
         assert(m is None)
 
     def test_unhandled_invalid_header(self) -> None:
         # parse unhandled event (invalid header and not from alarm sender)
         sms = "test112"
         se = self.__new_message(sms)
-        m = self.p.parseMessage(se, None)
+        m = self.p.parseMessage(se)
         assert(isinstance(m, UnhandledEvent))
         self.__check_original(m, sms)
         assert(m.unparsable)
@@ -101,7 +121,7 @@ class Test_MessageParserSMS:
         # parse invalid alarm event (invalid header but from alarm sender)
         sms = "test112"
         se = self.__new_message(sms, sender=self.alarmSender)
-        m = self.p.parseMessage(se, None)
+        m = self.p.parseMessage(se)
         assert(isinstance(m, AlarmEvent))
         self.__check_original(m, sms, sender=self.alarmSender)
         assert(m.invalid)
@@ -111,7 +131,7 @@ class Test_MessageParserSMS:
         # parse invalid alarm event (correct header but parsing event and location failed)
         sms = "SMS Alarm\nNOTHING HERE"
         se = self.__new_message(sms)
-        m = self.p.parseMessage(se, None)
+        m = self.p.parseMessage(se)
         assert(isinstance(m, AlarmEvent))
         self.__check_original(m, sms)
         assert(m.invalid)
@@ -121,7 +141,7 @@ class Test_MessageParserSMS:
         # parse valid alarm event (correct header, successful parsing, any sender)
         sms = "SMS Alarm\nAlarmzeit: 24.06.2019 01:02:03\nEO: location, location details\nevent details\nSTW: event\nBem: comment\ncomment\ncomment"
         se = self.__new_message(sms)
-        m = self.p.parseMessage(se, None)
+        m = self.p.parseMessage(se)
         assert(isinstance(m, AlarmEvent))
         self.__check_original(m, sms)
         assert(m.valid)
@@ -133,11 +153,44 @@ class Test_MessageParserSMS:
         assert(m.comment == "comment\ncomment\ncomment")
         assert(m.noID)
 
+    def test_valid_alarm_event_custom_format(self) -> None:
+        # parse valid alarm event of another dispatch centre (alarm format declared in the config file)
+        appInfo = AppInfo()
+        settingsFilenameOrig = os.path.join(appInfo.path, "misc/setup/situationboard_default.conf")
+        settingsFilename = os.path.join(appInfo.path, ".temp/situationboard_format.conf")
+        shutil.copy(settingsFilenameOrig, settingsFilename)
+
+        s = Settings(settingsFilename, appInfo.path)
+        s.setString("parser:sms:ils", "alarm_header", "ILS Alarm")
+        s.setString("parser:sms:ils", "alarm_keywords", "Einsatzzeit:=timestamp,Stichwort:=event,Ort:=location,Objekt:=location_details,Hinweis:=comment")
+        s.setString("parser:sms:ils", "alarm_continuations", "event=event_details")
+        s.setString("parser:sms:ils", "alarm_timestamp_formats", "%Y-%m-%d %H:%M")
+        p = MessageParserSMS("ils", s)
+
+        sms = "ILS Alarm\nEinsatzzeit: 2019-06-24 01:02\nStichwort: B 3\nBrand Wohnhaus\nOrt: location\nObjekt: location details\nHinweis: comment\ncomment"
+        se = self.__new_message(sms)
+        m = p.parseMessage(se)
+        assert(isinstance(m, AlarmEvent))
+        self.__check_original(m, sms)
+        assert(m.valid)
+        assert(m.alarmTimestamp == "2019-06-24 01:02:00")
+        assert(m.event == "B 3")
+        assert(m.eventDetails == "Brand Wohnhaus")
+        assert(m.location == "location")
+        assert(m.locationDetails == "location details")
+        assert(m.comment == "comment\ncomment")
+
+        # the default format is not understood by this parser instance
+        sms = "ILS Alarm\nAlarmzeit: 24.06.2019 01:02:03\nEO: location, location details\nevent details\nSTW: event\nBem: comment"
+        m = p.parseMessage(self.__new_message(sms))
+        assert(isinstance(m, AlarmEvent))
+        assert(m.invalid)
+
     def test_valid_alarm_event_invalid_timestamp(self) -> None:
         # parse valid alarm event with invalid timestamp (correct header, successful parsing, any sender)
         sms = "SMS Alarm\nAlarmzeit: 24.06.ABCD 01:02:03\nEO: location, location details\nevent details\nSTW: event\nBem: comment\ncomment\ncomment"
         se = self.__new_message(sms)
-        m = self.p.parseMessage(se, None)
+        m = self.p.parseMessage(se)
         assert(isinstance(m, AlarmEvent))
         self.__check_original(m, sms)
         assert(m.valid)
@@ -155,7 +208,7 @@ class Test_MessageParserSMS:
         sms2 = "ails\nSTW: event\nBem: comment\ncomment\ncomment"
 
         se1 = self.__new_message(sms1)
-        m1 = self.p.parseMessage(se1, None)
+        m1 = self.p.parseMessage(se1)
         assert(isinstance(m1, AlarmEvent))
         self.__check_original(m1, sms1)
         assert(m1.invalid)
@@ -169,7 +222,7 @@ class Test_MessageParserSMS:
         m1.eventID = self.eid
 
         se2 = self.__new_message(sms2)
-        m2 = self.p.parseMessage(se2, m1)
+        m2 = self.p.parseMessage(se2)
         assert(isinstance(m2, AlarmEvent))
         self.__check_original(m2, sms1 + sms2)
         assert(m2.valid)
@@ -188,7 +241,7 @@ class Test_MessageParserSMS:
         sms2 = "nt\nBem: comment\ncomment\ncomment"
 
         se1 = self.__new_message(sms1)
-        m1 = self.p.parseMessage(se1, None)
+        m1 = self.p.parseMessage(se1)
         assert(isinstance(m1, AlarmEvent))
         self.__check_original(m1, sms1)
         assert(m1.invalid)
@@ -202,7 +255,7 @@ class Test_MessageParserSMS:
         m1.eventID = self.eid
 
         se2 = self.__new_message(sms2)
-        m2 = self.p.parseMessage(se2, m1)
+        m2 = self.p.parseMessage(se2)
         assert(isinstance(m2, AlarmEvent))
         self.__check_original(m2, sms1 + sms2)
         assert(m2.valid)
@@ -221,7 +274,7 @@ class Test_MessageParserSMS:
         sms2 = "comment\ncomment"
 
         se1 = self.__new_message(sms1)
-        m1 = self.p.parseMessage(se1, None)
+        m1 = self.p.parseMessage(se1)
         assert(isinstance(m1, AlarmEvent))
         self.__check_original(m1, sms1)
         assert(m1.valid)
@@ -235,7 +288,7 @@ class Test_MessageParserSMS:
         m1.eventID = self.eid
 
         se2 = self.__new_message(sms2)
-        m2 = self.p.parseMessage(se2, m1)
+        m2 = self.p.parseMessage(se2)
         assert(isinstance(m2, AlarmEvent))
         self.__check_original(m2, sms1 + sms2)
         assert(m2.valid)
@@ -248,13 +301,116 @@ class Test_MessageParserSMS:
         assert(m2.eventID == self.eid)
         assert(m2 is m1)
 
+    def test_valid_alarm_event_merged_concurrent_senders(self) -> None:
+        # parse two alarm events whose fragments (split within keywords and lines) are received alternately from two senders
+        sms = "SMS Alarm\nAlarmzeit: 24.06.2019 01:02:03\nEO: location, location details\nevent details\nSTW: event\nBem: comment\ncomment"
+        senders = [self.defaultSender, self.alarmSender]
+        cuts = [0, 40, 73, 88, len(sms)]
+
+        alarms: Dict[str, AlarmEvent] = {}
+        for (start, end) in zip(cuts[:-1], cuts[1:]):
+            for sender in senders:
+                m = self.p.parseMessage(self.__new_message(sms[start:end], sender=sender))
+                assert(isinstance(m, AlarmEvent))
+                alarms.setdefault(sender, m)
+                assert(m is alarms[sender])
+                if m.noID:
+                    m.eventID = self.eid
+
+        for sender in senders:
+            m = alarms[sender]
+            self.__check_original(m, sms, sender=sender)
+            assert(m.valid)
+            assert(m.alarmTimestamp == "2019-06-24 01:02:03")
+            assert(m.event == "event")
+            assert(m.eventDetails == "event details")
+            assert(m.location == "location")
+            assert(m.locationDetails == "location details")
+            assert(m.comment == "comment\ncomment")
+
+    def test_valid_alarm_event_merged_without_changes(self) -> None:
+        # parse a fragment that only changes the raw text of the alarm event (the update is held back until the next change)
+        sms1 = "SMS Alarm\nAlarmzeit: 24.06.2019 01:02:03\nEO: location, location details\nevent details\nSTW: event\nBem: comment"
+        sms2 = "  "
+        sms3 = "\ncomment"
+
+        m1 = self.p.parseMessage(self.__new_message(sms1))
+        assert(isinstance(m1, AlarmEvent))
+        assert(m1.valid)
+        m1.eventID = self.eid
+
+        m2 = self.p.parseMessage(self.__new_message(sms2))
+        assert(m2 is None)
+        self.__check_original(m1, sms1 + sms2)
+        assert(m1.comment == "comment")
+        assert(self.p.retrievePendingEvent(self.__later(0)) is None)
+
+        m3 = self.p.parseMessage(self.__new_message(sms3))
+        assert(m3 is m1)
+        self.__check_original(m1, sms1 + sms2 + sms3)
+        assert(m1.comment == "comment  \ncomment")
+
+        # the update was returned with the changed comment (nothing is pending after the merge duration)
+        assert(self.p.retrievePendingEvent(self.__later(91)) is None)
+
+    def test_valid_alarm_event_merged_without_changes_expired(self) -> None:
+        # the held back raw text is returned once the merge duration expired
+        sms1 = "SMS Alarm\nAlarmzeit: 24.06.2019 01:02:03\nEO: location, location details\nevent details\nSTW: event\nBem: comment"
+        sms2 = "  "
+
+        m1 = self.p.parseMessage(self.__new_message(sms1))
+        assert(isinstance(m1, AlarmEvent))
+        m1.eventID = self.eid
+
+        assert(self.p.parseMessage(self.__new_message(sms2)) is None)
+        assert(self.p.retrievePendingEvent(self.__later(90)) is None)
+
+        m2 = self.p.retrievePendingEvent(self.__later(91))
+        assert(m2 is m1)
+        self.__check_original(m1, sms1 + sms2)
+        assert(m1.comment == "comment")
+        assert(self.p.retrievePendingEvent(self.__later(91)) is None)
+
+    def test_valid_alarm_event_merged_without_changes_replaced(self) -> None:
+        # the held back raw text is returned when the next alarm message of the sender is received
+        sms1 = "SMS Alarm\nAlarmzeit: 24.06.2019 01:02:03\nEO: location, location details\nevent details\nSTW: event\nBem: comment"
+        sms2 = "  "
+
+        m1 = self.p.parseMessage(self.__new_message(sms1))
+        assert(isinstance(m1, AlarmEvent))
+        m1.eventID = self.eid
+
+        assert(self.p.parseMessage(self.__new_message(sms2)) is None)
+
+        m2 = self.p.parseMessage(self.__new_message(sms1))
+        assert(isinstance(m2, AlarmEvent))
+        assert(m2 is not m1)
+        assert(self.p.retrievePendingEvent(self.__later(0)) is m1)
+        self.__check_original(m1, sms1 + sms2)
+        assert(self.p.retrievePendingEvent(self.__later(0)) is None)
+
+    def test_valid_alarm_event_not_merged_expired(self) -> None:
+        # parse a fragment that is received after the merge duration (not merged)
+        sms1 = "SMS Alarm\nAlarmzeit: 24.06.2019 01:02:03\nEO: location, location details\nevent details\nSTW: event\nBem: comment"
+        sms2 = "comment"
+        timestamp = datetime.datetime.now()
+        timestampLate = timestamp + datetime.timedelta(seconds = 91)
+
+        m1 = self.p.parseMessage(self.__new_message(sms1, timestamp=timestamp.strftime(AlarmEvent.TIMESTAMP_FORMAT)))
+        assert(isinstance(m1, AlarmEvent))
+        m1.eventID = self.eid
+
+        m2 = self.p.parseMessage(self.__new_message(sms2, timestamp=timestampLate.strftime(AlarmEvent.TIMESTAMP_FORMAT)))
+        assert(isinstance(m2, UnhandledEvent))
+        assert(m1.comment == "comment")
+
     def test_valid_alarm_event_not_merged_two_valid(self) -> None:
         # parse valid alarm event after not merging with another valid alarm event
         sms1 = "SMS Alarm\nAlarmzeit: 24.06.2019 01:02:03\nEO: location, location details\nevent details\nSTW: event1\nBem: comment one"
         sms2 = "SMS Alarm\nAlarmzeit: 24.06.2020 01:02:03\nEO: location, location details\nevent details\nSTW: event2\nBem: comment two"
 
         se1 = self.__new_message(sms1)
-        m1 = self.p.parseMessage(se1, None)
+        m1 = self.p.parseMessage(se1)
         assert(isinstance(m1, AlarmEvent))
         self.__check_original(m1, sms1)
         assert(m1.valid)
@@ -268,7 +424,7 @@ class Test_MessageParserSMS:
         m1.eventID = self.eid
 
         se2 = self.__new_message(sms2)
-        m2 = self.p.parseMessage(se2, m1)
+        m2 = self.p.parseMessage(se2)
         assert(isinstance(m2, AlarmEvent))
         self.__check_original(m2, sms2)
         assert(m2.valid)
@@ -287,7 +443,7 @@ class Test_MessageParserSMS:
         sms2 = "FALLBACK"
 
         se1 = self.__new_message(sms1)
-        m1 = self.p.parseMessage(se1, None)
+        m1 = self.p.parseMessage(se1)
         assert(isinstance(m1, AlarmEvent))
         self.__check_original(m1, sms1)
         assert(m1.valid)
@@ -301,7 +457,7 @@ class Test_MessageParserSMS:
         m1.eventID = self.eid
 
         se2 = self.__new_message(sms2, sender=self.alarmSender)
-        m2 = self.p.parseMessage(se2, m1)
+        m2 = self.p.parseMessage(se2)
         assert(isinstance(m2, AlarmEvent))
         self.__check_original(m2, sms2, sender=self.alarmSender)
         assert(m2.invalid)
@@ -314,7 +470,7 @@ class Test_MessageParserSMS:
         sms2 = "SMS Alarm\nAlarmzeit: 24.06.2020 01:02:03\nEO: location, location details\nevent details\nSTW: event2\nBem: comment\ncomment\ncomment"
 
         se1 = self.__new_message(sms1, sender=self.alarmSender)
-        m1 = self.p.parseMessage(se1, None)
+        m1 = self.p.parseMessage(se1)
         assert(isinstance(m1, AlarmEvent))
         self.__check_original(m1, sms1, sender=self.alarmSender)
         assert(m1.invalid)
@@ -322,7 +478,7 @@ class Test_MessageParserSMS:
         m1.eventID = self.eid
 
         se2 = self.__new_message(sms2, sender=self.alarmSender)
-        m2 = self.p.parseMessage(se2, m1)
+        m2 = self.p.parseMessage(se2)
         assert(isinstance(m2, AlarmEvent))
         self.__check_original(m2, sms2, sender=self.alarmSender)
         assert(m2.valid)
@@ -339,7 +495,7 @@ class Test_MessageParserSMS:
         # parse invalid settings event (no key, only value)
         sms = "=a b"
         se = self.__new_message(sms, sender=self.settingSender)
-        m = self.p.parseMessage(se, None)
+        m = self.p.parseMessage(se)
         assert(isinstance(m, SettingEvent))
         self.__check_original(m, sms, sender=self.settingSender)
         assert(m.invalid)
@@ -350,7 +506,7 @@ class Test_MessageParserSMS:
         # parse invalid settings event (no key, no value)
         sms = "="
         se = self.__new_message(sms, sender=self.settingSender)
-        m = self.p.parseMessage(se, None)
+        m = self.p.parseMessage(se)
         assert(isinstance(m, SettingEvent))
         self.__check_original(m, sms, sender=self.settingSender)
         assert(m.invalid)
@@ -361,7 +517,7 @@ class Test_MessageParserSMS:
         # parse valid settings event (only key, no value)
         sms = "key="
         se = self.__new_message(sms, sender=self.settingSender)
-        m = self.p.parseMessage(se, None)
+        m = self.p.parseMessage(se)
         assert(isinstance(m, SettingEvent))
         self.__check_original(m, sms, sender=self.settingSender)
         assert(m.valid)
@@ -372,7 +528,7 @@ class Test_MessageParserSMS:
         # parse valid settings event (key and multiline value)
         sms = "key=a b\nc d"
         se = self.__new_message(sms, sender=self.settingSender)
-        m = self.p.parseMessage(se, None)
+        m = self.p.parseMessage(se)
         assert(isinstance(m, SettingEvent))
         self.__check_original(m, sms, sender=self.settingSender)
         assert(m.valid)
@@ -383,9 +539,22 @@ class Test_MessageParserSMS:
         # parse valid settings event (key and value with =)
         sms = "key=a b=c d"
         se = self.__new_message(sms, sender=self.settingSender)
-        m = self.p.parseMessage(se, None)
+        m = self.p.parseMessage(se)
         assert(isinstance(m, SettingEvent))
         self.__check_original(m, sms, sender=self.settingSender)
         assert(m.valid)
         assert(m.key == "key")
         assert(m.value == "a b=c d")
+
+    def test_fuzz_corpus(self) -> None:
+        # parse mutated fixtures (the parser must neither raise nor return unexpected events)
+        for sms in generateMutations(500):
+            for sender in [self.defaultSender, self.alarmSender]:
+                self.__nextReceptionTime()
+                se = self.__new_message(sms, sender=sender)
+                m = self.p.parseMessage(se)
+                if sms == "":
+                    assert(m is None)
+                else:
+                    assert(isinstance(m, (AlarmEvent, SettingEvent, UnhandledEvent)))
+                    assert(m.raw == sms)
@@ -0,0 +1,94 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+
+from backend.data.Outbox import Outbox
+from backend.util.AppInfo import AppInfo
+
+class Test_Outbox:
+
+    def setup_method(self) -> None:
+        #pylint: disable=W0201
+        appInfo = AppInfo()
+        self.filename = os.path.join(appInfo.path, ".temp/outbox.sqlite")
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_enqueue_deduplication(self) -> None:
+        outbox = Outbox("outbox", self.filename)
+        assert(outbox.enqueue("key1", "GROUP", "/request1", 60.0))
+        assert(not outbox.enqueue("key1", "GROUP", "/request1", 60.0)) # still pending
+        assert(outbox.enqueue("key2", "GROUP", "/request2", 60.0))
+        assert(outbox.getPendingCount() == 2)
+
+        for item in outbox.acquireDueItems(10.0):
+            outbox.markSent(item)
+
+        assert(outbox.getPendingCount() == 0)
+        assert(not outbox.enqueue("key1", "GROUP", "/request1", 60.0)) # sent recently
+        assert(outbox.enqueue("key1", "GROUP", "/request1", 0.0))      # no deduplication
+        assert(outbox.getState() == {'pending': 1, 'sent': 1, 'failed': 0,
+                                     'oldest_pending_age': 0.0, 'oldest_pending_attempts': 0, 'oldest_pending_error': ""})
+        outbox.close()
+
+    def test_lease_and_retry(self) -> None:
+        outbox = Outbox("outbox", self.filename)
+        outbox.enqueue("key", "GROUP", "/request")
+
+        items = outbox.acquireDueItems(10.0)
+        assert(len(items) == 1)
+        assert(items[0].request == "/request")
+        assert(outbox.acquireDueItems(10.0) == []) # leased
+
+        outbox.markRetry(items[0], 0.1, "error")
+        assert(outbox.acquireDueItems(10.0) == [])
+        nextAttempt = outbox.getNextAttempt()
+        assert(nextAttempt is not None and nextAttempt > time.time())
+
+        time.sleep(0.15)
+        items = outbox.acquireDueItems(10.0)
+        assert(len(items) == 1)
+        assert(items[0].attempts == 1)
+        outbox.markFailed(items[0], "error")
+        assert(outbox.getNextAttempt() is None)
+        assert(outbox.getState()['failed'] == 1)
+        outbox.close()
+
+    def test_crash_recovery(self) -> None:
+        outbox = Outbox("outbox", self.filename)
+        outbox.enqueue("key1", "GROUP", "/request1")
+        outbox.enqueue("key2", "GROUP", "/request2")
+        assert(len(outbox.acquireDueItems(60.0)) == 2)
+        outbox.close() # crash while the requests were in flight
+
+        outbox = Outbox("outbox", self.filename)
+        assert(outbox.getPendingCount() == 2)
+        assert(len(outbox.acquireDueItems(60.0)) == 2) # delivered right away
+        outbox.close()
+
+    def test_expire_purge(self) -> None:
+        outbox = Outbox("outbox", self.filename)
+        outbox.enqueue("key", "GROUP", "/request")
+        time.sleep(0.05)
+        assert(outbox.expire(60.0) == 0)
+        assert(outbox.expire(0.01) == 1)
+        assert(outbox.getPendingCount() == 0)
+        assert(outbox.purge(60.0) == 0)
+        assert(outbox.purge(0.0) == 1)
+        assert(outbox.getState() == {'pending': 0, 'sent': 0, 'failed': 0})
+        outbox.close()
@@ -0,0 +1,162 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import threading
+
+from typing import List, Optional
+
+import pytest
+
+from backend.action.Action import Action
+from backend.api.WebSocket import WebSocket
+from backend.event.SourceEvent import SourceEvent
+from backend.data.Database import Database
+from backend.source.SourceDriver import SourceDriver, SourceState
+from backend.source.SourceDriverDummy import SourceDriverDummy
+from backend.util.AppInfo import AppInfo
+from backend.util.Settings import Settings
+from backend.util.DisplayPowerManager import DisplayPowerManager
+from backend.util.PluginManager import PluginManager
+from backend.util.PluginRegistry import PluginRegistry
+
+class _ActionRegistryTest(Action):
+
+    DEPENDENCIES = [Action.DEPENDENCY_DATABASE]
+
+    BARRIER_TIMEOUT = 5.0 # in seconds
+
+    barrier: Optional[threading.Barrier] = None # set by tests that require all instances to be initialized at the same time
+    created: List['_ActionRegistryTest'] = []
+
+    def __init__(self, instanceName: str, settings: Settings, database: Database) -> None:
+        super().__init__("registry_test", instanceName, settings, True)
+        self.database = database
+        self.initThread = threading.current_thread().name
+        self.initOverlapped = False
+        barrier = _ActionRegistryTest.barrier
+        if barrier is not None:
+            # e.g. initial download or slow hardware (that only completes once all instances are initializing)
+            try:
+                barrier.wait(_ActionRegistryTest.BARRIER_TIMEOUT)
+                self.initOverlapped = True
+            except threading.BrokenBarrierError:
+                pass
+        _ActionRegistryTest.created.append(self)
+
+class _SourceRegistryTest(SourceDriver):
+
+    created: List['_SourceRegistryTest'] = []
+
+    def __init__(self, instanceName: str, settings: Settings) -> None:
+        super().__init__("registry_test", instanceName, settings, None, True)
+        self.state = SourceState.OK
+        self.stateQueries = 0
+        _SourceRegistryTest.created.append(self)
+
+    def getSourceState(self) -> SourceState:
+        self.stateQueries += 1
+        return self.state
+
+class Test_PluginRegistry:
+
+    def setup_class(self) -> None:
+        #pylint: disable=W0201
+        appInfo = AppInfo()
+        settingsFilenameOrig = os.path.join(appInfo.path, "misc/setup/situationboard_default.conf")
+        settingsFilename = os.path.join(appInfo.path, ".temp/situationboard.conf")
+        databaseFilename = os.path.join(appInfo.path, ".temp/situationboard.sqlite")
+
+        shutil.copy(settingsFilenameOrig, settingsFilename)
+
+        self.appInfo = appInfo
+        self.database = Database(databaseFilename, reset = True)
+        self.settings = Settings(settingsFilename, appInfo.path)
+
+        PluginRegistry.register(PluginRegistry.TYPE_SOURCE, "registry_test", f"{__name__}:_SourceRegistryTest")
+        PluginRegistry.register(PluginRegistry.TYPE_ACTION, "registry_test", f"{__name__}:_ActionRegistryTest")
+
+    def teardown_class(self) -> None:
+        self.database.commitAndClose()
+
+    def test_builtin_plugins(self) -> None:
+        assert("sms" in PluginRegistry.getPluginNames(PluginRegistry.TYPE_SOURCE))
+        assert("sms" in PluginRegistry.getPluginNames(PluginRegistry.TYPE_PARSER))
+        assert("update_database" in PluginRegistry.getPluginNames(PluginRegistry.TYPE_ACTION))
+        assert("registry_test" in PluginRegistry.getPluginNames(PluginRegistry.TYPE_ACTION))
+        assert(PluginRegistry.loadPlugin(PluginRegistry.TYPE_SOURCE, "dummy") is SourceDriverDummy)
+
+    def test_lazy_import(self) -> None:
+        # the module of a plugin is only imported when the plugin is loaded
+        PluginRegistry.register(PluginRegistry.TYPE_ACTION, "registry_missing", "backend.action.ActionMissing:ActionMissing")
+        assert("registry_missing" in PluginRegistry.getPluginNames(PluginRegistry.TYPE_ACTION))
+        with pytest.raises(ImportError):
+            PluginRegistry.loadPlugin(PluginRegistry.TYPE_ACTION, "registry_missing")
+
+    def test_invalid_plugins(self) -> None:
+        with pytest.raises(KeyError):
+            PluginRegistry.loadPlugin(PluginRegistry.TYPE_ACTION, "registry_unknown")
+        with pytest.raises(ValueError):
+            PluginRegistry.register("invalid", "registry_invalid", "module:Class")
+        with pytest.raises(ValueError):
+            PluginRegistry.register(PluginRegistry.TYPE_ACTION, "registry_invalid", "module")
+
+    def test_dependencies(self) -> None:
+        action = PluginRegistry.createPlugin(PluginRegistry.TYPE_ACTION, "registry_test", "dependencies", self.settings,
+                                             {Action.DEPENDENCY_DATABASE: self.database, Action.DEPENDENCY_WEBSOCKET: None})
+        assert(isinstance(action, _ActionRegistryTest))
+        assert(action.database is self.database)
+
+        with pytest.raises(KeyError):
+            PluginRegistry.createPlugin(PluginRegistry.TYPE_ACTION, "registry_test", "missing", self.settings, {})
+
+    def test_parallel_init(self) -> None:
+        instances = [f"parallel{i}" for i in range(4)]
+        self.settings.setString("backend", "sources", "registry_test:parallel")
+        self.settings.setString("backend", "actions", ",".join(f"registry_test:{i}" for i in instances))
+        self.settings.setInt("backend", "plugin_init_workers", 4)
+
+        webSocket = WebSocket(self.appInfo, self.settings, self.database)
+        pluginManager = PluginManager(self.settings, self.database, webSocket, DisplayPowerManager(self.settings))
+
+        _ActionRegistryTest.barrier = threading.Barrier(len(instances))
+        try:
+            pluginManager.initPlugins()
+        finally:
+            _ActionRegistryTest.barrier = None
+
+        # the action plugins are initialized in parallel (on worker threads) but keep the configured order
+        actionPlugins = [a for a in _ActionRegistryTest.created if a.instanceName in instances]
+        assert(sorted(a.instanceName for a in actionPlugins) == instances)
+        assert(all(a.initOverlapped for a in actionPlugins))
+
+        # the action plugins handle events in the configured order (sequential dispatch)
+        pluginManager.handleEvent(SourceEvent())
+        assert(list(pluginManager.getActionTimings().keys()) == [f"action:registry_test:{i}" for i in instances])
+        assert(all(a.initThread != threading.current_thread().name for a in actionPlugins))
+        assert(all(a.database is self.database for a in actionPlugins))
+
+        # the source state is cached (and only updated by the event loop)
+        sourcePlugin = _SourceRegistryTest.created[-1]
+        assert(pluginManager.getSourceState() == SourceState.OK)
+        sourcePlugin.state = SourceState.ERROR
+        queries = sourcePlugin.stateQueries
+        assert(pluginManager.getSourceState() == SourceState.OK)
+        assert(sourcePlugin.stateQueries == queries)
+        assert(pluginManager.updateSourceState())
+        assert(not pluginManager.updateSourceState())
+        assert(pluginManager.getSourceState() == SourceState.ERROR)
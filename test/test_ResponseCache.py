@@ -0,0 +1,119 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import time
+import threading
+
+from typing import List
+
+from socketio import packet
+
+from backend.util.ResponseCache import ResponseCache, EncodedPayload, PayloadJSON
+
+class Test_ResponseCache:
+
+    def test_hit_miss(self) -> None:
+        cache = ResponseCache(4)
+        calls: List[int] = []
+
+        def producer() -> str:
+            calls.append(1)
+            return "payload"
+
+        assert(cache.get("endpoint", 10, 0, producer) == "payload")
+        assert(cache.get("endpoint", 10, 0, producer) == "payload")
+        assert(len(calls) == 1)
+
+        # different parameters or revisions are separate entries
+        assert(cache.get("endpoint", 20, 0, producer) == "payload")
+        assert(cache.get("endpoint", 10, 1, producer) == "payload")
+        assert(cache.get("other", 10, 1, producer) == "payload")
+        assert(len(calls) == 4)
+
+        stats = cache.getStats()
+        assert(stats['hits'] == 1)
+        assert(stats['misses'] == 4)
+        assert(stats['entries'] == 4)
+
+    def test_eviction(self) -> None:
+        cache = ResponseCache(2)
+        cache.get("endpoint", 1, 0, lambda: 1)
+        cache.get("endpoint", 2, 0, lambda: 2)
+        cache.get("endpoint", 1, 0, lambda: 0)  # hit (entry 1 is now the most recently used one)
+        cache.get("endpoint", 3, 0, lambda: 3)  # evicts entry 2
+        assert(len(cache) == 2)
+        assert(cache.get("endpoint", 1, 0, lambda: 0) == 1)
+        assert(cache.get("endpoint", 2, 0, lambda: 0) == 0)
+
+        cache.clear()
+        assert(len(cache) == 0)
+
+    def test_disabled(self) -> None:
+        cache = ResponseCache(0)
+        assert(cache.get("endpoint", 1, 0, lambda: 1) == 1)
+        assert(cache.get("endpoint", 1, 0, lambda: 2) == 2)
+        assert(len(cache) == 0)
+        assert(cache.getStats()['misses'] == 2)
+
+    def test_single_flight(self) -> None:
+        cache = ResponseCache(4)
+        calls: List[int] = []
+        results: List[str] = []
+
+        def producer() -> str:
+            calls.append(1)
+            time.sleep(0.1) # concurrent requests arrive while the payload is created
+            return "payload"
+
+        threads = [threading.Thread(target=lambda: results.append(cache.get("endpoint", 1, 0, producer))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert(len(calls) == 1)
+        assert(results == ["payload"] * 4)
+        stats = cache.getStats()
+        assert(stats['misses'] == 1)
+        assert(stats['shared'] + stats['hits'] == 3)
+
+    def test_single_flight_error(self) -> None:
+        cache = ResponseCache(4)
+
+        def producer() -> str:
+            raise ValueError("failed")
+
+        try:
+            cache.get("endpoint", 1, 0, producer)
+            assert(False)
+        except ValueError:
+            pass
+
+        # failed payloads are not cached
+        assert(cache.get("endpoint", 1, 0, lambda: "payload") == "payload")
+        assert(cache.getStats()['misses'] == 2)
+
+    def test_encoded_payload(self) -> None:
+        data = {'total': 1, 'events': ["Event", None]}
+        encodedPacket = packet.Packet(packet.EVENT, data=["stats", data], namespace="/ns")
+        encodedPacket.json = PayloadJSON
+        payloadPacket = packet.Packet(packet.EVENT, data=["stats", EncodedPayload(data)], namespace="/ns")
+        payloadPacket.json = PayloadJSON
+
+        # packets with an encoded payload are identical to packets that are encoded as a whole
+        assert(payloadPacket.encode() == encodedPacket.encode())
+        assert(PayloadJSON.loads(PayloadJSON.dumps(["stats", EncodedPayload(data)])) == ["stats", data])
@@ -0,0 +1,273 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+import shutil
+import datetime
+import threading
+
+from typing import List, Optional
+
+from test.FakeGammu import FakeGammu
+
+from backend.util.AppInfo import AppInfo
+from backend.util.Settings import Settings
+from backend.util.EventQueue import EventQueue
+from backend.source.SourceDriver import SourceState
+from backend.source.SourceDriverSMS import SourceDriverSMS
+from backend.source.MessageParserSMS import MessageParserSMS
+from backend.event.SourceEvent import SourceEvent
+from backend.event.AlarmEvent import AlarmEvent
+
+class Test_SourceDriverSMS:
+
+    def setup_class(self) -> None:
+        #pylint: disable=W0201
+        appInfo = AppInfo()
+        settingsFilenameOrig = os.path.join(appInfo.path, "misc/setup/situationboard_default.conf")
+        settingsFilename = os.path.join(appInfo.path, ".temp/situationboard.conf")
+
+        shutil.copy(settingsFilenameOrig, settingsFilename)
+
+        self.settings = Settings(settingsFilename, appInfo.path)
+
+    def __create_source(self, instanceName: str, fakeGammu: FakeGammu, pollInterval: float = 0.01, networkInterval: float = 0.01) -> SourceDriverSMS:
+        # each test uses its own (named) parser and source instances
+        self.settings.setFloat(f"source:sms:{instanceName}", "poll_interval", pollInterval)
+        self.settings.setFloat(f"source:sms:{instanceName}", "network_interval", networkInterval)
+        parser = MessageParserSMS(instanceName, self.settings)
+        source = SourceDriverSMS(instanceName, self.settings, parser, backend = fakeGammu)
+        source.attachEventQueue(EventQueue(threading.Event()))
+        return source
+
+    def __retrieve_events(self, source: SourceDriverSMS, count: int, timeout: float = 5.0) -> List[SourceEvent]:
+        events: List[SourceEvent] = []
+        deadline = time.monotonic() + timeout
+        while len(events) < count and time.monotonic() < deadline:
+            sourceEvent = source.retrieveEvent()
+            if sourceEvent is not None:
+                events.append(sourceEvent)
+            else:
+                time.sleep(0.01)
+        return events
+
+    def __wait_for_state(self, source: SourceDriverSMS, state: SourceState, timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if source.getSourceState() == state:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_burst(self) -> None:
+        fakeGammu = FakeGammu()
+        now = datetime.datetime.now().replace(microsecond=0)
+        fakeGammu.receive("123", "third", timestamp = now + datetime.timedelta(seconds=2))
+        fakeGammu.receive("456", "first", timestamp = now)
+        fakeGammu.receive("789", "second message", timestamp = now + datetime.timedelta(seconds=1), parts = 2)
+        fakeGammu.receive("321", "incomplete", timestamp = now, parts = 2, partNumbers = [1]) # second part is missing
+
+        source = self.__create_source("burst", fakeGammu, pollInterval = 0.05)
+        try:
+            events = self.__retrieve_events(source, 3)
+            assert([e.raw for e in events] == ["first", "second message", "third"])
+            assert([e.sender for e in events] == ["456", "789", "123"])
+
+            # the incomplete multipart SMS is kept on the modem until all parts are available
+            with fakeGammu.lock:
+                assert(len(fakeGammu.stored) == 1)
+
+            source.stop(5.0)
+            assert(fakeGammu.getCalls("DeleteSMS") == 4)
+            assert(source.retrieveEvent() is None)
+        finally:
+            source.stop(5.0)
+
+    def test_delete_failure(self) -> None:
+        fakeGammu = FakeGammu()
+        fakeGammu.deleteFailures = 2 # the first message and the first part of the multipart message
+        fakeGammu.receive("123", "message")
+        fakeGammu.receive("456", "multipart message", parts = 2)
+
+        source = self.__create_source("delete_failure", fakeGammu)
+        try:
+            # messages that could not be deleted are queued only once (while their deletion is retried)
+            deadline = time.monotonic() + 5.0
+            while time.monotonic() < deadline:
+                with fakeGammu.lock:
+                    if len(fakeGammu.stored) == 0:
+                        break
+                time.sleep(0.01)
+            source.stop(5.0)
+
+            with fakeGammu.lock:
+                assert(len(fakeGammu.stored) == 0)
+            assert(fakeGammu.getCalls("DeleteSMS") == 5)
+            events: List[SourceEvent] = []
+            sourceEvent = source.retrieveEvent()
+            while sourceEvent is not None:
+                events.append(sourceEvent)
+                sourceEvent = source.retrieveEvent()
+            assert(sorted(e.raw for e in events) == ["message", "multipart message"])
+        finally:
+            source.stop(5.0)
+
+    def test_drain(self) -> None:
+        fakeGammu = FakeGammu()
+        now = datetime.datetime.now().replace(microsecond=0)
+        count = 20
+        for i in reversed(range(count)):
+            fakeGammu.receive(f"{i}", f"message {i}", timestamp = now + datetime.timedelta(seconds=i))
+        fakeGammu.receive("999", "", timestamp = now) # swallowed by the parser (empty message)
+
+        # only the initial scan is done (the next poll is not due during the test)
+        source = self.__create_source("drain", fakeGammu, pollInterval = 60.0)
+        try:
+            # all stored SMS are read and deleted by a single scan and handled in the order of their reception
+            events = self.__retrieve_events(source, count)
+            assert([e.raw for e in events] == [f"message {i}" for i in range(count)])
+            assert(source.retrieveEvent() is None)
+
+            source.stop(5.0)
+            assert(fakeGammu.getCalls("GetSMSStatus") == 1)
+            assert(fakeGammu.getCalls("GetNextSMS") == count + 1)
+            assert(fakeGammu.getCalls("DeleteSMS") == count + 1)
+            with fakeGammu.lock:
+                assert(len(fakeGammu.stored) == 0)
+        finally:
+            source.stop(5.0)
+
+    def test_delete_failure_rescan(self) -> None:
+        fakeGammu = FakeGammu()
+        fakeGammu.deleteFailures = 1000 # the messages cannot be deleted at all
+        fakeGammu.receive("123", "first")
+        fakeGammu.receive("456", "second")
+        fakeGammu.receive("789", "third")
+
+        source = self.__create_source("delete_failure_rescan", fakeGammu, pollInterval = 60.0)
+        try:
+            events = self.__retrieve_events(source, 3)
+            assert(sorted(e.raw for e in events) == ["first", "second", "third"])
+
+            # further scans retry the deletion but do not queue the messages again
+            # (the modem thread handles the commands in order, i.e. both scans are done once it stopped)
+            source.requestScan()
+            source.requestScan()
+            source.stop(5.0)
+
+            assert(fakeGammu.getCalls("GetSMSStatus") == 3)
+            assert(fakeGammu.getCalls("DeleteSMS") == 3 * 3)
+            with fakeGammu.lock:
+                assert(len(fakeGammu.stored) == 3)
+            assert(source.retrieveEvent() is None)
+        finally:
+            source.stop(5.0)
+
+    def test_alarm(self) -> None:
+        fakeGammu = FakeGammu()
+        sms = "SMS Alarm\nAlarmzeit: 24.06.2019 01:02:03\nEO: location, location details\nevent details\nSTW: event\nBem: comment"
+        fakeGammu.receive("+49112", sms, parts = 3)
+
+        source = self.__create_source("alarm", fakeGammu)
+        try:
+            events = self.__retrieve_events(source, 1)
+            assert(len(events) == 1)
+            alarmEvent = events[0]
+            assert(isinstance(alarmEvent, AlarmEvent))
+            assert(alarmEvent.event == "event")
+            assert(alarmEvent.location == "location")
+            assert(alarmEvent.comment == "comment")
+        finally:
+            source.stop(5.0)
+
+    def test_slow_modem(self) -> None:
+        # the event loop must not be blocked by the (slow) modem I/O
+        fakeGammu = FakeGammu()
+        source = self.__create_source("slow_modem", fakeGammu, pollInterval = 0.0)
+        try:
+            fakeGammu.delay = 0.2
+            with fakeGammu.lock:
+                fakeGammu.callers.clear() # the modem is initialized by the caller of the constructor
+            fakeGammu.receive("123", "message")
+
+            events: List[Optional[SourceEvent]] = []
+            deadline = time.monotonic() + 10.0
+            while len(events) == 0 and time.monotonic() < deadline:
+                sourceEvent = source.retrieveEvent()
+                assert(source.getSourceState() == SourceState.OK)
+                if sourceEvent is not None:
+                    events.append(sourceEvent)
+                time.sleep(0.01)
+
+            assert(len(events) == 1)
+            with fakeGammu.lock:
+                assert(len(fakeGammu.callers) > 0)
+                assert(threading.current_thread() not in fakeGammu.callers)
+        finally:
+            fakeGammu.delay = 0.0
+            source.stop(5.0)
+
+    def test_modem_failure(self) -> None:
+        # the modem thread survives failing modem I/O
+        fakeGammu = FakeGammu()
+        source = self.__create_source("modem_failure", fakeGammu, pollInterval = 60.0, networkInterval = 60.0)
+        try:
+            assert(self.__wait_for_state(source, SourceState.OK))
+
+            fakeGammu.statusFailures = 1
+            source.requestScan()
+            assert(self.__wait_for_state(source, SourceState.ERROR))
+
+            source.requestNetworkProbe()
+            assert(self.__wait_for_state(source, SourceState.OK))
+
+            fakeGammu.receive("123", "message")
+            source.requestScan()
+            events = self.__retrieve_events(source, 1)
+            assert([e.raw for e in events] == ["message"])
+        finally:
+            source.stop(5.0)
+
+    def test_network_state(self) -> None:
+        fakeGammu = FakeGammu()
+        fakeGammu.setNetwork("")
+        source = self.__create_source("network_state", fakeGammu, networkInterval = 60.0)
+        try:
+            assert(source.getSourceState() == SourceState.ERROR)
+
+            fakeGammu.setNetwork("262 01")
+            source.requestNetworkProbe()
+            assert(self.__wait_for_state(source, SourceState.OK))
+
+            fakeGammu.setNetwork("")
+            source.requestNetworkProbe()
+            assert(self.__wait_for_state(source, SourceState.ERROR))
+        finally:
+            source.stop(5.0)
+
+    def test_request_scan(self) -> None:
+        fakeGammu = FakeGammu()
+        source = self.__create_source("request_scan", fakeGammu, pollInterval = 60.0)
+        try:
+            assert(len(self.__retrieve_events(source, 1, timeout = 0.1)) == 0)
+
+            fakeGammu.receive("123", "message")
+            source.requestScan()
+            events = self.__retrieve_events(source, 1)
+            assert([e.raw for e in events] == ["message"])
+        finally:
+            source.stop(5.0)
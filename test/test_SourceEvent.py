@@ -0,0 +1,75 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import copy
+
+from backend.event.SourceEvent import SourceEvent
+from backend.event.AlarmEvent import AlarmEvent
+from backend.event.SettingEvent import SettingEvent
+from backend.event.UnhandledEvent import UnhandledEvent
+
+class Test_SourceEvent:
+
+    def test_slots(self) -> None:
+        for event in [SourceEvent(), AlarmEvent(), SettingEvent(), UnhandledEvent(UnhandledEvent.CAUSE_IGNORED_SENDER)]:
+            assert(not hasattr(event, "__dict__"))
+            try:
+                setattr(event, "unknownField", "value")
+                assert(False)
+            except AttributeError:
+                pass
+
+    def test_json_fields(self) -> None:
+        assert(SourceEvent.jsonFields() == ("source", "sender", "raw", "timestamp"))
+        assert(AlarmEvent.jsonFields() == ("source", "sender", "raw", "timestamp", "eventID",
+                                           "event", "eventDetails", "location", "locationDetails", "comment", "alarmTimestamp",
+                                           "locationLatitude", "locationLongitude", "flags"))
+        assert(SettingEvent.jsonFields() == ("source", "sender", "raw", "timestamp", "key", "value", "flags"))
+        assert(UnhandledEvent.jsonFields() == ("source", "sender", "raw", "timestamp", "cause"))
+
+    def test_json(self) -> None:
+        alarmEvent = AlarmEvent(42)
+        alarmEvent.event = "Brand"
+        alarmEvent.locationLatitude = 1.5
+        alarmEvent.flags = AlarmEvent.FLAGS_VALID
+
+        alarmEventDict = alarmEvent.toJSON()
+        assert(list(alarmEventDict.keys()) == list(AlarmEvent.jsonFields()))
+        assert(alarmEventDict["eventID"] == 42)
+        assert(alarmEventDict["event"] == "Brand")
+        assert(alarmEventDict["locationLatitude"] == 1.5)
+        assert(alarmEventDict["flags"] == AlarmEvent.FLAGS_VALID)
+        assert(alarmEventDict["source"] == SourceEvent.SOURCE_UNKNOWN)
+
+        # the JSON representation is a snapshot that is independent of the event
+        alarmEventDict["event"] = "Changed"
+        assert(alarmEvent.event == "Brand")
+        alarmEvent.comment = "Comment"
+        assert(alarmEventDict["comment"] == "")
+        assert(alarmEvent.toJSON()["comment"] == "Comment")
+
+    def test_copy(self) -> None:
+        alarmEvent = AlarmEvent(7)
+        alarmEvent.location = "Location"
+        alarmEventCopy = copy.deepcopy(alarmEvent)
+        assert(alarmEventCopy is not alarmEvent)
+        assert(alarmEventCopy.toJSON() == alarmEvent.toJSON())
+
+        settingEvent = SettingEvent()
+        settingEvent.key = "header"
+        settingEvent.copyDataFrom(alarmEvent)
+        assert(settingEvent.toJSON()["key"] == "header")
+        assert(settingEvent.toJSON()["source"] == alarmEvent.source)
@@ -0,0 +1,81 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+import time
+import importlib
+import subprocess
+
+from backend.util.AppInfo import AppInfo
+from backend.util.StartupProfiler import StartupProfiler
+
+class Test_StartupProfiler:
+
+    def test_phases(self) -> None:
+        profiler = StartupProfiler(True)
+        with profiler.phase("first"):
+            time.sleep(0.01)
+        profiler.addPhase("second", 1.5)
+        profiler.mark("ready")
+
+        phases = profiler.getPhases()
+        assert([name for (name, _) in phases] == ["first", "second"])
+        assert(phases[0][1] >= 0.01)
+        assert(phases[1][1] == 1.5)
+        profiler.report()
+
+    def test_disabled(self) -> None:
+        profiler = StartupProfiler(False)
+        with profiler.phase("first"):
+            pass
+        profiler.addPhase("second", 1.0)
+        profiler.startImportTracking()
+        importlib.import_module("json")
+        profiler.stopImportTracking()
+        assert(len(profiler.getPhases()) == 0)
+        assert(len(profiler.getImports()) == 0)
+
+    def test_import_tracking(self) -> None:
+        sys.modules.pop("colorsys", None)
+        sys.modules.pop("wave", None)
+        originalImport = __import__
+        originalImportModule = importlib.import_module
+
+        profiler = StartupProfiler(True)
+        profiler.startImportTracking()
+        try:
+            importlib.import_module("colorsys")
+            import wave # pylint: disable=import-outside-toplevel,unused-import
+            importlib.import_module("colorsys") # already imported (not tracked again)
+        finally:
+            profiler.stopImportTracking()
+
+        imports = profiler.getImports()
+        assert("colorsys" in imports)
+        assert("wave" in imports)
+        (cumulative, selfDuration) = imports["wave"]
+        assert(0.0 <= selfDuration <= cumulative)
+
+        # the original import functions are restored
+        assert(__import__ is originalImport)
+        assert(importlib.import_module is originalImportModule)
+
+    def test_import_budget(self) -> None:
+        # the import/export commands must not import the web server or (heavy) plugin dependencies
+        heavyModules = ["flask", "flask_socketio", "geopy", "gammu", "RPi", "backend.api.WebSocket"]
+        script = f"import sys, SituationBoard; print(','.join(m for m in {heavyModules!r} if m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", script], cwd=AppInfo().path, capture_output=True, text=True, check=True)
+        assert(result.stdout.strip() == "")
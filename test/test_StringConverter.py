@@ -0,0 +1,94 @@
+# SituationBoard - Alarm Display for Fire Departments
+# Copyright (C) 2017-2021 Sebastian Maier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import random
+
+from typing import List
+
+from backend.util.StringConverter import StringConverter
+
+def singleline2stringReference(csvText: str) -> str:
+    # original (character by character) implementation that defines the expected semantics
+    dbText = ""
+    act = False
+
+    for c in csvText:
+        if act is False and c == '\\':
+            act = True
+        elif act is True and c == 'n':
+            dbText += '\n'
+            act = False
+        elif act is True and c == '\\':
+            dbText += '\\'
+            act = False
+        else:
+            dbText += c
+
+    return dbText
+
+def string2singlelineReference(dbText: str) -> str:
+    # original (character by character) implementation that defines the expected semantics
+    csvText = ""
+
+    for c in dbText:
+        if c == '\\':
+            csvText += '\\\\'
+        elif c == '\n':
+            csvText += '\\n'
+        else:
+            csvText += c
+
+    return csvText
+
+class Test_StringConverter:
+
+    ALPHABET = ["\\", "n", "\n", "\r", "a", "Z", " ", ";", "\"", "ä", "ß", "\U0001F692"]
+
+    def setup_class(self) -> None:
+        #pylint: disable=W0201
+        self.random = random.Random(112)
+
+    def __randomStrings(self, count: int, maxLength: int) -> List[str]:
+        return ["".join(self.random.choices(Test_StringConverter.ALPHABET, k = self.random.randint(0, maxLength)))
+                for _ in range(count)]
+
+    def test_examples(self) -> None:
+        assert(StringConverter.string2singleline("") == "")
+        assert(StringConverter.string2singleline("a\nb\\c") == "a\\nb\\\\c")
+        assert(StringConverter.singleline2string("") == "")
+        assert(StringConverter.singleline2string("a\\nb\\\\c") == "a\nb\\c")
+
+        # unknown escape sequences and trailing backslashes behave as before
+        assert(StringConverter.singleline2string("\\x") == "x")
+        assert(StringConverter.singleline2string("\\xn") == "x\n")
+        assert(StringConverter.singleline2string("\\x\\") == "x\\")
+        assert(StringConverter.singleline2string("a\\") == "a")
+        assert(StringConverter.singleline2string("\\\n") == "\n")
+
+    def test_equivalence(self) -> None:
+        for text in self.__randomStrings(20000, 16):
+            assert(StringConverter.singleline2string(text) == singleline2stringReference(text))
+            assert(StringConverter.string2singleline(text) == string2singlelineReference(text))
+
+    def test_round_trip(self) -> None:
+        for text in self.__randomStrings(5000, 64):
+            singleLine = StringConverter.string2singleline(text)
+            assert("\n" not in singleLine)
+            assert(StringConverter.singleline2string(singleLine) == text)
+
+    def test_long_text(self) -> None:
+        text = "SMS Alarm\nAlarmzeit: 24.06.2019 01:02:03\nEO: location\\details\n" * 2000
+        assert(StringConverter.singleline2string(StringConverter.string2singleline(text)) == text)
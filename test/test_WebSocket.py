@@ -15,6 +15,7 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import json
 import shutil
 
 from typing import Tuple, Any, Dict, Optional
@@ -26,6 +27,7 @@ from backend.util.AppInfo import AppInfo
 from backend.util.Settings import Settings
 from backend.util.DisplayPowerManager import DisplayPowerManager
 from backend.util.PluginManager import PluginManager
+from backend.util.ResponseCache import EncodedPayload
 from backend.event.AlarmEvent import AlarmEvent
 
 class Test_WebSocket:
@@ -64,6 +66,7 @@ class Test_WebSocket:
         self.__emit("get_last_alarm_events", {'count': 10})
         (event, args) = self.__getReceived()
         assert(event == "last_alarm_events")
+        assert(args['revision'] == 0)
         assert(args['total_events'] == 0)
         assert(args['alarm_events'] == "[]")
 
@@ -77,6 +80,31 @@ class Test_WebSocket:
         assert(args['month'] == 0)
         assert(args['today'] == 0)
 
+    def test_response_cache(self) -> None:
+        stats = self.webSocket.responseCache.getStats()
+
+        # identical requests are answered from the cache
+        self.__emit("get_last_alarm_events", {'count': 5})
+        (_, args1) = self.__getReceived()
+        self.__emit("get_last_alarm_events", {'count': 5})
+        (_, args2) = self.__getReceived()
+        assert(args1 == args2)
+        assert(self.webSocket.responseCache.getStats()['misses'] == stats['misses'] + 1)
+        assert(self.webSocket.responseCache.getStats()['hits'] == stats['hits'] + 1)
+
+        # changing the database invalidates the cached payloads
+        alarmEvent = AlarmEvent()
+        alarmEvent.event = "Event"
+        alarmEvent.flags = AlarmEvent.FLAGS_VALID
+        eventID = self.database.addEvent(alarmEvent)
+        self.__emit("get_last_alarm_events", {'count': 5})
+        (_, args3) = self.__getReceived()
+        assert(args3['revision'] == args1['revision'] + 1)
+        assert(args3['total_events'] == 1)
+        assert(self.webSocket.responseCache.getStats()['misses'] == stats['misses'] + 2)
+
+        assert(self.database.removeEventID(eventID) == 0)
+
     def test_get_header(self) -> None:
         self.__emit("get_header")
         (event, args) = self.__getReceived()
@@ -100,6 +128,14 @@ class Test_WebSocket:
         assert(args['start_timestamp'] > 0)
         assert(args['source_state'] == SourceState.OK)
 
+    def test_broadcast_state(self) -> None:
+        self.webSocket.broadcastState()
+        (event, args) = self.__getReceived()
+        assert(event == "state")
+        assert(args is not None)
+        assert(args['version'] == self.appInfo.version)
+        assert(args['source_state'] == SourceState.OK)
+
     def test_broadcast_alarm_event(self) -> None:
         alarmEvent = AlarmEvent(1302)
         self.webSocket.broadcastAlarmEvent(alarmEvent)
@@ -124,8 +160,17 @@ class Test_WebSocket:
 
     def test_broadcast_database_changed(self) -> None:
         self.webSocket.broadcastDatabaseChanged()
-        (event, _) = self.__getReceived()
+        (event, args) = self.__getReceived()
+        assert(event == "database_changed")
+        assert(args['revision'] == self.database.getRevision())
+        assert(args['alarm_event'] is None)
+
+        alarmEvent = AlarmEvent(1302)
+        self.webSocket.broadcastDatabaseChanged(WebSocket.CHANGE_ADDED, alarmEvent)
+        (event, args) = self.__getReceived()
         assert(event == "database_changed")
+        assert(args['change'] == WebSocket.CHANGE_ADDED)
+        assert(args['alarm_event']['eventID'] == 1302)
 
     def test_broadcast_calendar_changed(self) -> None:
         self.webSocket.broadcastCalendarChanged()
@@ -166,6 +211,59 @@ class Test_WebSocket:
         assert(state['version'] == self.appInfo.version)
         assert(state['start_timestamp'] > 0)
         assert(state['source_state'] == SourceState.OK)
+        assert(state['action_states'] == {})
+        assert(state['response_cache']['misses'] >= 0)
+
+    def test_get_alarm_events(self) -> None:
+        eventIDs = [self.__addEvent(f"Event {i}") for i in range(5)]
+
+        self.__emit("get_alarm_events", {'limit': 2, 'fields': ['event', 'flags']})
+        (event, args) = self.__getReceived()
+        assert(event == "alarm_events")
+        assert(args['total_events'] == 5)
+        assert(args['more'])
+        assert([e['eventID'] for e in args['alarm_events']] == [eventIDs[4], eventIDs[3]])
+        assert(args['alarm_events'][0] == {'eventID': eventIDs[4], 'event': "Event 4", 'flags': AlarmEvent.FLAGS_VALID})
+
+        # request the next (older) page with the cursor of the previous page
+        self.__emit("get_alarm_events", {'limit': 2, 'before_id': args['next_before_id']})
+        (event, args) = self.__getReceived()
+        assert([e['eventID'] for e in args['alarm_events']] == [eventIDs[2], eventIDs[1]])
+        assert('raw' in args['alarm_events'][0])
+
+        self.__emit("get_alarm_events", {'limit': 0})
+        (event, args) = self.__getReceived()
+        assert(event == "alarm_events")
+        assert('error' in args)
+
+        for eventID in eventIDs:
+            assert(self.database.removeEventID(eventID) == 0)
+
+    def test_api_events(self) -> None:
+        eventIDs = [self.__addEvent(f"Event {i}") for i in range(3)]
+
+        response = self.appClient.get(f'/api/v1/events?limit=2&fields=event&after_id={eventIDs[0]}&flags=valid')
+        assert(response.status_code == 200)
+        assert(response.json['result'] == "ok")
+        events = response.json['events']
+        assert(events['alarm_events'] == [{'eventID': eventIDs[2], 'event': "Event 2"}, {'eventID': eventIDs[1], 'event': "Event 1"}])
+        assert(not events['more'])
+        assert(events['next_after_id'] == eventIDs[2])
+
+        for query in ["limit=1000", "before_id=abc", "since=2021-13-01", "fields=unknown"]:
+            response = self.appClient.get(f'/api/v1/events?{query}')
+            assert(response.status_code == 400)
+            assert(response.json['result'] == "error")
+
+        for eventID in eventIDs:
+            assert(self.database.removeEventID(eventID) == 0)
+
+    def __addEvent(self, text: str) -> int:
+        alarmEvent = AlarmEvent()
+        alarmEvent.event = text
+        alarmEvent.raw = text
+        alarmEvent.flags = AlarmEvent.FLAGS_VALID
+        return self.database.addEvent(alarmEvent)
 
     def __emit(self, event: str, args: Optional[Dict[str, Any]] = None) -> None:
         if args is not None:
@@ -183,6 +281,9 @@ class Test_WebSocket:
         assert(asgsListLen <= 1)
         if asgsListLen == 1:
             args = argsList[0]
+            if isinstance(args, EncodedPayload):
+                # the test client receives the packet data without encoding it
+                args = json.loads(args.encoded)
             return (event, args)
 
         return (event, None)